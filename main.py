@@ -13,7 +13,21 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 # Import and run the main API
 if __name__ == "__main__":
     import uvicorn
-    from api import app
-    
-    # Run the application
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # Several API workers only pay off when they share one embedding model
+    # through the embedding worker (src/rag_api/embedding_worker.py)
+    workers = int(os.getenv("RAG_API_WORKERS", "1"))
+    if os.getenv("RAG_SERVER_MODE") == "prefork":
+        # Load models once, then fork workers sharing them copy-on-write
+        from prefork_server import serve
+        serve(host="0.0.0.0", port=8000, workers=workers)
+    elif workers > 1:
+        if not os.getenv("RAG_EMBEDDING_WORKER_SOCKET"):
+            print("⚠️  RAG_API_WORKERS > 1 without RAG_EMBEDDING_WORKER_SOCKET: every worker loads its own embedding model")
+        uvicorn.run("api:app", host="0.0.0.0", port=8000, workers=workers,
+                    app_dir=os.path.join(os.path.dirname(__file__), 'src'))
+    else:
+        from api import app
+
+        # Run the application
+        uvicorn.run(app, host="0.0.0.0", port=8000)
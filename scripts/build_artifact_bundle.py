@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Build an offline artifact bundle (embedding model, tokenizers, NLTK data and an
+optional ONNX export, with checksums) for servers started with
+RAG_ARTIFACT_BUNDLE=<bundle dir>.
+
+Usage:
+    python scripts/build_artifact_bundle.py --output artifacts/2024.06 --onnx
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from rag_api.artifacts import build_bundle, load_bundle, DEFAULT_TOKENIZERS, DEFAULT_NLTK_PACKAGES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an offline model and NLTK artifact bundle")
+    parser.add_argument("--output", required=True, help="Bundle directory to create")
+    parser.add_argument("--version", help="Bundle version (default: build timestamp)")
+    parser.add_argument("--embedding-model", default="intfloat/multilingual-e5-small",
+                        help="Embedding model to bundle (use intfloat/multilingual-e5-base for GPU servers)")
+    parser.add_argument("--tokenizer", action="append", metavar="NAME=REPO",
+                        help="Tokenizer to bundle; repeatable (default: %s)" %
+                             ", ".join(f"{k}={v}" for k, v in DEFAULT_TOKENIZERS.items()))
+    parser.add_argument("--nltk", nargs="*", default=DEFAULT_NLTK_PACKAGES, help="NLTK packages to bundle")
+    parser.add_argument("--onnx", action="store_true", help="Also export the embedding model to ONNX")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    tokenizers = None
+    if args.tokenizer:
+        tokenizers = dict(item.split("=", 1) for item in args.tokenizer)
+
+    if os.path.exists(args.output) and os.listdir(args.output):
+        print(f"❌ Output directory {args.output} is not empty")
+        sys.exit(1)
+
+    manifest = build_bundle(
+        args.output,
+        embedding_model=args.embedding_model,
+        tokenizers=tokenizers,
+        nltk_packages=args.nltk,
+        export_onnx=args.onnx,
+        version=args.version
+    )
+    # Re-read and verify what was written
+    load_bundle(args.output, verify=True)
+
+    print(f"✅ Built artifact bundle {manifest['version']} in {args.output}")
+    print(f"   - {len(manifest['files'])} files checksummed")
+    print(f"   - Tokenizers: {', '.join(manifest['tokenizers']) or 'none'}")
+    print(f"   - ONNX export: {'yes' if manifest['onnx'] else 'no'}")
+    print(f"Start the API with RAG_ARTIFACT_BUNDLE={os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Request, Depends, status, Body, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Request, Depends, status, Body, WebSocket, WebSocketDisconnect
 from typing import Optional, List, Union, Dict, Any
 import datetime
 import aiofiles
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
@@ -19,23 +19,9 @@ import aiofiles
 import aiofiles.os
 import glob
 import asyncio
-from quiz_management import (
-    init_quiz_management_db,
-    create_manual_quiz,
-    get_all_quizzes,
-    get_quiz_by_id,
-    update_quiz,
-    delete_quiz,
-    submit_quiz_result,
-    get_quiz_submissions,
-    get_quiz_statistics,
-    Quiz,
-    QuizQuestion,
-    QuizSubmission
-)
 import aiosqlite
 
-from rag_api.timing_utils import Timer, PerformanceTracker, time_block
+from rag_api.timing_utils import Timer, PerformanceTracker, SearchTrace, time_block
 
 from userdb import (
     create_user,
@@ -73,6 +59,15 @@ from messages_db import (
     get_unread_message_count,
 )
 from rag_security import SecureRAGRetriever, get_filtered_rag_context
+from response_fields import (
+    init_field_defaults_db,
+    resolve_fields,
+    wants,
+    project,
+    set_api_key_field_defaults,
+    get_api_key_field_defaults,
+    PROJECTABLE_ENDPOINTS,
+)
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -98,22 +93,6 @@ from api_keys import (
 )
 
 
-from plugin_manager import (
-    init_plugins_db,
-    enable_plugin,
-    disable_plugin,
-    is_plugin_enabled,
-    list_enabled_plugins,
-    create_plugin_token,
-    validate_plugin_token,
-    revoke_plugin_token,
-    list_plugin_tokens,
-    bind_plugin_resource,
-    get_org_plugin_resources,
-    get_organization_plugin_status,
-)
-
-
 from llm import llm_call
 
 
@@ -121,79 +100,72 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), 'rag_api'))
 from rag_api.pydantic_models import QueryInput, QueryResponse, DocumentInfo, DeleteFileRequest, ModelName
 from rag_api.langchain_utils import get_rag_chain
-from rag_api.db_utils import insert_application_logs, get_chat_history, get_all_documents, insert_document_record, delete_document_record, get_file_content_by_filename
+from rag_api.db_utils import insert_application_logs, get_chat_history, get_all_documents, insert_document_record, insert_document_record_from_file, delete_document_record, get_file_content_by_filename, get_document_info_by_filename
 from rag_api.chroma_utils import index_document_to_chroma, delete_doc_from_chroma
+from rag_api.title_index import get_title_for_file
+from rag_api.lazy import readiness, warm_up_in_background
+from rag_api.indexing_queue import enqueue_indexing_job, get_job_status, recover_orphaned_jobs, indexing_pool
+from rag_api.zip_ingest import start_zip_ingestion, get_ingestion, list_ingestions
+from rag_api.ingest_progress import ingest_progress, PUSH_INTERVAL_SECONDS
+from rag_api.resource_manager import resource_manager
+from rag_api.serving_profile import SERVING_PROFILE, is_search_profile
 import json
 import datetime
 
 
 from metricsdb import init_metrics_db, log_event, log_query, log_file_access, log_security_event
-from metrics_middleware import MetricsMiddleware
-from quizdb import init_quiz_db, create_quiz_for_filename, get_quiz_by_filename
 from rag_api.db_utils import insert_application_logs
 
 
-from opencart_catalog import (
-    init_catalog_db,
-    create_catalog,
-    get_catalog,
-    list_catalogs_by_user,
-    list_catalogs_by_org,
-    update_catalog_metadata,
-    delete_catalog,
-    upsert_catalog_products,
-    get_catalog_products,
-    mark_products_indexed,
-    log_indexing_event,
-)
-
-
-try:
-    from analytics_core import get_analytics_core, QueryMetrics, QueryType, SecurityEventType, SecurityEvent
-    from advanced_analytics_api import router as advanced_analytics_router
-    from performance_analytics import PerformanceTracker as AnalyticsPerformanceTracker
-    from user_behavior_analytics import UserBehaviorAnalyzer
-    from security_analytics import SecurityAnalyzer
-    from analytics_middleware import AdvancedAnalyticsMiddleware
-    ADVANCED_ANALYTICS_ENABLED = True
-except ImportError as e:
-    logger_temp = logging.getLogger(__name__)
-    logger_temp.warning(f"Advanced analytics not available: {e}")
-    ADVANCED_ANALYTICS_ENABLED = False
-    AdvancedAnalyticsMiddleware = None
-    
-    get_analytics_core = None  
-    QueryMetrics = None  
-    QueryType = None  
-    SecurityEventType = None  
-    SecurityEvent = None  
-    advanced_analytics_router = None  
-    AnalyticsPerformanceTracker = None  
-    UserBehaviorAnalyzer = None  
-    SecurityAnalyzer = None  
+# Analytics, reports, metrics and CMS back routes the search profile does not
+# serve, so read replicas never import them
+ADVANCED_ANALYTICS_ENABLED = False
+AdvancedAnalyticsMiddleware = None
+get_analytics_core = None
+QueryMetrics = None
+QueryType = None
+SecurityEventType = None
+SecurityEvent = None
+advanced_analytics_router = None
+AnalyticsPerformanceTracker = None
+UserBehaviorAnalyzer = None
+SecurityAnalyzer = None
+
+if not is_search_profile():
+    try:
+        from analytics_core import get_analytics_core, QueryMetrics, QueryType, SecurityEventType, SecurityEvent
+        from advanced_analytics_api import router as advanced_analytics_router
+        from performance_analytics import PerformanceTracker as AnalyticsPerformanceTracker
+        from user_behavior_analytics import UserBehaviorAnalyzer
+        from security_analytics import SecurityAnalyzer
+        from analytics_middleware import AdvancedAnalyticsMiddleware
+        ADVANCED_ANALYTICS_ENABLED = True
+    except ImportError as e:
+        logger_temp = logging.getLogger(__name__)
+        logger_temp.warning(f"Advanced analytics not available: {e}")
 
 
 init_metrics_db()
 
 
-from reports_api import router as reports_router
-from metrics_api import router as metrics_router
-from metrics_user_api import router as metrics_user_router
-
-# Import CMS API from landing-pages-api
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), 'landing-pages-api'))
+if not is_search_profile():
+    from metrics_middleware import MetricsMiddleware
+    from reports_api import router as reports_router
+    from metrics_api import router as metrics_router
+    from metrics_user_api import router as metrics_user_router
 
-# Set CMS database path to absolute path
-cms_db_path = os.path.join(os.path.dirname(__file__), 'landing-pages-api', 'landing_pages.db')
-os.environ['DATABASE_URL'] = cms_db_path
-import sys
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'landing-pages-api'))
-from database import init_database as init_cms_database
+    # Import CMS API from landing-pages-api
+    sys.path.append(os.path.join(os.path.dirname(__file__), 'landing-pages-api'))
+
+    # Set CMS database path to absolute path
+    cms_db_path = os.path.join(os.path.dirname(__file__), 'landing-pages-api', 'landing_pages.db')
+    os.environ['DATABASE_URL'] = cms_db_path
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'landing-pages-api'))
+    from database import init_database as init_cms_database
 
-from routers.cms import router as cms_router
-from database import init_database as init_cms_database
+    from routers.cms import router as cms_router
 
 app = FastAPI(
     title="RAG API",
@@ -204,11 +176,16 @@ app = FastAPI(
     openapi_url=None
 )
 
-app.include_router(reports_router)
-app.include_router(metrics_user_router)
+# Routes registered on the app are the ones in SEARCH_PROFILE_PATHS; every
+# other route is registered on full_routes, which only the full profile mounts
+full_routes = APIRouter()
+
+if not is_search_profile():
+    app.include_router(reports_router)
+    app.include_router(metrics_user_router)
 
-# Include CMS router from landing-pages-api
-app.include_router(cms_router, prefix="/api/cms", tags=["CMS"])
+    # Include CMS router from landing-pages-api
+    app.include_router(cms_router, prefix="/api/cms", tags=["CMS"])
 
 
 if ADVANCED_ANALYTICS_ENABLED and advanced_analytics_router:
@@ -230,17 +207,38 @@ if ADVANCED_ANALYTICS_ENABLED and AdvancedAnalyticsMiddleware:
     app.add_middleware(AdvancedAnalyticsMiddleware)
 
 
-app.add_middleware(MetricsMiddleware)
+if not is_search_profile():
+    app.add_middleware(MetricsMiddleware)
 
 
 @app.on_event("startup")
 async def _startup_events():
+    # Size the default executor and Starlette's threadpool from the CPU budget
+    resource_manager.install(asyncio.get_running_loop())
+
+    if is_search_profile():
+        # Read replica: only the tables auth and /query read from
+        await init_org_db()
+        await init_api_keys_db()
+        await init_field_defaults_db()
+        if os.getenv("RAG_WARMUP_ON_STARTUP", "true").lower() == "true":
+            warm_up_in_background()
+        logger.info(f"Serving profile '{SERVING_PROFILE}': {len(app.router.routes)} routes mounted")
+        return
+
+    # Feature modules are imported on first use, not when the API module loads
+    from quizdb import init_quiz_db
+    from quiz_management import init_quiz_management_db
+    from opencart_catalog import init_catalog_db
+    from plugin_manager import init_plugins_db
+
     await init_quiz_db()
     await init_quiz_management_db()  
     await init_opencart_db()
     await init_catalog_db()  
     await init_org_db()
     await init_api_keys_db()
+    await init_field_defaults_db()
     await init_plugins_db()
     
     # Initialize CMS database
@@ -248,6 +246,15 @@ async def _startup_events():
     
     # Initialize messages database
     await init_messages_db()
+
+    # Build the search stack (embedding model, tokenizers, Chroma) in the
+    # background; the API serves health, auth and CMS requests meanwhile
+    if os.getenv("RAG_WARMUP_ON_STARTUP", "true").lower() == "true":
+        warm_up_in_background()
+
+    # Uploads are indexed by the background pool
+    recover_orphaned_jobs()
+    indexing_pool.start()
     
     
     if ADVANCED_ANALYTICS_ENABLED:
@@ -262,7 +269,22 @@ async def _startup_events():
             logger.error(f"Failed to initialize advanced analytics: {e}")
 
 
+@app.get("/health")
+async def health_check():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness of the lazily initialized subsystems; 503 until all are ready"""
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
 UPLOAD_DIR = "uploads"
+# Uploads are copied to disk in blocks of this size
+UPLOAD_READ_BYTES = 1024 * 1024
 SECRETS_PATH = os.path.expanduser("~/secrets.toml")
 
 
@@ -320,6 +342,15 @@ class RAGQueryRequest(BaseModel):
     session_id: Optional[str] = None
     model_type: Optional[str] = None
     catalog_ids: Optional[List[str]] = None  
+    explain: Optional[bool] = False  # Admin only: return a per-stage trace of the search pipeline
+    fields: Optional[str] = None  # Comma-separated response fields, e.g. "immediate.files,immediate.snippets.source"
+
+class SearchResultsRequest(BaseModel):
+    question: Optional[str] = None
+    cursor: Optional[str] = None  # Opaque cursor from a previous page's next_cursor
+    page_size: Optional[int] = 10
+    max_results: Optional[int] = 50
+    stream: Optional[bool] = False  # Stream results as application/x-ndjson
 
 class BatchOverviewRequest(BaseModel):
     queries: List[str]
@@ -625,7 +656,7 @@ async def upsert_opencart_products(products: List[OCProductPayload]) -> Dict[str
                  product.description, product.url, product.image, qty, status, 
                  rating, datetime.utcnow())
             )
-@app.post("/api-keys/create", response_model=APIResponse)
+@full_routes.post("/api-keys/create", response_model=APIResponse)
 async def create_api_key_endpoint(
     request: CreateAPIKeyRequest,
     current_user=Depends(get_current_user)
@@ -678,7 +709,7 @@ async def create_api_key_endpoint(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/api-keys/list", response_model=APIResponse)
+@full_routes.get("/api-keys/list", response_model=APIResponse)
 async def list_api_keys_endpoint(
     current_user=Depends(get_current_user)
 ):
@@ -708,7 +739,7 @@ async def list_api_keys_endpoint(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/api-keys/{key_id}", response_model=APIResponse)
+@full_routes.get("/api-keys/{key_id}", response_model=APIResponse)
 async def get_api_key_endpoint(
     key_id: str,
     current_user=Depends(get_current_user)
@@ -742,7 +773,7 @@ async def get_api_key_endpoint(
         return APIResponse(status="error", message=f"Failed to get user details: {str(e)}", response=None)
 
 
-@app.put("/api-keys/{key_id}", response_model=APIResponse)
+@full_routes.put("/api-keys/{key_id}", response_model=APIResponse)
 async def update_api_key_endpoint(
     key_id: str,
     request: UpdateAPIKeyRequest,
@@ -790,7 +821,7 @@ async def update_api_key_endpoint(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.post("/api-keys/{key_id}/revoke", response_model=APIResponse)
+@full_routes.post("/api-keys/{key_id}/revoke", response_model=APIResponse)
 async def revoke_api_key_endpoint(
     key_id: str,
     current_user=Depends(get_current_user)
@@ -828,7 +859,7 @@ async def revoke_api_key_endpoint(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.delete("/api-keys/{key_id}", response_model=APIResponse)
+@full_routes.delete("/api-keys/{key_id}", response_model=APIResponse)
 async def delete_api_key_endpoint(
     key_id: str,
     current_user=Depends(get_current_user)
@@ -866,7 +897,7 @@ async def delete_api_key_endpoint(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/api-keys/{key_id}/quota", response_model=APIResponse)
+@full_routes.get("/api-keys/{key_id}/quota", response_model=APIResponse)
 async def get_api_key_quota(
     key_id: str,
     current_user=Depends(get_current_user)
@@ -909,7 +940,7 @@ async def get_api_key_quota(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/api-keys/{key_id}/usage-stats", response_model=APIResponse)
+@full_routes.get("/api-keys/{key_id}/usage-stats", response_model=APIResponse)
 async def get_api_key_usage_stats(
     key_id: str,
     days: int = 7,
@@ -954,7 +985,7 @@ async def get_api_key_usage_stats(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/api-keys/{key_id}/audit-log", response_model=APIResponse)
+@full_routes.get("/api-keys/{key_id}/audit-log", response_model=APIResponse)
 async def get_api_key_audit_log(
     key_id: str,
     limit: int = 20,
@@ -992,7 +1023,7 @@ async def get_api_key_audit_log(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/api-keys/{key_id}/llm-control", response_model=APIResponse)
+@full_routes.get("/api-keys/{key_id}/llm-control", response_model=APIResponse)
 async def get_api_key_llm_control(
     key_id: str,
     current_user=Depends(get_current_user)
@@ -1033,7 +1064,7 @@ async def get_api_key_llm_control(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.put("/api-keys/{key_id}/llm-control", response_model=APIResponse)
+@full_routes.put("/api-keys/{key_id}/llm-control", response_model=APIResponse)
 async def update_api_key_llm_control(
     key_id: str,
     request: dict,
@@ -1083,7 +1114,87 @@ async def update_api_key_llm_control(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/api-keys/permissions/list", response_model=APIResponse)
+@full_routes.get("/api-keys/{key_id}/field-defaults", response_model=APIResponse)
+async def get_api_key_field_defaults_endpoint(
+    key_id: str,
+    current_user=Depends(get_current_user)
+):
+    """Get the default response fields of an API key, per endpoint."""
+    try:
+        if current_user[3] not in ["admin"]:
+            raise HTTPException(status_code=403, detail="Admin access required.")
+        
+        organization_id = _get_active_org_id(current_user)
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="Organization context required.")
+        
+        key_details = await get_api_key_details_by_key_id(key_id, organization_id)
+        if not key_details:
+            raise HTTPException(status_code=404, detail="API key not found.")
+        
+        return APIResponse(
+            status="success",
+            message="Field defaults retrieved",
+            response={
+                "key_id": key_id,
+                "field_defaults": await get_api_key_field_defaults(key_details.get("id", key_id)),
+                "endpoints": list(PROJECTABLE_ENDPOINTS)
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Failed to get field defaults for API key {key_id}")
+        return APIResponse(status="error", message=str(e), response=None)
+
+
+@full_routes.put("/api-keys/{key_id}/field-defaults", response_model=APIResponse)
+async def update_api_key_field_defaults_endpoint(
+    key_id: str,
+    request: dict,
+    current_user=Depends(get_current_user)
+):
+    """
+    Set the default response fields of an API key, e.g.
+    {"query": ["immediate.files", "immediate.snippets.source"], "files.list": null}.
+    An empty list or null clears the default for that endpoint.
+    """
+    try:
+        if current_user[3] not in ["admin"]:
+            raise HTTPException(status_code=403, detail="Admin access required.")
+        
+        organization_id = _get_active_org_id(current_user)
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="Organization context required.")
+        
+        key_details = await get_api_key_details_by_key_id(key_id, organization_id)
+        if not key_details:
+            raise HTTPException(status_code=404, detail="API key not found.")
+        
+        unknown = [endpoint for endpoint in request if endpoint not in PROJECTABLE_ENDPOINTS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown endpoints: {', '.join(unknown)}")
+        
+        for endpoint, fields in request.items():
+            if isinstance(fields, str):
+                fields = fields.split(",")
+            await set_api_key_field_defaults(key_details.get("id", key_id), endpoint, fields)
+        
+        logger.info(f"Field defaults updated for key {key_id} by {current_user[1]}")
+        
+        return APIResponse(
+            status="success",
+            message="Field defaults updated",
+            response={"key_id": key_id}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Failed to update field defaults for API key {key_id}")
+        return APIResponse(status="error", message=str(e), response=None)
+
+
+@full_routes.get("/api-keys/permissions/list", response_model=APIResponse)
 async def get_available_permissions(
     current_user=Depends(get_current_user)
 ):
@@ -1101,7 +1212,7 @@ async def get_available_permissions(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/", include_in_schema=False)
+@full_routes.get("/", include_in_schema=False)
 async def landing_page():
     return {
         "app": "Secure RAG API",
@@ -1132,7 +1243,8 @@ async def _get_organization_id_from_request(
     current_user,
     plugin_token: Optional[str] = None
 ) -> str:
-    
+    from plugin_manager import validate_plugin_token
+
     if plugin_token:
         token_data = await validate_plugin_token(plugin_token)
         if not token_data:
@@ -1151,7 +1263,7 @@ async def _get_organization_id_from_request(
     return organization_id
 
 
-@app.post("/opencart/products/import", response_model=APIResponse)
+@full_routes.post("/opencart/products/import", response_model=APIResponse)
 async def import_opencart_products(
     payload: OCProductsImport,
     current_user=Depends(get_current_user),
@@ -1187,7 +1299,7 @@ async def import_opencart_products(
 
 
 
-@app.post("/opencart", response_model=APIResponse, include_in_schema=False)
+@full_routes.post("/opencart", response_model=APIResponse, include_in_schema=False)
 async def import_opencart_products_alias(
     payload: OCProductsImport,
     current_user=Depends(get_current_user),
@@ -1221,7 +1333,7 @@ async def import_opencart_products_alias(
 
 
 
-@app.post("/opencart/sync", response_model=APIResponse, include_in_schema=False)
+@full_routes.post("/opencart/sync", response_model=APIResponse, include_in_schema=False)
 async def import_opencart_products_sync(
     payload: OCProductsImport,
     current_user=Depends(get_current_user),
@@ -1255,8 +1367,9 @@ async def import_opencart_products_sync(
 
 
 
-@app.get("/plugins/status", response_model=APIResponse, tags=["Plugins"])
+@full_routes.get("/plugins/status", response_model=APIResponse, tags=["Plugins"])
 async def get_plugins_status(current_user=Depends(get_current_user)):
+    from plugin_manager import get_organization_plugin_status
     try:
         organization_id = _get_active_org_id(current_user)
         if not organization_id:
@@ -1273,11 +1386,12 @@ async def get_plugins_status(current_user=Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/plugins/enable", response_model=APIResponse, tags=["Plugins"])
+@full_routes.post("/plugins/enable", response_model=APIResponse, tags=["Plugins"])
 async def enable_org_plugin(
     plugin_type: str = Query(...),
     current_user=Depends(get_current_user)
 ):
+    from plugin_manager import enable_plugin
     try:
         organization_id = _get_active_org_id(current_user)
         if not organization_id:
@@ -1293,11 +1407,12 @@ async def enable_org_plugin(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/plugins/disable", response_model=APIResponse, tags=["Plugins"])
+@full_routes.post("/plugins/disable", response_model=APIResponse, tags=["Plugins"])
 async def disable_org_plugin(
     plugin_type: str = Query(...),
     current_user=Depends(get_current_user)
 ):
+    from plugin_manager import disable_plugin
     try:
         organization_id = _get_active_org_id(current_user)
         if not organization_id:
@@ -1313,11 +1428,12 @@ async def disable_org_plugin(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/plugins/tokens", response_model=APIResponse, tags=["Plugins"])
+@full_routes.get("/plugins/tokens", response_model=APIResponse, tags=["Plugins"])
 async def get_plugin_tokens(
     plugin_type: Optional[str] = Query(None),
     current_user=Depends(get_current_user)
 ):
+    from plugin_manager import list_plugin_tokens
     try:
         organization_id = _get_active_org_id(current_user)
         if not organization_id:
@@ -1334,13 +1450,14 @@ async def get_plugin_tokens(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/plugins/tokens/create", response_model=APIResponse, tags=["Plugins"])
+@full_routes.post("/plugins/tokens/create", response_model=APIResponse, tags=["Plugins"])
 async def create_shop_token(
     plugin_type: str = Query(...),
     shop_name: Optional[str] = Query(None),
     shop_url: Optional[str] = Query(None),
     current_user=Depends(get_current_user)
 ):
+    from plugin_manager import create_plugin_token
     try:
         organization_id = _get_active_org_id(current_user)
         if not organization_id:
@@ -1363,11 +1480,12 @@ async def create_shop_token(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/plugins/tokens/revoke", response_model=APIResponse, tags=["Plugins"])
+@full_routes.post("/plugins/tokens/revoke", response_model=APIResponse, tags=["Plugins"])
 async def revoke_shop_token(
     token_id: str = Query(...),
     current_user=Depends(get_current_user)
 ):
+    from plugin_manager import revoke_plugin_token
     try:
         organization_id = _get_active_org_id(current_user)
         if not organization_id:
@@ -1386,7 +1504,7 @@ async def revoke_shop_token(
 
 
 
-@app.post("/shops/register", response_model=APIResponse, tags=["OpenCart Shops"])
+@full_routes.post("/shops/register", response_model=APIResponse, tags=["OpenCart Shops"])
 async def register_opencart_shop(
     request: CreateCatalogRequest,
     current_user=Depends(get_current_user),
@@ -1415,7 +1533,7 @@ async def register_opencart_shop(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/shops", response_model=APIResponse, tags=["OpenCart Shops"])
+@full_routes.get("/shops", response_model=APIResponse, tags=["OpenCart Shops"])
 async def list_shops(
     current_user=Depends(get_current_user),
 ):
@@ -1436,7 +1554,7 @@ async def list_shops(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.delete("/shops/{shop_id}", response_model=APIResponse, tags=["OpenCart Shops"])
+@full_routes.delete("/shops/{shop_id}", response_model=APIResponse, tags=["OpenCart Shops"])
 async def delete_shop(
     shop_id: str,
     current_user=Depends(get_current_user),
@@ -1465,7 +1583,7 @@ async def delete_shop(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/shops/{shop_id}/catalogs", response_model=APIResponse, tags=["OpenCart Catalogs"])
+@full_routes.post("/shops/{shop_id}/catalogs", response_model=APIResponse, tags=["OpenCart Catalogs"])
 async def create_catalog_from_shop(
     shop_id: str,
     current_user=Depends(get_current_user),
@@ -1518,11 +1636,12 @@ async def create_catalog_from_shop(
 
 
 
-@app.post("/catalogs/create", response_model=APIResponse, tags=["OpenCart Catalogs"])
+@full_routes.post("/catalogs/create", response_model=APIResponse, tags=["OpenCart Catalogs"])
 async def create_new_catalog(
     request: CreateCatalogRequest,
     current_user=Depends(get_current_user),
 ):
+    from opencart_catalog import create_catalog
     try:
         user_id = current_user[0]
         organization_id = _get_active_org_id(current_user)
@@ -1572,11 +1691,12 @@ async def create_new_catalog(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/catalogs/{catalog_id}", response_model=APIResponse, tags=["OpenCart Catalogs"])
+@full_routes.get("/catalogs/{catalog_id}", response_model=APIResponse, tags=["OpenCart Catalogs"])
 async def get_catalog_details(
     catalog_id: str,
     current_user=Depends(get_current_user),
 ):
+    from opencart_catalog import get_catalog
     try:
         catalog = await get_catalog(catalog_id)
         if not catalog:
@@ -1600,10 +1720,11 @@ async def get_catalog_details(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/catalogs", response_model=APIResponse, tags=["OpenCart Catalogs"])
+@full_routes.get("/catalogs", response_model=APIResponse, tags=["OpenCart Catalogs"])
 async def list_user_catalogs(
     current_user=Depends(get_current_user),
 ):
+    from opencart_catalog import list_catalogs_by_user
     try:
         user_id = current_user[0]
         organization_id = _get_active_org_id(current_user)
@@ -1760,7 +1881,7 @@ async def login_user(request: LoginRequest, request_obj: Request):
     )
 
 
-@app.post("/organizations/create_with_admin", response_model=TokenRoleResponse)
+@full_routes.post("/organizations/create_with_admin", response_model=TokenRoleResponse)
 async def create_organization_with_admin(request: OrganizationCreateRequest, request_obj: Request):
     client_ip = request_obj.client.host if request_obj and request_obj.client else None
 
@@ -1835,7 +1956,7 @@ async def create_organization_with_admin(request: OrganizationCreateRequest, req
     )
 
 
-@app.post("/organizations/approve/{org_id}", response_model=APIResponse)
+@full_routes.post("/organizations/approve/{org_id}", response_model=APIResponse)
 async def approve_organization_endpoint(
     org_id: str,
     user=Depends(get_current_user),
@@ -1870,7 +1991,7 @@ async def approve_organization_endpoint(
         )
 
 
-@app.get("/organizations/pending", response_model=APIResponse)
+@full_routes.get("/organizations/pending", response_model=APIResponse)
 async def get_pending_organizations_endpoint(
     user=Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security_scheme)
@@ -1898,7 +2019,7 @@ async def get_pending_organizations_endpoint(
         )
 
 
-@app.get("/organizations", response_model=APIResponse)
+@full_routes.get("/organizations", response_model=APIResponse)
 async def get_all_organizations_endpoint(
     user=Depends(get_current_user)
 ):
@@ -1949,7 +2070,7 @@ async def get_all_organizations_endpoint(
         )
 
 
-@app.post("/organizations/reject/{org_id}", response_model=APIResponse)
+@full_routes.post("/organizations/reject/{org_id}", response_model=APIResponse)
 async def reject_organization_endpoint(
     org_id: str,
     request: Optional[Dict[str, str]] = Body(None),
@@ -1989,7 +2110,7 @@ async def reject_organization_endpoint(
         )
 
 
-@app.post("/organizations/change-status/{org_id}", response_model=APIResponse)
+@full_routes.post("/organizations/change-status/{org_id}", response_model=APIResponse)
 async def change_organization_status_endpoint(
     org_id: str,
     request: Dict[str, str] = Body(...),
@@ -2038,7 +2159,7 @@ async def change_organization_status_endpoint(
 
 
 # Messaging endpoints
-@app.post("/messages/threads", response_model=APIResponse)
+@full_routes.post("/messages/threads", response_model=APIResponse)
 async def create_message_thread_endpoint(
     request: MessageThreadRequest,
     user=Depends(get_current_user),
@@ -2074,7 +2195,7 @@ async def create_message_thread_endpoint(
         )
 
 
-@app.post("/messages/threads/{thread_id}/messages", response_model=APIResponse)
+@full_routes.post("/messages/threads/{thread_id}/messages", response_model=APIResponse)
 async def add_message_to_thread_endpoint(
     thread_id: str,
     request: MessageRequest,
@@ -2114,7 +2235,7 @@ async def add_message_to_thread_endpoint(
         )
 
 
-@app.get("/messages/threads", response_model=APIResponse)
+@full_routes.get("/messages/threads", response_model=APIResponse)
 async def get_message_threads_endpoint(
     user=Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security_scheme)
@@ -2140,7 +2261,7 @@ async def get_message_threads_endpoint(
         )
 
 
-@app.get("/messages/threads/{thread_id}/messages", response_model=APIResponse)
+@full_routes.get("/messages/threads/{thread_id}/messages", response_model=APIResponse)
 async def get_thread_messages_endpoint(
     thread_id: str,
     user=Depends(get_current_user),
@@ -2172,7 +2293,7 @@ async def get_thread_messages_endpoint(
         )
 
 
-@app.post("/messages/{message_id}/read", response_model=APIResponse)
+@full_routes.post("/messages/{message_id}/read", response_model=APIResponse)
 async def mark_message_as_read_endpoint(
     message_id: str,
     user=Depends(get_current_user),
@@ -2200,7 +2321,7 @@ async def mark_message_as_read_endpoint(
         )
 
 
-@app.get("/messages/unread-count", response_model=APIResponse)
+@full_routes.get("/messages/unread-count", response_model=APIResponse)
 async def get_unread_count_endpoint(
     user=Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security_scheme)
@@ -2269,7 +2390,7 @@ async def logout_user(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.post("/register", response_model=APIResponse)
+@full_routes.post("/register", response_model=APIResponse)
 async def register_user(
     request: RegisterRequest,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
@@ -2426,7 +2547,7 @@ async def validate_token(user=Depends(get_current_user)):
         )
 
 
-@app.get("/admin/access", response_model=APIResponse)
+@full_routes.get("/admin/access", response_model=APIResponse)
 async def check_admin_access(user=Depends(get_current_user)):
     try:
         username = user[1]
@@ -2461,7 +2582,19 @@ async def check_admin_access(user=Depends(get_current_user)):
             response={"is_admin": False}
         )
 
-@app.post("/create_token", response_model=TokenResponse)
+@full_routes.get("/admin/resources", response_model=APIResponse)
+async def get_resource_usage(user=Depends(get_current_user)):
+    """Thread budget, executor queue depths and readiness of the lazy subsystems"""
+    if not user or user[3] != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return APIResponse(
+        status="success",
+        message="Resource usage retrieved",
+        response={**resource_manager.stats(), "indexing": indexing_pool.stats(), "readiness": readiness()}
+    )
+
+@full_routes.post("/create_token", response_model=TokenResponse)
 async def generate_token():
     
     if os.path.exists(SECRETS_PATH):
@@ -2488,7 +2621,7 @@ async def generate_token():
     )
 
 
-@app.get("/docs", include_in_schema=False)
+@full_routes.get("/docs", include_in_schema=False)
 async def get_documentation():
     return get_swagger_ui_html(
         openapi_url="/openapi.json",
@@ -2496,60 +2629,29 @@ async def get_documentation():
     )
 
 
-@app.get("/openapi.json", include_in_schema=False)
+@full_routes.get("/openapi.json", include_in_schema=False)
 async def get_openapi_schema():
     return app.openapi()
 
-async def get_available_filenames(username: str) -> List[str]:
-    """Get list of filenames user is allowed to access"""
-    from userdb import get_user_allowed_filenames
-    
-    allowed_files = await get_user_allowed_filenames(username)
-    
-    # If None, user is admin and can access all files
-    if allowed_files is None:
-        return []  # Return empty list for admin (means all files accessible)
-    
-    return allowed_files
-
-
-async def get_possible_files_by_title(username: str) -> Dict[str, str]:
-    """Get mapping of file titles to filenames for user"""
-    # For now, return empty mapping - this could be enhanced later
-    # to extract titles from document metadata
-    return {}
+async def filter_files_by_title(allowed_files: Optional[List[str]], organization_id: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Mapping of document titles to the files a user can access, from the
+    precomputed title index. allowed_files comes from get_user_allowed_filenames
+    (None: every file), so one permission lookup serves a whole request.
+    """
+    from rag_api.title_index import get_files_by_title
 
+    files_by_title = await run_in_threadpool(get_files_by_title, organization_id)
+    if allowed_files is None:
+        return dict(files_by_title)
 
-def extract_title_from_chunk(chunk_text: str) -> Optional[str]:
-    """Extract title from chunk content"""
-    try:
-        # Try to parse as JSON first
-        if chunk_text.strip().startswith('{'):
-            candidate = chunk_text
-            if "'title'" in candidate and '"title"' not in candidate:
-                candidate = candidate.replace("'", '"')
-            
-            start = candidate.find("{")
-            end = candidate.rfind("}")
-            if start != -1 and end != -1 and end > start:
-                obj_str = candidate[start:end+1]
-                data = json.loads(obj_str)
-                title = data.get("title")
-                if isinstance(title, str) and title.strip():
-                    return title.strip()
-    except Exception:
-        pass
-    
-    # Try regex extraction
-    try:
-        import re
-        m = re.search(r"['\"]title['\"]\s*:\s*['\"]([^'\"]+)['\"]", chunk_text)
-        if m:
-            return m.group(1).strip()
-    except Exception:
-        pass
-    
-    return None
+    allowed = {os.path.basename(f).lower() for f in allowed_files}
+    possible = {}
+    for title, filenames in files_by_title.items():
+        permitted = [f for f in filenames if f.lower() in allowed]
+        if permitted:
+            possible[title] = permitted
+    return possible
 
 
 async def get_user_from_token(token: str):
@@ -2568,12 +2670,14 @@ async def get_user_from_token(token: str):
 
 
 
-@app.post("/search/opencart", response_model=APIResponse)
+@full_routes.post("/search/opencart", response_model=APIResponse)
 async def search_opencart_products(
     request: RAGQueryRequest,
     request_obj: Request,
     user=Depends(get_current_user)
 ):
+    from opencart_catalog import list_catalogs_by_org
+    from plugin_manager import is_plugin_enabled
     username = user[1]
     role = user[2]
     organization_id = user[3]
@@ -2883,6 +2987,29 @@ async def search_opencart_products(
 
 from fastapi.responses import PlainTextResponse, JSONResponse, Response
 from urllib.parse import unquote
+from query_coalescing import query_coalescer, make_query_key
+
+
+async def coalesced_llm_overview(username: str, question: str, organization_id: Optional[str],
+                                 rag_result: Dict[str, Any], stream_callback=None) -> Optional[str]:
+    """
+    Generate the LLM overview for a query, fanning one LLM stream out to every
+    concurrent subscriber asking the same question with the same file access.
+    """
+    from userdb import get_user_allowed_filenames
+    from llm import generate_llm_overview
+
+    allowed_files = await get_user_allowed_filenames(username)
+    key = make_query_key("overview", question, organization_id, allowed_files, stream=stream_callback is not None)
+    data = {"source_documents": rag_result.get("source_documents", []), "answer": rag_result.get("answer", "")}
+
+    if stream_callback is None:
+        return await query_coalescer.run(key, lambda: generate_llm_overview(question, data))
+    return await query_coalescer.run_stream(
+        key,
+        lambda publish: generate_llm_overview(question, data, stream_callback=publish),
+        stream_callback=stream_callback
+    )
 
 
 # WebSocket endpoint for streaming query responses
@@ -2952,15 +3079,12 @@ async def websocket_query_endpoint(websocket: WebSocket, token: Optional[str] =
                 # Cleanup expired sessions
                 await cleanup_expired_sessions()
                 
-                # Initialize RAG chain
-                from rag_api.langchain_utils import get_rag_chain
-                rag_chain = get_rag_chain()
-                
-                # Use secure RAG retriever with skip_llm=True for immediate results
+                # Use secure RAG retriever with skip_llm=True for immediate results;
+                # identical concurrent queries share one document search
                 organization_id = _get_active_org_id(user)
                 secure_retriever = SecureRAGRetriever(username=username, organization_id=organization_id)
                 rag_result = await secure_retriever.invoke_secure_rag_chain(
-                    rag_chain=rag_chain,
+                    rag_chain=get_rag_chain(),
                     query=question,
                     model_type=model_type,
                     humanize=humanize,
@@ -3029,8 +3153,6 @@ async def websocket_query_endpoint(websocket: WebSocket, token: Optional[str] =
                 # Generate LLM overview if humanize is enabled (in background)
                 if humanize:
                     try:
-                        from llm import generate_llm_overview
-                        
                         # Send streaming start message
                         logger.info("Sending stream_start message")
                         await websocket.send_json({
@@ -3056,9 +3178,8 @@ async def websocket_query_endpoint(websocket: WebSocket, token: Optional[str] =
                         
                         if use_streaming:
                             # Generate overview with streaming
-                            overview = await generate_llm_overview(
-                                question,
-                                {"source_documents": source_docs, "answer": rag_result.get("answer", "")},
+                            overview = await coalesced_llm_overview(
+                                username, question, organization_id, rag_result,
                                 stream_callback=stream_token
                             )
                             
@@ -3069,9 +3190,8 @@ async def websocket_query_endpoint(websocket: WebSocket, token: Optional[str] =
                             })
                         else:
                             # Generate overview without streaming (fallback)
-                            overview = await generate_llm_overview(
-                                question,
-                                {"source_documents": source_docs, "answer": rag_result.get("answer", "")}
+                            overview = await coalesced_llm_overview(
+                                username, question, organization_id, rag_result
                             )
                         
                         # Always send an overview message, even if LLM generation fails
@@ -3100,8 +3220,10 @@ async def websocket_query_endpoint(websocket: WebSocket, token: Optional[str] =
                 
                 # Handle non-humanized response (raw chunks)
                 if not humanize:
-                    available_files = await get_available_filenames(username)
-                    possible_files_by_title = await get_possible_files_by_title(username)
+                    from userdb import get_user_allowed_filenames
+                    allowed_files = await get_user_allowed_filenames(username)
+                    available_files = allowed_files or []
+                    possible_files_by_title = await filter_files_by_title(allowed_files, organization_id)
                     
                     rag_chunks = []
                     chunk_docs = source_docs_raw if source_docs_raw else source_docs
@@ -3114,7 +3236,7 @@ async def websocket_query_endpoint(websocket: WebSocket, token: Optional[str] =
                             fname = doc.metadata["source"] if hasattr(doc, "metadata") and "source" in doc.metadata else "unknown"
                             chunk = doc.page_content if hasattr(doc, "page_content") else str(doc)
                         
-                        base_title = extract_title_from_chunk(chunk)
+                        base_title = get_title_for_file(fname, organization_id)
                         possible_files = possible_files_by_title.get(base_title, []) if base_title else []
                         rag_chunks.append(
                             f"{chunk}\n<filename>{fname}</filename>\n<possible_files>{json.dumps(possible_files, ensure_ascii=False)}</possible_files>"
@@ -3244,7 +3366,7 @@ async def websocket_query_endpoint(websocket: WebSocket, token: Optional[str] =
         except:
             pass
 
-@app.post("/query/batch-overview", response_model=APIResponse)
+@full_routes.post("/query/batch-overview", response_model=APIResponse)
 async def batch_overview_endpoint(
     request: BatchOverviewRequest,
     current_user=Depends(get_current_user)
@@ -3284,8 +3406,19 @@ async def process_secure_rag_query(
     if request.humanize and not await check_api_key_operation_permission(user, "generate_ai_response"):
         raise HTTPException(status_code=403, detail="API key requires 'generate_ai_response' permission for humanized responses")
     
+    if request.explain and user[3] != 'admin':
+        raise HTTPException(status_code=403, detail="Explain mode is only available to admins")
+    
     logger = logging.getLogger(__name__)
     tracker = PerformanceTracker(f"query_endpoint('{request.question[:50]}...')", logger)
+    trace = SearchTrace(request.question) if request.explain else None
+    fields = await resolve_fields(user, "query", request.fields)
+    humanize = request.humanize is None or request.humanize
+    want_overview = humanize and wants(fields, "overview")
+    # Parent windows are only loaded when chunk content is returned or fed to the LLM
+    load_context = want_overview or (
+        wants(fields, "immediate.snippets.content") if humanize else wants(fields, "chunks")
+    )
 
     try:
         username = user[1]  # Extract username from user tuple
@@ -3306,21 +3439,18 @@ async def process_secure_rag_query(
         await cleanup_expired_sessions()
         tracker.end_operation("cleanup_sessions")
 
-        # Initialize the RAG chain
-        tracker.start_operation("init_rag_chain")
-        from rag_api.langchain_utils import get_rag_chain
-        rag_chain = get_rag_chain()
-        tracker.end_operation("init_rag_chain")
-
-        # Use secure RAG retriever that respects file permissions
+        # Use secure RAG retriever that respects file permissions; identical concurrent
+        # queries share one document search (explain runs always search on their own)
         tracker.start_operation("secure_retrieval")
         secure_retriever = SecureRAGRetriever(username=username, session_id=session_id, organization_id=organization_id)
         rag_result = await secure_retriever.invoke_secure_rag_chain(
-            rag_chain=rag_chain,
+            rag_chain=get_rag_chain(),
             query=request.question,
             model_type=model_type,
-            humanize=request.humanize if hasattr(request, 'humanize') else True,
-            skip_llm=True  # Skip LLM to return documents immediately
+            humanize=humanize,
+            skip_llm=True,  # Skip LLM to return documents immediately
+            trace=trace,
+            load_context=load_context
         )
         tracker.end_operation("secure_retrieval")
 
@@ -3364,18 +3494,26 @@ async def process_secure_rag_query(
             except Exception as e:
                 logger.warning(f"Error processing document: {e}")
         
-        # Generate LLM overview if humanize is enabled
+        # Generate LLM overview if humanize is enabled and the overview is requested
         overview = None
-        if request.humanize is None or request.humanize:
+        if want_overview:
+            llm_start = datetime.datetime.now()
             try:
-                from llm import generate_llm_overview
-                overview = await generate_llm_overview(
-                    request.question,
-                    {"source_documents": source_docs, "answer": rag_result.get("answer", "")}
-                )
+                if trace is not None:
+                    from llm import generate_llm_overview
+                    overview = await generate_llm_overview(
+                        request.question,
+                        {"source_documents": source_docs, "answer": rag_result.get("answer", "")}
+                    )
+                else:
+                    overview = await coalesced_llm_overview(
+                        username, request.question, organization_id, rag_result
+                    )
             except Exception as e:
                 logger.error(f"Error generating LLM overview: {e}")
                 overview = "Error generating overview. Showing raw results."
+            if trace is not None:
+                trace.add_stage("llm_overview", (datetime.datetime.now() - llm_start).total_seconds() * 1000)
 
         # Calculate response time
         tracker.start_operation("calculate_response_time")
@@ -3507,7 +3645,7 @@ async def process_secure_rag_query(
             return APIResponse(
                 status="success",
                 message="No matching documents found",
-                response={
+                response=project({
                     "immediate": {
                         "files": [],
                         "snippets": [],
@@ -3519,8 +3657,9 @@ async def process_secure_rag_query(
                             "security_filtered": security_filtered
                         }
                     },
-                    "model": model_type
-                }
+                    "model": model_type,
+                    **({"explain": trace.to_dict()} if trace is not None else {})
+                }, fields)
             )
 
         # If humanize is True (default): return response with immediate data and optional overview
@@ -3537,16 +3676,26 @@ async def process_secure_rag_query(
             if overview is not None:
                 response_data["overview"] = overview
             
+            if trace is not None:
+                response_data["explain"] = trace.to_dict()
+            
             return APIResponse(
                 status="success",
                 message=f"Query processed with secure RAG using {model_type} model",
-                response=response_data
+                response=project(response_data, fields)
             )
         else:
             # If humanize is False: return array of RAG chunks with <filename></filename> tag
             # Get available filenames and mapping by title, filtered by user permissions
-            available_files = await get_available_filenames(username)
-            possible_files_by_title = await get_possible_files_by_title(username)
+            # (one permission lookup for both, and none when neither is requested)
+            from userdb import get_user_allowed_filenames
+            wants_titles = wants(fields, "possible_files_by_title") or wants(fields, "chunks")
+            allowed_files = (
+                await get_user_allowed_filenames(username)
+                if wants_titles or wants(fields, "available_files") else []
+            )
+            available_files = (allowed_files or []) if wants(fields, "available_files") else []
+            possible_files_by_title = await filter_files_by_title(allowed_files, organization_id) if wants_titles else {}
 
             rag_chunks = []
             chunk_docs = source_docs_raw if source_docs_raw else source_docs
@@ -3559,8 +3708,8 @@ async def process_secure_rag_query(
                 else:
                     fname = doc.metadata["source"] if hasattr(doc, "metadata") and "source" in doc.metadata else "unknown"
                     chunk = doc.page_content if hasattr(doc, "page_content") else str(doc)
-                # Try to extract a base title from the chunk and map to possible filenames
-                base_title = extract_title_from_chunk(chunk)
+                # Map the chunk's document title (precomputed at ingest) to possible filenames
+                base_title = get_title_for_file(fname, organization_id)
                 possible_files = possible_files_by_title.get(base_title, []) if base_title else []
                 rag_chunks.append(
                     f"{chunk}\n<filename>{fname}</filename>\n<possible_files>{json.dumps(possible_files, ensure_ascii=False)}</possible_files>"
@@ -3571,7 +3720,7 @@ async def process_secure_rag_query(
             return APIResponse(
                 status="success",
                 message="Query processed with secure RAG (raw chunks)",
-                response={
+                response=project({
                     "chunks": rag_chunks,
                     "model": model_type,
                     "available_files": available_files,
@@ -3581,23 +3730,155 @@ async def process_secure_rag_query(
                         "username": username,
                         "source_documents_count": len(source_docs),
                         "security_filtered": security_filtered
-                    }
-                }
+                    },
+                    **({"explain": trace.to_dict()} if trace is not None else {})
+                }, fields)
             )
     except Exception as e:
         logger.exception(f"Secure RAG query processing error for user {username if 'username' in locals() else 'unknown'}")
         tracker.log_summary()
         return APIResponse(status="error", message=str(e), response=None)
+
+
+@app.post("/query/results")
+async def query_search_results(
+    request: SearchResultsRequest,
+    user=Depends(get_current_user)
+):
+    """
+    Ranked search results without LLM processing, either cursor-paginated or
+    streamed as NDJSON (the query is ranked first, then one result per line,
+    each emitted as soon as its context is loaded).
+    """
+    from search_results import get_results_page, stream_results_ndjson, CursorError
+    import orjson
+
+    if not await check_api_key_operation_permission(user, "search"):
+        raise HTTPException(status_code=403, detail="API key requires 'search' permission")
+
+    username = user[1]
+    organization_id = _get_active_org_id(user)
+    page_size = max(1, min(request.page_size or 10, 100))
+    max_results = max(1, request.max_results or 50)
+
+    if request.stream:
+        if not request.question:
+            raise HTTPException(status_code=400, detail="Question is required")
+        return StreamingResponse(
+            stream_results_ndjson(username, request.question, organization_id, max_results),
+            media_type="application/x-ndjson"
+        )
+
+    if not request.question and not request.cursor:
+        raise HTTPException(status_code=400, detail="Question or cursor is required")
+
+    try:
+        page = await get_results_page(
+            username, request.question, organization_id,
+            cursor=request.cursor, page_size=page_size, max_results=max_results
+        )
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return Response(
+        content=orjson.dumps({
+            "status": "success",
+            "message": f"Returned {len(page['results'])} of {page['total']} results",
+            "response": page
+        }),
+        media_type="application/json"
+    )
+
 from fastapi.responses import PlainTextResponse
 from urllib.parse import unquote
 
-@app.get("/files/content/{filename}")
+BINARY_MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".svg": "image/svg+xml",
+}
+
+
+async def get_quiz_payload(filename: str) -> Dict[str, Any]:
+    """Quiz stored for a file, in the shape returned by /files/content"""
+    from quizdb import get_quiz_by_filename
+    quiz_row = await get_quiz_by_filename(filename)
+    if not quiz_row:
+        return {}
+    try:
+        quiz_dict = json.loads(quiz_row[3]) if quiz_row[3] else None
+    except Exception:
+        quiz_dict = {"questions": [], "raw": quiz_row[3]}
+    return {
+        "id": quiz_row[0],
+        "filename": quiz_row[1],
+        "timestamp": quiz_row[2],
+        "quiz": quiz_dict,
+        "logs": quiz_row[4],
+    }
+
+
+async def get_projected_file_content(filename: str, organization_id: str, fields, user, client_ip: Optional[str]):
+    """
+    JSON file response restricted to the requested fields. File content and quiz
+    are only read from the database when asked for.
+    """
+    import base64 as _base64
+
+    info = get_document_info_by_filename(filename, organization_id=organization_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    binary_mime = BINARY_MIME_TYPES.get(os.path.splitext(filename)[1].lower())
+    payload: Dict[str, Any] = {
+        "filename": filename,
+        "file_id": info.get("id"),
+        "file_size": info.get("file_size"),
+        "upload_timestamp": info.get("upload_timestamp"),
+        "isBinary": bool(binary_mime),
+        "mimeType": binary_mime or "text/plain",
+    }
+
+    if wants(fields, "content"):
+        content_bytes = get_file_content_by_filename(filename, organization_id=organization_id) or b""
+        if binary_mime:
+            payload["content"] = _base64.b64encode(content_bytes).decode("ascii")
+        else:
+            try:
+                payload["content"] = content_bytes.decode("utf-8")
+            except UnicodeDecodeError:
+                payload["content"] = content_bytes.decode("latin1")
+        log_file_access(
+            user_id=user[1],
+            role=user[3],
+            filename=filename,
+            access_type="view",
+            session_id=None,
+            ip_address=client_ip or "unknown"
+        )
+
+    if wants(fields, "quiz"):
+        payload["quiz"] = await get_quiz_payload(filename)
+
+    return JSONResponse(content=project(payload, fields))
+
+
+@full_routes.get("/files/content/{filename}")
 async def get_file_content(
     filename: str,
     request_obj: Request,
     user = Depends(get_current_user),
     include_quiz: bool = Query(False, description="If true, return JSON with file content and quiz"),
-    catalog_id: str = Query(None, description="If provided, treat filename as product name and return OpenCart product data")
+    catalog_id: str = Query(None, description="If provided, treat filename as product name and return OpenCart product data"),
+    fields: Optional[str] = Query(None, description="Comma-separated JSON fields (filename, content, quiz, file_size, ...); unrequested content is not loaded")
 ):
     # Check API key permissions for download
     if not await check_api_key_operation_permission(user, "download"):
@@ -3617,10 +3898,10 @@ async def get_file_content(
         
         
         try:
-            from rag_api.chroma_utils import vectorstore
+            from rag_api.chroma_utils import get_vectorstore_for_org
             
             
-            results = vectorstore.get(
+            results = get_vectorstore_for_org(organization_id).get(
                 where={
                     "$and": [
                         {"catalog_id": catalog_id},
@@ -3692,6 +3973,9 @@ async def get_file_content(
             )
             raise HTTPException(status_code=403, detail="You do not have access to this file.")
     
+    projected_fields = await resolve_fields(user, "files.content", fields)
+    if projected_fields is not None:
+        return await get_projected_file_content(resolved_filename, organization_id, projected_fields, user, client_ip)
     
     content_bytes = get_file_content_by_filename(resolved_filename, organization_id=organization_id)
     if content_bytes is None:
@@ -3701,42 +3985,14 @@ async def get_file_content(
         
         
         ext = os.path.splitext(resolved_filename)[1].lower()
-        binary_mime_types = {
-            ".pdf": "application/pdf",
-            ".doc": "application/msword",
-            ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            ".xls": "application/vnd.ms-excel",
-            ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            ".png": "image/png",
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".gif": "image/gif",
-            ".webp": "image/webp",
-            ".svg": "image/svg+xml",
-        }
-        binary_mime = binary_mime_types.get(ext)
+        binary_mime = BINARY_MIME_TYPES.get(ext)
 
         if binary_mime:
             if include_quiz:
                 import base64 as _base64
 
                 
-                quiz_row = await get_quiz_by_filename(resolved_filename)
-                quiz_payload: Dict[str, Any]
-                if quiz_row:
-                    try:
-                        quiz_dict = json.loads(quiz_row[3]) if quiz_row[3] else None
-                    except Exception:
-                        quiz_dict = {"questions": [], "raw": quiz_row[3]}
-                    quiz_payload = {
-                        "id": quiz_row[0],
-                        "filename": quiz_row[1],
-                        "timestamp": quiz_row[2],
-                        "quiz": quiz_dict,
-                        "logs": quiz_row[4],
-                    }
-                else:
-                    quiz_payload = {}
+                quiz_payload = await get_quiz_payload(resolved_filename)
 
                 return JSONResponse(
                     content={
@@ -3767,24 +4023,7 @@ async def get_file_content(
         )
 
         if include_quiz:
-            
-            quiz_row = await get_quiz_by_filename(resolved_filename)
-            quiz_payload: Dict[str, Any]
-            if quiz_row:
-                
-                try:
-                    quiz_dict = json.loads(quiz_row[3]) if quiz_row[3] else None
-                except Exception:
-                    quiz_dict = {"questions": [], "raw": quiz_row[3]}
-                quiz_payload = {
-                    "id": quiz_row[0],
-                    "filename": quiz_row[1],
-                    "timestamp": quiz_row[2],
-                    "quiz": quiz_dict,
-                    "logs": quiz_row[4]
-                }
-            else:
-                quiz_payload: Dict[str, Any] = {}
+            quiz_payload = await get_quiz_payload(resolved_filename)
 
             return JSONResponse(
                 content={
@@ -3801,13 +4040,14 @@ async def get_file_content(
         raise HTTPException(status_code=500, detail=f"Failed to decode file: {e}")
 
 
-@app.post("/quiz/{filename}", response_model=APIResponse)
+@full_routes.post("/quiz/{filename}", response_model=APIResponse)
 async def create_or_get_quiz(
     filename: str,
     request_obj: Request,
     user = Depends(get_current_user),
     regenerate: bool = Query(False, description="If true, re-generate a new quiz for the file")
 ):
+    from quizdb import create_quiz_for_filename, get_quiz_by_filename
     decoded_filename = unquote(filename)
     resolved_filename = resolve_actual_filename_case_insensitive(decoded_filename)
     allowed_files = await get_allowed_files(user[1])
@@ -3872,13 +4112,14 @@ async def create_or_get_quiz(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.post("/chat", response_model=APIResponse)
+@full_routes.post("/chat", response_model=APIResponse)
 async def secure_chat(
     request: RAGQueryRequest,
     request_obj: Request,
     session_id: str = Query(..., description="Session ID for chat history"),
     user=Depends(get_current_user)
 ):
+    from quizdb import create_quiz_for_filename
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required.")
 
@@ -3902,185 +4143,79 @@ async def secure_chat(
     file_extension = os.path.splitext(original_filename)[1].lower()
 
     try:
-        
-        content_bytes = await file.read()
-        
-        
         logger.info(f"Starting upload: {original_filename}")
         logger.info(f"  - Upload ID: {upload_id}")
         logger.info(f"  - User: {current_user[1]}")
         logger.info(f"  - File type: {file_extension}")
-        logger.info(f"  - File size: {len(content_bytes)} bytes")
         logger.info(f"  - Timestamp: {timestamp}")
         
         
         if file_extension == '.zip':
-            logger.info(f"Archive detected. Extracting and processing contents as separate files...")
-            import zipfile
-            import tempfile
+            # Spool the archive to disk instead of holding it in memory; its entries are
+            # read, parsed and embedded in the background, so the request returns right away
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            file_path = os.path.join(UPLOAD_DIR, f"{upload_id}_{os.path.basename(original_filename)}")
+            file_size = 0
+            async with aiofiles.open(file_path, "wb") as buffer:
+                while True:
+                    block = await file.read(UPLOAD_READ_BYTES)
+                    if not block:
+                        break
+                    await buffer.write(block)
+                    file_size += len(block)
+            logger.info(f"  - File size: {file_size} bytes")
             
-            extracted_files = []
-            failed_files = []
+            loop = asyncio.get_running_loop()
             
-            with tempfile.TemporaryDirectory() as temp_extract_dir:
-                
-                try:
-                    
-                    temp_zip_path = f"temp_{original_filename}"
-                    with open(temp_zip_path, 'wb') as buffer:
-                        buffer.write(content_bytes)
-                    
-                    
-                    with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-                        logger.info(f"Archive extracted with {len(zip_ref.filelist)} total files (UTF-8 filename support enabled)")
-                        
-                        
-                        for member in zip_ref.filelist:
-                            try:
-                                
-                                
-                                raw_filename = member.filename
-                                filename_to_use = raw_filename
-                                
-                                
-                                
-                                if isinstance(raw_filename, str) and any(ord(c) > 127 for c in raw_filename):
-                                    
-                                    try:
-                                        
-                                        
-                                        attempt1 = raw_filename.encode('latin-1').decode('utf-8')
-                                        filename_to_use = attempt1
-                                        logger.debug(f"Successfully decoded via latin-1→utf-8: {raw_filename} -> {attempt1}")
-                                    except (UnicodeDecodeError, UnicodeEncodeError):
-                                        
-                                        try:
-                                            attempt2 = raw_filename.encode('cp437').decode('utf-8')
-                                            filename_to_use = attempt2
-                                            logger.debug(f"Successfully decoded via cp437→utf-8: {raw_filename} -> {attempt2}")
-                                        except (UnicodeDecodeError, UnicodeEncodeError):
-                                            
-                                            logger.debug(f"Could not decode {raw_filename}, keeping original")
-                                            filename_to_use = raw_filename
-                                
-                                
-                                member.filename = filename_to_use
-                                extracted_path = zip_ref.extract(member, temp_extract_dir)
-                                
-                            except Exception as e:
-                                logger.warning(f"Could not extract {member.filename}: {str(e)}")
-                                try:
-                                    zip_ref.extract(member, temp_extract_dir)
-                                except Exception as e2:
-                                    logger.error(f"Failed to extract {member.filename}: {str(e2)}")
-                    
-                    
-                    if os.path.exists(temp_zip_path):
-                        os.remove(temp_zip_path)
-                    
-                    allowed_archive_extensions = ['.pdf', '.docx', '.doc', '.html', '.txt', '.md']
-                    
-                    for root, dirs, files in os.walk(temp_extract_dir):
-                        for extracted_filename in files:
-                            extracted_file_path = os.path.join(root, extracted_filename)
-                            extracted_ext = os.path.splitext(extracted_filename)[1].lower()
-                            
-                            
-                            if extracted_ext not in allowed_archive_extensions:
-                                logger.info(f"Skipping unsupported file in archive: {extracted_filename} ({extracted_ext})")
-                                continue
-                            
-                            try:
-                                logger.info(f"Processing extracted file: {extracted_filename}")
-                                
-                                
-                                if get_file_content_by_filename(extracted_filename, organization_id=organization_id) is not None:
-                                    logger.warning(f"File {extracted_filename} already exists in DB, skipping")
-                                    continue
-                                
-                                
-                                with open(extracted_file_path, 'rb') as f:
-                                    extracted_content = f.read()
-                                
-                                
-                                extracted_file_id = insert_document_record(extracted_filename, extracted_content, organization_id=organization_id)
-                                logger.info(f"  Saved to database: {extracted_filename} (file_id: {extracted_file_id})")
-                                
-                                
-                                temp_index_path = f"temp_{extracted_filename}"
-                                with open(temp_index_path, 'wb') as buffer:
-                                    buffer.write(extracted_content)
-                                
-                                if extracted_file_id and index_document_to_chroma(temp_index_path, extracted_file_id, organization_id=organization_id):
-                                    logger.info(f"✓ Indexed {extracted_filename}")
-                                    extracted_files.append({
-                                        "filename": extracted_filename,
-                                        "file_id": extracted_file_id,
-                                        "size": len(extracted_content)
-                                    })
-                                    
-                                    try:
-                                        asyncio.create_task(create_quiz_for_filename(extracted_filename, organization_id=organization_id))
-                                    except Exception:
-                                        pass
-                                else:
-                                    logger.error(f"Failed to index {extracted_filename}")
-                                    if extracted_file_id:
-                                        delete_document_record(extracted_file_id)
-                                    failed_files.append(extracted_filename)
-                                
-                                if os.path.exists(temp_index_path):
-                                    os.remove(temp_index_path)
-                                    
-                            except Exception as e:
-                                logger.error(f"Error processing {extracted_filename}: {str(e)}")
-                                failed_files.append(extracted_filename)
-                    
-                    
-                    logger.info(f"Archive processing complete: {len(extracted_files)} files processed, {len(failed_files)} failed")
-                    
-                    return APIResponse(
-                        status="success",
-                        message=f"Archive {original_filename} processed: {len(extracted_files)} files uploaded and indexed.",
-                        response={
-                            "upload_id": upload_id,
-                            "archive_filename": original_filename,
-                            "files_processed": len(extracted_files),
-                            "files_failed": len(failed_files),
-                            "extracted_files": extracted_files,
-                            "timestamp": timestamp
-                        }
-                    )
-                    
-                except zipfile.BadZipFile as e:
-                    logger.error(f"Invalid ZIP file: {str(e)}")
-                    raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {str(e)}")
-                except Exception as e:
-                    logger.error(f"Error extracting archive: {str(e)}")
-                    raise HTTPException(status_code=400, detail=f"Error extracting archive: {str(e)}")
+            def create_quizzes(state):
+                # Runs on the ingestion thread once every entry is done
+                for entry in state["entries"]:
+                    if entry["status"] == "indexed":
+                        asyncio.run_coroutine_threadsafe(
+                            create_quiz_for_filename(entry["filename"], organization_id=organization_id), loop
+                        )
+            
+            ingestion = start_zip_ingestion(file_path, original_filename, organization_id=organization_id,
+                                            remove_archive=True, on_done=create_quizzes)
+            logger.info(f"✓ Archive accepted: {original_filename} (Upload ID: {upload_id}, Ingestion ID: {ingestion.id})")
+            return APIResponse(
+                status="success",
+                message=f"Archive uploaded successfully: {original_filename}; ingestion started",
+                response={
+                    "upload_id": upload_id,
+                    "archive_filename": original_filename,
+                    "ingestion_id": ingestion.id,
+                    "ingestion_status": ingestion.status,
+                    "file_size": file_size,
+                    "timestamp": timestamp
+                }
+            )
         
         else:
+            content_bytes = await file.read()
+            logger.info(f"  - File size: {len(content_bytes)} bytes")
             
-            
-            if get_file_content_by_filename(original_filename, organization_id=organization_id) is not None:
+            existing = await resource_manager.run(
+                "io", get_file_content_by_filename, original_filename, organization_id=organization_id
+            )
+            if existing is not None:
                 raise HTTPException(status_code=400, detail="A file with this name already exists.")
             
             
-            file_id = insert_document_record(original_filename, content_bytes, organization_id=organization_id)
+            file_id = await resource_manager.run(
+                "io", insert_document_record, original_filename, content_bytes, organization_id=organization_id
+            )
             logger.info(f"  - Database file_id: {file_id}")
 
             
-            temp_file_path = f"temp_{original_filename}"
-            with open(temp_file_path, "wb") as buffer:
-                buffer.write(content_bytes)
-            
             if file_id:
-                success = index_document_to_chroma(temp_file_path, file_id, organization_id=organization_id)
+                # Parsing, chunking and embedding run on the index executor so the event loop keeps serving
+                success = await resource_manager.run(
+                    "index", index_document_to_chroma,
+                    content_bytes, file_id, organization_id=organization_id, filename=original_filename
+                )
             else:
                 success = False
-            
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
 
             if success:
                 
@@ -4122,7 +4257,7 @@ async def secure_chat(
                 )
             else:
                 if file_id:
-                    delete_document_record(file_id)
+                    await resource_manager.run("io", delete_document_record, file_id)
                 logger.error(f"Failed to index {original_filename} (ID: {file_id})")
                 raise HTTPException(status_code=500, detail=f"Failed to index {original_filename}.")
 
@@ -4135,9 +4270,10 @@ async def secure_chat(
         raise HTTPException(500, f"Failed to upload file: {e}")
 
 
-@app.post("/files/upload", response_model=APIResponse, tags=["Documents"])
+@full_routes.post("/files/upload", response_model=APIResponse, tags=["Documents"])
 async def upload_file(
     file: UploadFile = File(...),
+    priority: int = Query(0, description="Indexing priority; higher runs first"),
     current_user=Depends(get_current_user)
 ):
     # Check API key permissions for upload
@@ -4161,54 +4297,74 @@ async def upload_file(
     timestamp = datetime.datetime.utcnow().isoformat()
     original_filename = file.filename or "unknown"
     file_extension = os.path.splitext(original_filename)[1].lower()
+    file_path = None
 
     try:
-        content_bytes = await file.read()
-        
         logger.info(f"Starting upload: {original_filename}")
         logger.info(f"  - Upload ID: {upload_id}")
         logger.info(f"  - User: {current_user[1]}")
         logger.info(f"  - File type: {file_extension}")
-        logger.info(f"  - File size: {len(content_bytes)} bytes")
         logger.info(f"  - Timestamp: {timestamp}")
         
-        # Save file to upload directory
+        # Stream the upload to the upload directory without holding it in memory; the
+        # upload id keeps concurrent uploads of one filename apart, basename keeps it inside
         os.makedirs(UPLOAD_DIR, exist_ok=True)
-        file_path = os.path.join(UPLOAD_DIR, original_filename)
+        file_path = os.path.join(UPLOAD_DIR, f"{upload_id}_{os.path.basename(original_filename)}")
+        file_size = 0
         
         async with aiofiles.open(file_path, "wb") as buffer:
-            await buffer.write(content_bytes)
+            while True:
+                block = await file.read(UPLOAD_READ_BYTES)
+                if not block:
+                    break
+                await buffer.write(block)
+                file_size += len(block)
+        logger.info(f"  - File size: {file_size} bytes")
         
-        # Add document to database
-        document_id = insert_document_record(
-            filename=original_filename,
-            content_bytes=content_bytes,
+        if file_extension == '.zip':
+            # Entries become documents of their own; they are read, parsed and embedded in the background
+            ingestion = start_zip_ingestion(file_path, original_filename, organization_id=organization_id, remove_archive=True)
+            file_path = None  # The ingestion removes the archive when it is done
+            logger.info(f"✓ Archive accepted: {original_filename} (Upload ID: {upload_id}, Ingestion ID: {ingestion.id})")
+            return APIResponse(
+                status="success",
+                message=f"Archive uploaded successfully: {original_filename}; ingestion started",
+                response={
+                    "filename": original_filename,
+                    "upload_id": upload_id,
+                    "ingestion_id": ingestion.id,
+                    "ingestion_status": ingestion.status,
+                    "file_size": file_size,
+                    "timestamp": timestamp
+                }
+            )
+        
+        # Add document to database, copying the file into the BLOB incrementally
+        document_id = await resource_manager.run(
+            "io", insert_document_record_from_file,
+            original_filename, file_path,
             organization_id=organization_id
         )
         
-        # Automatically index the uploaded document
-        try:
-            from auto_indexer import AutoIndexer
-            indexer = AutoIndexer()
-            file_hash = indexer.get_file_hash(file_path)
-            if indexer.index_document(file_path, file_hash, organization_id=organization_id):
-                logger.info(f"✓ Document automatically indexed: {original_filename}")
-            else:
-                logger.warning(f"⚠️ Failed to auto-index document: {original_filename}")
-        except Exception as e:
-            logger.error(f"⚠️ Auto-indexing error for {original_filename}: {e}")
-            # Don't fail the upload if indexing fails
+        # Parsing, chunking and embedding run on the background indexing pool, from the job's own spool copy
+        job_id = await resource_manager.run(
+            "io", enqueue_indexing_job,
+            document_id, original_filename,
+            organization_id=organization_id, priority=priority, source_path=file_path
+        )
         
-        logger.info(f"✓ Upload completed successfully: {original_filename} (ID: {document_id}, Upload ID: {upload_id})")
+        logger.info(f"✓ Upload accepted: {original_filename} (ID: {document_id}, Upload ID: {upload_id}, Job ID: {job_id})")
         
         return APIResponse(
             status="success", 
-            message=f"File uploaded successfully: {original_filename}",
+            message=f"File uploaded successfully: {original_filename}; indexing queued",
             response={
                 "filename": original_filename,
                 "document_id": document_id,
                 "upload_id": upload_id,
-                "file_size": len(content_bytes),
+                "job_id": job_id,
+                "job_status": "queued",
+                "file_size": file_size,
                 "timestamp": timestamp
             }
         )
@@ -4220,10 +4376,80 @@ async def upload_file(
         logger.error(f"  - Upload ID: {upload_id}")
         logger.error(f"  - File type: {file_extension}")
         raise HTTPException(500, f"Failed to upload file: {e}")
+    finally:
+        if file_path is not None and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+@full_routes.get("/files/jobs/{job_id}", response_model=APIResponse, tags=["Documents"])
+async def get_indexing_job_status(job_id: str, current_user=Depends(get_current_user)):
+    """Status of a background indexing job created by /files/upload"""
+    job = await resource_manager.run("io", get_job_status, job_id)
+    if job is None or job.get("organization_id") != _get_active_org_id(current_user):
+        raise HTTPException(status_code=404, detail="Indexing job not found")
+
+    return APIResponse(status="success", message=f"Indexing job {job['status']}", response=job)
+
+
+@full_routes.get("/files/archives/{ingestion_id}", response_model=APIResponse, tags=["Documents"])
+async def get_archive_ingestion_status(ingestion_id: str, current_user=Depends(get_current_user)):
+    """Per-entry progress of a ZIP archive uploaded through /files/upload"""
+    ingestion = get_ingestion(ingestion_id)
+    if ingestion is None or ingestion.organization_id != _get_active_org_id(current_user):
+        raise HTTPException(status_code=404, detail="Archive ingestion not found")
+
+    return APIResponse(status="success", message=f"Archive ingestion {ingestion.status}", response=ingestion.snapshot())
+
+
+def _ingestion_status(organization_id: Optional[str]) -> Dict[str, Any]:
+    """Ingest jobs of an organization with queue depth and running archive uploads"""
+    return {
+        **ingest_progress.status(organization_id),
+        "queue": indexing_pool.stats(),
+        "archives": [ingestion.snapshot(include_entries=False) for ingestion in list_ingestions()
+                     if ingestion.organization_id == organization_id],
+    }
+
+
+@full_routes.get("/ingestion/status", response_model=APIResponse, tags=["Documents"])
+async def get_ingestion_status(user=Depends(get_current_user)):
+    """Stage, counters, throughput and errors of running and recent ingest jobs"""
+    if not user or user[3] != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return APIResponse(
+        status="success",
+        message="Ingestion status retrieved",
+        response=_ingestion_status(_get_active_org_id(user))
+    )
+
+
+@full_routes.websocket("/ws/ingestion")
+async def websocket_ingestion_endpoint(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """Pushes the ingestion status every RAG_INGEST_PROGRESS_INTERVAL seconds"""
+    user = await get_user_from_token(token) if token else None
+    if not user:
+        await websocket.close(code=1008, reason="Authentication required")
+        return
+    if user[3] != 'admin':
+        await websocket.close(code=1008, reason="Admin access required")
+        return
+
+    await websocket.accept()
+    organization_id = _get_active_org_id(user)
+    try:
+        while True:
+            await websocket.send_json(_ingestion_status(organization_id))
+            await asyncio.sleep(PUSH_INTERVAL_SECONDS)
+    except WebSocketDisconnect:
+        logger.info(f"Ingestion status feed closed for user {user[1]}")
 
 
-@app.get("/files/list", response_model=APIResponse)
-async def list_documents(user=Depends(get_current_user)):
+@full_routes.get("/files/list", response_model=APIResponse)
+async def list_documents(
+    user=Depends(get_current_user),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. documents.filename,documents.id")
+):
     # Check API key permissions for download (viewing files)
     if not await check_api_key_operation_permission(user, "download"):
         raise HTTPException(status_code=403, detail="API key requires 'download' permission")
@@ -4243,14 +4469,14 @@ async def list_documents(user=Depends(get_current_user)):
         return APIResponse(
             status="success",
             message="List of uploaded documents",
-            response={"documents": filtered_docs}
+            response=project({"documents": filtered_docs}, await resolve_fields(user, "files.list", fields))
         )
     except Exception as e:
         logger.exception("Failed to list documents")
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.delete("/files/delete_by_fileid", response_model=APIResponse)
+@full_routes.delete("/files/delete_by_fileid", response_model=APIResponse)
 async def delete_document(
     request: DeleteFileRequest,
     current_user=Depends(get_current_user)
@@ -4296,7 +4522,7 @@ async def delete_document(
         return APIResponse(status="error", message=str(e), response=None)
 
 
-@app.get("/files/available")
+@full_routes.get("/files/available")
 async def list_available_filenames():
     try:
         
@@ -4329,7 +4555,7 @@ async def list_available_filenames():
         raise HTTPException(status_code=500, detail=f"Error listing available files: {str(e)}")
 
 
-@app.delete("/files/delete_by_filename", response_model=APIResponse)
+@full_routes.delete("/files/delete_by_filename", response_model=APIResponse)
 async def delete_file_by_filename(filename: str, current_user=Depends(get_current_user)):
     # Check API key permissions for delete_documents
     if not await check_api_key_operation_permission(current_user, "delete_documents"):
@@ -4386,8 +4612,10 @@ async def delete_file_by_filename(filename: str, current_user=Depends(get_curren
 
 
 
-@app.post("/files/index", response_model=APIResponse, tags=["Documents"])
+@full_routes.post("/files/index", response_model=APIResponse, tags=["Documents"])
 async def index_files(
+    dry_run: bool = Query(False, description="Only report the files that would be indexed, replaced and deleted"),
+    full: bool = Query(False, description="Reindex every document instead of only changed ones"),
     current_user=Depends(get_current_user)
 ):
     if current_user[3] != "admin":
@@ -4398,114 +4626,70 @@ async def index_files(
         if not organization_id:
             raise HTTPException(status_code=400, detail="Organization context required.")
         
-        from rag_api.db_utils import get_unindexed_documents
-        from rag_api.chroma_utils import index_document_to_chroma, delete_doc_from_chroma
-        
-        logger.info(f"Starting manual indexation for organization {organization_id}")
+        from rag_api.bulk_reindex import BulkReindexer, organization_items
+        from rag_api.corpus_sync import run_sync
         
-        from rag_api.db_utils import get_file_content_by_id
-        documents = get_all_documents(organization_id=organization_id)
+        logger.info(f"Starting {'full' if full else 'incremental'} indexation for organization {organization_id}")
         
-        if not documents:
-            return APIResponse(
-                status="success",
-                message="No documents found to index",
-                response={"indexed_count": 0, "failed_count": 0, "replaced_count": 0, "documents": []}
-            )
+        if not full or dry_run:
+            # Only files whose content hash differs from the indexed manifest
+            sync = await resource_manager.run("io", run_sync, organization_id, dry_run)
+            plan = sync["plan"]
+            if dry_run:
+                return APIResponse(
+                    status="success",
+                    message=(f"Dry run: {len(plan['added'])} to index, {len(plan['modified'])} to replace, "
+                             f"{len(plan['deleted'])} to delete, {plan['unchanged']} unchanged"),
+                    response=plan
+                )
+            result = sync.get("reindex") or {
+                "indexed_documents": [], "failed_documents": [], "replaced_documents": [],
+                "chunks": 0, "elapsed_seconds": 0, "chunks_per_second": 0
+            }
+            deleted_docs = plan["deleted"]
+            unchanged_count = plan["unchanged"]
+        else:
+            items = organization_items(organization_id)
+            
+            if not items:
+                return APIResponse(
+                    status="success",
+                    message="No documents found to index",
+                    response={"indexed_count": 0, "failed_count": 0, "replaced_count": 0, "documents": []}
+                )
+            
+            # Parsing runs on a process pool and embedding in large batches, off the event loop
+            result = await resource_manager.run("io", BulkReindexer(replace_existing=True).run, items)
+            deleted_docs = []
+            unchanged_count = 0
         
-        indexed_count = 0
-        failed_count = 0
-        replaced_count = 0
-        indexed_docs = []
-        failed_docs = []
-        replaced_docs = []
+        indexed_docs = result["indexed_documents"]
+        failed_docs = result["failed_documents"]
+        replaced_docs = [{**doc, "action": "Replaced"} for doc in result["replaced_documents"]]
+        indexed_count = len(indexed_docs)
+        failed_count = len(failed_docs)
+        replaced_count = len(replaced_docs)
         
-        for doc in documents:
-            try:
-                from rag_api.db_utils import get_file_content_by_id
-                
-                if isinstance(doc, dict):
-                    file_id = doc.get("id")
-                    filename = doc.get("filename")
-                elif isinstance(doc, (list, tuple)) and len(doc) >= 2:
-                    file_id = doc[0]
-                    filename = doc[1]
-                else:
-                    continue
-                
-                if not file_id or not filename:
-                    continue
-                
-                file_data = get_file_content_by_id(file_id, organization_id)
-                if not file_data or not file_data.get('content'):
-                    failed_count += 1
-                    failed_docs.append({
-                        "file_id": file_id,
-                        "filename": filename,
-                        "reason": "No content in DB"
-                    })
-                    continue
-                
-                content = file_data['content']
-                temp_file_path = f"temp_{filename}"
-                
-                try:
-                    try:
-                        existing_deleted = delete_doc_from_chroma(file_id, organization_id=organization_id)
-                        if existing_deleted:
-                            replaced_count += 1
-                            replaced_docs.append({
-                                "file_id": file_id,
-                                "filename": filename,
-                                "action": "Replaced"
-                            })
-                    except:
-                        pass
-                    
-                    with open(temp_file_path, "wb") as buffer:
-                        if isinstance(content, bytes):
-                            buffer.write(content)
-                        else:
-                            buffer.write(content.encode('utf-8'))
-                    
-                    success = index_document_to_chroma(
-                        temp_file_path, 
-                        file_id, 
-                        organization_id=organization_id
-                    )
-                    
-                    if success:
-                        indexed_count += 1
-                        indexed_docs.append({"file_id": file_id, "filename": filename})
-                        logger.info(f"✓ Indexed {filename}")
-                    else:
-                        failed_count += 1
-                        failed_docs.append({"file_id": file_id, "filename": filename, "reason": "Index failed"})
-                finally:
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
-                    
-            except Exception as e:
-                failed_count += 1
-                failed_docs.append({
-                    "file_id": doc.get("id") if isinstance(doc, dict) else None,
-                    "filename": doc.get("filename") if isinstance(doc, dict) else None,
-                    "reason": str(e)
-                })
-                logger.error(f"Error: {str(e)}")
-        
-        logger.info(f"Indexation complete: {indexed_count} indexed, {replaced_count} replaced, {failed_count} failed")
+        logger.info(f"Indexation complete: {indexed_count} indexed, {replaced_count} replaced, "
+                    f"{len(deleted_docs)} deleted, {unchanged_count} unchanged, {failed_count} failed")
         
         return APIResponse(
             status="success",
-            message=f"Indexation complete: {indexed_count} files indexed, {replaced_count} replaced, {failed_count} failed",
+            message=(f"Indexation complete: {indexed_count} files indexed, {replaced_count} replaced, "
+                     f"{len(deleted_docs)} deleted, {unchanged_count} unchanged, {failed_count} failed"),
             response={
                 "indexed_count": indexed_count,
                 "replaced_count": replaced_count,
+                "deleted_count": len(deleted_docs),
+                "unchanged_count": unchanged_count,
                 "failed_count": failed_count,
                 "indexed_documents": indexed_docs,
                 "replaced_documents": replaced_docs,
-                "failed_documents": failed_docs
+                "deleted_documents": deleted_docs,
+                "failed_documents": failed_docs,
+                "total_chunks": result["chunks"],
+                "elapsed_seconds": result["elapsed_seconds"],
+                "chunks_per_second": result["chunks_per_second"]
             }
         )
     
@@ -4519,7 +4703,7 @@ async def index_files(
 
 
 
-@app.get("/accounts", response_model=List[dict])
+@full_routes.get("/accounts", response_model=List[dict])
 async def get_accounts(current_user=Depends(get_current_user)):
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required.")
@@ -4541,7 +4725,7 @@ async def get_accounts(current_user=Depends(get_current_user)):
 if __name__ == "__main__":
     uvicorn.run("api:app", host="0.0.0.0", port=9001, reload=True)
 
-@app.delete("/user/delete", response_model=APIResponse)
+@full_routes.delete("/user/delete", response_model=APIResponse)
 async def delete_user_endpoint(
     username: str,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme)
@@ -4584,7 +4768,7 @@ async def delete_user_endpoint(
     return APIResponse(status="success", message=f"User {username} deleted", response={})
 
 
-@app.post("/user/edit", response_model=APIResponse)
+@full_routes.post("/user/edit", response_model=APIResponse)
 async def edit_user_endpoint(
     request: UserEditRequest,
     request_obj: Request,
@@ -4736,22 +4920,15 @@ async def edit_user_endpoint(
             if previous_files and request.allowed_files:
                 new_files = set(request.allowed_files) - set(previous_files if previous_files else [])
                 if new_files:
-                    from rag_api.db_utils import get_file_content_by_filename
+                    from rag_api.db_utils import get_file_content_by_filename, get_document_info_by_filename
                     from rag_api.chroma_utils import index_document_to_chroma
-                    import tempfile
 
                     for filename in new_files:
                         try:
                             content = get_file_content_by_filename(filename)
-                            if content:
-                                
-                                with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
-                                    temp_file.write(content)
-                                    temp_path = temp_file.name
-
-                                
-                                index_document_to_chroma(temp_path, filename)
-                                os.unlink(temp_path)  
+                            info = get_document_info_by_filename(filename)
+                            if content and info:
+                                index_document_to_chroma(content, info["id"], organization_id=info.get("organization_id"), filename=filename)
                         except Exception as e:
                             logger.error(f"Error reindexing file {filename} after permission update: {e}")
 
@@ -4788,7 +4965,7 @@ async def edit_user_endpoint(
         return APIResponse(status="error", message=f"Failed to update user: {str(e)}", response={})
 
 
-@app.get("/users", response_model=APIResponse)
+@full_routes.get("/users", response_model=APIResponse)
 async def list_users(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
     request_obj: Request = None
@@ -4880,7 +5057,7 @@ async def list_users(
         )
 
 
-@app.get("/user/{username}", response_model=APIResponse)
+@full_routes.get("/user/{username}", response_model=APIResponse)
 async def get_user_details(
     username: str,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
@@ -4971,7 +5148,7 @@ async def get_user_details(
         )
 
 
-@app.put("/user/{username}", response_model=APIResponse)
+@full_routes.put("/user/{username}", response_model=APIResponse)
 async def update_user_endpoint(
     username: str,
     request: UserEditRequest,
@@ -4987,7 +5164,7 @@ async def update_user_endpoint(
 class DisruptSessionsRequest(BaseModel):
     access_token: str
 
-@app.post("/user/disrupt_sessions", response_model=APIResponse)
+@full_routes.post("/user/disrupt_sessions", response_model=APIResponse)
 async def disrupt_sessions_endpoint(request: DisruptSessionsRequest):
     user = await get_user_by_token(request.access_token)
     if not user:
@@ -4998,7 +5175,7 @@ async def disrupt_sessions_endpoint(request: DisruptSessionsRequest):
     return APIResponse(status="success", message=f"Disrupted {count} sessions for user {username}", response={"sessions_removed": count})
 
 
-@app.post("/files/edit", response_model=APIResponse)
+@full_routes.post("/files/edit", response_model=APIResponse)
 async def edit_file_content(
     filename: str = Body(..., embed=True),
     new_content: str = Body(..., embed=True),
@@ -5008,7 +5185,7 @@ async def edit_file_content(
         raise HTTPException(status_code=403, detail="Admin only.")
     try:
         from rag_api.db_utils import update_document_record
-        from rag_api.chroma_utils import index_document_to_chroma, delete_doc_from_chroma
+        from rag_api.chroma_utils import reindex_document_incremental
         import os
         
         organization_id = _get_active_org_id(user)
@@ -5017,15 +5194,15 @@ async def edit_file_content(
         if not file_ids:
             return APIResponse(status="error", message="File not found in DB", response=None)
         
-        temp_file_path = f"temp_{filename}"
-        with open(temp_file_path, "w", encoding="utf-8") as buffer:
-            buffer.write(new_content)
-        
+        # Only chunks whose text changed are re-embedded
+        chunk_changes = {}
         for file_id in file_ids:
-            delete_doc_from_chroma(file_id, organization_id=organization_id)
-            index_document_to_chroma(temp_file_path, file_id, organization_id=organization_id)
-        os.remove(temp_file_path)
-        return APIResponse(status="success", message="File updated and reindexed", response={"file_ids": file_ids, "filename": filename})
+            chunk_changes[file_id] = await resource_manager.run(
+                "index", reindex_document_incremental, new_content.encode("utf-8"), file_id,
+                organization_id=organization_id, filename=filename
+            )
+        return APIResponse(status="success", message="File updated and reindexed",
+                           response={"file_ids": file_ids, "filename": filename, "chunk_changes": chunk_changes})
     except Exception as e:
         return APIResponse(status="error", message=str(e), response=None)
 
@@ -5035,7 +5212,7 @@ class TimeRangeQuery(BaseModel):
 
 
 
-@app.get("/metrics/summary", tags=["Analytics"])
+@full_routes.get("/metrics/summary", tags=["Analytics"])
 async def get_metrics_summary_endpoint(
     since: str = Query("24h", description="Time range: 1h, 24h, 7d, etc"),
     scope: str = Query("org", description="user|org|global"),
@@ -5094,7 +5271,7 @@ async def get_metrics_summary_endpoint(
         logger.error(f"Error getting metrics summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/metrics/queries", tags=["Analytics"])
+@full_routes.get("/metrics/queries", tags=["Analytics"])
 async def get_metrics_queries(
     since: str = Query("24h", description="Time range"),
     limit: int = Query(10, le=100),
@@ -5164,7 +5341,7 @@ async def get_metrics_queries(
         logger.error(f"Error getting metrics queries: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/metrics/performance", tags=["Analytics"])
+@full_routes.get("/metrics/performance", tags=["Analytics"])
 async def get_metrics_performance(
     since: str = Query("24h"),
     limit: int = Query(20, le=100),
@@ -5199,7 +5376,7 @@ async def get_metrics_performance(
         logger.error(f"Error getting performance metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/metrics/errors", tags=["Analytics"])
+@full_routes.get("/metrics/errors", tags=["Analytics"])
 async def get_metrics_errors(
     since: str = Query("24h"),
     limit: int = Query(50, le=100),
@@ -5231,7 +5408,7 @@ async def get_metrics_errors(
         logger.error(f"Error getting error metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/metrics/documents", tags=["Analytics"])
+@full_routes.get("/metrics/documents", tags=["Analytics"])
 async def get_metrics_documents(
     limit: int = Query(20, le=100),
     admin_user=Depends(get_current_user)
@@ -5254,7 +5431,7 @@ async def get_metrics_documents(
         logger.error(f"Error getting document metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/metrics/health", tags=["Analytics"])
+@full_routes.get("/metrics/health", tags=["Analytics"])
 async def get_metrics_health(
     current_user=Depends(get_current_user)
 ):
@@ -5296,7 +5473,7 @@ async def get_metrics_health(
         }
 
 
-@app.get("/metrics/volume", tags=["Analytics"])
+@full_routes.get("/metrics/volume", tags=["Analytics"])
 async def get_query_volume(
     days: int = Query(7, description="Number of days to retrieve", ge=1, le=365),
     scope: str = Query("org", description="Scope: user|org|global"),
@@ -5362,7 +5539,7 @@ async def get_query_volume(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/dashboard/employee", tags=["Dashboard"])
+@full_routes.get("/dashboard/employee", tags=["Dashboard"])
 async def get_employee_dashboard_data(
     current_user=Depends(get_current_user),
     since: str = Query("24h", description="Time range: 1h, 24h, 7d, etc"),
@@ -5471,7 +5648,7 @@ async def get_employee_dashboard_data(
     }
 
 
-@app.get("/dashboard/admin", tags=["Dashboard"])
+@full_routes.get("/dashboard/admin", tags=["Dashboard"])
 async def get_admin_dashboard_data(
     current_user=Depends(get_current_user),
     since: str = Query("24h", description="Time range: 1h, 24h, 7d, etc"),
@@ -5765,7 +5942,7 @@ async def get_admin_dashboard_data(
 
 
 
-@app.get("/metrics/summary-legacy", tags=["Analytics (Deprecated)"], deprecated=True)
+@full_routes.get("/metrics/summary-legacy", tags=["Analytics (Deprecated)"], deprecated=True)
 async def get_metrics_summary_legacy(
     since: str = "24h",
     current_user=Depends(get_current_user)
@@ -5776,7 +5953,7 @@ async def get_metrics_summary_legacy(
         "redirect": "/metrics/summary"
     }
 
-@app.get("/metrics/queries-legacy", tags=["Analytics (Deprecated)"], deprecated=True)
+@full_routes.get("/metrics/queries-legacy", tags=["Analytics (Deprecated)"], deprecated=True)
 async def get_metrics_queries_legacy(
     since: str = "24h",
     limit: int = 10,
@@ -5824,12 +6001,13 @@ class QuizSubmissionCreate(BaseModel):
     answers: Dict[str, str]
     time_spent: int
 
-@app.post("/admin/quizzes", response_model=APIResponse, tags=["Quiz Management"]) # Create quiz endpoint
+@full_routes.post("/admin/quizzes", response_model=APIResponse, tags=["Quiz Management"]) # Create quiz endpoint
 async def create_quiz(
     quiz_data: QuizCreate,
     request_obj: Request,
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import QuizQuestion, create_manual_quiz
     logger.info(f"Quiz creation attempt by user: {current_user[1]} with role: {current_user[3]}")
     
     if current_user[3] != "admin":
@@ -5892,7 +6070,7 @@ async def create_quiz(
         logger.error(f"Error creating quiz: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/admin/quizzes", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.get("/admin/quizzes", response_model=APIResponse, tags=["Quiz Management"])
 async def list_quizzes(
     category: Optional[str] = Query(None),
     difficulty: Optional[str] = Query(None),
@@ -5900,6 +6078,7 @@ async def list_quizzes(
     offset: int = Query(0, ge=0),
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import get_all_quizzes
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
@@ -5926,11 +6105,12 @@ async def list_quizzes(
         logger.error(f"Error listing quizzes: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/admin/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.get("/admin/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"])
 async def get_quiz(
     quiz_id: str,
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import get_quiz_by_id
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
@@ -5953,12 +6133,13 @@ async def get_quiz(
         logger.error(f"Error getting quiz: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.put("/admin/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.put("/admin/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"])
 async def update_quiz_endpoint(
     quiz_id: str,
     quiz_data: QuizUpdate,
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import QuizQuestion, update_quiz
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
@@ -5995,11 +6176,12 @@ async def update_quiz_endpoint(
         logger.error(f"Error updating quiz: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/admin/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"]) 
+@full_routes.delete("/admin/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"]) 
 async def delete_quiz_endpoint(
     quiz_id: str,
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import delete_quiz
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
@@ -6021,7 +6203,7 @@ async def delete_quiz_endpoint(
         logger.error(f"Error deleting quiz: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/quizzes", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.get("/quizzes", response_model=APIResponse, tags=["Quiz Management"])
 async def get_available_quizzes(
     category: Optional[str] = Query(None),
     difficulty: Optional[str] = Query(None),
@@ -6029,6 +6211,7 @@ async def get_available_quizzes(
     offset: int = Query(0, ge=0),
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import get_all_quizzes
     logger.info(f"Fetching available quizzes for user: {current_user[1]}")
     logger.info(f"Query params - category: {category}, difficulty: {difficulty}, limit: {limit}, offset: {offset}")
     
@@ -6076,11 +6259,12 @@ async def get_available_quizzes(
         logger.exception("Full traceback:")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.get("/quizzes/{quiz_id}", response_model=APIResponse, tags=["Quiz Management"])
 async def get_quiz_for_user(
     quiz_id: str,
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import get_quiz_by_id
     organization_id = _get_active_org_id(current_user)
     
     try:
@@ -6100,12 +6284,13 @@ async def get_quiz_for_user(
         logger.error(f"Error getting quiz for user: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/quizzes/{quiz_id}/submit", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.post("/quizzes/{quiz_id}/submit", response_model=APIResponse, tags=["Quiz Management"])
 async def submit_quiz(
     quiz_id: str,
     submission: QuizSubmissionCreate,
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import get_quiz_by_id, submit_quiz_result
     organization_id = _get_active_org_id(current_user)
     
     try:
@@ -6155,11 +6340,12 @@ async def submit_quiz(
         logger.error(f"Error submitting quiz: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/admin/quizzes/{quiz_id}/statistics", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.get("/admin/quizzes/{quiz_id}/statistics", response_model=APIResponse, tags=["Quiz Management"])
 async def get_quiz_stats(
     quiz_id: str,
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import get_quiz_statistics
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
@@ -6177,13 +6363,14 @@ async def get_quiz_stats(
         logger.error(f"Error getting quiz statistics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/admin/quizzes/{quiz_id}/submissions", response_model=APIResponse, tags=["Quiz Management"])
+@full_routes.get("/admin/quizzes/{quiz_id}/submissions", response_model=APIResponse, tags=["Quiz Management"])
 async def get_quiz_submissions_admin(
     quiz_id: str,
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
     current_user=Depends(get_current_user)
 ):
+    from quiz_management import get_quiz_submissions
     if current_user[3] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
@@ -6211,7 +6398,7 @@ async def get_quiz_submissions_admin(
 
 
 # Invite Management Endpoints
-@app.post("/invites/create", response_model=APIResponse)
+@full_routes.post("/invites/create", response_model=APIResponse)
 async def create_invite(
     request: CreateInviteRequest,
     request_obj: Request,
@@ -6338,7 +6525,7 @@ async def create_invite(
         )
 
 
-@app.get("/invites", response_model=APIResponse)
+@full_routes.get("/invites", response_model=APIResponse)
 async def list_invites(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
     request_obj: Request = None
@@ -6410,7 +6597,7 @@ async def list_invites(
         )
 
 
-@app.post("/invites/accept", response_model=APIResponse)
+@full_routes.post("/invites/accept", response_model=APIResponse)
 async def accept_invite(
     request: InviteAcceptRequest,
     request_obj: Request
@@ -6525,7 +6712,7 @@ async def accept_invite(
         )
 
 
-@app.get("/invite/{token}", response_model=APIResponse)
+@full_routes.get("/invite/{token}", response_model=APIResponse)
 async def get_invite_info(token: str):
     """
     Get information about an invite by token.
@@ -6566,7 +6753,7 @@ async def get_invite_info(token: str):
         )
 
 
-@app.delete("/invites/{invite_id}", response_model=APIResponse)
+@full_routes.delete("/invites/{invite_id}", response_model=APIResponse)
 async def revoke_invite(
     invite_id: str,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
@@ -6632,3 +6819,8 @@ async def revoke_invite(
             message=f"Failed to revoke invite: {str(e)}", 
             response=None
         )
+
+
+# The search profile serves only the auth, query and health routes registered on the app
+if not is_search_profile():
+    app.include_router(full_routes)
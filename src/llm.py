@@ -3,6 +3,9 @@ import asyncio
 from typing import List, Optional, Dict, Any, Union
 from dotenv import load_dotenv
 
+from rag_api.lazy import LazyResource
+from rag_api.resource_manager import resource_manager
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -11,56 +14,58 @@ DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Initialize clients
-deepseek_client = None
-openai_client = None
-gemini_client = None
-active_llm = None  # Track which LLM is being used
+def _create_llm_clients() -> Dict[str, Any]:
+    """
+    Initialize the LLM SDK clients. Runs on first use rather than at import,
+    so processes that never call an LLM do not pay for the SDK imports.
+    """
+    clients = {"deepseek": None, "chatgpt": None, "gemini": None, "active": None}
 
-# Try DeepSeek first (preferred)
-if DEEPSEEK_API_KEY:
-    try:
-        from openai import AsyncOpenAI
-        deepseek_client = AsyncOpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com/v1"
-        )
-        active_llm = "deepseek"
-        print("✓ DeepSeek client initialized successfully")
-    except Exception as e:
-        print(f"Warning: Failed to initialize DeepSeek client: {e}")
-        deepseek_client = None
+    # Try DeepSeek first (preferred)
+    if DEEPSEEK_API_KEY:
+        try:
+            from openai import AsyncOpenAI
+            clients["deepseek"] = AsyncOpenAI(
+                api_key=DEEPSEEK_API_KEY,
+                base_url="https://api.deepseek.com/v1"
+            )
+            clients["active"] = "deepseek"
+            print("✓ DeepSeek client initialized successfully")
+        except Exception as e:
+            print(f"Warning: Failed to initialize DeepSeek client: {e}")
 
-# Try ChatGPT/OpenAI if DeepSeek is not available
-if not deepseek_client and OPENAI_API_KEY:
-    try:
-        from openai import AsyncOpenAI
-        openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-        active_llm = "chatgpt"
-        print("✓ ChatGPT (OpenAI) client initialized successfully")
-    except Exception as e:
-        print(f"Warning: Failed to initialize OpenAI client: {e}")
-        openai_client = None
+    # Try ChatGPT/OpenAI if DeepSeek is not available
+    if not clients["deepseek"] and OPENAI_API_KEY:
+        try:
+            from openai import AsyncOpenAI
+            clients["chatgpt"] = AsyncOpenAI(api_key=OPENAI_API_KEY)
+            clients["active"] = "chatgpt"
+            print("✓ ChatGPT (OpenAI) client initialized successfully")
+        except Exception as e:
+            print(f"Warning: Failed to initialize OpenAI client: {e}")
+
+    # Try Gemini if DeepSeek and ChatGPT are not available
+    if not clients["deepseek"] and not clients["chatgpt"] and GEMINI_API_KEY:
+        try:
+            from google import genai
+            # Set the API key in environment for the library
+            if not os.getenv("GOOGLE_API_KEY"):
+                os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
+            clients["gemini"] = genai.Client(api_key=GEMINI_API_KEY)
+            clients["active"] = "gemini"
+            print("✓ Gemini client initialized successfully")
+        except Exception as e:
+            print(f"Warning: Failed to initialize Gemini client: {e}")
 
-# Try Gemini if DeepSeek and ChatGPT are not available
-if not deepseek_client and not openai_client and GEMINI_API_KEY:
-    try:
-        from google import genai
-        # Set the API key in environment for the library
-        if not os.getenv("GOOGLE_API_KEY"):
-            os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
-        gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-        active_llm = "gemini"
-        print("✓ Gemini client initialized successfully")
-    except Exception as e:
-        print(f"Warning: Failed to initialize Gemini client: {e}")
-        gemini_client = None
+    if not clients["active"]:
+        print("ℹ No LLM API key found. Running in RAG-only mode (search results only).")
+    return clients
 
-if not deepseek_client and not openai_client and not gemini_client:
-    print("ℹ No LLM API key found. Running in RAG-only mode (search results only).")
+llm_clients = LazyResource("llm_clients", _create_llm_clients, required_for_ready=False)
 
-# Check if any LLM is available
-LLM_AVAILABLE = deepseek_client is not None or openai_client is not None or gemini_client is not None
+def is_llm_available() -> bool:
+    """Check if any LLM is available"""
+    return llm_clients.get()["active"] is not None
 
 def get_immediate_results(data):
     """
@@ -100,8 +105,10 @@ async def generate_llm_overview(message: str, data: Any, stream_callback=None) -
     Returns:
         str or None: LLM-generated overview
     """
-    if not LLM_AVAILABLE:
+    if not is_llm_available():
         return None
+    clients = llm_clients.get()
+    deepseek_client, openai_client, gemini_client = clients["deepseek"], clients["chatgpt"], clients["gemini"]
     
     system_prompt = (
         "You are an AI assistant. You receive search results from a knowledge base. "
@@ -203,7 +210,7 @@ async def generate_llm_overview(message: str, data: Any, stream_callback=None) -
             print("🤖 Generating overview with Gemini...")
             loop = asyncio.get_event_loop()
             response = await loop.run_in_executor(
-                None,
+                resource_manager.executors["llm"],
                 lambda: gemini_client.models.generate_content(
                     model="gemini-2.0-flash-exp",
                     contents=[
@@ -230,7 +237,7 @@ async def generate_batch_overviews(queries: List[str], search_results: List[Any]
     """
     Generate multiple AI overviews in parallel for a batch of queries.
     """
-    if not LLM_AVAILABLE:
+    if not is_llm_available():
         return ["AI overview unavailable (LLM not configured)"] * len(queries)
         
     tasks = []
@@ -274,7 +281,7 @@ async def llm_call(message, data, get_overview=True):
     immediate_response = get_immediate_results(data)
     
     # If no LLM or overview not requested, return immediately
-    if not LLM_AVAILABLE or not get_overview:
+    if not get_overview or not is_llm_available():
         return {
             'immediate': immediate_response,
             'overview': None,
@@ -287,7 +294,7 @@ async def llm_call(message, data, get_overview=True):
     return {
         'immediate': immediate_response,
         'overview': overview,
-        'llm_used': active_llm if overview else None
+        'llm_used': llm_clients.get()["active"] if overview else None
     }
 
 if __name__ == "__main__":
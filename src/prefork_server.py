@@ -0,0 +1,204 @@
+"""
+Preload-and-fork Server
+Loads the API, embedding model, tokenizers and NLTK data once in a master
+process, freezes the heap (gc.freeze) and forks uvicorn workers that share
+those pages copy-on-write, instead of each `uvicorn --workers` child
+re-importing and re-loading everything.
+
+Usage:
+    cd src && python prefork_server.py --workers 4 --port 8000
+    RAG_SERVER_MODE=prefork RAG_API_WORKERS=4 python main.py
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Resources built in the master before forking; Chroma is reopened per worker
+# because its SQLite connections and background threads do not survive fork
+PRELOAD_RESOURCES = ["nltk", "chunkers", "embeddings", "llm_clients", "rag_chain_llm_clients"]
+FORK_UNSAFE_RESOURCES = ["vectorstore", "summary_vectorstore"]
+# Seconds to wait before restarting a worker that keeps crashing
+RESTART_BACKOFF = 1.0
+# Seconds after startup at which the master reports each worker's memory
+MEMORY_REPORT_DELAY = 2.0
+
+
+def memory_usage_mb(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Resident memory of a process: rss, plus uss (pages unique to it) and the
+    shared remainder when psutil can read them. uss is what one more worker costs.
+    """
+    pid = pid or os.getpid()
+    if psutil is not None:
+        try:
+            info = psutil.Process(pid).memory_full_info()
+            return {
+                "rss": round(info.rss / 1048576, 1),
+                "uss": round(info.uss / 1048576, 1),
+                "shared": round((info.rss - info.uss) / 1048576, 1)
+            }
+        except (psutil.Error, AttributeError):
+            pass  # Fall back to /proc
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            _size, resident, shared = (int(x) for x in f.read().split()[:3])
+        page_mb = os.sysconf("SC_PAGE_SIZE") / 1048576
+        return {"rss": round(resident * page_mb, 1), "shared": round(shared * page_mb, 1)}
+    except (OSError, ValueError):
+        return {}
+
+
+def preload():
+    """Import the app and build the shared read-only resources in the master"""
+    from api import app
+    from rag_api import chroma_utils
+    from rag_api.lazy import get_resource, warm_up
+
+    # Load weights only: a forward pass here would start torch's OpenMP pool,
+    # whose threads do not survive fork; each worker warms up after forking
+    warmup_inference, chroma_utils.WARMUP_INFERENCE = chroma_utils.WARMUP_INFERENCE, False
+    try:
+        state = warm_up([name for name in PRELOAD_RESOURCES if get_resource(name) is not None])
+    finally:
+        chroma_utils.WARMUP_INFERENCE = warmup_inference
+    failed = [name for name in PRELOAD_RESOURCES if state["resources"].get(name, {}).get("state") == "failed"]
+    if failed:
+        logger.warning(f"Preload failed for {', '.join(failed)}; workers will retry on first use")
+
+    # Load the stopword lists and punkt models into the shared heap too
+    try:
+        from rag_api.chroma_utils import preprocess_text
+        preprocess_text("Warmup text. Текст для прогрева.", language='russian')
+    except Exception as e:
+        logger.warning(f"Could not preload NLTK corpora: {e}")
+
+    # Move everything allocated so far into the permanent generation so the
+    # cyclic GC never touches (and copy-on-write dirties) those pages in workers
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Master preloaded in {os.getpid()}: {memory_usage_mb()} MB, {gc.get_freeze_count()} objects frozen")
+    return app
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, worker_id: int):
+    import uvicorn
+    from rag_api import chroma_utils
+    from rag_api.lazy import get_resource
+
+    for name in FORK_UNSAFE_RESOURCES:
+        resource = get_resource(name)
+        if resource is not None:
+            resource.reset()
+
+    if chroma_utils.WARMUP_INFERENCE:
+        try:
+            chroma_utils.warm_up_inference()
+        except Exception as e:
+            logger.warning(f"Worker {worker_id} warm-up inference failed: {e}")
+
+    logger.info(f"Worker {worker_id} (pid {os.getpid()}) started: {memory_usage_mb()} MB")
+    config = uvicorn.Config(app, lifespan="on", log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 2,
+          preload_fn: Callable[[], Any] = preload, worker_fn: Callable[[Any, socket.socket, int], None] = _run_worker):
+    """
+    Preload once, then fork and supervise the workers.
+
+    Args:
+        workers: Number of forked workers kept running
+        preload_fn: Builds the app in the master; its result is handed to every worker
+        worker_fn: Serves the app on the shared socket in a worker
+    """
+    logging.basicConfig(level=logging.INFO)
+    app = preload_fn()
+    sock = _bind_socket(host, port)
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                # Reset signal handlers inherited from the master; uvicorn installs its own
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                worker_fn(app, sock, worker_id)
+            finally:
+                os._exit(0)
+        children[pid] = worker_id
+
+    def shutdown(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for worker_id in range(workers):
+        spawn(worker_id)
+    logger.info(f"Serving on {host}:{port} with {workers} forked workers")
+
+    # Give workers a moment to start, then report what each one really costs
+    time.sleep(MEMORY_REPORT_DELAY)
+    for pid, worker_id in children.items():
+        logger.info(f"Worker {worker_id} (pid {pid}) resident memory: {memory_usage_mb(pid)} MB")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_id = children.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+        logger.warning(f"Worker {worker_id} (pid {pid}) exited with status {status}; restarting")
+        time.sleep(RESTART_BACKOFF)
+        spawn(worker_id)
+
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preload-and-fork GraphTalk API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("RAG_API_WORKERS", "2")))
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,169 @@
+"""
+Query Coalescing Module
+Collapses concurrent identical queries into a single in-flight computation
+(singleflight). Duplicate /query and /ws/query requests await the result of
+the first one, and streaming subscribers fan out from one LLM token stream.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Coalescing can be disabled to debug per-request behaviour
+QUERY_COALESCING_ENABLED = os.getenv("RAG_QUERY_COALESCING", "true").lower() == "true"
+
+_STREAM_END = object()
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a flight"""
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+def acl_fingerprint(allowed_files: Optional[Iterable[str]]) -> str:
+    """
+    Fingerprint of a user's file access list.
+    None means full access (admin); otherwise a hash of the sorted file list.
+    """
+    if allowed_files is None:
+        return "*"
+    files = sorted({f.strip().lower() for f in allowed_files if f and f.strip()})
+    return hashlib.sha1("\n".join(files).encode("utf-8")).hexdigest()
+
+
+def make_query_key(kind: str, query: str, organization_id: Optional[str],
+                   allowed_files: Optional[Iterable[str]], **options: Any) -> str:
+    """Build the coalescing key from (normalized query, org, ACL fingerprint, options)"""
+    return json.dumps({
+        "kind": kind,
+        "query": normalize_query(query),
+        "org": organization_id or "",
+        "acl": acl_fingerprint(allowed_files),
+        "options": options,
+    }, sort_keys=True, default=str)
+
+
+class _TokenBroadcast:
+    """Replays an LLM token stream to every subscriber, including late joiners"""
+
+    def __init__(self):
+        self.tokens = []
+        self.queues = set()
+        self.closed = False
+
+    async def publish(self, token: str):
+        self.tokens.append(token)
+        for queue in self.queues:
+            queue.put_nowait(token)
+
+    def close(self):
+        self.closed = True
+        for queue in self.queues:
+            queue.put_nowait(_STREAM_END)
+
+    async def subscribe(self, callback: Callable[[str], Awaitable[None]]):
+        queue = asyncio.Queue()
+        # Replay what was already generated before this subscriber joined
+        for token in self.tokens:
+            queue.put_nowait(token)
+        if self.closed:
+            queue.put_nowait(_STREAM_END)
+        else:
+            self.queues.add(queue)
+        try:
+            while True:
+                token = await queue.get()
+                if token is _STREAM_END:
+                    return
+                await callback(token)
+        finally:
+            self.queues.discard(queue)
+
+
+class QueryCoalescer:
+    """
+    Singleflight for async computations.
+
+    The first caller for a key runs the computation in its own task; callers
+    arriving while it is in flight await the same result. The computation is
+    not tied to any single caller, so a client disconnecting does not cancel
+    the work for the others. Every caller gets its own deep copy of the
+    result, so per-request post-processing never leaks into another response.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _TokenBroadcast] = {}
+        self.stats = {"executed": 0, "coalesced": 0}
+
+    def _start(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        future = asyncio.ensure_future(factory())
+        self._inflight[key] = future
+        self.stats["executed"] += 1
+
+        def _done(fut):
+            self._inflight.pop(key, None)
+            self._streams.pop(key, None)
+            if not fut.cancelled() and fut.exception() is not None:
+                logger.debug(f"Coalesced computation failed: {fut.exception()}")
+
+        future.add_done_callback(_done)
+        return future
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() once per key among concurrent callers and return its result"""
+        if not QUERY_COALESCING_ENABLED:
+            return await factory()
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            logger.info(f"Coalescing duplicate in-flight query ({self.stats['coalesced']} coalesced so far)")
+        else:
+            future = self._start(key, factory)
+        return copy.deepcopy(await asyncio.shield(future))
+
+    async def run_stream(self, key: str,
+                         factory: Callable[[Callable[[str], Awaitable[None]]], Awaitable[Any]],
+                         stream_callback: Optional[Callable[[str], Awaitable[None]]] = None) -> Any:
+        """
+        Like run(), for computations that stream tokens.
+
+        factory receives a publish callback; every caller's stream_callback is
+        fed the full token stream (replayed from the start for late joiners)
+        before its copy of the final result is returned.
+        """
+        if not QUERY_COALESCING_ENABLED:
+            return await factory(stream_callback)
+
+        broadcast = self._streams.get(key)
+        future = self._inflight.get(key)
+        if future is not None and broadcast is not None:
+            self.stats["coalesced"] += 1
+            logger.info(f"Coalescing duplicate in-flight stream ({self.stats['coalesced']} coalesced so far)")
+        else:
+            broadcast = _TokenBroadcast()
+
+            async def _produce():
+                try:
+                    return await factory(broadcast.publish)
+                finally:
+                    broadcast.close()
+
+            self._streams[key] = broadcast
+            future = self._start(key, _produce)
+
+        if stream_callback is not None:
+            await broadcast.subscribe(stream_callback)
+        return copy.deepcopy(await asyncio.shield(future))
+
+
+# Process-wide coalescer shared by the query endpoints
+query_coalescer = QueryCoalescer()
@@ -0,0 +1,203 @@
+"""
+Offline artifact bundle: a versioned directory with the embedding model,
+tokenizers, NLTK data and an optional ONNX export, plus a manifest of SHA-256
+checksums. When RAG_ARTIFACT_BUNDLE points at a bundle, the server loads models
+exclusively from it and never reaches out to the Hugging Face hub or NLTK.
+
+Layout:
+    manifest.json
+    embedding/            sentence-transformers model
+    onnx/                 optional ONNX export of the embedding model
+    tokenizers/<name>/    tokenizers used by the chunkers
+    nltk_data/            NLTK packages
+"""
+import os
+import json
+import hashlib
+import logging
+import datetime
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+BUNDLE_FORMAT = 1
+
+# Bundle to load models from; unset keeps loading from the hub caches
+ARTIFACT_BUNDLE_DIR = os.getenv("RAG_ARTIFACT_BUNDLE")
+# Verify checksums of every bundle file before using it
+ARTIFACT_VERIFY = os.getenv("RAG_ARTIFACT_VERIFY", "true").lower() == "true"
+# "onnx" runs the embedding model from the bundle's ONNX export, if present
+EMBEDDING_BACKEND = os.getenv("RAG_EMBEDDING_BACKEND", "torch")
+
+# huggingface_hub and transformers read the offline switches when they are
+# imported, so they are set here, before the lazy loaders import them
+if ARTIFACT_BUNDLE_DIR:
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+DEFAULT_TOKENIZERS = {
+    "mistral": "mistralai/Mistral-7B-v0.1",
+    "gpt2": "gpt2",
+}
+DEFAULT_NLTK_PACKAGES = ["punkt", "punkt_tab", "stopwords"]
+
+
+class ArtifactBundleError(Exception):
+    """Raised for missing, incomplete or tampered artifact bundles"""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checksum_tree(root: str) -> Dict[str, str]:
+    """SHA-256 of every file below root (except the manifest), keyed by relative path"""
+    checksums = {}
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            if rel != MANIFEST_NAME:
+                checksums[rel] = _sha256(path)
+    return dict(sorted(checksums.items()))
+
+
+def write_manifest(root: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Checksum the bundle contents and write the manifest"""
+    manifest = {**manifest, "format": BUNDLE_FORMAT, "files": checksum_tree(root)}
+    with open(os.path.join(root, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+class ArtifactBundle:
+    """A loaded (and optionally verified) artifact bundle"""
+
+    def __init__(self, root: str, manifest: Dict[str, Any]):
+        self.root = os.path.abspath(root)
+        self.manifest = manifest
+        self.version = manifest.get("version")
+
+    @property
+    def embedding_path(self) -> str:
+        return os.path.join(self.root, "embedding")
+
+    @property
+    def onnx_path(self) -> Optional[str]:
+        return os.path.join(self.root, "onnx") if self.manifest.get("onnx") else None
+
+    @property
+    def nltk_path(self) -> str:
+        return os.path.join(self.root, "nltk_data")
+
+    def tokenizer_path(self, name: str) -> Optional[str]:
+        """Directory of a bundled tokenizer, or None if the bundle lacks it"""
+        if name not in (self.manifest.get("tokenizers") or {}):
+            return None
+        return os.path.join(self.root, "tokenizers", name)
+
+    def verify(self):
+        """Check every file listed in the manifest is present and unmodified"""
+        expected = self.manifest.get("files") or {}
+        if not expected:
+            raise ArtifactBundleError(f"Bundle {self.root} lists no files")
+        for rel, checksum in expected.items():
+            path = os.path.join(self.root, rel)
+            if not os.path.isfile(path):
+                raise ArtifactBundleError(f"Bundle file missing: {rel}")
+            if _sha256(path) != checksum:
+                raise ArtifactBundleError(f"Checksum mismatch for bundle file: {rel}")
+
+
+def load_bundle(root: str, verify: bool = True) -> ArtifactBundle:
+    manifest_path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        raise ArtifactBundleError(f"No {MANIFEST_NAME} in artifact bundle {root}")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ArtifactBundleError(f"Unsupported bundle format {manifest.get('format')} in {root}")
+
+    bundle = ArtifactBundle(root, manifest)
+    if verify:
+        bundle.verify()
+    return bundle
+
+
+_bundle: Optional[ArtifactBundle] = None
+_bundle_lock = threading.Lock()
+
+
+def get_artifact_bundle() -> Optional[ArtifactBundle]:
+    """
+    The configured bundle (None when RAG_ARTIFACT_BUNDLE is unset). With a
+    bundle configured the Hugging Face libraries run in offline mode (set when
+    this module is imported), so a missing file fails loudly instead of
+    silently falling back to a download.
+    """
+    global _bundle
+    if not ARTIFACT_BUNDLE_DIR:
+        return None
+    with _bundle_lock:
+        if _bundle is None:
+            bundle = load_bundle(ARTIFACT_BUNDLE_DIR, verify=ARTIFACT_VERIFY)
+            logger.info(f"Using artifact bundle {bundle.version} from {bundle.root}")
+            _bundle = bundle
+    return _bundle
+
+
+def build_bundle(output_dir: str, embedding_model: str, tokenizers: Dict[str, str] = None,
+                 nltk_packages: List[str] = None, export_onnx: bool = False,
+                 version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Download and assemble an artifact bundle into output_dir.
+
+    Returns:
+        The written manifest
+    """
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoTokenizer
+    import nltk
+
+    tokenizers = DEFAULT_TOKENIZERS if tokenizers is None else tokenizers
+    nltk_packages = DEFAULT_NLTK_PACKAGES if nltk_packages is None else nltk_packages
+    os.makedirs(output_dir, exist_ok=True)
+
+    logger.info(f"Saving embedding model {embedding_model}")
+    SentenceTransformer(embedding_model, device="cpu").save(os.path.join(output_dir, "embedding"))
+
+    onnx_exported = False
+    if export_onnx:
+        try:
+            SentenceTransformer(embedding_model, device="cpu", backend="onnx").save(os.path.join(output_dir, "onnx"))
+            onnx_exported = True
+        except Exception as e:
+            logger.warning(f"ONNX export failed, bundle will only contain the torch model: {e}")
+
+    saved_tokenizers = {}
+    for name, repo in tokenizers.items():
+        try:
+            AutoTokenizer.from_pretrained(repo).save_pretrained(os.path.join(output_dir, "tokenizers", name))
+            saved_tokenizers[name] = repo
+        except Exception as e:
+            logger.warning(f"Could not bundle tokenizer {name} ({repo}): {e}")
+
+    nltk_dir = os.path.join(output_dir, "nltk_data")
+    for package in nltk_packages:
+        if not nltk.download(package, download_dir=nltk_dir, quiet=True):
+            logger.warning(f"Could not bundle NLTK package {package}")
+
+    return write_manifest(output_dir, {
+        "version": version or datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S"),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "embedding_model": embedding_model,
+        "onnx": onnx_exported,
+        "tokenizers": saved_tokenizers,
+        "nltk": nltk_packages,
+    })
@@ -0,0 +1,318 @@
+"""
+Bulk reindex pipeline. Parsing and chunking run on a process pool (one file
+per task); the chunks of finished files are collected into large batches
+that are embedded and added to Chroma in one call each, on a dedicated
+embedding thread. Bounded queues between the stages provide backpressure:
+when embedding falls behind, no new files are handed to the parsers.
+
+Used by reindex_documents() and POST /files/index, and from the command line:
+
+    python -m rag_api.bulk_reindex --organization <org_id>
+    python -m rag_api.bulk_reindex --all
+    python -m rag_api.bulk_reindex --directory ./documents
+"""
+import os
+import time
+import queue
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .resource_manager import resource_manager
+from .write_gate import index_write_gate
+from .ingest_progress import IngestJob, ingest_progress, source_size
+
+logger = logging.getLogger(__name__)
+
+# Parser processes; parsing and chunking are CPU-bound and single-threaded per file
+PARSE_PROCESSES = int(os.getenv("RAG_REINDEX_PROCESSES", str(resource_manager.budget.cpu_budget)))
+# Chunks per embedding + Chroma add call
+EMBED_BATCH_CHUNKS = int(os.getenv("RAG_REINDEX_EMBED_BATCH", "512"))
+# Parsed files allowed to wait for the embedding stage
+QUEUE_FILES = int(os.getenv("RAG_REINDEX_QUEUE", str(PARSE_PROCESSES * 2)))
+PROGRESS_INTERVAL_SECONDS = float(os.getenv("RAG_REINDEX_PROGRESS_INTERVAL", "10"))
+# spawn keeps the parent's torch and Chroma threads out of the parsers
+START_METHOD = os.getenv("RAG_REINDEX_START_METHOD", "spawn")
+
+_DONE = object()
+
+
+def _parse_file(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Process pool task: load and chunk one file. Items either point at a file
+    on disk ("path") or at a document_store row whose content is read here,
+    so file contents never pass through the parent process.
+    """
+    from .chroma_utils import load_documents, split_documents, source_content_hash
+    from .db_utils import get_file_content_by_id
+
+    try:
+        source = item.get("path")
+        if source is None:
+            file_data = get_file_content_by_id(item["file_id"], item.get("organization_id"))
+            if not file_data or not file_data.get("content"):
+                return {**item, "error": "No content in DB"}
+            content = file_data["content"]
+            source = content if isinstance(content, bytes) else content.encode("utf-8")
+
+        documents = load_documents(source, item["filename"])
+        splits = split_documents(documents, source, item["filename"])
+        if not splits:
+            return {**item, "error": "No content extracted"}
+        return {**item, "documents": documents, "splits": splits, "content_hash": source_content_hash(source),
+                "bytes": source_size(source) or 0}
+    except Exception as e:
+        return {**item, "error": str(e)}
+
+
+class ReindexProgress:
+    """Counters of a running bulk reindex, with throughput"""
+
+    def __init__(self, total_files: Optional[int], callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.total_files = total_files
+        self.parsed = 0
+        self.indexed = 0
+        self.failed = 0
+        self.chunks = 0
+        self.started = time.time()
+        self.callback = callback
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+        now = time.time()
+        if now - self._last_report >= PROGRESS_INTERVAL_SECONDS:
+            self._last_report = now
+            self.report()
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(time.time() - self.started, 1e-6)
+        return {
+            "total_files": self.total_files,
+            "parsed": self.parsed,
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(elapsed, 1),
+            "files_per_second": round(self.indexed / elapsed, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 1),
+        }
+
+    def report(self):
+        state = self.snapshot()
+        logger.info(
+            f"Reindex: {state['indexed'] + state['failed']}/{state['total_files'] or '?'} files "
+            f"({state['failed']} failed), {state['chunks']} chunks, "
+            f"{state['files_per_second']} files/s, {state['chunks_per_second']} chunks/s"
+        )
+        if self.callback:
+            self.callback(state)
+
+
+class BulkReindexer:
+    def __init__(self, processes: int = PARSE_PROCESSES, batch_chunks: int = EMBED_BATCH_CHUNKS,
+                 queue_files: int = QUEUE_FILES, replace_existing: bool = False,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 file_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 vectorstore=None, summary_vectorstore=None):
+        """
+        Args:
+            processes: Parser processes
+            batch_chunks: Chunks per embedding/add call
+            queue_files: Parsed files buffered ahead of the embedding stage
+            replace_existing: Delete each file's existing vectors before adding the new ones
+            progress_callback: Called with progress snapshots while running
+            file_callback: Called with the result of each file as soon as it is indexed or has failed
+            vectorstore: Chunk store to write to (default: each organization's live store)
+            summary_vectorstore: Summary store to write to (default: the live one)
+        """
+        self.processes = max(1, processes)
+        self.batch_chunks = batch_chunks
+        self.queue_files = max(1, queue_files)
+        self.replace_existing = replace_existing
+        self.progress_callback = progress_callback
+        self.file_callback = file_callback
+        self.vectorstore = vectorstore
+        self.summary_vectorstore = summary_vectorstore
+
+    def run(self, items: Iterable[Dict[str, Any]], total_files: Optional[int] = None,
+            job_name: str = "bulk reindex", organization_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Reindex files. Each item has file_id, filename, optional organization_id
+        and metadata, and a "path" unless the content comes from document_store.
+        Items may be a generator; it is consumed only as fast as parsers free up.
+        The run is reported as one ingest job named job_name.
+
+        Returns:
+            Progress counters plus per-file results (indexed_documents, failed_documents, replaced_documents)
+        """
+        from .chroma_utils import _refuse_write
+
+        if _refuse_write("bulk reindexing"):
+            raise RuntimeError("Cannot reindex: Chroma is read-only in this process")
+        if total_files is None and hasattr(items, "__len__"):
+            total_files = len(items)
+
+        progress = ReindexProgress(total_files, self.progress_callback)
+        results = {"indexed_documents": [], "failed_documents": [], "replaced_documents": []}
+        parsed_files = queue.Queue(maxsize=self.queue_files)
+        logger.info(f"Bulk reindex of {total_files or 'streamed'} files: {self.processes} parser processes, "
+                    f"{self.batch_chunks} chunks per embedding batch")
+
+        with ingest_progress.track(job_name, organization_id=organization_id, kind="bulk") as job:
+            # The embedding thread has no current job of its own
+            embedder = threading.Thread(target=self._embed_stage, args=(parsed_files, progress, results, job),
+                                        name="rag-reindex-embed", daemon=True)
+            embedder.start()
+            job.set_stage("parse")
+            try:
+                context = multiprocessing.get_context(START_METHOD)
+                with ProcessPoolExecutor(max_workers=self.processes, mp_context=context) as pool:
+                    pending = set()
+                    for item in items:
+                        # Keep at most one task per process queued beyond the running ones
+                        while len(pending) >= self.processes * 2:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            self._forward(done, parsed_files, progress, job)
+                        pending.add(pool.submit(_parse_file, item))
+                    while pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self._forward(done, parsed_files, progress, job)
+            finally:
+                parsed_files.put(_DONE)
+                embedder.join()
+
+        if progress.total_files is None:
+            progress.total_files = progress.parsed
+        progress.report()
+        return {**progress.snapshot(), **results}
+
+    @staticmethod
+    def _forward(done, parsed_files: queue.Queue, progress: ReindexProgress, job: IngestJob):
+        for future in done:
+            parsed = future.result()
+            if not parsed.get("error"):
+                job.add(pages=len(parsed["documents"]), chunks=len(parsed["splits"]), bytes=parsed["bytes"])
+            # Blocks while the embedding stage is saturated
+            parsed_files.put(parsed)
+            progress.add(parsed=1)
+
+    def _embed_stage(self, parsed_files: queue.Queue, progress: ReindexProgress, results: Dict[str, List], job: IngestJob):
+        batch: List[Dict[str, Any]] = []
+        batch_size = 0
+        with index_write_gate.writing():
+            while True:
+                parsed = parsed_files.get()
+                if parsed is _DONE:
+                    break
+                if parsed.get("error"):
+                    self._fail(parsed, parsed["error"], progress, results, job)
+                    continue
+                batch.append(parsed)
+                batch_size += len(parsed["splits"])
+                if batch_size >= self.batch_chunks:
+                    self._flush(batch, progress, results, job)
+                    batch, batch_size = [], 0
+            if batch:
+                self._flush(batch, progress, results, job)
+
+    def _fail(self, parsed: Dict[str, Any], reason: str, progress: ReindexProgress, results: Dict[str, List], job: IngestJob):
+        logger.error(f"Failed to reindex {parsed['filename']} (ID: {parsed['file_id']}): {reason}")
+        job.fail(f"{parsed['filename']}: {reason}")
+        failure = {"file_id": parsed["file_id"], "filename": parsed["filename"], "reason": reason}
+        results["failed_documents"].append(failure)
+        progress.add(failed=1)
+        if self.file_callback:
+            self.file_callback({**failure, "status": "failed"})
+
+    def _flush(self, batch: List[Dict[str, Any]], progress: ReindexProgress, results: Dict[str, List], job: IngestJob):
+        """Embed and add the chunks of several files at once, then record each file"""
+        from .chroma_utils import (
+            annotate_splits, record_document_index, record_manifest_entry, delete_doc_from_chroma, get_vectorstore_for_org,
+            upsert_splits
+        )
+
+        by_organization: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for parsed in batch:
+            if self.replace_existing:
+                try:
+                    if delete_doc_from_chroma(parsed["file_id"], organization_id=parsed.get("organization_id")):
+                        results["replaced_documents"].append({"file_id": parsed["file_id"], "filename": parsed["filename"]})
+                except Exception as e:
+                    logger.warning(f"Could not delete existing vectors of {parsed['filename']}: {e}")
+            annotate_splits(parsed["splits"], parsed["file_id"], parsed["filename"],
+                            organization_id=parsed.get("organization_id"), metadata=parsed.get("metadata"))
+            by_organization.setdefault(parsed.get("organization_id"), []).append(parsed)
+
+        for organization_id, files in by_organization.items():
+            splits = [split for parsed in files for split in parsed["splits"]]
+            job.set_stage("embed")
+            try:
+                store = self.vectorstore or get_vectorstore_for_org(organization_id)
+                upsert_splits(store, splits, batch_size=self.batch_chunks)
+            except Exception as e:
+                for parsed in files:
+                    self._fail(parsed, f"Embedding failed: {e}", progress, results, job)
+                continue
+            job.add(chunks_stored=len(splits))
+            job.set_stage("store")
+            for parsed in files:
+                try:
+                    record_document_index(parsed["file_id"], parsed["filename"], parsed["documents"],
+                                          parsed["splits"], organization_id=organization_id,
+                                          metadata=parsed.get("metadata"), summary_store=self.summary_vectorstore)
+                    record_manifest_entry(parsed["file_id"], parsed["filename"], organization_id,
+                                          parsed["content_hash"], len(parsed["splits"]))
+                except Exception as e:
+                    logger.warning(f"Chunks of {parsed['filename']} were added but its summary/titles failed: {e}")
+                indexed = {"file_id": parsed["file_id"], "filename": parsed["filename"], "chunks": len(parsed["splits"])}
+                results["indexed_documents"].append(indexed)
+                progress.add(indexed=1, chunks=len(parsed["splits"]))
+                job.add(files=1)
+                if self.file_callback:
+                    self.file_callback({**indexed, "status": "indexed"})
+        job.set_stage("parse")
+
+
+def organization_items(organization_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Work items for every stored document of an organization, or of all organizations"""
+    from .db_utils import get_all_documents
+    return [
+        {"file_id": doc["id"], "filename": doc["filename"], "organization_id": doc.get("organization_id") or None}
+        for doc in get_all_documents(organization_id=organization_id)
+        if doc.get("id") and doc.get("filename")
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk reindex with parallel parsing and batched embedding")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--organization", help="Reindex the stored documents of an organization")
+    target.add_argument("--all", action="store_true", help="Rebuild the index from every stored document")
+    target.add_argument("--directory", help="Rebuild the index from the stored documents' files in a directory")
+    parser.add_argument("--processes", type=int, default=PARSE_PROCESSES)
+    parser.add_argument("--batch-chunks", type=int, default=EMBED_BATCH_CHUNKS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.all or args.directory:
+        from .chroma_utils import reindex_documents
+        stats = reindex_documents(args.directory)
+        print(f"✅ Reindexed {stats['successful']} files ({stats['failed']} failed), "
+              f"{stats['total_chunks']} chunks in {stats['total_time_seconds']:.1f}s")
+        return
+
+    reindexer = BulkReindexer(args.processes, args.batch_chunks, replace_existing=True)
+    stats = reindexer.run(organization_items(args.organization))
+    print(f"✅ Reindexed {stats['indexed']} files ({stats['failed']} failed), {stats['chunks']} chunks "
+          f"in {stats['elapsed_seconds']}s ({stats['chunks_per_second']} chunks/s)")
+
+
+if __name__ == "__main__":
+    main()
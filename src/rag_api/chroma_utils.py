@@ -1,21 +1,7 @@
 import os
 import re
 import logging
-import nltk
-
-# Ensure NLTK data is downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    try:
-        nltk.download('punkt_tab', quiet=True)
-    except:
-        # If punkt_tab is not available, use the standard punkt tokenizer
-        pass
+import gc
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,65 +10,109 @@ if not logger.handlers:
     handler = logging.StreamHandler()
     handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
     logger.addHandler(handler)
-import torch
 import hashlib
 import json
-import nltk
+import zlib
+import time
+import threading
 from functools import lru_cache
-from typing import List, Dict, Tuple, Optional, Union, Set, Any
-
-# Ensure NLTK data is downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-from .document_loaders import EnhancedPDFLoader, EnhancedDocxLoader, ZIPLoader, UnstructuredHTMLLoader
-from langchain_chroma import Chroma
+from contextlib import nullcontext
+from typing import List, Dict, Tuple, Optional, Union, Set, Any, Iterable, Iterator, TYPE_CHECKING
+
 from langchain_core.documents import Document
 from difflib import SequenceMatcher
 import numpy as np
-from .timing_utils import Timer, PerformanceTracker, time_block
+from .timing_utils import Timer, PerformanceTracker, SearchTrace, time_block
+from .db_utils import replace_document_chunks, append_document_chunks, get_document_chunks, delete_document_chunks, upsert_manifest_entry, delete_manifest_entry, content_hash, file_content_hash, get_chunk_vector_ids, get_all_documents, get_all_document_hashes
+from .title_index import index_document_titles, remove_document_titles, lookup_titles
+from .lazy import LazyResource
+from .artifacts import get_artifact_bundle, ArtifactBundleError, EMBEDDING_BACKEND, DEFAULT_TOKENIZERS
+from .embedding_worker import RemoteEmbeddings, EMBEDDING_WORKER_SOCKET
+from .resource_manager import resource_manager, current_rss_mb
+from .serving_profile import CHROMA_READ_ONLY
+from .write_gate import index_write_gate
+from .shard_router import sharding_enabled, get_shard_router
+from .collection_pointer import CollectionPointer, versioned_name
+from .ingest_progress import ingest_progress, source_size
 from cachetools import TTLCache
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
+if TYPE_CHECKING:
+    from .document_loaders import DocumentSource
+
+# Heavy subsystems (NLTK data, torch, the sentence-transformer, tokenizers and
+# Chroma) are built on first use by the lazy resources below, so importing this
+# module is cheap and the API can serve non-search endpoints right away. With
+# RAG_ARTIFACT_BUNDLE set, models and NLTK data come only from that bundle.
 
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings as SentenceTransformerEmbeddings
-except ImportError:
-    from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
+# Run a throwaway inference when a model is built, so it is warm before ready
+WARMUP_INFERENCE = os.getenv("RAG_WARMUP_INFERENCE", "true").lower() == "true"
+_WARMUP_TEXT = "Warmup query. Разогрев модели перед первым запросом."
 
-# Import Chonkie for advanced chunking
-from chonkie import TokenChunker, SentenceChunker
+def _load_nltk():
+    """Import NLTK and make sure the tokenizer and stopword data is present"""
+    import nltk
+    bundle = get_artifact_bundle()
+    if bundle:
+        nltk.data.path.insert(0, bundle.nltk_path)
+        return nltk
+    try:
+        nltk.data.find('tokenizers/punkt')
+        nltk.data.find('corpora/stopwords')
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        nltk.download('punkt', quiet=True)
+        nltk.download('stopwords', quiet=True)
+        try:
+            nltk.download('punkt_tab', quiet=True)
+        except Exception:
+            # If punkt_tab is not available, use the standard punkt tokenizer
+            pass
+    return nltk
 
-# Configure device (use GPU if available)
-device = "cuda" if torch.cuda.is_available() else "cpu"
+nltk_resource = LazyResource("nltk", _load_nltk)
+
+@lru_cache(maxsize=1)
+def get_device() -> str:
+    """Use GPU if available"""
+    import torch
+    resource_manager.configure_torch()
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def get_embedding_model_name() -> str:
+    bundle = get_artifact_bundle()
+    if bundle:
+        if EMBEDDING_BACKEND == "onnx" and bundle.onnx_path:
+            return bundle.onnx_path
+        return bundle.embedding_path
+    # Use a faster model for production
+    return "intfloat/multilingual-e5-small" if get_device() == "cpu" else "intfloat/multilingual-e5-base"
 
 # Initialize embedding function with caching and singleton pattern
 class CachedEmbeddings:
     _instance = None
     _initialized = False
     
-    def __new__(cls, model_name: str = None, device: str = "cpu"):
+    def __new__(cls, model_name: str = None, device: str = "cpu", backend: str = None):
         if cls._instance is None:
             cls._instance = super(CachedEmbeddings, cls).__new__(cls)
         return cls._instance
     
-    def __init__(self, model_name: str = None, device: str = "cpu"):
+    def __init__(self, model_name: str = None, device: str = "cpu", backend: str = None):
         if self._initialized:
             return
         
+        try:
+            from langchain_huggingface import HuggingFaceEmbeddings as SentenceTransformerEmbeddings
+        except ImportError:
+            from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
+
+        model_kwargs = {"device": device}
+        if backend:
+            model_kwargs["backend"] = backend
         # Only pass show_progress_bar in one place, not both
         self.embedder = SentenceTransformerEmbeddings(
-            model_name=model_name or EMBEDDING_MODEL,
-            model_kwargs={"device": device}
+            model_name=model_name or get_embedding_model_name(),
+            model_kwargs=model_kwargs
         )
         self.device = device
         self.cache = TTLCache(maxsize=1000, ttl=3600)  # Cache for 1 hour
@@ -98,6 +128,15 @@ class CachedEmbeddings:
         embedding = self.embedder.embed_query(text)
         self.cache[cache_key] = embedding
         return embedding
+
+    def warm_up(self):
+        """Run uncached inferences so the first real query skips lazy allocation"""
+        self.embedder.embed_query(_WARMUP_TEXT)
+        self.embedder.embed_documents([_WARMUP_TEXT] * 4)
+
+    def is_query_cached(self, text: str) -> bool:
+        """Whether an embedding for this text is already cached"""
+        return hashlib.md5(text.encode()).hexdigest() in self.cache
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Batch process documents with caching"""
@@ -132,193 +171,605 @@ class CachedEmbeddings:
                 
         return results
 
-# Use a faster model for production
-EMBEDDING_MODEL = "intfloat/multilingual-e5-small" if device == "cpu" else "intfloat/multilingual-e5-base"
-embedding_function = CachedEmbeddings(model_name=EMBEDDING_MODEL, device=device)
+def _create_embedding_function() -> Union[CachedEmbeddings, RemoteEmbeddings]:
+    if EMBEDDING_WORKER_SOCKET:
+        # The model lives in the shared embedding worker process
+        remote = RemoteEmbeddings(EMBEDDING_WORKER_SOCKET)
+        if WARMUP_INFERENCE:
+            remote.warm_up()
+        return remote
+    return create_local_embeddings()
+
+def create_local_embeddings() -> CachedEmbeddings:
+    """Load the embedding model in this process, whether or not an embedding worker is configured"""
+    bundle = get_artifact_bundle()
+    backend = "onnx" if bundle and bundle.onnx_path and EMBEDDING_BACKEND == "onnx" else None
+    embeddings = CachedEmbeddings(model_name=get_embedding_model_name(), device=get_device(), backend=backend)
+    if WARMUP_INFERENCE:
+        embeddings.warm_up()
+    return embeddings
+
+embedding_resource = LazyResource("embeddings", _create_embedding_function)
+
+def get_embedding_function() -> Union[CachedEmbeddings, RemoteEmbeddings]:
+    """Get the shared embedding function, loading the model on first use"""
+    return embedding_resource.get()
 
 # Initialize Chonkie chunkers for different document types
-# TokenChunker: Token-based chunking with overlap (best for general use and code)
-# Using Mistral tokenizer for better multilingual support and larger vocabulary
-try:
-    # Try Mistral tokenizer first (best for multilingual, modern architecture)
-    token_chunker = TokenChunker(
-        tokenizer="mistralai/Mistral-7B-v0.1",
-        chunk_size=512,
-        chunk_overlap=128  # Increased overlap for better context preservation
-    )
-    print("✓ Using Mistral tokenizer for enhanced chunking")
-except Exception as e:
-    # Fallback to GPT-2 if Mistral not available
-    print(f"⚠️  Mistral tokenizer not available ({e}), using GPT-2")
-    token_chunker = TokenChunker(
-        tokenizer="gpt2",
-        chunk_size=512,
-        chunk_overlap=128
+# Chunks are small "child" chunks embedded for matching; the context handed to
+# the LLM is expanded to a parent window of neighbouring chunks at query time.
+CHILD_CHUNK_SIZE = int(os.getenv("RAG_CHILD_CHUNK_SIZE", "256"))
+CHILD_CHUNK_OVERLAP = int(os.getenv("RAG_CHILD_CHUNK_OVERLAP", "64"))
+# Number of neighbouring chunks on each side included in a parent window
+PARENT_WINDOW_CHUNKS = int(os.getenv("RAG_PARENT_WINDOW_CHUNKS", "2"))
+
+def _create_chunkers() -> Dict[str, Any]:
+    # Import Chonkie for advanced chunking
+    from chonkie import TokenChunker, SentenceChunker
+
+    bundle = get_artifact_bundle()
+    if bundle:
+        # Only bundled tokenizers: hub names would fail offline, far from the cause
+        mistral_tokenizer = bundle.tokenizer_path("mistral") or bundle.tokenizer_path("gpt2")
+        gpt2_tokenizer = bundle.tokenizer_path("gpt2") or mistral_tokenizer
+        if mistral_tokenizer is None:
+            raise ArtifactBundleError(f"Artifact bundle {bundle.root} has no chunker tokenizer "
+                                      "(tokenizers/mistral or tokenizers/gpt2); rebuild it with scripts/build_artifact_bundle.py")
+    else:
+        mistral_tokenizer, gpt2_tokenizer = DEFAULT_TOKENIZERS["mistral"], DEFAULT_TOKENIZERS["gpt2"]
+
+    # TokenChunker: Token-based chunking with overlap (best for general use and code)
+    # Using Mistral tokenizer for better multilingual support and larger vocabulary
+    try:
+        # Try Mistral tokenizer first (best for multilingual, modern architecture)
+        token_chunker = TokenChunker(
+            tokenizer=mistral_tokenizer,
+            chunk_size=CHILD_CHUNK_SIZE,
+            chunk_overlap=CHILD_CHUNK_OVERLAP
+        )
+        print("✓ Using Mistral tokenizer for enhanced chunking")
+    except Exception as e:
+        # Fallback to GPT-2 if Mistral not available
+        print(f"⚠️  Mistral tokenizer not available ({e}), using GPT-2")
+        token_chunker = TokenChunker(
+            tokenizer=gpt2_tokenizer,
+            chunk_size=CHILD_CHUNK_SIZE,
+            chunk_overlap=CHILD_CHUNK_OVERLAP
+        )
+
+    # SentenceChunker: Sentence-aware chunking (best for structured text)
+    sentence_chunker = SentenceChunker(
+        chunk_size=CHILD_CHUNK_SIZE,
+        chunk_overlap=1  # Overlap by 1 sentence
     )
+    if WARMUP_INFERENCE:
+        token_chunker.chunk(_WARMUP_TEXT)
+        sentence_chunker.chunk(_WARMUP_TEXT)
+    return {"token": token_chunker, "sentence": sentence_chunker}
 
-# SentenceChunker: Sentence-aware chunking (best for structured text)
-sentence_chunker = SentenceChunker(
-    chunk_size=512,
-    chunk_overlap=1  # Overlap by 1 sentence
-)
+chunker_resource = LazyResource("chunkers", _create_chunkers)
 
-# Default chunker - use token chunker for best compatibility
-chonkie_chunker = token_chunker
+def warm_up_inference():
+    """Run the warm-up inferences on the embedding model and chunkers already built in this process"""
+    if embedding_resource.ready:
+        embedding_resource.get().warm_up()
+    if chunker_resource.ready:
+        for chunker in chunker_resource.get().values():
+            chunker.chunk(_WARMUP_TEXT)
 
 # Configure Chroma for optimal performance
-chroma_settings = {
-    "persist_directory": "./chroma_db",
-    "collection_name": "documents_optimized",
-    "embedding_function": embedding_function,
-    "collection_metadata": {
-        "hnsw:space": "cosine",
-        "hnsw:construction_ef": 128,  # Higher = more accurate but slower indexing
-        "hnsw:search_ef": 64,         # Higher = more accurate but slower search
-        "hnsw:M": 16                   # Higher = more memory usage but better accuracy
-    }
+CHROMA_PERSIST_DIRECTORY = "./chroma_db"
+CHROMA_COLLECTION_NAME = "documents_optimized"
+CHROMA_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 128,  # Higher = more accurate but slower indexing
+    "hnsw:search_ef": 64,         # Higher = more accurate but slower search
+    "hnsw:M": 16,                  # Higher = more memory usage but better accuracy
+    "hnsw:num_threads": resource_manager.budget.hnsw_threads  # Share cores with the embedding threads
 }
 
+# Full reindexes build new versioned collections and flip this pointer (see reindex_documents)
+collection_pointer = CollectionPointer(os.path.join(CHROMA_PERSIST_DIRECTORY, "active_collections.json"))
+
+def get_chroma_settings(collection_name: str = CHROMA_COLLECTION_NAME) -> Dict[str, Any]:
+    return {
+        "persist_directory": CHROMA_PERSIST_DIRECTORY,
+        "collection_name": collection_name,
+        "embedding_function": get_embedding_function(),
+        "collection_metadata": CHROMA_COLLECTION_METADATA
+    }
+
+def _create_vectorstore():
+    from langchain_chroma import Chroma
+
+    # Initialize Chroma with optimized settings
+    chroma_settings = get_chroma_settings(collection_pointer.active("documents", CHROMA_COLLECTION_NAME))
+    store = Chroma(**chroma_settings)
+
+    # Ensure the collection exists and is properly configured
+    try:
+        if not hasattr(store, '_collection'):
+            store._collection = store._client.get_or_create_collection(
+                name=chroma_settings["collection_name"],
+                metadata=chroma_settings["collection_metadata"]
+            )
+    except Exception as e:
+        logging.warning(f"Could not configure Chroma collection: {str(e)}")
+    return store
+
+# With tenant shards the global collection is not searched, so it does not gate readiness
+vectorstore_resource = LazyResource("vectorstore", _create_vectorstore, depends_on=[embedding_resource],
+                                    required_for_ready=not sharding_enabled())
+
 def get_vectorstore():
     """
-    Get the global vectorstore instance.
+    Get the global vectorstore instance, opening Chroma on first use.
     
     Returns:
         The global Chroma vectorstore instance
     """
-    return vectorstore
+    _follow_collection_pointer()
+    return vectorstore_resource.get()
+
+def get_vectorstore_for_org(organization_id: Optional[str] = None):
+    """
+    Get the chunk vectorstore an organization's documents are written to: its
+    tenant shard when RAG_CHROMA_SHARDS > 1, otherwise the global vectorstore.
+    """
+    if sharding_enabled():
+        return get_shard_router().store_for(organization_id)
+    return get_vectorstore()
+
+def _similarity_search(query: str, k: int, filter: Optional[Dict] = None, organization_id: Optional[str] = None):
+    """Chunk similarity search over the global store or the organization's shards (distances, lower is closer)"""
+    if sharding_enabled():
+        query_embedding = get_embedding_function().embed_query(query)
+        return get_shard_router().similarity_search(query_embedding, k, filter=filter, organization_id=organization_id)
+    return get_vectorstore().similarity_search_with_score(query, k=k, filter=filter)
 
-# Initialize Chroma with optimized settings
-vectorstore = Chroma(**chroma_settings)
+# Document-level summary index: one vector per file (title + leading content).
+# Used to preselect candidate files before the chunk search on large corpora.
+SUMMARY_COLLECTION_NAME = "documents_summary"
+SUMMARY_LEADING_CHARS = int(os.getenv("RAG_SUMMARY_LEADING_CHARS", "2000"))
+DOCUMENT_PREFILTER_TOP_N = int(os.getenv("RAG_DOC_PREFILTER_TOP_N", "50"))
+# Below this many indexed files the flat chunk search is already cheap
+DOCUMENT_PREFILTER_MIN_FILES = int(os.getenv("RAG_DOC_PREFILTER_MIN_FILES", "200"))
+# Seconds a per-organization summary count is reused before it is recounted
+SUMMARY_COUNT_TTL_SECONDS = int(os.getenv("RAG_SUMMARY_COUNT_TTL", "60"))
+_summary_counts = TTLCache(maxsize=1024, ttl=SUMMARY_COUNT_TTL_SECONDS)
 
-# Ensure the collection exists and is properly configured
-try:
-    if not hasattr(vectorstore, '_collection'):
-        vectorstore._collection = vectorstore._client.get_or_create_collection(
-            name=chroma_settings["collection_name"],
-            metadata=chroma_settings["collection_metadata"]
+def _create_summary_vectorstore():
+    from langchain_chroma import Chroma
+    return Chroma(**get_chroma_settings(collection_pointer.active("summary", SUMMARY_COLLECTION_NAME)))
+
+summary_vectorstore_resource = LazyResource("summary_vectorstore", _create_summary_vectorstore, depends_on=[embedding_resource])
+
+def get_summary_vectorstore():
+    """
+    Get the document summary vectorstore instance.
+
+    Returns:
+        The Chroma vectorstore holding one summary vector per file
+    """
+    _follow_collection_pointer()
+    return summary_vectorstore_resource.get()
+
+def _follow_collection_pointer(immediate: bool = False):
+    """Reopen the stores once a reindex (in this or another process) has flipped the active collections"""
+    if collection_pointer.refresh(immediate=immediate):
+        logger.info(f"Active collections changed, reopening: {collection_pointer.active('documents', CHROMA_COLLECTION_NAME)}")
+        vectorstore_resource.reset()
+        summary_vectorstore_resource.reset()
+
+# A write that waited out a blue/green flip must go to the new collections, not the retired ones
+index_write_gate.on_acquire(lambda: _follow_collection_pointer(immediate=True))
+
+# Module attributes kept for callers that imported the eagerly built objects
+_LEGACY_ATTRIBUTES = {
+    "vectorstore": get_vectorstore,
+    "summary_vectorstore": get_summary_vectorstore,
+    "embedding_function": get_embedding_function,
+    "device": get_device,
+    "EMBEDDING_MODEL": get_embedding_model_name,
+    "token_chunker": lambda: chunker_resource.get()["token"],
+    "sentence_chunker": lambda: chunker_resource.get()["sentence"],
+    "chonkie_chunker": lambda: chunker_resource.get()["token"],
+    "chroma_settings": get_chroma_settings,
+    "summary_settings": lambda: get_chroma_settings(SUMMARY_COLLECTION_NAME),
+}
+
+def __getattr__(name: str):
+    if name in _LEGACY_ATTRIBUTES:
+        return _LEGACY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _refuse_write(operation: str) -> bool:
+    """Read replicas (search serving profile) never write to Chroma"""
+    if CHROMA_READ_ONLY:
+        logger.warning(f"Refusing {operation}: Chroma is read-only in this process (RAG_CHROMA_READ_ONLY)")
+        return True
+    return False
+
+def _summary_id(file_id: Any) -> str:
+    return f"file-{file_id}"
+
+def build_document_summary(filename: str, splits: List[Document]) -> str:
+    """
+    Build the text embedded for the document-level index: the document title
+    (or filename) followed by the leading content of the document.
+    """
+    title = None
+    if splits:
+        title = splits[0].metadata.get('title')
+    if not title:
+        title = os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ')
+
+    leading = []
+    remaining = SUMMARY_LEADING_CHARS
+    for split in splits:
+        if remaining <= 0:
+            break
+        text = split.page_content[:remaining]
+        leading.append(text)
+        remaining -= len(text)
+
+    return f"{title}\n{' '.join(leading)}".strip()
+
+def index_document_summary(file_id: int, filename: str, splits: List[Document], organization_id: str = None, metadata: Dict[str, str] = None,
+                           chunk_count: Optional[int] = None, store=None) -> bool:
+    """
+    Add or replace the summary vector for a single file. Only the leading
+    splits are used, so streamed files pass those plus their total chunk_count.
+    A collection being rebuilt is passed as store; the live one is the default.
+    """
+    try:
+        summary_metadata = {
+            "file_id": file_id,
+            "filename": filename,
+            # Empty string marks legacy/shared documents (Chroma cannot filter on missing keys)
+            "organization_id": organization_id or "",
+            "chunk_count": len(splits) if chunk_count is None else chunk_count
+        }
+        if metadata and 'catalog_id' in metadata:
+            summary_metadata['catalog_id'] = metadata['catalog_id']
+
+        (store or get_summary_vectorstore()).add_texts(
+            texts=[build_document_summary(filename, splits)],
+            metadatas=[summary_metadata],
+            ids=[_summary_id(file_id)]
         )
-except Exception as e:
-    logging.warning(f"Could not configure Chroma collection: {str(e)}")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not index document summary for {filename} (ID: {file_id}): {e}")
+        return False
+
+def delete_document_summary(file_id: int) -> bool:
+    """Remove the summary vector of a file, if present."""
+    try:
+        get_summary_vectorstore()._collection.delete(ids=[_summary_id(file_id)])
+        return True
+    except Exception as e:
+        logger.warning(f"Could not delete document summary for file_id {file_id}: {e}")
+        return False
 
-def select_optimal_chunker(file_path: str, content: str) -> Any:
+def backfill_document_summaries(page_size: int = 1000) -> Dict[str, int]:
+    """
+    Build summary vectors for files that were indexed before the document
+    summary index existed, using their already stored chunks.
+
+    Returns:
+        Dictionary with the number of files scanned and summaries created
+    """
+    if _refuse_write("summary backfill"):
+        raise RuntimeError("Cannot backfill summaries: Chroma is read-only in this process")
+    stats = {'files_scanned': 0, 'summaries_created': 0}
+    file_chunks: Dict[Any, List[Tuple[int, Document]]] = {}
+
+    vectorstore = get_vectorstore()
+    offset = 0
+    while True:
+        batch = vectorstore.get(include=["metadatas", "documents"], limit=page_size, offset=offset)
+        ids = batch.get('ids') or []
+        if not ids:
+            break
+        for metadata, content in zip(batch['metadatas'], batch['documents']):
+            metadata = metadata or {}
+            file_id = metadata.get('file_id')
+            if file_id is None:
+                continue
+            # chunk_start is 0 or missing on older chunks; chunk_index orders them reliably
+            position = metadata.get('chunk_index')
+            if position is None:
+                position = metadata.get('chunk_start', 0) or 0
+            file_chunks.setdefault(file_id, []).append(
+                (position, Document(page_content=content or "", metadata=metadata))
+            )
+        offset += len(ids)
+
+    existing = set(get_summary_vectorstore().get(include=[]).get('ids') or [])
+    for file_id, chunks in file_chunks.items():
+        stats['files_scanned'] += 1
+        if _summary_id(file_id) in existing:
+            continue
+        chunks.sort(key=lambda item: item[0])
+        splits = [doc for _, doc in chunks]
+        metadata = splits[0].metadata
+        if index_document_summary(
+            file_id,
+            metadata.get('filename', str(file_id)),
+            splits,
+            organization_id=metadata.get('organization_id') or None,
+            metadata=metadata
+        ):
+            stats['summaries_created'] += 1
+
+    logger.info(f"Document summary backfill: {stats['summaries_created']} created for {stats['files_scanned']} files")
+    return stats
+
+def _summary_filter(organization_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Summaries visible to an organization: its own and the shared (legacy) ones"""
+    if organization_id:
+        return {"organization_id": {"$in": [organization_id, ""]}}
+    return None
+
+def count_document_summaries(organization_id: Optional[str] = None) -> int:
+    """Number of files in the summary index visible to an organization (cached for a short while)"""
+    collection = get_summary_vectorstore()._collection
+    key = (collection.name, organization_id)
+    if key not in _summary_counts:
+        if organization_id:
+            ids = collection.get(where=_summary_filter(organization_id), include=[]).get('ids') or []
+            _summary_counts[key] = len(ids)
+        else:
+            _summary_counts[key] = collection.count()
+    return _summary_counts[key]
+
+def select_candidate_files(
+    preprocessed_query: str,
+    organization_id: str = None,
+    top_n: int = DOCUMENT_PREFILTER_TOP_N,
+    min_indexed_files: int = DOCUMENT_PREFILTER_MIN_FILES
+) -> Optional[List[Any]]:
+    """
+    First retrieval stage: select the top-N files from the document summary index.
+
+    Returns:
+        List of file_ids to restrict the chunk search to, or None when the
+        prefilter should be skipped (small corpus, empty index or error)
+    """
+    try:
+        summary_vectorstore = get_summary_vectorstore()
+        # Counted per organization: another organization's summaries say nothing about this one's coverage
+        indexed_files = count_document_summaries(organization_id)
+        if indexed_files < max(min_indexed_files, top_n + 1):
+            return None
+
+        summaries = summary_vectorstore.similarity_search_with_score(
+            preprocessed_query,
+            k=top_n,
+            filter=_summary_filter(organization_id)
+        )
+        file_ids = []
+        for doc, _score in summaries:
+            file_id = doc.metadata.get('file_id')
+            if file_id is not None and file_id not in file_ids:
+                file_ids.append(file_id)
+
+        logger.info(f"Document prefilter selected {len(file_ids)} of {indexed_files} files")
+        return file_ids or None
+    except Exception as e:
+        logger.warning(f"Document prefilter failed, falling back to full chunk search: {e}")
+        return None
+
+def select_optimal_chunker(filename: str, content: str) -> Any:
     """
     Intelligently select the best chunker based on document type and content characteristics.
     
     Args:
-        file_path: Path to the file
+        filename: Name or path of the file
         content: Document content
         
     Returns:
         The optimal chunker for this document
     """
-    file_ext = os.path.splitext(file_path)[1].lower()
+    file_ext = os.path.splitext(filename)[1].lower()
     content_length = len(content)
+    chunkers = chunker_resource.get()
     
     # For structured documents (HTML, MD), use sentence chunker
     if file_ext in ['.html', '.md', '.markdown']:
-        return sentence_chunker
+        return chunkers["sentence"]
     
     # For short documents, use sentence chunker to avoid over-splitting
     if content_length < 2000:
-        return sentence_chunker
+        return chunkers["sentence"]
     
     # For all other cases (including code), use token chunker
     # Token chunker is most reliable and works well for all content types
-    return token_chunker
+    return chunkers["token"]
 
-def load_and_split_document(file_path: str, filename: str) -> List[Document]:
-    """Load and split document with enhanced metadata and preprocessing using Chonkie"""
-    try:
-        ext = os.path.splitext(filename)[1].lower()
-        
-        if ext == '.zip':
-            loader = ZIPLoader(file_path)
-        elif ext == '.pdf':
-            loader = EnhancedPDFLoader(file_path)
-        elif ext in ['.docx', '.doc']:
-            loader = EnhancedDocxLoader(file_path)
-        elif ext == '.html':
-            loader = UnstructuredHTMLLoader(file_path)
-        elif ext in ['.txt', '.md']:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Preprocess content to improve quality
-            preprocessed_content = preprocess_text(content)
-            
-            # Select optimal chunker based on document characteristics
-            optimal_chunker = select_optimal_chunker(file_path, content)
-            
-            # Use Chonkie to chunk the text
-            chunks = optimal_chunker.chunk(preprocessed_content)
-            
+def load_documents(source: "DocumentSource", filename: str) -> List[Document]:
+    """Load the raw (unchunked) documents of a file (path, bytes or stream) with the loader matching its type"""
+    from .document_loaders import load_source
+    return load_source(source, filename)
+
+def iter_documents(source: "DocumentSource", filename: str) -> Iterator[Document]:
+    """Yield the raw documents of a file; PDFs are read page by page"""
+    if os.path.splitext(filename)[1].lower() == '.pdf':
+        from .document_loaders import EnhancedPDFLoader
+        name = source if isinstance(source, str) else filename
+        yield from EnhancedPDFLoader(name, source=source).lazy_load()
+    else:
+        yield from load_documents(source, filename)
+
+def source_content_hash(source: "DocumentSource") -> str:
+    """SHA-256 of a file given as path, bytes or seekable stream"""
+    if isinstance(source, str):
+        return file_content_hash(source)
+    if isinstance(source, (bytes, bytearray)):
+        return content_hash(bytes(source))
+    digest = hashlib.sha256()
+    source.seek(0)
+    for block in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+# Average size of the content-defined sections a document is split into before chunking
+SECTION_TARGET_CHARS = int(os.getenv("RAG_SECTION_TARGET_CHARS", "4000"))
+
+def _split_keeping_separators(text: str, separator: str) -> List[str]:
+    """Split text after every separator match, so the parts concatenate back to text"""
+    parts = re.split(f"({separator})", text)
+    return [part for part in (parts[i] + "".join(parts[i + 1:i + 2]) for i in range(0, len(parts), 2)) if part]
+
+def content_defined_sections(text: str, target_chars: int = SECTION_TARGET_CHARS) -> List[str]:
+    """
+    Split text into sections of about ``target_chars`` at paragraph breaks
+    chosen by the paragraphs' own content.
+
+    A section ends after a paragraph whose hash falls below its length, so
+    the cut points depend only on nearby text: an edit moves the boundaries
+    of its own section at most, and the sections (and chunks) before and
+    after it come out unchanged. Sections are at least a quarter of the
+    target unless the text ends, and at most four times the target.
+    """
+    min_chars, max_chars = target_chars // 4, target_chars * 4
+    paragraphs = []
+    for paragraph in _split_keeping_separators(text, r"\n\s*\n"):
+        # A paragraph without blank lines is cut at line breaks instead
+        paragraphs.extend(_split_keeping_separators(paragraph, r"\n") if len(paragraph) > max_chars else [paragraph])
+
+    sections, current, size = [], [], 0
+    for paragraph in paragraphs:
+        current.append(paragraph)
+        size += len(paragraph)
+        key = paragraph.strip()
+        boundary = size >= min_chars and zlib.crc32(key.encode("utf-8")) % target_chars < len(key)
+        if boundary or size >= max_chars:
+            sections.append("".join(current))
+            current, size = [], 0
+    if current:
+        sections.append("".join(current))
+    return sections
+
+def iter_splits(documents: Iterable[Document], source: "DocumentSource", filename: str) -> Iterator[Document]:
+    """
+    Split loaded documents into child chunks with Chonkie, one document at a time.
+
+    Every chunk gets a file-wide ``chunk_index`` and the ``segment_index`` of the
+    loaded document (page, archive entry, ...) it came from, so neighbouring
+    chunks can be stitched back into parent windows at query time. Documents
+    are chunked one content-defined section at a time, so an edit only
+    changes the chunks of the sections it touches.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    chunk_index = 0
+    # Files received as bytes or streams were created and modified when they arrived
+    if isinstance(source, str):
+        created_at, modified_at = os.path.getctime(source), os.path.getmtime(source)
+    else:
+        created_at = modified_at = time.time()
+
+    for segment_index, doc in enumerate(documents):
+        # Sections are cut on the raw text: preprocessing collapses the paragraph breaks
+        sections = [text for text in map(preprocess_text, content_defined_sections(doc.page_content, SECTION_TARGET_CHARS)) if text]
+
+        # Select optimal chunker based on document characteristics
+        optimal_chunker = select_optimal_chunker(filename, " ".join(sections))
+
+        # Preserve original metadata and add chunking info
+        base_metadata = {
+            **doc.metadata,
+            "filename": filename,
+            "file_type": ext,
+            "created_at": created_at,
+            "modified_at": modified_at,
+            "segment_index": segment_index
+        }
+
+        # Offsets count into the sections joined by one space, so chunks of
+        # different sections never overlap when stitched into parent windows
+        offset = 0
+        for section in sections:
             # Convert Chonkie chunks to LangChain Documents
-            documents = []
-            for chunk in chunks:
-                doc = Document(
+            for chunk in optimal_chunker.chunk(section):
+                yield Document(
                     page_content=chunk.text,
                     metadata={
-                        "source": file_path,
-                        "filename": filename,
-                        "file_type": ext,
-                        "created_at": os.path.getctime(file_path),
-                        "modified_at": os.path.getmtime(file_path),
-                        "chunk_start": chunk.start_index,
-                        "chunk_end": chunk.end_index,
+                        **base_metadata,
+                        "chunk_index": chunk_index,
+                        "chunk_start": offset + chunk.start_index,
+                        "chunk_end": offset + chunk.end_index,
                         "token_count": chunk.token_count
                     }
                 )
-                documents.append(doc)
-            return documents
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
+                chunk_index += 1
+            offset += len(section) + 1
 
-        # Load documents using the appropriate loader
-        documents = loader.load()
-        
-        if ext not in ['.txt', '.md']:  # These are already chunked above
-            # Process loaded documents with Chonkie
-            chunked_documents = []
-            for doc in documents:
-                # Preprocess content to improve quality
-                preprocessed_content = preprocess_text(doc.page_content)
-                
-                # Select optimal chunker based on document characteristics
-                optimal_chunker = select_optimal_chunker(file_path, preprocessed_content)
-                
-                # Use Chonkie to chunk the text
-                chunks = optimal_chunker.chunk(preprocessed_content)
-                
-                # Preserve original metadata and add chunking info
-                base_metadata = {
-                    **doc.metadata,
-                    "filename": filename,
-                    "file_type": ext,
-                    "created_at": os.path.getctime(file_path),
-                    "modified_at": os.path.getmtime(file_path)
-                }
-                
-                # Convert Chonkie chunks to LangChain Documents
-                for chunk in chunks:
-                    new_doc = Document(
-                        page_content=chunk.text,
-                        metadata={
-                            **base_metadata,
-                            "chunk_start": chunk.start_index,
-                            "chunk_end": chunk.end_index,
-                            "token_count": chunk.token_count
-                        }
-                    )
-                    chunked_documents.append(new_doc)
-                    
-            documents = chunked_documents
-            
-        return documents
-        
+def split_documents(documents: List[Document], source: "DocumentSource", filename: str) -> List[Document]:
+    """Split loaded documents into child chunks with Chonkie (see iter_splits)"""
+    return list(iter_splits(documents, source, filename))
+
+def _load_and_split(source: "DocumentSource", filename: str) -> Tuple[List[Document], List[Document]]:
+    """Load and split a document, advancing the parse and chunk counters of the ingest job"""
+    ingest_progress.stage("parse")
+    documents = load_documents(source, filename)
+    ingest_progress.add(pages=len(documents), bytes=source_size(source) or 0)
+    ingest_progress.stage("chunk")
+    splits = split_documents(documents, source, filename)
+    ingest_progress.add(chunks=len(splits))
+    return documents, splits
+
+def load_and_split_document(source: "DocumentSource", filename: str) -> List[Document]:
+    """Load and split document with enhanced metadata and preprocessing using Chonkie"""
+    try:
+        return _load_and_split(source, filename)[1]
     except Exception as e:
         logging.error(f"Error loading document {filename}: {str(e)}")
+        ingest_progress.fail(f"{filename}: {e}")
         raise
 
+def merge_chunk_window(chunks: List[Dict[str, Any]]) -> str:
+    """
+    Stitch consecutive chunks (ordered by chunk_index) into one text, removing
+    the overlap between neighbouring chunks of the same segment.
+    """
+    parts = []
+    previous = None
+    for chunk in chunks:
+        text = chunk.get('content') or ''
+        contiguous = (
+            previous is not None
+            and chunk.get('segment_index') == previous.get('segment_index')
+            and chunk.get('chunk_start') is not None
+            and previous.get('chunk_end') is not None
+            and chunk['chunk_start'] <= previous['chunk_end']
+        )
+        if contiguous and parts:
+            parts[-1] += text[previous['chunk_end'] - chunk['chunk_start']:]
+        else:
+            parts.append(text)
+        previous = chunk
+    return "\n\n".join(part for part in parts if part)
+
+def get_parent_window(file_id: Any, chunk_index: int, window: int = PARENT_WINDOW_CHUNKS) -> Optional[str]:
+    """
+    Get the parent window of a chunk: the chunk itself plus ``window``
+    neighbouring chunks on each side, read from the chunk store.
+
+    Returns:
+        The stitched window text, or None if the file has no stored chunks
+    """
+    try:
+        rows = get_document_chunks(file_id, max(0, chunk_index - window), chunk_index + window)
+        if not rows:
+            return None
+        return merge_chunk_window(rows)
+    except Exception as e:
+        logger.warning(f"Could not load parent window for file_id {file_id}, chunk {chunk_index}: {e}")
+        return None
+
 def preprocess_text(text: str, language: str = 'russian') -> str:
     """
     Enhanced text preprocessing for better search quality.
@@ -347,6 +798,7 @@ def preprocess_text(text: str, language: str = 'russian') -> str:
     
     # Tokenize and remove stopwords
     try:
+        nltk = nltk_resource.get()
         stop_words = set(nltk.corpus.stopwords.words(language))
         # Add English stopwords for mixed language content
         if language != 'english':
@@ -387,56 +839,342 @@ def preprocess_query(query: str, language: str = 'russian') -> str:
     # Apply the same preprocessing as regular text
     return preprocess_text(query, language)
 
-def index_document_to_chroma(file_path: str, file_id: int, organization_id: str = None, metadata: Dict[str, str] = None) -> bool:
-	try:
-		# Extract just the filename from the path
-		filename = os.path.basename(file_path)
-		file_ext = os.path.splitext(filename)[1].lower()
-		
-		# Log the indexing operation
-		logger.info(f"Starting indexing for file: {filename} (ID: {file_id}, Type: {file_ext})")
-		
-		splits = load_and_split_document(file_path, filename)
-		
-		logger.info(f"Loaded {len(splits)} chunks from {filename}")
-		
-		for split in splits:
-			split.metadata['file_id'] = file_id
-			split.metadata['filename'] = filename  # Ensure filename is in metadata
-			if organization_id:
-				split.metadata['organization_id'] = organization_id
-			
-		# Add source_type - determine if this is a document or from external source
-		split.metadata['source_type'] = 'document'
-		
-		# Add custom metadata if provided
-		if metadata:
-			for key, value in metadata.items():
-				split.metadata[key] = value
-			# If metadata contains 'catalog_id', this is an OpenCart product
-			if 'catalog_id' in metadata:
-				split.metadata['source_type'] = 'opencart_product'  # Must match the filter in search
-				if 'archive_filename' in locals() and 'archive_source' in locals() and 'archive_path' in locals():
-					logger.debug(f"  Chunk from archive '{archive_filename}' (source: {archive_source}, path: {archive_path})")
-		
-		vectorstore.add_documents(splits)
-		
-		logger.info(f"✓ Successfully indexed {filename} with {len(splits)} chunks (ID: {file_id})")
-		
-		# If this is a ZIP file, log the summary
-		if file_ext == '.zip':
-			# Count archive chunks
-			archive_chunks = sum(1 for split in splits if 'archive_source' in split.metadata)
-			logger.info(f"ZIP ARCHIVE INDEXING SUMMARY: {filename}")
-			logger.info(f"  - Total chunks indexed: {len(splits)}")
-			logger.info(f"  - Chunks from archive: {archive_chunks}")
-		
-		return True
-	except Exception as e:
-		logger.error(f"Error indexing document {filename} (ID: {file_id}): {e}", exc_info=True)
-		return False
+def chunk_content_hash(text: str) -> str:
+    """Identity of a chunk's text, used to find unchanged chunks when a document is edited"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def chunk_vector_id(file_id: int, chunk_index: int, chunk_hash: str) -> str:
+    """Deterministic Chroma ID of a chunk, so re-indexing a file overwrites its vectors instead of duplicating them"""
+    return f"{file_id}:{chunk_index}:{chunk_hash[:16]}"
+
+def annotate_splits(splits: List[Document], file_id: int, filename: str, organization_id: str = None, metadata: Dict[str, str] = None):
+    """Tag every chunk with its file, organization, content hash, vector ID, source type and custom metadata"""
+    for i, split in enumerate(splits):
+        split.metadata['file_id'] = file_id
+        split.metadata['chunk_hash'] = chunk_content_hash(split.page_content)
+        split.metadata['vector_id'] = chunk_vector_id(file_id, split.metadata.get('chunk_index', i), split.metadata['chunk_hash'])
+        split.metadata['filename'] = filename  # Ensure filename is in metadata
+        if organization_id:
+            split.metadata['organization_id'] = organization_id
+        
+        # Add source_type - determine if this is a document or from external source
+        split.metadata['source_type'] = 'document'
+        
+        # Add custom metadata if provided
+        if metadata:
+            for key, value in metadata.items():
+                split.metadata[key] = value
+            # If metadata contains 'catalog_id', this is an OpenCart product
+            if 'catalog_id' in metadata:
+                split.metadata['source_type'] = 'opencart_product'  # Must match the filter in search
+
+# Chunks per embedding + Chroma upsert call
+CHROMA_UPSERT_BATCH = int(os.getenv("RAG_CHROMA_UPSERT_BATCH", "512"))
+
+def upsert_splits(store, splits: List[Document], batch_size: int = CHROMA_UPSERT_BATCH) -> List[str]:
+    """Embed and upsert annotated chunks under their vector IDs, in batches. Returns the IDs written"""
+    ids = []
+    for start in range(0, len(splits), batch_size):
+        batch = splits[start:start + batch_size]
+        batch_ids = [split.metadata['vector_id'] for split in batch]
+        # LangChain's Chroma writes through collection.upsert, so existing IDs are overwritten
+        store.add_documents(batch, ids=batch_ids)
+        ids.extend(batch_ids)
+    return ids
+
+def delete_vectors(store, ids: List[str], batch_size: int = CHROMA_UPSERT_BATCH):
+    """Delete vectors by ID, in batches"""
+    for start in range(0, len(ids), batch_size):
+        store._collection.delete(ids=ids[start:start + batch_size])
 
+def _file_where(file_id: int, organization_id: Optional[str] = None) -> Dict[str, Any]:
+    """Chroma filter for the chunks of a file (and organization)"""
+    if organization_id:
+        return {"$and": [{"file_id": file_id}, {"organization_id": organization_id}]}
+    return {"file_id": file_id}
+
+def indexed_vector_ids(store, file_id: int, organization_id: Optional[str] = None) -> List[str]:
+    """
+    Chroma IDs of the vectors a file currently has: the ones recorded with its
+    chunks, or found by metadata for files indexed before IDs were recorded.
+    """
+    known_ids = get_chunk_vector_ids(file_id)
+    if known_ids is not None:
+        return known_ids
+    return store._collection.get(where=_file_where(file_id, organization_id), include=[])['ids']
+
+def delete_replaced_vectors(store, previous_ids: List[str], new_ids: List[str]) -> int:
+    """
+    Delete the vectors of a file's previous version that re-indexing did not
+    overwrite (chunk IDs change with content). Returns how many were deleted.
+    """
+    written = set(new_ids)
+    stale = [vector_id for vector_id in previous_ids if vector_id not in written]
+    delete_vectors(store, stale)
+    return len(stale)
+
+def record_document_index(file_id: int, filename: str, documents: List[Document], splits: List[Document], organization_id: str = None, metadata: Dict[str, str] = None,
+                          summary_store=None):
+    """Store the chunk rows, document summary vector and titles of a file whose chunks were added to Chroma"""
+    replace_document_chunks(file_id, splits)
+    index_document_summary(file_id, filename, splits, organization_id=organization_id, metadata=metadata, store=summary_store)
+    index_document_titles(file_id, filename, documents, organization_id=organization_id)
+
+def record_manifest_entry(file_id: int, filename: str, organization_id: Optional[str], content_hash: str, chunk_count: int):
+    """Remember which content of an organization's stored document is indexed, for incremental corpus syncs"""
+    if not organization_id:
+        return  # Directory reindexes and ad-hoc files have no document_store row to sync against
+    try:
+        upsert_manifest_entry(file_id, filename, organization_id, content_hash, chunk_count)
+    except Exception as e:
+        logger.warning(f"Could not record manifest entry for {filename} (ID: {file_id}): {e}")
+
+# Streaming ingestion (PDFs): chunks are embedded and added in buffers of this
+# size, so memory does not grow with the number of pages
+INGEST_BUFFER_CHUNKS = int(os.getenv("RAG_INGEST_BUFFER_CHUNKS", "256"))
+# Resident memory ceiling while ingesting, in MB (0 disables). Above 80% of it the
+# buffer is halved; above it (after a GC) the file fails instead of the process being OOM-killed
+INGEST_MEMORY_LIMIT_MB = float(os.getenv("RAG_INGEST_MEMORY_LIMIT_MB", "0"))
+
+def _ingest_buffer_limit() -> int:
+    if not INGEST_MEMORY_LIMIT_MB:
+        return INGEST_BUFFER_CHUNKS
+    rss = current_rss_mb()
+    if rss > INGEST_MEMORY_LIMIT_MB:
+        gc.collect()
+        rss = current_rss_mb()
+        if rss > INGEST_MEMORY_LIMIT_MB:
+            raise MemoryError(f"Ingestion uses {rss:.0f} MB, above RAG_INGEST_MEMORY_LIMIT_MB={INGEST_MEMORY_LIMIT_MB:.0f}")
+    if rss > INGEST_MEMORY_LIMIT_MB * 0.8:
+        return max(16, INGEST_BUFFER_CHUNKS // 2)
+    return INGEST_BUFFER_CHUNKS
+
+def _outline_stub(doc: Document) -> Document:
+    """What title extraction needs from a later page: its metadata and heading lines"""
+    headings = [line for line in doc.page_content.splitlines() if line.lstrip().startswith('#')]
+    return Document(page_content="\n".join(headings), metadata=doc.metadata)
+
+def _index_document_streaming(source: "DocumentSource", file_id: int, filename: str, organization_id: str = None, metadata: Dict[str, str] = None) -> bool:
+    """
+    Index a file page by page: each page is chunked as it is read and chunks
+    are embedded and added in bounded buffers. Only the leading chunks (for the
+    summary) and heading lines (for the title index) are kept for the whole file.
+    """
+    store = get_vectorstore_for_org(organization_id)
+    outline_docs: List[Document] = []
+    leading: List[Document] = []
+    leading_chars = 0
+    buffer: List[Document] = []
+    buffer_limit = _ingest_buffer_limit()
+    added_ids: List[str] = []
+    total = 0
+    job = ingest_progress.current()
+    bytes_total = job.bytes_total if job else None
+
+    def pages():
+        ingest_progress.stage("parse")
+        for i, doc in enumerate(iter_documents(source, filename)):
+            outline_docs.append(doc if i == 0 else _outline_stub(doc))
+            # Bytes are apportioned by page: the loader does not report its read position
+            total_pages = doc.metadata.get('total_pages') or 0
+            ingest_progress.add(pages=1, bytes=bytes_total // total_pages if bytes_total and total_pages else 0)
+            ingest_progress.stage("chunk")
+            yield doc
+            ingest_progress.stage("parse")
+
+    def flush():
+        nonlocal buffer, total, buffer_limit
+        ingest_progress.stage("embed")
+        added_ids.extend(upsert_splits(store, buffer))
+        ingest_progress.stage("store")
+        append_document_chunks(file_id, buffer)
+        ingest_progress.add(chunks_stored=len(buffer))
+        ingest_progress.stage("chunk")
+        total += len(buffer)
+        buffer = []
+        buffer_limit = _ingest_buffer_limit()
+
+    try:
+        # Read before the rows that hold them are cleared; removed once the new version is in
+        previous_ids = indexed_vector_ids(store, file_id, organization_id)
+        delete_document_chunks(file_id)
+        for split in iter_splits(pages(), source, filename):
+            annotate_splits([split], file_id, filename, organization_id=organization_id, metadata=metadata)
+            ingest_progress.add(chunks=1)
+            if leading_chars < SUMMARY_LEADING_CHARS:
+                leading.append(split)
+                leading_chars += len(split.page_content)
+            buffer.append(split)
+            if len(buffer) >= buffer_limit:
+                flush()
+        if buffer:
+            flush()
+        if not total:
+            raise ValueError("No content extracted")
+
+        ingest_progress.stage("store")
+        delete_replaced_vectors(store, previous_ids, added_ids)
+        index_document_summary(file_id, filename, leading, organization_id=organization_id, metadata=metadata, chunk_count=total)
+        index_document_titles(file_id, filename, outline_docs, organization_id=organization_id)
+        record_manifest_entry(file_id, filename, organization_id, source_content_hash(source), total)
+        logger.info(f"✓ Successfully indexed {filename} with {total} chunks from {len(outline_docs)} pages (ID: {file_id}, streamed)")
+        return True
+    except Exception as e:
+        logger.error(f"Error indexing document {filename} (ID: {file_id}): {e}", exc_info=True)
+        ingest_progress.fail(str(e))
+        # Remove the buffers already added so a retry starts clean
+        try:
+            delete_vectors(store, added_ids)
+            delete_document_chunks(file_id)
+        except Exception as cleanup_error:
+            logger.warning(f"Could not clean up partial index of {filename}: {cleanup_error}")
+        return False
+
+@index_write_gate.writer
+def index_document_to_chroma(source: "DocumentSource", file_id: int, organization_id: str = None, metadata: Dict[str, str] = None, filename: str = None) -> bool:
+    """
+    Index a file given as a path, its bytes or a binary stream. The filename
+    (default: the basename of the path) selects the loader and is stored on the chunks.
+    """
+    if _refuse_write(f"indexing of file_id {file_id}"):
+        return False
+    # Extract just the filename from the path unless given
+    filename = filename or os.path.basename(source)
+    with ingest_progress.track(filename, file_id=file_id, organization_id=organization_id, bytes_total=source_size(source)):
+        try:
+            file_ext = os.path.splitext(filename)[1].lower()
+        
+            # Log the indexing operation
+            logger.info(f"Starting indexing for file: {filename} (ID: {file_id}, Type: {file_ext})")
+        
+            if file_ext == '.pdf':
+                return _index_document_streaming(source, file_id, filename, organization_id=organization_id, metadata=metadata)
+        
+            documents, splits = _load_and_split(source, filename)
+        
+            logger.info(f"Loaded {len(splits)} chunks from {filename}")
+        
+            if not splits:
+                raise ValueError("No content extracted")
+            annotate_splits(splits, file_id, filename, organization_id=organization_id, metadata=metadata)
+        
+            store = get_vectorstore_for_org(organization_id)
+            # Read before record_document_index replaces the rows that hold them
+            previous_ids = indexed_vector_ids(store, file_id, organization_id)
+            ingest_progress.stage("embed")
+            new_ids = upsert_splits(store, splits)
+            ingest_progress.add(chunks_stored=len(new_ids))
+            ingest_progress.stage("store")
+            delete_replaced_vectors(store, previous_ids, new_ids)
+            record_document_index(file_id, filename, documents, splits, organization_id=organization_id, metadata=metadata)
+            record_manifest_entry(file_id, filename, organization_id, source_content_hash(source), len(splits))
+
+            logger.info(f"✓ Successfully indexed {filename} with {len(splits)} chunks (ID: {file_id})")
+        
+            # If this is a ZIP file, log the summary
+            if file_ext == '.zip':
+                # Count archive chunks
+                archive_chunks = sum(1 for split in splits if 'archive_source' in split.metadata)
+                logger.info(f"ZIP ARCHIVE INDEXING SUMMARY: {filename}")
+                logger.info(f"  - Total chunks indexed: {len(splits)}")
+                logger.info(f"  - Chunks from archive: {archive_chunks}")
+        
+            return True
+        except Exception as e:
+            logger.error(f"Error indexing document {filename} (ID: {file_id}): {e}", exc_info=True)
+            ingest_progress.fail(str(e))
+            return False
+
+@index_write_gate.writer
+def reindex_document_incremental(source: "DocumentSource", file_id: int, organization_id: str = None, metadata: Dict[str, str] = None,
+                                 filename: str = None) -> Optional[Dict[str, int]]:
+    """
+    Re-index an edited document by chunk diff: the new text is rechunked and
+    matched by content hash against the file's stored vectors. Unchanged chunks
+    keep their embeddings (a chunk whose position moved is rewritten under its
+    new vector ID with the stored embedding), new chunks are embedded and
+    added, and vanished ones deleted.
+
+    Returns:
+        Counts of reused, added and deleted chunks, or None on failure
+    """
+    if _refuse_write(f"incremental reindexing of file_id {file_id}"):
+        return None
+    filename = filename or os.path.basename(source)
+    with ingest_progress.track(filename, file_id=file_id, organization_id=organization_id,
+                               bytes_total=source_size(source), kind="incremental"):
+        try:
+            store = get_vectorstore_for_org(organization_id)
+            include = ["metadatas", "documents", "embeddings"]
+            known_ids = get_chunk_vector_ids(file_id)
+            if known_ids is not None:
+                existing = store._collection.get(ids=known_ids, include=include)
+            else:
+                # Indexed before vector IDs were recorded: find the chunks by metadata
+                existing = store._collection.get(where=_file_where(file_id, organization_id), include=include)
+
+            # Stored (vector ID, embedding) pairs by content hash (legacy chunks have no chunk_hash yet)
+            stored: Dict[str, List[Tuple[str, Any]]] = {}
+            for vector_id, chunk_metadata, text, embedding in zip(existing['ids'], existing['metadatas'], existing['documents'], existing['embeddings']):
+                chunk_hash = (chunk_metadata or {}).get('chunk_hash') or chunk_content_hash(text or "")
+                stored.setdefault(chunk_hash, []).append((vector_id, embedding))
+
+            documents, splits = _load_and_split(source, filename)
+            if not splits:
+                raise ValueError("No content extracted")
+            annotate_splits(splits, file_id, filename, organization_id=organization_id, metadata=metadata)
+
+            kept_ids, kept_metadatas = [], []
+            moved = {"ids": [], "embeddings": [], "metadatas": [], "documents": []}
+            moved_from = []
+            added_splits = []
+            for split in splits:
+                new_id = split.metadata['vector_id']
+                candidates = stored.get(split.metadata['chunk_hash'])
+                if not candidates:
+                    added_splits.append(split)
+                    continue
+                match = next((c for c in candidates if c[0] == new_id), candidates[-1])
+                candidates.remove(match)
+                if match[0] == new_id:
+                    kept_ids.append(new_id)
+                    kept_metadatas.append(split.metadata)
+                else:
+                    moved["ids"].append(new_id)
+                    moved["embeddings"].append(match[1])
+                    moved["metadatas"].append(split.metadata)
+                    moved["documents"].append(split.page_content)
+                    moved_from.append(match[0])
+            deleted_ids = [vector_id for pairs in stored.values() for vector_id, _ in pairs]
+
+            ingest_progress.stage("embed")
+            # Deletes go first: a moved chunk may take over the ID of a vanished one
+            delete_vectors(store, deleted_ids + moved_from)
+            if kept_ids:
+                store._collection.update(ids=kept_ids, metadatas=kept_metadatas)
+            for start in range(0, len(moved["ids"]), CHROMA_UPSERT_BATCH):
+                # Same text, same embedding: no model call
+                store._collection.upsert(**{key: values[start:start + CHROMA_UPSERT_BATCH] for key, values in moved.items()})
+            upsert_splits(store, added_splits)
+            ingest_progress.add(chunks_stored=len(added_splits))
+            ingest_progress.stage("store")
+
+            record_document_index(file_id, filename, documents, splits, organization_id=organization_id, metadata=metadata)
+            record_manifest_entry(file_id, filename, organization_id, source_content_hash(source), len(splits))
+
+            stats = {"reused": len(kept_ids) + len(moved_from), "added": len(added_splits), "deleted": len(deleted_ids)}
+            logger.info(f"✓ Incrementally reindexed {filename} (ID: {file_id}): {stats['reused']} chunks reused, "
+                        f"{stats['added']} embedded, {stats['deleted']} deleted")
+            return stats
+        except Exception as e:
+            logger.error(f"Error incrementally reindexing {filename} (ID: {file_id}): {e}", exc_info=True)
+            ingest_progress.fail(str(e))
+            return None
+
+@index_write_gate.writer
 def delete_doc_from_chroma(file_id: int, organization_id: str = None) -> bool:
+    if _refuse_write(f"deletion of file_id {file_id}"):
+        return False
     try:
         # First, get the filename from the database using file_id
         import sqlite3
@@ -448,92 +1186,263 @@ def delete_doc_from_chroma(file_id: int, organization_id: str = None) -> bool:
         cursor.execute("SELECT filename FROM document_store WHERE id = ?", (file_id,))
         result = cursor.fetchone()
         conn.close()
-        
+
+        # Recorded vector IDs allow a direct delete; files indexed before they were recorded need a metadata scan
+        vector_ids = get_chunk_vector_ids(file_id)
+
+        delete_document_summary(file_id)
+        delete_document_chunks(file_id)
+        remove_document_titles(file_id)
+        delete_manifest_entry(file_id)
+
         if result:
             filename = result['filename']
-            print(f"Found filename '{filename}' for file_id {file_id}")
+            logger.info(f"Found filename '{filename}' for file_id {file_id}")
         else:
-            print(f"No document found with file_id {file_id}")
-            return True  # Document not found, consider successful
+            # Already removed from document_store (e.g. found by a corpus sync); its vectors may remain
+            filename = f"file_id {file_id}"
+            logger.warning(f"No document found with file_id {file_id}, deleting its vectors by id")
         
-        # Build where clause to find by filename and organization_id
+        # Build where clause to find by file_id and organization_id
+        # (chunk "source" is the temporary path the file was indexed from, not its filename)
         if organization_id:
             where_clause = {
                 "$and": [
-                    {"source": filename},
+                    {"file_id": file_id},
                     {"organization_id": organization_id}
                 ]
             }
         else:
-            where_clause = {"source": filename}
+            where_clause = {"file_id": file_id}
         
+        if sharding_enabled():
+            # The organization's shard, or every shard when the owner is unknown
+            for store in get_shard_router().stores_for_delete(organization_id):
+                if vector_ids is not None:
+                    delete_vectors(store, vector_ids)
+                else:
+                    store._collection.delete(where=where_clause)
+            logger.info(f"Deleted all documents with filename '{filename}' from tenant shards")
+            return True
+
         # Check if vectorstore is initialized
-        global vectorstore
+        try:
+            vectorstore = get_vectorstore()
+        except Exception:
+            vectorstore = None
         if vectorstore is None:
-            print("Error: Vectorstore not initialized")
+            logger.error("Vectorstore not initialized")
             return False
         
         # Check if collection exists
         try:
             collection = vectorstore._collection
-            print(f"Collection name: {collection.name}")
+            logger.info(f"Collection name: {collection.name}")
         except Exception as e:
-            print(f"Error accessing collection: {e}")
+            logger.error(f"Error accessing collection: {e}")
             return False
+        
+        if vector_ids is not None:
+            delete_vectors(vectorstore, vector_ids)
+            logger.info(f"Deleted {len(vector_ids)} document chunks of '{filename}' by ID")
+            return True
             
         # Get documents to see what exists
         try:
             docs = vectorstore.get(where=where_clause)
-            print(f"Found {len(docs['ids'])} document chunks for filename '{filename}'")
-            print(f"Document IDs: {docs['ids'][:5] if docs['ids'] else 'None'}")
+            logger.info(f"Found {len(docs['ids'])} document chunks for filename '{filename}'")
+            logger.info(f"Document IDs: {docs['ids'][:5] if docs['ids'] else 'None'}")
         except Exception as e:
-            print(f"Error getting documents from Chroma: {e}")
+            logger.error(f"Error getting documents from Chroma: {e}")
             return False
         
         if len(docs['ids']) == 0:
-            print(f"No documents found with filename '{filename}'")
+            logger.warning(f"No documents found with filename '{filename}'")
             return True  # Consider this successful since nothing to delete
         
         # Try to delete using the collection directly
         try:
             result = collection.delete(where=where_clause)
-            print(f"Chroma delete operation result: {result}")
-            print(f"Deleted all documents with filename '{filename}'")
+            logger.info(f"Chroma delete operation result: {result}")
+            logger.info(f"Deleted all documents with filename '{filename}'")
             return True
         except Exception as e:
-            print(f"Error in collection.delete(): {e}")
+            logger.warning(f"Error in collection.delete(), retrying with vectorstore.delete: {e}")
             
             # Fallback: try using vectorstore.delete
             try:
                 result = vectorstore.delete(where=where_clause)
-                print(f"Vectorstore delete operation result: {result}")
-                print(f"Deleted all documents with filename '{filename}' using vectorstore.delete")
+                logger.info(f"Vectorstore delete operation result: {result}")
+                logger.info(f"Deleted all documents with filename '{filename}' using vectorstore.delete")
                 return True
             except Exception as e2:
-                print(f"Error in vectorstore.delete(): {e2}")
+                logger.error(f"Error in vectorstore.delete(): {e2}")
                 return False
                 
     except Exception as e:
-        print(f"Error deleting document with file_id {file_id}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error deleting document with file_id {file_id}: {e}", exc_info=True)
         return False
 
-def reindex_documents(documents_dir: str, file_paths: List[str] = None) -> Dict[str, Any]:
+# Blue/green reindex: seconds a retired collection is kept after a flip, so
+# searches already running (in any process) against it can finish
+COLLECTION_GC_GRACE_SECONDS = float(os.getenv("RAG_COLLECTION_GC_GRACE", "30"))
+# A rebuilt collection smaller than this share of the live one is not activated
+REINDEX_MIN_COUNT_RATIO = float(os.getenv("RAG_REINDEX_MIN_COUNT_RATIO", "0.5"))
+# Sample queries run against a rebuilt collection before it is activated (they also warm its index)
+REINDEX_VALIDATION_QUERIES = int(os.getenv("RAG_REINDEX_VALIDATION_QUERIES", "5"))
+
+def _validate_collection(candidate, expected_chunks: int, live_count: int) -> Dict[str, Any]:
+    """Count and sample-query checks a rebuilt collection must pass before it serves"""
+    count = candidate._collection.count()
+    problems = []
+    if count == 0:
+        problems.append("the new collection is empty")
+    elif count < expected_chunks:
+        problems.append(f"the new collection holds {count} chunks but {expected_chunks} were indexed")
+    if live_count and count < live_count * REINDEX_MIN_COUNT_RATIO:
+        problems.append(f"the new collection holds {count} chunks, under {REINDEX_MIN_COUNT_RATIO:.0%} of the live collection's {live_count}")
+
+    # Every sampled chunk should be found by its own text
+    samples = candidate._collection.get(limit=REINDEX_VALIDATION_QUERIES, include=["documents"])
+    latencies_ms = []
+    missed = 0
+    for text in samples["documents"]:
+        started = time.perf_counter()
+        hits = candidate.similarity_search_with_score(text, k=5)
+        latencies_ms.append(round((time.perf_counter() - started) * 1000, 1))
+        if not any(doc.page_content == text for doc, _ in hits):
+            missed += 1
+    if missed > len(samples["documents"]) // 2:
+        problems.append(f"{missed} of {len(samples['documents'])} sampled chunks were not found by their own text")
+
+    return {"count": count, "live_count": live_count, "sample_queries": len(latencies_ms), "sample_misses": missed,
+            "sample_latency_ms": latencies_ms, "problems": problems}
+
+def _drop_collections(client, names: List[str]) -> List[str]:
+    dropped = []
+    for name in names:
+        try:
+            client.delete_collection(name)
+            dropped.append(name)
+        except Exception as e:
+            logger.warning(f"Could not delete collection {name}: {e}")
+    return dropped
+
+def gc_retired_collections(grace_seconds: float = COLLECTION_GC_GRACE_SECONDS) -> List[str]:
+    """Delete collections retired by a blue/green flip at least grace_seconds ago"""
+    collection_pointer.refresh(force=True)
+    cutoff = time.time() - grace_seconds
+    due = [entry["name"] for entry in collection_pointer.retired() if entry["retired_at"] <= cutoff]
+    if not due:
+        return []
+    dropped = _drop_collections(get_vectorstore()._client, due)
+    collection_pointer.forget_retired(dropped)
+    logger.info(f"Deleted retired collections: {dropped}")
+    return dropped
+
+def _stored_documents() -> Dict[int, Tuple[str, Optional[str], str]]:
+    """Content hash, organization and filename of every stored document, by id"""
+    return {row["id"]: (row["content_hash"], row["organization_id"] or None, row["filename"])
+            for row in get_all_document_hashes()}
+
+def _replay_changes(store, summary_store, since: Dict[int, Tuple[str, Optional[str], str]]) -> Dict[str, Any]:
     """
-    Completely reindex all documents in the specified directory or from the provided file paths.
-    
+    Bring a collection being rebuilt up to date with the documents stored,
+    changed or deleted since the `since` snapshot of _stored_documents(), so a
+    flip does not lose writes made to the live collections meanwhile.
+
+    Returns:
+        The snapshot the collection is now current with, and replay counts and errors
+    """
+    from .bulk_reindex import _parse_file
+
+    current = _stored_documents()
+    changed = [file_id for file_id, state in current.items() if since.get(file_id) != state]
+    deleted = [file_id for file_id in since if file_id not in current]
+    errors = []
+
+    for file_id in deleted:
+        store._collection.delete(where={"file_id": file_id})
+        summary_store._collection.delete(ids=[_summary_id(file_id)])
+        # The build may have recorded the file after it was deleted
+        delete_document_chunks(file_id)
+        remove_document_titles(file_id)
+        delete_manifest_entry(file_id)
+
+    for file_id in changed:
+        _hash, organization_id, filename = current[file_id]
+        parsed = _parse_file({"file_id": file_id, "filename": filename, "organization_id": organization_id})
+        store._collection.delete(where={"file_id": file_id})
+        if parsed.get("error"):
+            errors.append(f"Failed to index {filename}: {parsed['error']}")
+            summary_store._collection.delete(ids=[_summary_id(file_id)])
+            continue
+        annotate_splits(parsed["splits"], file_id, filename, organization_id=organization_id)
+        upsert_splits(store, parsed["splits"])
+        record_document_index(file_id, filename, parsed["documents"], parsed["splits"],
+                              organization_id=organization_id, summary_store=summary_store)
+        record_manifest_entry(file_id, filename, organization_id, parsed["content_hash"], len(parsed["splits"]))
+
+    if changed or deleted:
+        logger.info(f"Replayed {len(changed)} changed and {len(deleted)} deleted documents into {store._collection.name}")
+    return {"snapshot": current, "changed": len(changed), "deleted": len(deleted), "errors": errors}
+
+def stored_items_for_paths(file_paths: Iterable[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Match files on disk to their document_store rows by filename, so their
+    chunks keep the stored file_id and organization. Files without exactly
+    one row are left out.
+
+    Returns:
+        Bulk reindex items, and an error for every file left out
+    """
+    rows: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in get_all_documents():
+        rows.setdefault(doc["filename"], []).append(doc)
+    items, errors = [], []
+    for file_path in map(str, file_paths):
+        filename = os.path.basename(file_path)
+        matches = rows.get(filename, [])
+        if len(matches) != 1:
+            reason = "not in document_store" if not matches else f"{len(matches)} document_store rows share this filename"
+            errors.append(f"Failed to index {filename}: {reason}")
+            continue
+        items.append({"path": file_path, "filename": filename, "file_id": matches[0]["id"],
+                      "organization_id": matches[0].get("organization_id") or None})
+    return items, errors
+
+def reindex_documents(documents_dir: Optional[str] = None, file_paths: List[str] = None) -> Dict[str, Any]:
+    """
+    Completely reindex all stored documents, or the stored documents' files in
+    the specified directory or the provided file paths.
+
+    The index is rebuilt blue/green: documents go into new versioned chunk and
+    summary collections while the live ones keep serving. Once the new chunk
+    collection passes validation (counts and sample queries), the active
+    pointer flips to both at once and the old ones are deleted after
+    RAG_COLLECTION_GC_GRACE seconds. If validation fails, the new collections
+    are dropped and the live ones stay active. Documents stored, changed or
+    deleted during the rebuild are replayed into the new collections; the last
+    replay and the flip run with index writes quiesced, so none are lost.
+    
+    Chunks are written under the document_store id and organization of each
+    file; files on disk are matched to their rows by filename.
+
     Args:
-        documents_dir: Directory containing documents to index
+        documents_dir: Directory containing documents to index (default: read every document from document_store)
         file_paths: Optional list of specific file paths to index (if not provided, all files in directory will be indexed)
         
     Returns:
         Dictionary with reindexing statistics
     """
-    global vectorstore
-    import time
+    if _refuse_write("reindexing"):
+        raise RuntimeError("Cannot reindex: Chroma is read-only in this process")
+    if sharding_enabled():
+        raise RuntimeError("Full reindex rebuilds the unsharded collection; with RAG_CHROMA_SHARDS > 1 "
+                           "reindex each organization with bulk_reindex --organization")
     from datetime import datetime
     from pathlib import Path
+    from langchain_chroma import Chroma
     
     start_time = time.time()
     stats = {
@@ -547,64 +1456,80 @@ def reindex_documents(documents_dir: str, file_paths: List[str] = None) -> Dict[
     }
     
     try:
-        # Reinitialize the vectorstore
-        vectorstore = Chroma(**chroma_settings)
-        
-        # Delete existing collection
-        logger.info("Deleting existing Chroma collection...")
-        vectorstore.delete_collection()
-        
-        # Recreate the collection
-        vectorstore = Chroma(**chroma_settings)
+        # Leftovers of earlier rebuilds whose process exited before cleaning up
+        gc_retired_collections()
+
+        live = get_vectorstore()
+        live_count = live._collection.count()
+        new_names = {
+            "documents": versioned_name(CHROMA_COLLECTION_NAME),
+            "summary": versioned_name(SUMMARY_COLLECTION_NAME),
+        }
+        candidate = Chroma(**get_chroma_settings(new_names["documents"]))
+        candidate_summary = Chroma(**get_chroma_settings(new_names["summary"]))
+        logger.info(f"Building {new_names['documents']} while {live._collection.name} ({live_count} chunks) keeps serving")
         
-        # Get list of files to process
-        if file_paths is None:
-            file_paths = []
-            # Include additional archive and legacy document formats
-            for ext in ['.pdf', '.docx', '.doc', '.txt', '.md', '.html', '.zip']:
-                file_paths.extend(list(Path(documents_dir).rglob(f'*{ext}')))
+        # Parse and chunk on a process pool, embed and add in large batches
+        from .bulk_reindex import BulkReindexer, organization_items
+        if documents_dir is None and file_paths is None:
+            # The parsers read each document's content from document_store
+            items, unmatched = organization_items(), []
+        else:
+            # Get list of files to process
+            if file_paths is None:
+                file_paths = []
+                # Include additional archive and legacy document formats
+                for ext in ['.pdf', '.docx', '.doc', '.txt', '.md', '.html', '.zip']:
+                    file_paths.extend(list(Path(documents_dir).rglob(f'*{ext}')))
+            items, unmatched = stored_items_for_paths(file_paths)
+            for error in unmatched:
+                logger.warning(error)
         
-        stats['total_files'] = len(file_paths)
+        stats['total_files'] = len(items) + len(unmatched)
+        stats['errors'].extend(unmatched)
         logger.info(f"Starting reindexing of {stats['total_files']} files...")
         
-        # Process each file
-        for file_path in file_paths:
-            file_path = str(file_path)
-            file_ext = os.path.splitext(file_path)[1].lower()
-            file_id = hash(file_path) % (2**32)  # Generate a consistent file ID
-            
+        for item in items:
+            file_ext = os.path.splitext(item['filename'])[1].lower()
             if file_ext not in stats['file_types']:
                 stats['file_types'][file_ext] = 0
             stats['file_types'][file_ext] += 1
-            
-            try:
-                logger.info(f"Indexing {file_path}...")
-                if index_document_to_chroma(file_path, file_id):
-                    # Get the number of chunks added
-                    docs = vectorstore.get(where={"file_id": file_id})
-                    chunks_added = len(docs['ids']) if docs and 'ids' in docs else 0
-                    stats['total_chunks'] += chunks_added
-                    stats['successful'] += 1
-                    stats['processed'] += 1
-                    logger.info(f"Successfully indexed {file_path} ({chunks_added} chunks)")
-                else:
-                    stats['failed'] += 1
-                    stats['processed'] += 1
-                    stats['errors'].append(f"Failed to index {file_path}")
-                    logger.error(f"Failed to index {file_path}")
-            except Exception as e:
-                stats['failed'] += 1
-                stats['processed'] += 1
-                error_msg = f"Error indexing {file_path}: {str(e)}"
-                stats['errors'].append(error_msg)
-                logger.error(error_msg, exc_info=True)
-        
-        # Persist the vectorstore (if persist method exists)
+
+        # Writes to the live collections from here on are replayed before the flip
+        snapshot = _stored_documents()
         try:
-            vectorstore.persist()
-        except AttributeError:
-            # Chroma no longer has persist() method in newer versions
-            logger.info("Vectorstore persistence handled automatically")
+            result = BulkReindexer(vectorstore=candidate, summary_vectorstore=candidate_summary).run(items)
+            stats['successful'] = result['indexed']
+            stats['failed'] = result['failed'] + len(unmatched)
+            stats['processed'] = result['indexed'] + result['failed']
+            stats['total_chunks'] = result['chunks']
+            stats['chunks_per_second'] = result['chunks_per_second']
+            stats['errors'].extend(f"Failed to index {doc['filename']}: {doc['reason']}" for doc in result['failed_documents'])
+
+            stats['validation'] = _validate_collection(candidate, result['chunks'], live_count)
+            if stats['validation']['problems']:
+                raise RuntimeError("Rebuilt collection failed validation, the live collection keeps serving: "
+                                   + "; ".join(stats['validation']['problems']))
+
+            # Catch up while writes continue, then replay the last few and flip with writes held off
+            replay = _replay_changes(candidate, candidate_summary, snapshot)
+            with index_write_gate.quiesced():
+                final = _replay_changes(candidate, candidate_summary, replay['snapshot'])
+                collection_pointer.flip(new_names, defaults={"documents": CHROMA_COLLECTION_NAME, "summary": SUMMARY_COLLECTION_NAME})
+                vectorstore_resource.reset()
+                summary_vectorstore_resource.reset()
+        except Exception:
+            _drop_collections(candidate._client, list(new_names.values()))
+            raise
+
+        stats['replayed'] = {"changed": replay['changed'] + final['changed'], "deleted": replay['deleted'] + final['deleted']}
+        stats['errors'].extend(replay['errors'] + final['errors'])
+        stats['active_collections'] = new_names
+
+        # Other processes switch within RAG_COLLECTION_POINTER_CHECK_INTERVAL; drop the old collections after the grace period
+        gc_timer = threading.Timer(COLLECTION_GC_GRACE_SECONDS, gc_retired_collections)
+        gc_timer.daemon = True
+        gc_timer.start()
         
     except Exception as e:
         error_msg = f"Fatal error during reindexing: {str(e)}"
@@ -699,6 +1624,14 @@ def calculate_bm25_score(query_terms: List[str], document: str, avg_doc_length:
     
     return score
 
+def _trace_stage(trace: Optional[SearchTrace], name: str, **details):
+    """Time a stage on the explain trace, or do nothing when not tracing"""
+    return trace.stage(name, **details) if trace is not None else nullcontext({})
+
+def _trace_item(metadata: Dict[str, Any]) -> str:
+    """Label of a chunk in explain traces"""
+    return f"{metadata.get('filename', '') or metadata.get('source', '')}#{metadata.get('chunk_index', '?')}"
+
 def search_documents(
     query: str,
     similarity_threshold: float = 0.15,  # Lowered for better recall
@@ -715,7 +1648,11 @@ def search_documents(
     use_hybrid_search: bool = True,  # Enable hybrid semantic + keyword search
     bm25_weight: float = 0.3,  # Weight for BM25 score in hybrid search
     organization_id: str = None,
-    filter_conditions: Optional[Dict] = None
+    filter_conditions: Optional[Dict] = None,
+    use_document_prefilter: bool = True,  # Two-stage search: pick top files first, then their chunks
+    prefilter_top_n: int = DOCUMENT_PREFILTER_TOP_N,
+    load_context: bool = True,
+    trace: Optional[SearchTrace] = None
 ) -> Dict[str, Union[List[Document], Dict[str, any]]]:
     """
     Advanced hybrid document search combining semantic similarity and keyword matching.
@@ -732,7 +1669,13 @@ def search_documents(
         use_cache: Whether to use caching for queries
         use_hybrid_search: Enable hybrid semantic + BM25 keyword search
         bm25_weight: Weight for BM25 score (1 - bm25_weight is semantic weight)
-        
+        use_document_prefilter: Restrict the chunk search to the top files of the document summary index
+        prefilter_top_n: Number of candidate files selected by the document prefilter
+        load_context: Attach parent windows / full file content to the results. Callers
+            that load context lazily per result (streaming, pagination) pass False.
+        trace: Optional SearchTrace collecting per-stage timings and keep/drop reasons
+            (explain mode). Tracing bypasses the result cache.
+
     Returns:
         Dictionary with search results and statistics
     """
@@ -740,7 +1683,9 @@ def search_documents(
     tracker = PerformanceTracker(f"search_documents('{query[:50]}...')", logger)
     
     # Preprocess query
-    preprocessed_query = preprocess_query(query, language=language)
+    with _trace_stage(trace, "preprocess") as stage:
+        preprocessed_query = preprocess_query(query, language=language)
+        stage['preprocessed_query'] = preprocessed_query
     if not preprocessed_query:
         return {
             'semantic_results': [],
@@ -750,7 +1695,10 @@ def search_documents(
     
     # Generate cache key
     cache_key = None
-    if use_cache:
+    if trace is not None:
+        # An explain trace must reflect a real run of the pipeline
+        trace.note('result_cache', 'bypassed')
+    elif use_cache:
         cache_key = hashlib.md5(json.dumps({
             'query': preprocessed_query,
             'similarity_threshold': similarity_threshold,
@@ -760,7 +1708,10 @@ def search_documents(
             'max_chunks_per_file': max_chunks_per_file,
             'filename_match_boost': filename_match_boost,
             'language': language,
-            'organization_id': organization_id
+            'organization_id': organization_id,
+            'use_document_prefilter': use_document_prefilter,
+            'prefilter_top_n': prefilter_top_n,
+            'load_context': load_context
         }, sort_keys=True).encode()).hexdigest()
         
         # Check cache first
@@ -779,7 +1730,8 @@ def search_documents(
             'processing_time_ms': None,
             'query': query,
             'error': None,
-            'cache_hit': False
+            'cache_hit': False,
+            'candidate_files': None
         }
     }
 
@@ -787,8 +1739,11 @@ def search_documents(
         # Get query embedding with preprocessing
         tracker.start_operation("query_embedding")
         try:
-            query_embedding = embedding_function.embed_query(preprocessed_query)
-            query_embedding_np = np.array(query_embedding, dtype=np.float32)
+            embedding_function = get_embedding_function()
+            embedding_cache_hit = embedding_function.is_query_cached(preprocessed_query) if trace is not None else None
+            with _trace_stage(trace, "embedding", cache_hit=embedding_cache_hit):
+                query_embedding = embedding_function.embed_query(preprocessed_query)
+                query_embedding_np = np.array(query_embedding, dtype=np.float32)
             tracker.end_operation("query_embedding")
         except Exception as e:
             logger.error(f"Error generating query embedding: {str(e)}")
@@ -805,14 +1760,50 @@ def search_documents(
             filter_dict = None
             if filter_conditions:
                 filter_dict = filter_conditions
-            
-            # Perform similarity search to get relevant documents with metadata
-            similar_docs = vectorstore.similarity_search_with_score(
-                preprocessed_query,
-                k=max_results * 2,  # Get more results for filtering
-                filter=filter_dict
-            )
-            
+
+            # Stage 1: select candidate files from the document summary index
+            candidate_files = None
+            if use_document_prefilter:
+                tracker.start_operation("document_prefilter")
+                with _trace_stage(trace, "document_prefilter") as stage:
+                    candidate_files = select_candidate_files(
+                        preprocessed_query,
+                        organization_id=organization_id,
+                        top_n=prefilter_top_n
+                    )
+                    stage['candidate_files'] = len(candidate_files) if candidate_files else 'all'
+                tracker.end_operation("document_prefilter",
+                                      f"{len(candidate_files) if candidate_files else 'all'} candidate files")
+
+            similar_docs = []
+            if candidate_files:
+                results['stats']['candidate_files'] = len(candidate_files)
+                candidate_filter = {"file_id": {"$in": candidate_files}}
+                restricted_filter = {"$and": [filter_dict, candidate_filter]} if filter_dict else candidate_filter
+
+                # Stage 2: chunk search restricted to the candidate files
+                with _trace_stage(trace, "vector_query", restricted_to_candidates=True) as stage:
+                    similar_docs = _similarity_search(
+                        preprocessed_query,
+                        k=max_results * 2,
+                        filter=restricted_filter,
+                        organization_id=organization_id
+                    )
+                    stage['returned'] = len(similar_docs)
+                if not similar_docs:
+                    logger.info("No chunks within candidate files, falling back to full chunk search")
+
+            if not similar_docs:
+                # Perform similarity search to get relevant documents with metadata
+                with _trace_stage(trace, "vector_query", restricted_to_candidates=False) as stage:
+                    similar_docs = _similarity_search(
+                        preprocessed_query,
+                        k=max_results * 2,  # Get more results for filtering
+                        filter=filter_dict,
+                        organization_id=organization_id
+                    )
+                    stage['returned'] = len(similar_docs)
+
             if not similar_docs:
                 logger.warning("No similar documents found in vectorstore")
                 return results
@@ -835,6 +1826,8 @@ def search_documents(
                         doc_org_id = metadata.get('organization_id') if isinstance(metadata, dict) else None
                         # Include document if it belongs to the user's org OR if it has no org (legacy)
                         if doc_org_id != organization_id and doc_org_id is not None:
+                            if trace is not None:
+                                trace.decision(_trace_item(metadata), False, 'other_organization', 'organization_filter')
                             continue  # Skip documents from other organizations
                     
                     doc_scores.append(float(score))
@@ -850,6 +1843,8 @@ def search_documents(
                 return results
             
             logger.info(f"Org filter {organization_id}: {len(similar_docs)} total -> {len(doc_scores)} matching")
+            if trace is not None:
+                trace.count('organization_filter', before=len(similar_docs), after=len(doc_scores))
             
             # Invert scores so higher similarity = higher score (similarity_search_with_score returns distance)
             semantic_similarities = np.array([1.0 - s for s in doc_scores], dtype=np.float32)
@@ -869,15 +1864,16 @@ def search_documents(
         bm25_scores = None
         if use_hybrid_search:
             tracker.start_operation("calculate_bm25")
-            query_terms = query.lower().split()
-            avg_doc_length = np.mean([len(doc.split()) for doc in documents])
-            bm25_scores = np.array([
-                calculate_bm25_score(query_terms, doc, avg_doc_length) 
-                for doc in documents
-            ])
-            # Normalize BM25 scores to [0, 1]
-            if bm25_scores.max() > 0:
-                bm25_scores = bm25_scores / bm25_scores.max()
+            with _trace_stage(trace, "bm25", documents=len(documents)):
+                query_terms = query.lower().split()
+                avg_doc_length = np.mean([len(doc.split()) for doc in documents])
+                bm25_scores = np.array([
+                    calculate_bm25_score(query_terms, doc, avg_doc_length) 
+                    for doc in documents
+                ])
+                # Normalize BM25 scores to [0, 1]
+                if bm25_scores.max() > 0:
+                    bm25_scores = bm25_scores / bm25_scores.max()
             tracker.end_operation("calculate_bm25")
 
         # Process documents
@@ -888,30 +1884,51 @@ def search_documents(
         
         logger.debug(f"Processing {len(metadatas)} documents")
         
-        # Get filename similar in batch
-        filenames = [m.get('filename', '') for m in metadatas] if metadatas else []
-        filename_similarities = np.array([_calculate_filename_similarity(query, f) for f in filenames]) if filenames else np.array([])
-        
-        # Combine semantic and BM25 scores if hybrid search is enabled
-        if use_hybrid_search and bm25_scores is not None:
-            # Hybrid score: weighted combination of semantic and keyword matching
-            combined_scores = (1 - bm25_weight) * semantic_similarities + bm25_weight * bm25_scores
-        else:
-            combined_scores = semantic_similarities
-        
-        # Apply filename boost if we have documents
-        if len(combined_scores) > 0 and len(filename_similarities) > 0:
-            boosted_scores = np.where(
-                filename_similarities >= filename_similarity_threshold,
-                np.minimum(1.0, combined_scores * filename_match_boost),
-                combined_scores
-            )
-        else:
-            boosted_scores = combined_scores
+        with _trace_stage(trace, "filename_boost") as stage:
+            # Get filename similar in batch
+            filenames = [m.get('filename', '') for m in metadatas] if metadatas else []
+            filename_similarities = np.array([_calculate_filename_similarity(query, f) for f in filenames]) if filenames else np.array([])
+            
+            # Files whose precomputed title or headings match the query count as filename matches
+            try:
+                title_scores = {m['filename']: m['score'] / 100.0 for m in lookup_titles(query, organization_id)}
+            except Exception as e:
+                logger.debug(f"Title lookup failed: {e}")
+                title_scores = {}
+            if title_scores and len(filename_similarities) > 0:
+                filename_similarities = np.maximum(
+                    filename_similarities,
+                    np.array([title_scores.get(f, 0.0) for f in filenames])
+                )
+                stage['title_matches'] = len(title_scores)
+            
+            # Combine semantic and BM25 scores if hybrid search is enabled
+            if use_hybrid_search and bm25_scores is not None:
+                # Hybrid score: weighted combination of semantic and keyword matching
+                combined_scores = (1 - bm25_weight) * semantic_similarities + bm25_weight * bm25_scores
+            else:
+                combined_scores = semantic_similarities
+            
+            # Apply filename boost if we have documents
+            if len(combined_scores) > 0 and len(filename_similarities) > 0:
+                boosted_scores = np.where(
+                    filename_similarities >= filename_similarity_threshold,
+                    np.minimum(1.0, combined_scores * filename_match_boost),
+                    combined_scores
+                )
+                stage['boosted'] = int((filename_similarities >= filename_similarity_threshold).sum())
+            else:
+                boosted_scores = combined_scores
         
         # Filter by minimum relevance
         relevant_indices = np.where(boosted_scores >= min_relevance_score)[0]
         results['stats']['total_checked'] = len(metadatas)
+        if trace is not None:
+            trace.count('relevance_filter', before=len(metadatas), after=len(relevant_indices))
+            relevant_set = set(int(i) for i in relevant_indices)
+            for idx, metadata in enumerate(metadatas):
+                if idx not in relevant_set:
+                    trace.decision(_trace_item(metadata), False, 'below_min_relevance', 'relevance_filter', boosted_scores[idx])
         
         # Process relevant documents
         for idx in relevant_indices:
@@ -959,6 +1976,8 @@ def search_documents(
         
         # Process top chunks
         semantic_results = []
+        kept_chunks = set()  # ids of chunks that made it into the results (explain mode)
+        capped_chunks = set()  # ids of chunks dropped by max_chunks_per_file (explain mode)
         for file_data in sorted_files:
             # Sort chunks by score in descending order
             sorted_chunks = sorted(
@@ -974,6 +1993,7 @@ def search_documents(
                     relevant_chunks.append(chunk)
                     if max_chunks_per_file and len(relevant_chunks) >= max_chunks_per_file:
                         break
+            capped_chunks.update(id(chunk) for chunk in sorted_chunks[len(relevant_chunks):])
             
             # Add relevant chunks to results with content length limit
             for chunk in relevant_chunks:
@@ -996,6 +2016,7 @@ def search_documents(
                     }
                 )
                 semantic_results.append((doc, chunk['score']))
+                kept_chunks.add(id(chunk))
                 results['stats']['semantic_matches'] += 1
                 
                 if len(semantic_results) >= max_results:
@@ -1006,40 +2027,61 @@ def search_documents(
         
         # Sort and store results
         semantic_results.sort(key=lambda x: x[1], reverse=True)
-        
-        # Group results by file and add full file content to each
-        file_content_cache = {}  # Cache to avoid retrieving same file multiple times
-        enhanced_results = []
-        
-        for doc, score in semantic_results:
-            file_id = doc.metadata.get('file_id')
-            filename = doc.metadata.get('filename')
-            source = doc.metadata.get('source')
-            
-            # Create a cache key
-            cache_key = f"{file_id}_{filename}_{source}"
-            
-            # Get full file content (use cache if available)
-            if cache_key not in file_content_cache:
-                if file_id or filename or source:
-                    file_data = get_full_file_content(
-                        file_id=file_id,
-                        filename=filename,
-                        source_path=source
-                    )
-                    if file_data and file_data.get('content'):
-                        file_content_cache[cache_key] = file_data['content']
+
+        if trace is not None:
+            for file_data in sorted_files:
+                for chunk in file_data['chunks']:
+                    if id(chunk) in kept_chunks:
+                        trace.decision(_trace_item(chunk['metadata']), True, 'ranked', 'ranking', chunk['score'])
+                    elif id(chunk) in capped_chunks:
+                        trace.decision(_trace_item(chunk['metadata']), False, 'max_chunks_per_file', 'ranking', chunk['score'])
                     else:
-                        file_content_cache[cache_key] = None
-                else:
-                    file_content_cache[cache_key] = None
-            
-            # Update document metadata with full file content
-            if file_content_cache[cache_key]:
-                doc.metadata['full_file_content'] = file_content_cache[cache_key]
-            
-            enhanced_results.append(doc)
+                        trace.decision(_trace_item(chunk['metadata']), False, 'max_results', 'ranking', chunk['score'])
+            trace.count('ranking', files=len(sorted_files), results=len(semantic_results))
         
+        # Expand each child chunk to its parent window (neighbouring chunks).
+        # Chunks indexed before windows existed fall back to the full file content.
+        with _trace_stage(trace, "content_loading", skipped=not load_context) as stage:
+            window_cache = {}  # Cache to avoid rebuilding the same window twice
+            file_content_cache = {}
+            enhanced_results = []
+
+            for doc, score in semantic_results:
+                if not load_context:
+                    enhanced_results.append(doc)
+                    continue
+
+                file_id = doc.metadata.get('file_id')
+                filename = doc.metadata.get('filename')
+                source = doc.metadata.get('source')
+                chunk_index = doc.metadata.get('chunk_index')
+
+                if file_id is not None and chunk_index is not None:
+                    window_key = (file_id, chunk_index)
+                    if window_key not in window_cache:
+                        window_cache[window_key] = get_parent_window(file_id, chunk_index)
+                    if window_cache[window_key]:
+                        doc.metadata['parent_window'] = window_cache[window_key]
+                        enhanced_results.append(doc)
+                        continue
+
+                if include_full_document and (file_id or filename or source):
+                    content_key = f"{file_id}_{filename}_{source}"
+                    if content_key not in file_content_cache:
+                        file_data = get_full_file_content(
+                            file_id=file_id,
+                            filename=filename,
+                            source_path=source
+                        )
+                        file_content_cache[content_key] = file_data['content'] if file_data and file_data.get('content') else None
+                    if file_content_cache[content_key]:
+                        doc.metadata['full_file_content'] = file_content_cache[content_key]
+
+                enhanced_results.append(doc)
+            if trace is not None:
+                stage['parent_windows'] = sum(1 for d in enhanced_results if d.metadata.get('parent_window'))
+                stage['full_files'] = sum(1 for d in enhanced_results if d.metadata.get('full_file_content'))
+
         results['semantic_results'] = enhanced_results
         
         # Update filename matches with limited chunks
@@ -1295,6 +2337,8 @@ def format_search_results_with_citations(
         
         if full_content:
             result_text += f"Complete Source Document:\n{'-'*70}\n{full_content}\n"
+        elif metadata.get('parent_window'):
+            result_text += f"Surrounding Section:\n{'-'*70}\n{metadata['parent_window']}\n"
         elif metadata.get('full_file_content'):
             # Check if full content is in metadata
             result_text += f"Complete Source Document:\n{'-'*70}\n{metadata['full_file_content']}\n"
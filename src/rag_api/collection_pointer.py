@@ -0,0 +1,149 @@
+"""
+Active Chroma collections for blue/green rebuilds. A full reindex builds
+into fresh versioned collections (e.g. documents_optimized_v1760000000)
+while the live ones keep serving, validates them, then flips the pointer
+file with one atomic rename. Every process re-reads the pointer when the
+file changes (checked at most every RAG_COLLECTION_POINTER_CHECK_INTERVAL
+seconds), so all API workers switch over without a restart. Collections
+retired by a flip are dropped once no process can still be reading them.
+Updates re-read the pointer under an flock on a sidecar file, so flips and
+cleanups from different processes never overwrite each other.
+"""
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL_SECONDS = float(os.getenv("RAG_COLLECTION_POINTER_CHECK_INTERVAL", "1"))
+
+
+def versioned_name(base: str) -> str:
+    """Name for a new build of a collection"""
+    return f"{base}_v{int(time.time() * 1000)}"
+
+
+class CollectionPointer:
+    def __init__(self, path: str, check_interval: float = CHECK_INTERVAL_SECONDS):
+        """
+        Args:
+            path: JSON file holding the active collection of every role
+            check_interval: Minimum seconds between checks for a flip by another process
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._state: Dict[str, Any] = {}
+        self._stamp: Optional[int] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def _file_stamp(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, force: bool = False, immediate: bool = False) -> bool:
+        """
+        Re-read the pointer if its file changed. Returns True when the active collections changed.
+
+        Args:
+            force: Re-read even if the file looks unchanged
+            immediate: Check the file now instead of at most every check_interval seconds
+        """
+        now = time.monotonic()
+        if not (force or immediate) and now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            stamp = self._file_stamp()
+            if stamp == self._stamp and not force:
+                return False
+            try:
+                state = self._read()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read collection pointer {self.path}: {e}")
+                return False
+            changed = state.get("active") != self._state.get("active")
+            self._state, self._stamp = state, stamp
+            return changed
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @contextmanager
+    def _updating(self):
+        """
+        Exclusive hold for a read-modify-write of the pointer, across threads
+        and processes. Yields the pointer as currently on disk.
+        """
+        with self._lock:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            with open(f"{self.path}.lock", "a+") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield self._read()
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def active(self, role: str, default: str) -> str:
+        """Collection currently serving a role ("documents", "summary")"""
+        return self._state.get("active", {}).get(role, default)
+
+    def retired(self) -> List[Dict[str, Any]]:
+        return list(self._state.get("retired", []))
+
+    def _write(self, state: Dict[str, Any]):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def flip(self, active: Dict[str, str], defaults: Dict[str, str]) -> Dict[str, str]:
+        """
+        Atomically make the given collections active.
+
+        Args:
+            active: New collection per role
+            defaults: Collection serving a role that has no pointer entry yet
+
+        Returns:
+            The collections retired by the flip, per role
+        """
+        with self._updating() as latest:
+            current = {role: latest.get("active", {}).get(role, defaults.get(role)) for role in active}
+            retired_now = {role: name for role, name in current.items() if name and name != active[role]}
+            state = {
+                "active": {**latest.get("active", {}), **active},
+                "retired": latest.get("retired", []) + [
+                    {"role": role, "name": name, "retired_at": time.time()} for role, name in retired_now.items()
+                ],
+                "flipped_at": time.time(),
+            }
+            self._write(state)
+            self._state, self._stamp = state, self._file_stamp()
+        logger.info(f"Active collections flipped to {active} (retired: {retired_now})")
+        return retired_now
+
+    def forget_retired(self, names: List[str]):
+        """Drop retired collections from the pointer once they are deleted"""
+        with self._updating() as latest:
+            state = dict(latest)
+            state["retired"] = [entry for entry in state.get("retired", []) if entry["name"] not in names]
+            self._write(state)
+            self._state, self._stamp = state, self._file_stamp()
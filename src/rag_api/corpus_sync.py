@@ -0,0 +1,97 @@
+"""
+Incremental corpus sync. Every stored document carries a SHA-256 content hash
+(document_store.content_hash) and every indexed one a document_manifest row
+with the hash that was indexed. A sync diffs the two per organization and
+only touches what changed:
+
+    added       stored, never indexed         -> index
+    modified    stored hash != indexed hash   -> replace vectors
+    deleted     indexed, no longer stored     -> delete vectors
+    unchanged                                 -> skipped
+
+The diff is two SQLite queries, so syncing an unchanged corpus is fast.
+Dry runs report the plan without touching the index.
+
+    python -m rag_api.corpus_sync --organization <org_id> [--dry-run]
+"""
+import logging
+import argparse
+from typing import Any, Callable, Dict, Optional
+
+from .db_utils import get_document_hashes, get_manifest_entries
+
+logger = logging.getLogger(__name__)
+
+
+def plan_sync(organization_id: str) -> Dict[str, Any]:
+    """Files of an organization to add, re-index and delete"""
+    stored = {row["id"]: row for row in get_document_hashes(organization_id)}
+    indexed = {row["file_id"]: row for row in get_manifest_entries(organization_id)}
+
+    plan = {"added": [], "modified": [], "deleted": [], "unchanged": 0}
+    for file_id, doc in stored.items():
+        entry = indexed.get(file_id)
+        if entry is None:
+            plan["added"].append({"file_id": file_id, "filename": doc["filename"], "file_size": doc["file_size"]})
+        elif entry["content_hash"] != doc["content_hash"]:
+            plan["modified"].append({"file_id": file_id, "filename": doc["filename"], "file_size": doc["file_size"],
+                                     "indexed_at": entry["indexed_at"]})
+        else:
+            plan["unchanged"] += 1
+    for file_id, entry in indexed.items():
+        if file_id not in stored:
+            plan["deleted"].append({"file_id": file_id, "filename": entry["filename"]})
+    return plan
+
+
+def run_sync(organization_id: str, dry_run: bool = False,
+             progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Bring an organization's index in line with document_store.
+
+    Returns:
+        The plan, plus the reindex results unless dry_run
+    """
+    plan = plan_sync(organization_id)
+    logger.info(f"Corpus sync for {organization_id}: {len(plan['added'])} added, {len(plan['modified'])} modified, "
+                f"{len(plan['deleted'])} deleted, {plan['unchanged']} unchanged{' (dry run)' if dry_run else ''}")
+    result = {"organization_id": organization_id, "dry_run": dry_run, "plan": plan}
+    if dry_run:
+        return result
+
+    from .chroma_utils import delete_doc_from_chroma
+    from .bulk_reindex import BulkReindexer
+
+    deleted_failed = []
+    for doc in plan["deleted"]:
+        if not delete_doc_from_chroma(doc["file_id"], organization_id=organization_id):
+            deleted_failed.append(doc)
+    result["deleted_failed"] = deleted_failed
+
+    items = [
+        {"file_id": doc["file_id"], "filename": doc["filename"], "organization_id": organization_id}
+        for doc in plan["added"] + plan["modified"]
+    ]
+    if items:
+        result["reindex"] = BulkReindexer(replace_existing=True, progress_callback=progress_callback).run(items)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental corpus sync")
+    parser.add_argument("--organization", required=True)
+    parser.add_argument("--dry-run", action="store_true", help="Only report the planned work")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_sync(args.organization, dry_run=args.dry_run)
+    plan = result["plan"]
+    for action in ("added", "modified", "deleted"):
+        for doc in plan[action]:
+            print(f"{action:>9}  {doc['file_id']:>8}  {doc['filename']}")
+    print(f"{'✅ Planned' if args.dry_run else '✅ Synced'}: {len(plan['added'])} added, {len(plan['modified'])} modified, "
+          f"{len(plan['deleted'])} deleted, {plan['unchanged']} unchanged")
+
+
+if __name__ == "__main__":
+    main()
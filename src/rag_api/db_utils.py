@@ -1,6 +1,11 @@
+import os
 import sqlite3
+import json
+import hashlib
 from datetime import datetime
 
+from .write_gate import index_write_gate
+
 DB_NAME = "rag_app.db"
 
 def get_db_connection():
@@ -41,11 +46,86 @@ def create_document_store():
 			conn.execute("ALTER TABLE document_store ADD COLUMN organization_id TEXT")
 		if "file_size" not in cols:
 			conn.execute("ALTER TABLE document_store ADD COLUMN file_size INTEGER")
+		if "content_hash" not in cols:
+			conn.execute("ALTER TABLE document_store ADD COLUMN content_hash TEXT")
 		conn.commit()
 	except Exception:
 		pass
 	conn.close()
 
+def create_document_manifest():
+	conn = get_db_connection()
+	# What is indexed for each stored document, so syncs only touch changed files
+	conn.execute('''CREATE TABLE IF NOT EXISTS document_manifest
+				   (file_id INTEGER PRIMARY KEY,
+					filename TEXT NOT NULL,
+					organization_id TEXT,
+					content_hash TEXT NOT NULL,
+					chunk_count INTEGER,
+					indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+	conn.execute('CREATE INDEX IF NOT EXISTS idx_document_manifest_org ON document_manifest (organization_id)')
+	conn.commit()
+	conn.close()
+
+def content_hash(content_bytes):
+	return hashlib.sha256(content_bytes or b"").hexdigest()
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+	digest = hashlib.sha256()
+	with open(file_path, 'rb') as f:
+		for block in iter(lambda: f.read(chunk_size), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+def create_document_chunks():
+	conn = get_db_connection()
+	# Child chunks of every indexed file, used to rebuild parent windows at query time
+	conn.execute('''CREATE TABLE IF NOT EXISTS document_chunks
+				   (file_id INTEGER NOT NULL,
+					chunk_index INTEGER NOT NULL,
+					segment_index INTEGER,
+					chunk_start INTEGER,
+					chunk_end INTEGER,
+					content TEXT,
+					vector_id TEXT,
+					PRIMARY KEY (file_id, chunk_index))''')
+	# Backfill columns if missing
+	try:
+		cursor = conn.execute("PRAGMA table_info(document_chunks)")
+		cols = {row[1] for row in cursor.fetchall()}
+		if "vector_id" not in cols:
+			conn.execute("ALTER TABLE document_chunks ADD COLUMN vector_id TEXT")
+	except Exception:
+		pass
+	conn.commit()
+	conn.close()
+
+def create_document_titles():
+	conn = get_db_connection()
+	# Titles, headings and section outlines extracted once at ingest time
+	conn.execute('''CREATE TABLE IF NOT EXISTS document_titles
+				   (file_id INTEGER PRIMARY KEY,
+					filename TEXT NOT NULL,
+					organization_id TEXT,
+					title TEXT,
+					headings TEXT,
+					outline TEXT,
+					updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+	conn.execute('CREATE INDEX IF NOT EXISTS idx_document_titles_org ON document_titles (organization_id)')
+	conn.execute('CREATE INDEX IF NOT EXISTS idx_document_titles_title ON document_titles (title)')
+	conn.execute('CREATE INDEX IF NOT EXISTS idx_document_titles_filename ON document_titles (filename)')
+	# Bumped by every change to document_titles, so each process can tell its cached title index is stale
+	conn.execute('''CREATE TABLE IF NOT EXISTS document_titles_generation
+				   (id INTEGER PRIMARY KEY CHECK (id = 0),
+					generation INTEGER NOT NULL)''')
+	conn.execute('INSERT OR IGNORE INTO document_titles_generation (id, generation) VALUES (0, 0)')
+	for event in ('INSERT', 'UPDATE', 'DELETE'):
+		conn.execute(f'''CREATE TRIGGER IF NOT EXISTS document_titles_generation_{event.lower()}
+					   AFTER {event} ON document_titles
+					   BEGIN UPDATE document_titles_generation SET generation = generation + 1 WHERE id = 0; END''')
+	conn.commit()
+	conn.close()
+
 def insert_application_logs(session_id, user_query, gpt_response, model):
 	conn = get_db_connection()
 	conn.execute('INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES (?, ?, ?, ?)',
@@ -66,6 +146,7 @@ def get_chat_history(session_id):
 	conn.close()
 	return messages
 
+@index_write_gate.writer
 def insert_document_record(filename, content_bytes=None, organization_id=None):
 	conn = get_db_connection()
 	cursor = conn.cursor()
@@ -76,14 +157,41 @@ def insert_document_record(filename, content_bytes=None, organization_id=None):
 		content_bytes = b""
 	file_size = len(content_bytes)
 	cursor.execute(
-		'INSERT INTO document_store (filename, content, organization_id, file_size) VALUES (?, ?, ?, ?)',
-		(filename, content_bytes, organization_id, file_size)
+		'INSERT INTO document_store (filename, content, organization_id, file_size, content_hash) VALUES (?, ?, ?, ?, ?)',
+		(filename, content_bytes, organization_id, file_size, content_hash(content_bytes))
 	)
 	file_id = cursor.lastrowid
 	conn.commit()
 	conn.close()
 	return file_id
 	
+@index_write_gate.writer
+def insert_document_record_from_file(filename, file_path, organization_id=None, chunk_size=1024 * 1024):
+	"""Insert a document whose content is streamed from a file into the BLOB, never held in memory whole"""
+	if isinstance(filename, bytes):
+		filename = filename.decode('utf-8', errors='replace')
+	file_size = os.path.getsize(file_path)
+	conn = get_db_connection()
+	cursor = conn.cursor()
+	cursor.execute(
+		'INSERT INTO document_store (filename, content, organization_id, file_size) VALUES (?, zeroblob(?), ?, ?)',
+		(filename, file_size, organization_id, file_size)
+	)
+	file_id = cursor.lastrowid
+	digest = hashlib.sha256()
+	if file_size:
+		with conn.blobopen('document_store', 'content', file_id) as blob, open(file_path, 'rb') as f:
+			while True:
+				data = f.read(chunk_size)
+				if not data:
+					break
+				blob.write(data)
+				digest.update(data)
+	cursor.execute('UPDATE document_store SET content_hash = ? WHERE id = ?', (digest.hexdigest(), file_id))
+	conn.commit()
+	conn.close()
+	return file_id
+
 def get_file_content_by_filename(filename, organization_id=None):
 	conn = get_db_connection()
 	cursor = conn.cursor()
@@ -100,6 +208,18 @@ def get_file_content_by_filename(filename, organization_id=None):
 		return row['content']
 	return None
 
+def get_document_info_by_filename(filename, organization_id=None):
+	"""Document metadata (no content) by filename"""
+	conn = get_db_connection()
+	cursor = conn.cursor()
+	if organization_id:
+		cursor.execute('SELECT id, filename, upload_timestamp, organization_id, file_size FROM document_store WHERE filename = ? AND organization_id = ?', (filename, organization_id))
+	else:
+		cursor.execute('SELECT id, filename, upload_timestamp, organization_id, file_size FROM document_store WHERE filename = ?', (filename,))
+	row = cursor.fetchone()
+	conn.close()
+	return dict(row) if row else None
+
 def get_file_content_by_id(file_id, organization_id=None):
 	conn = get_db_connection()
 	cursor = conn.cursor()
@@ -113,6 +233,7 @@ def get_file_content_by_id(file_id, organization_id=None):
 		return {'content': row['content'], 'filename': row['filename']}
 	return None
 
+@index_write_gate.writer
 def delete_document_record(file_id):
     try:
         conn = get_db_connection()
@@ -127,8 +248,10 @@ def delete_document_record(file_id):
             conn.close()
             return True  # Consider successful if nothing to delete
         
-        # Delete the document
+        # Delete the document and its stored chunks
         cursor.execute('DELETE FROM document_store WHERE id = ?', (file_id,))
+        cursor.execute('DELETE FROM document_chunks WHERE file_id = ?', (file_id,))
+        cursor.execute('DELETE FROM document_titles WHERE file_id = ?', (file_id,))
         conn.commit()
         conn.close()
         print(f"Successfully deleted document with file_id {file_id} from database")
@@ -176,6 +299,7 @@ def get_all_documents(organization_id=None, include_content=False):
 	conn.close()
 	return [dict(doc) for doc in documents]
 
+@index_write_gate.writer
 def update_document_record(filename, new_content_bytes, organization_id=None):
 	conn = get_db_connection()
 	cursor = conn.cursor()
@@ -194,13 +318,276 @@ def update_document_record(filename, new_content_bytes, organization_id=None):
 		conn.close()
 		return []
 	file_ids = [row['id'] for row in rows]
+	new_hash = content_hash(new_content_bytes)
 	if organization_id:
-		cursor.execute('UPDATE document_store SET content = ?, file_size = ? WHERE filename = ? AND organization_id = ?', (new_content_bytes, file_size, filename, organization_id))
+		cursor.execute('UPDATE document_store SET content = ?, file_size = ?, content_hash = ? WHERE filename = ? AND organization_id = ?', (new_content_bytes, file_size, new_hash, filename, organization_id))
 	else:
-		cursor.execute('UPDATE document_store SET content = ?, file_size = ? WHERE filename = ?', (new_content_bytes, file_size, filename))
+		cursor.execute('UPDATE document_store SET content = ?, file_size = ?, content_hash = ? WHERE filename = ?', (new_content_bytes, file_size, new_hash, filename))
 	conn.commit()
 	conn.close()
 	return file_ids
 
+def replace_document_chunks(file_id, chunks):
+	"""Replace the stored chunks of a file with the given LangChain Documents"""
+	conn = get_db_connection()
+	conn.execute('DELETE FROM document_chunks WHERE file_id = ?', (file_id,))
+	_insert_document_chunks(conn, file_id, chunks)
+	conn.commit()
+	conn.close()
+
+def append_document_chunks(file_id, chunks):
+	"""Add chunks of a file being indexed in batches"""
+	conn = get_db_connection()
+	_insert_document_chunks(conn, file_id, chunks)
+	conn.commit()
+	conn.close()
+
+def _insert_document_chunks(conn, file_id, chunks):
+	conn.executemany(
+		'INSERT INTO document_chunks (file_id, chunk_index, segment_index, chunk_start, chunk_end, content, vector_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+		[
+			(
+				file_id,
+				chunk.metadata.get('chunk_index', i),
+				chunk.metadata.get('segment_index'),
+				chunk.metadata.get('chunk_start'),
+				chunk.metadata.get('chunk_end'),
+				chunk.page_content,
+				chunk.metadata.get('vector_id')
+			)
+			for i, chunk in enumerate(chunks)
+		]
+	)
+
+def get_document_chunks(file_id, start_index=None, end_index=None):
+	conn = get_db_connection()
+	cursor = conn.cursor()
+	if start_index is None or end_index is None:
+		cursor.execute('SELECT * FROM document_chunks WHERE file_id = ? ORDER BY chunk_index', (file_id,))
+	else:
+		cursor.execute(
+			'SELECT * FROM document_chunks WHERE file_id = ? AND chunk_index BETWEEN ? AND ? ORDER BY chunk_index',
+			(file_id, start_index, end_index)
+		)
+	rows = cursor.fetchall()
+	conn.close()
+	return [dict(row) for row in rows]
+
+def get_chunk_vector_ids(file_id):
+	"""Chroma IDs of a file's chunks, or None if any chunk was indexed before IDs were recorded"""
+	conn = get_db_connection()
+	rows = conn.execute('SELECT vector_id FROM document_chunks WHERE file_id = ? ORDER BY chunk_index', (file_id,)).fetchall()
+	conn.close()
+	if not rows or any(row['vector_id'] is None for row in rows):
+		return None
+	return [row['vector_id'] for row in rows]
+
+def delete_document_chunks(file_id):
+	conn = get_db_connection()
+	conn.execute('DELETE FROM document_chunks WHERE file_id = ?', (file_id,))
+	conn.commit()
+	conn.close()
+
+def upsert_document_title(file_id, filename, organization_id, title, headings, outline):
+	"""Store the extracted title, headings and outline (lists, stored as JSON) of a file"""
+	conn = get_db_connection()
+	conn.execute(
+		'''INSERT OR REPLACE INTO document_titles (file_id, filename, organization_id, title, headings, outline, updated_at)
+		   VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)''',
+		(file_id, filename, organization_id, title, json.dumps(headings, ensure_ascii=False), json.dumps(outline, ensure_ascii=False))
+	)
+	conn.commit()
+	conn.close()
+
+def get_document_titles(organization_id=None):
+	"""Get stored titles; with an organization, its documents plus legacy ones without an organization"""
+	conn = get_db_connection()
+	cursor = conn.cursor()
+	if organization_id:
+		cursor.execute(
+			"SELECT * FROM document_titles WHERE organization_id = ? OR organization_id IS NULL OR organization_id = ''",
+			(organization_id,)
+		)
+	else:
+		cursor.execute('SELECT * FROM document_titles')
+	rows = cursor.fetchall()
+	conn.close()
+	titles = []
+	for row in rows:
+		entry = dict(row)
+		entry['headings'] = json.loads(entry['headings']) if entry.get('headings') else []
+		entry['outline'] = json.loads(entry['outline']) if entry.get('outline') else []
+		titles.append(entry)
+	return titles
+
+def get_document_titles_generation():
+	"""Counter bumped by every change to document_titles, in any process"""
+	conn = get_db_connection()
+	row = conn.execute('SELECT generation FROM document_titles_generation WHERE id = 0').fetchone()
+	conn.close()
+	return row['generation'] if row else 0
+
+def delete_document_title(file_id):
+	conn = get_db_connection()
+	conn.execute('DELETE FROM document_titles WHERE file_id = ?', (file_id,))
+	conn.commit()
+	conn.close()
+
+def create_indexing_jobs():
+	conn = get_db_connection()
+	# Durable queue of uploaded files waiting to be parsed, chunked and embedded
+	conn.execute('''CREATE TABLE IF NOT EXISTS indexing_jobs
+				   (id TEXT PRIMARY KEY,
+					file_id INTEGER NOT NULL,
+					filename TEXT NOT NULL,
+					organization_id TEXT,
+					file_path TEXT NOT NULL,
+					metadata TEXT,
+					status TEXT NOT NULL DEFAULT 'queued',
+					priority INTEGER NOT NULL DEFAULT 0,
+					attempts INTEGER NOT NULL DEFAULT 0,
+					max_attempts INTEGER NOT NULL DEFAULT 3,
+					available_at REAL NOT NULL DEFAULT 0,
+					claimed_by TEXT,
+					error TEXT,
+					created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+					started_at TIMESTAMP,
+					finished_at TIMESTAMP)''')
+	conn.execute('CREATE INDEX IF NOT EXISTS idx_indexing_jobs_queue ON indexing_jobs (status, priority, available_at)')
+	conn.commit()
+	conn.close()
+
+def insert_indexing_job(job_id, file_id, filename, file_path, organization_id=None, priority=0, max_attempts=3, metadata=None):
+	conn = get_db_connection()
+	conn.execute('''INSERT INTO indexing_jobs
+					(id, file_id, filename, organization_id, file_path, metadata, priority, max_attempts)
+					VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+				 (job_id, file_id, filename, organization_id, file_path,
+				  json.dumps(metadata) if metadata else None, priority, max_attempts))
+	conn.commit()
+	conn.close()
+
+def claim_indexing_job(worker, now):
+	"""Atomically mark the next runnable job as running; one running job per file"""
+	conn = get_db_connection()
+	try:
+		conn.execute('BEGIN IMMEDIATE')
+		row = conn.execute('''SELECT * FROM indexing_jobs AS job
+							   WHERE status = 'queued' AND available_at <= ?
+							   AND NOT EXISTS (SELECT 1 FROM indexing_jobs AS other
+											   WHERE other.status = 'running'
+											   AND other.filename = job.filename
+											   AND IFNULL(other.organization_id, '') = IFNULL(job.organization_id, ''))
+							   ORDER BY priority DESC, created_at, rowid
+							   LIMIT 1''', (now,)).fetchone()
+		if row is None:
+			conn.commit()
+			return None
+		conn.execute('''UPDATE indexing_jobs
+						SET status = 'running', attempts = attempts + 1, claimed_by = ?,
+							started_at = ?, error = NULL
+						WHERE id = ?''', (worker, datetime.now().isoformat(), row['id']))
+		conn.commit()
+		job = dict(row)
+		job['attempts'] += 1
+		job['metadata'] = json.loads(job['metadata']) if job.get('metadata') else None
+		return job
+	finally:
+		conn.close()
+
+def finish_indexing_job(job_id, status, error=None, retry_at=None):
+	"""Record a job's outcome; with retry_at the job goes back to the queue"""
+	conn = get_db_connection()
+	if retry_at is not None:
+		conn.execute('''UPDATE indexing_jobs SET status = 'queued', available_at = ?, error = ?, claimed_by = NULL
+						WHERE id = ?''', (retry_at, error, job_id))
+	else:
+		conn.execute('''UPDATE indexing_jobs SET status = ?, error = ?, finished_at = ?
+						WHERE id = ?''', (status, error, datetime.now().isoformat(), job_id))
+	conn.commit()
+	conn.close()
+
+def get_indexing_job(job_id):
+	conn = get_db_connection()
+	row = conn.execute('SELECT * FROM indexing_jobs WHERE id = ?', (job_id,)).fetchone()
+	conn.close()
+	if row is None:
+		return None
+	job = dict(row)
+	job['metadata'] = json.loads(job['metadata']) if job.get('metadata') else None
+	return job
+
+def get_running_indexing_jobs():
+	conn = get_db_connection()
+	rows = conn.execute("SELECT id, claimed_by FROM indexing_jobs WHERE status = 'running'").fetchall()
+	conn.close()
+	return [dict(row) for row in rows]
+
+def requeue_indexing_job(job_id):
+	conn = get_db_connection()
+	conn.execute("UPDATE indexing_jobs SET status = 'queued', claimed_by = NULL WHERE id = ? AND status = 'running'", (job_id,))
+	conn.commit()
+	conn.close()
+
+def count_indexing_jobs():
+	conn = get_db_connection()
+	rows = conn.execute('SELECT status, COUNT(*) FROM indexing_jobs GROUP BY status').fetchall()
+	conn.close()
+	return {row[0]: row[1] for row in rows}
+
+def upsert_manifest_entry(file_id, filename, organization_id, content_hash, chunk_count=None):
+	conn = get_db_connection()
+	conn.execute(
+		'''INSERT OR REPLACE INTO document_manifest (file_id, filename, organization_id, content_hash, chunk_count, indexed_at)
+		   VALUES (?, ?, ?, ?, ?, ?)''',
+		(file_id, filename, organization_id, content_hash, chunk_count, datetime.now().isoformat())
+	)
+	conn.commit()
+	conn.close()
+
+def delete_manifest_entry(file_id):
+	conn = get_db_connection()
+	conn.execute('DELETE FROM document_manifest WHERE file_id = ?', (file_id,))
+	conn.commit()
+	conn.close()
+
+def get_manifest_entries(organization_id):
+	conn = get_db_connection()
+	rows = conn.execute(
+		'SELECT file_id, filename, organization_id, content_hash, chunk_count, indexed_at FROM document_manifest WHERE organization_id = ?',
+		(organization_id,)
+	).fetchall()
+	conn.close()
+	return [dict(row) for row in rows]
+
+def get_document_hashes(organization_id):
+	"""id, filename and content hash of an organization's stored documents; hashes missing on legacy rows are computed and saved"""
+	return _document_hashes('WHERE organization_id = ?', (organization_id,))
+
+def get_all_document_hashes():
+	"""get_document_hashes for the stored documents of every organization"""
+	return _document_hashes('', ())
+
+def _document_hashes(where, params):
+	conn = get_db_connection()
+	rows = [dict(row) for row in conn.execute(
+		f'SELECT id, filename, organization_id, file_size, content_hash FROM document_store {where}',
+		params
+	).fetchall()]
+	for row in rows:
+		if row['content_hash'] is None:
+			content = conn.execute('SELECT content FROM document_store WHERE id = ?', (row['id'],)).fetchone()['content']
+			if isinstance(content, str):
+				content = content.encode('utf-8')
+			row['content_hash'] = content_hash(content)
+			conn.execute('UPDATE document_store SET content_hash = ? WHERE id = ?', (row['content_hash'], row['id']))
+	conn.commit()
+	conn.close()
+	return rows
+
 create_application_logs()
 create_document_store()
+create_document_chunks()
+create_document_titles()
+create_indexing_jobs()
+create_document_manifest()
@@ -1,10 +1,20 @@
-"""Custom document loaders for handling various file formats."""
+"""Custom document loaders for handling various file formats.
 
+Loaders accept a path, the file's bytes or a binary stream, so uploads are
+parsed without being written to disk first. Archive entries larger than
+RAG_LOADER_SPOOL_BYTES are spooled to anonymous temporary files; a named
+temporary file is only created for fallback parsers that accept nothing but
+a path.
+"""
+
+import io
 import os
+import shutil
 import zipfile
 import tempfile
 import logging
-from typing import List, Optional, Dict, Any
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Dict, Any, Union
 from langchain_core.documents import Document
 from langchain_community.document_loaders import (
     PyPDFLoader,
@@ -15,53 +25,117 @@ from langchain_community.document_loaders import (
 )
 from langchain.document_loaders.base import BaseLoader
 
+# A file path, the file's bytes, or a seekable binary stream over them
+DocumentSource = Union[str, bytes, BinaryIO]
+
+SPOOL_THRESHOLD_BYTES = int(os.getenv("RAG_LOADER_SPOOL_BYTES", str(16 * 1024 * 1024)))
+
+
+@contextmanager
+def open_source(source: DocumentSource) -> Iterator[BinaryIO]:
+    """Binary stream over a source, positioned at its start"""
+    if isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+
+@contextmanager
+def source_path(source: DocumentSource, suffix: str) -> Iterator[str]:
+    """A filesystem path for parsers that accept nothing else, removed afterwards"""
+    if isinstance(source, str):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp, open_source(source) as stream:
+        shutil.copyfileobj(stream, tmp)
+        tmp.flush()
+        yield tmp.name
+
+
 class EnhancedPDFLoader(UnstructuredPDFLoader):
     """Enhanced PDF loader with better text extraction and metadata handling."""
-    
-    def __init__(self, file_path: str, **kwargs):
+
+    def __init__(self, file_path: str, source: Optional[DocumentSource] = None, **kwargs):
+        """
+        Args:
+            file_path: Path of the PDF, or its name when source is given
+            source: Bytes or stream of the PDF (default: read file_path)
+        """
         super().__init__(file_path, **kwargs)
+        self.source = file_path if source is None else source
         try:
             import pdfplumber  # Better PDF text extraction
             self.use_pdfplumber = True
         except ImportError:
             self.use_pdfplumber = False
             logging.warning("pdfplumber not installed, falling back to basic PDF extraction")
-    
-    def load(self) -> List[Document]:
-        """Load PDF with enhanced extraction if possible."""
+
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        Yield pages one at a time. Each page's parsed objects are released
+        before the next page is read, so memory does not grow with page count.
+        """
         if self.use_pdfplumber:
+            import pdfplumber
+            yielded = False
             try:
-                docs = []
-                with pdfplumber.open(self.file_path) as pdf:
+                with open_source(self.source) as stream, pdfplumber.open(stream) as pdf:
+                    total_pages = len(pdf.pages)
                     for i, page in enumerate(pdf.pages):
-                        text = page.extract_text()
+                        text = page.extract_text() or ""
+                        metadata = {
+                            "source": self.file_path,
+                            "page": i + 1,
+                            "total_pages": total_pages,
+                            "pdf_width": page.width,
+                            "pdf_height": page.height,
+                        }
+                        # Drop the page's cached layout objects before moving on
+                        if hasattr(page, "close"):
+                            page.close()
+                        else:
+                            page.flush_cache()
                         if text.strip():  # Skip empty pages
-                            metadata = {
-                                "source": self.file_path,
-                                "page": i + 1,
-                                "total_pages": len(pdf.pages),
-                                "pdf_width": page.width,
-                                "pdf_height": page.height,
-                            }
-                            docs.append(Document(page_content=text, metadata=metadata))
-                return docs
+                            yielded = True
+                            yield Document(page_content=text, metadata=metadata)
+                return
             except Exception as e:
+                if yielded:
+                    raise
                 logging.warning(f"pdfplumber extraction failed, falling back: {str(e)}")
-        
-        return super().load()
+
+        name = self.file_path
+        with source_path(self.source, ".pdf") as path:
+            self.file_path = path
+            try:
+                for doc in super().lazy_load():
+                    doc.metadata["source"] = name
+                    yield doc
+            finally:
+                self.file_path = name
+
+    def load(self) -> List[Document]:
+        """Load PDF with enhanced extraction if possible."""
+        return list(self.lazy_load())
 
 class EnhancedDocxLoader(UnstructuredWordDocumentLoader):
     """Enhanced DOCX loader with better metadata extraction."""
-    
-    def __init__(self, file_path: str, **kwargs):
+
+    def __init__(self, file_path: str, source: Optional[DocumentSource] = None, **kwargs):
         super().__init__(file_path, **kwargs)
-        
+        self.source = file_path if source is None else source
+
     def load(self) -> List[Document]:
         """Load DOCX with enhanced metadata extraction."""
         try:
             from docx import Document as DocxDocument
-            doc = DocxDocument(self.file_path)
-            
+            with open_source(self.source) as stream:
+                doc = DocxDocument(stream)
+
             # Extract document properties
             core_properties = doc.core_properties
             metadata = {
@@ -74,139 +148,159 @@ class EnhancedDocxLoader(UnstructuredWordDocumentLoader):
                 "revision": core_properties.revision,
                 "word_count": len(doc.paragraphs)
             }
-            
+
             # Get full text content
             full_text = "\n".join(paragraph.text for paragraph in doc.paragraphs)
-            
+
             return [Document(page_content=full_text, metadata=metadata)]
-            
+
         except ImportError:
             logging.warning("python-docx not installed, falling back to basic DOCX extraction")
-            return super().load()
+            name = self.file_path
+            with source_path(self.source, os.path.splitext(name)[1] or ".docx") as path:
+                self.file_path = path
+                try:
+                    docs = super().load()
+                finally:
+                    self.file_path = name
+            for doc in docs:
+                doc.metadata["source"] = name
+            return docs
+
+def load_html(source: DocumentSource, name: str) -> List[Document]:
+    """Load an HTML file as one document"""
+    if isinstance(source, str):
+        return UnstructuredHTMLLoader(source).load()
+    from unstructured.partition.html import partition_html
+    with open_source(source) as stream:
+        elements = partition_html(file=stream)
+    return [Document(page_content="\n\n".join(str(el) for el in elements), metadata={"source": name})]
+
+def load_text(source: DocumentSource, name: str) -> List[Document]:
+    """Load a UTF-8 text or markdown file as one document"""
+    with open_source(source) as stream:
+        text = stream.read().decode('utf-8')
+    return [Document(page_content=text, metadata={"source": name})]
+
+def load_source(source: DocumentSource, filename: str) -> List[Document]:
+    """
+    Load the raw (unchunked) documents of a file with the loader for its type.
+
+    Args:
+        source: Path, bytes or binary stream of the file
+        filename: Name of the file; selects the loader and is the "source" of non-path documents
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    name = source if isinstance(source, str) else filename
+
+    if ext == '.zip':
+        return ZIPLoader(name, source=source).load()
+    elif ext == '.pdf':
+        return EnhancedPDFLoader(name, source=source).load()
+    elif ext in ['.docx', '.doc']:
+        return EnhancedDocxLoader(name, source=source).load()
+    elif ext == '.html':
+        return load_html(source, name)
+    elif ext in ['.txt', '.md']:
+        return load_text(source, name)
+    raise ValueError(f"Unsupported file type: {ext}")
 
 class ZIPLoader(BaseLoader):
-    """Loader that handles ZIP files by extracting and loading contained documents."""
-    
+    """Loader that handles ZIP files by reading the contained documents from the archive."""
+
     def __init__(
         self,
         file_path: str,
         allowed_extensions: Optional[List[str]] = None,
-        max_files: int = 100
+        max_files: Optional[int] = None,
+        source: Optional[DocumentSource] = None
     ):
         """Initialize the ZIP loader.
-        
+
         Args:
-            file_path: Path to the ZIP file
+            file_path: Path to the ZIP file, or its name when source is given
             allowed_extensions: List of allowed file extensions (e.g. ['.pdf', '.docx'])
-            max_files: Maximum number of files to process from the ZIP
+            max_files: Maximum number of supported files in the ZIP (default: RAG_ZIP_MAX_ENTRIES)
+            source: Bytes or stream of the archive (default: read file_path)
         """
+        from .zip_ingest import MAX_ENTRIES
+
         self.file_path = file_path
+        self.source = file_path if source is None else source
         self.allowed_extensions = allowed_extensions or ['.pdf', '.docx', '.doc', '.txt', '.md', '.html']
-        self.max_files = max_files
+        self.max_files = max_files or MAX_ENTRIES
         self.logger = logging.getLogger(__name__)
-    
+
     def load(self) -> List[Document]:
-        """Extract and load documents from the ZIP file."""
+        """Load documents from the ZIP file's entries without extracting it.
+
+        Raises:
+            ZipBombError: If the archive decompresses to more than RAG_ZIP_MAX_TOTAL_BYTES
+        """
+        from .zip_ingest import ArchiveBudget, ZipBombError, select_entries
+
         documents = []
         archive_filename = os.path.basename(self.file_path)
-        
+
         self.logger.info(f"Starting ZIP archive processing: {archive_filename}")
         self.logger.info(f"Archive path: {self.file_path}")
-        
-        extracted_count = 0
+
         processed_count = 0
-        skipped_count = 0
-        
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Extract ZIP contents
-            try:
-                with zipfile.ZipFile(self.file_path, 'r') as zip_ref:
-                    # Log total files in archive
-                    total_files_in_zip = len(zip_ref.filelist)
-                    self.logger.info(f"Total files in archive: {total_files_in_zip}")
-                    
-                    # Filter files by extension and limit
-                    files_to_extract = []
-                    for file_info in zip_ref.filelist:
-                        if len(files_to_extract) >= self.max_files:
-                            self.logger.warning(f"Reached max file limit of {self.max_files}, stopping extraction")
-                            break
-                        if any(file_info.filename.lower().endswith(ext) for ext in self.allowed_extensions):
-                            files_to_extract.append(file_info.filename)
-                    
-                    self.logger.info(f"Files to extract: {len(files_to_extract)} (Allowed extensions: {', '.join(self.allowed_extensions)})")
-                    
-                    # Extract selected files
-                    zip_ref.extractall(temp_dir, members=files_to_extract)
-                    extracted_count = len(files_to_extract)
-                    self.logger.info(f"Successfully extracted {extracted_count} files to temporary directory")
-                    
-                    # Log extracted files
-                    for file_name in files_to_extract:
-                        self.logger.debug(f"Extracted: {file_name}")
-            
-            except zipfile.BadZipFile as e:
-                self.logger.error(f"Invalid ZIP file: {archive_filename} - {str(e)}")
-                raise
-            except Exception as e:
-                self.logger.error(f"Error extracting ZIP archive {archive_filename}: {str(e)}")
-                raise
-            
-            # Process each extracted file
-            for root, _, files in os.walk(temp_dir):
-                for filename in files:
-                    file_path = os.path.join(root, filename)
+
+        try:
+            with open_source(self.source) as stream, zipfile.ZipFile(stream, 'r') as zip_ref:
+                # Log total files in archive
+                total_files_in_zip = len(zip_ref.filelist)
+                self.logger.info(f"Total files in archive: {total_files_in_zip}")
+
+                selected, skipped = select_entries(zip_ref, self.allowed_extensions, max_entries=self.max_files)
+                for entry in skipped:
+                    self.logger.debug(f"Skipping {entry['entry']}: {entry['reason']}")
+                budget = ArchiveBudget()
+
+                for file_info, entry_name in selected:
+                    filename = os.path.basename(entry_name)
                     ext = os.path.splitext(filename)[1].lower()
-                    
                     try:
-                        self.logger.info(f"Processing extracted file: {filename} (Type: {ext})")
-                        
-                        if ext == '.pdf':
-                            loader = EnhancedPDFLoader(file_path)
-                        elif ext in ['.docx', '.doc']:
-                            loader = EnhancedDocxLoader(file_path)
-                        elif ext == '.html':
-                            loader = UnstructuredHTMLLoader(file_path)
-                        elif ext in ['.txt', '.md']:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                docs = [Document(
-                                    page_content=f.read(),
-                                    metadata={"source": f"zip://{self.file_path}/{filename}"}
-                                )]
-                        else:
-                            self.logger.debug(f"Skipping unsupported file type: {filename}")
-                            skipped_count += 1
-                            continue
-                        
-                        if not 'docs' in locals():
-                            docs = loader.load()
-                        
+                        self.logger.info(f"Processing archive entry: {entry_name} (Type: {ext})")
+
+                        # Small entries are read into memory, large ones spooled
+                        sink = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD_BYTES)
+                        docs = load_source(budget.read_entry(zip_ref, file_info, sink), filename)
+
                         # Update metadata to indicate ZIP source
                         for doc in docs:
+                            doc.metadata["source"] = f"zip://{self.file_path}/{entry_name}"
                             doc.metadata["archive_source"] = self.file_path
                             doc.metadata["archive_filename"] = archive_filename
                             doc.metadata["archive_path"] = filename
-                        
+
                         chunk_count = len(docs)
                         documents.extend(docs)
                         processed_count += 1
-                        
+
                         self.logger.info(f"✓ Processed {filename}: {chunk_count} document(s) loaded from archive")
-                        
+
+                    except ZipBombError:
+                        raise
                     except Exception as e:
                         self.logger.error(f"Error processing {filename} from ZIP {archive_filename}: {str(e)}")
-                        continue
-        
+
+        except zipfile.BadZipFile as e:
+            self.logger.error(f"Invalid ZIP file: {archive_filename} - {str(e)}")
+            raise
+
         # Log summary
         self.logger.info(f"ZIP PROCESSING SUMMARY for {archive_filename}")
-        self.logger.info(f"  - Extracted files: {extracted_count}")
+        self.logger.info(f"  - Selected files: {len(selected)}")
         self.logger.info(f"  - Successfully processed: {processed_count}")
-        self.logger.info(f"  - Skipped files: {skipped_count}")
+        self.logger.info(f"  - Skipped files: {len(skipped)}")
         self.logger.info(f"  - Total documents loaded: {len(documents)}")
         self.logger.info(f"Archive {archive_filename} processing complete")
-        
+
         return documents
 
 # Example usage:
 # zip_loader = ZIPLoader("documents.zip")
-# documents = zip_loader.load()
\ No newline at end of file
+# documents = zip_loader.load()
+# documents = load_source(uploaded_bytes, "report.pdf")
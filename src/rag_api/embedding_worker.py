@@ -0,0 +1,281 @@
+"""
+Shared embedding worker: one process holds the embedding model and serves
+every API worker over a Unix socket, micro-batching concurrent requests from
+all of them into single model calls.
+
+Run the worker, then point the API workers at it:
+
+    cd src && python -m rag_api.embedding_worker --socket /tmp/graphtalk-embed.sock
+    RAG_EMBEDDING_WORKER_SOCKET=/tmp/graphtalk-embed.sock RAG_API_WORKERS=4 python main.py
+
+Wire format: each frame is a 4-byte big-endian length followed by an orjson
+object. Requests are {"id", "op": "embed"|"ping", "texts": [...]}, responses
+{"id", "embeddings": [...]} or {"id", "error": "..."}.
+"""
+import os
+import socket
+import struct
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+import orjson
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Socket of a running worker; when set, API processes embed remotely
+EMBEDDING_WORKER_SOCKET = os.getenv("RAG_EMBEDDING_WORKER_SOCKET")
+# A batch is flushed when it reaches this many texts ...
+BATCH_MAX_TEXTS = int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", "64"))
+# ... or when its oldest request has waited this long
+BATCH_MAX_WAIT_MS = float(os.getenv("RAG_EMBEDDING_BATCH_WAIT_MS", "5"))
+# Client-side timeout for a single request
+CLIENT_TIMEOUT = float(os.getenv("RAG_EMBEDDING_WORKER_TIMEOUT", "30"))
+
+_HEADER = struct.Struct(">I")
+
+
+class EmbeddingWorkerError(Exception):
+    """Raised when the embedding worker is unreachable or reports an error"""
+
+
+def _default_embed_fn() -> Callable[[List[str]], List[List[float]]]:
+    # Imported here so clients never load the model stack. The worker loads the
+    # model itself: get_embedding_function() would hand back a client of this
+    # very socket when RAG_EMBEDDING_WORKER_SOCKET is set.
+    from .chroma_utils import create_local_embeddings
+    return create_local_embeddings().embed_documents
+
+
+class EmbeddingWorkerServer:
+    """
+    Unix-socket server batching embedding requests across connections.
+
+    Requests from all clients go into one queue; the batcher takes whatever is
+    queued (up to BATCH_MAX_TEXTS, waiting at most BATCH_MAX_WAIT_MS for more)
+    and embeds it in one call on a single inference thread, so the model uses
+    all cores for one batch at a time instead of contending with itself.
+    Queries and documents share batches: the model is used without query
+    prompts, so both embed the same way.
+    """
+
+    def __init__(self, socket_path: str, embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 max_batch: int = BATCH_MAX_TEXTS, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.socket_path = socket_path
+        self._embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-inference")
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+
+    async def _read_frame(self, reader: asyncio.StreamReader) -> Optional[dict]:
+        try:
+            header = await reader.readexactly(_HEADER.size)
+            payload = await reader.readexactly(_HEADER.unpack(header)[0])
+        except asyncio.IncompleteReadError:
+            return None
+        return orjson.loads(payload)
+
+    @staticmethod
+    def _frame(message: dict) -> bytes:
+        payload = orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY)
+        return _HEADER.pack(len(payload)) + payload
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        write_lock = asyncio.Lock()
+
+        async def respond(message: dict):
+            async with write_lock:
+                writer.write(self._frame(message))
+                await writer.drain()
+
+        async def serve(request: dict):
+            request_id = request.get("id")
+            try:
+                if request.get("op") == "ping":
+                    await respond({"id": request_id, "ok": True, "stats": self.stats})
+                    return
+                future = loop.create_future()
+                await self._queue.put((list(request.get("texts") or []), future))
+                await respond({"id": request_id, "embeddings": await future})
+            except Exception as e:
+                await respond({"id": request_id, "error": str(e)})
+
+        tasks = set()
+        try:
+            while True:
+                request = await self._read_frame(reader)
+                if request is None:
+                    break
+                self.stats["requests"] += 1
+                # Requests on one connection are served concurrently and may batch together
+                task = asyncio.create_task(serve(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = [await self._queue.get()]
+            count = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while count < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                count += len(item[0])
+
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                embeddings = await loop.run_in_executor(self._executor, self._embed_fn, texts) if texts else []
+                self.stats["batches"] += 1
+                self.stats["texts"] += len(texts)
+                offset = 0
+                for item_texts, future in pending:
+                    if not future.done():
+                        future.set_result([list(map(float, e)) for e in embeddings[offset:offset + len(item_texts)]])
+                    offset += len(item_texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def serve_forever(self):
+        if self._embed_fn is None:
+            self._embed_fn = _default_embed_fn()
+        self._queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        batcher = asyncio.create_task(self._batcher())
+        logger.info(f"Embedding worker listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._executor.shutdown(wait=False)
+
+
+class RemoteEmbeddings:
+    """
+    Embedding function that delegates to a shared embedding worker. Drop-in
+    for CachedEmbeddings (same methods and query cache), so Chroma and
+    search_documents use it unchanged.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.cache = TTLCache(maxsize=1000, ttl=3600)  # Cache for 1 hour
+        self._local = threading.local()
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    def _connection(self) -> socket.socket:
+        # One connection per thread: requests from a thread are sequential
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _reset_connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    @staticmethod
+    def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = sock.recv(size)
+            if not chunk:
+                raise ConnectionError("Embedding worker closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _request(self, message: dict) -> dict:
+        with self._counter_lock:
+            self._counter += 1
+            message = {**message, "id": self._counter}
+        payload = orjson.dumps(message)
+        # Retry once on a stale connection (e.g. the worker restarted)
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(_HEADER.pack(len(payload)) + payload)
+                size = _HEADER.unpack(self._recv_exactly(sock, _HEADER.size))[0]
+                response = orjson.loads(self._recv_exactly(sock, size))
+                break
+            except (OSError, ConnectionError) as e:
+                self._reset_connection()
+                if attempt:
+                    raise EmbeddingWorkerError(f"Embedding worker at {self.socket_path} unavailable: {e}")
+        if "error" in response:
+            raise EmbeddingWorkerError(response["error"])
+        return response
+
+    def ping(self) -> dict:
+        return self._request({"op": "ping"})
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._request({"op": "embed", "texts": list(texts)})["embeddings"]
+
+    def embed_query(self, text: str) -> List[float]:
+        cache_key = hashlib.md5(text.encode()).hexdigest()
+        if cache_key in self.cache:
+            return self.cache[cache_key]
+        embedding = self.embed_documents([text])[0]
+        self.cache[cache_key] = embedding
+        return embedding
+
+    def is_query_cached(self, text: str) -> bool:
+        """Whether an embedding for this text is already cached"""
+        return hashlib.md5(text.encode()).hexdigest() in self.cache
+
+    def warm_up(self):
+        """The worker warms its own model; just check it is reachable"""
+        self.ping()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding worker for GraphTalk API workers")
+    parser.add_argument("--socket", default=EMBEDDING_WORKER_SOCKET or "/tmp/graphtalk-embed.sock",
+                        help="Unix socket path to listen on")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Load and warm the model before accepting connections
+    embed_fn = _default_embed_fn()
+    asyncio.run(EmbeddingWorkerServer(args.socket, embed_fn=embed_fn).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Background indexing: uploads are recorded in document_store, spooled to disk
+and queued in the indexing_jobs table; a bounded pool of worker threads does
+the parsing, chunking and embedding. The upload request returns a job id
+right away and clients poll GET /files/jobs/{job_id}.
+
+Jobs are claimed atomically in SQLite, so several API processes can share one
+queue. Only one job per (organization, filename) runs at a time, higher
+priority jobs run first, and failed jobs are retried with exponential backoff
+up to RAG_INDEX_MAX_ATTEMPTS. The pool size is RAG_INDEX_WORKERS (see
+resource_manager); 0 leaves indexing to other processes.
+"""
+import os
+import time
+import uuid
+import shutil
+import socket
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .db_utils import (
+    insert_indexing_job, claim_indexing_job, finish_indexing_job, get_indexing_job,
+    get_running_indexing_jobs, requeue_indexing_job, count_indexing_jobs
+)
+from .resource_manager import resource_manager
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = os.getenv("RAG_INDEX_SPOOL_DIR", os.path.join("uploads", ".indexing"))
+MAX_ATTEMPTS = int(os.getenv("RAG_INDEX_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = float(os.getenv("RAG_INDEX_RETRY_DELAY", "30"))
+POLL_INTERVAL_SECONDS = float(os.getenv("RAG_INDEX_POLL_INTERVAL", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def enqueue_indexing_job(file_id: int, filename: str, content_bytes: Optional[bytes] = None, organization_id: Optional[str] = None,
+                         priority: int = 0, metadata: Optional[Dict[str, str]] = None, source_path: Optional[str] = None) -> str:
+    """
+    Spool an uploaded file (given as bytes or as a file on disk) and queue it for indexing.
+
+    Returns:
+        The job id
+    """
+    job_id = str(uuid.uuid4())
+    job_dir = os.path.join(SPOOL_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    file_path = os.path.join(job_dir, os.path.basename(filename))
+    if source_path is not None:
+        shutil.copyfile(source_path, file_path)
+    else:
+        with open(file_path, "wb") as f:
+            f.write(content_bytes)
+
+    insert_indexing_job(job_id, file_id, filename, file_path, organization_id=organization_id,
+                        priority=priority, max_attempts=MAX_ATTEMPTS, metadata=metadata)
+    logger.info(f"Queued indexing job {job_id} for {filename} (file_id: {file_id}, priority: {priority})")
+    indexing_pool.notify()
+    return job_id
+
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """Public view of a job (no spool path)"""
+    job = get_indexing_job(job_id)
+    if job is None:
+        return None
+    job.pop("file_path", None)
+    job.pop("claimed_by", None)
+    return job
+
+
+def recover_orphaned_jobs() -> int:
+    """Requeue jobs left running by processes on this host that no longer exist"""
+    hostname = socket.gethostname()
+    recovered = 0
+    for job in get_running_indexing_jobs():
+        host, _, pid = (job.get("claimed_by") or "").rpartition(":")
+        if host == hostname and pid.isdigit() and not _pid_alive(int(pid)):
+            requeue_indexing_job(job["id"])
+            recovered += 1
+    if recovered:
+        logger.warning(f"Requeued {recovered} indexing jobs orphaned by exited processes")
+    return recovered
+
+
+class IndexingWorkerPool:
+    def __init__(self, workers: int, index_fn=None):
+        self.workers = workers
+        # index_document_to_chroma unless given; resolved lazily to keep imports light
+        self.index_fn = index_fn
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self.active = 0
+        self._active_lock = threading.Lock()
+
+    def start(self):
+        if self._threads or self.workers <= 0:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"rag-index-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} indexing workers")
+
+    def stop(self, timeout: float = 30.0):
+        """Let running jobs finish, then stop the workers"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _loop(self):
+        worker = _worker_id()
+        while not self._stopping.is_set():
+            try:
+                job = claim_indexing_job(worker, time.time())
+            except Exception as e:
+                logger.error(f"Could not claim an indexing job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL_SECONDS)
+                self._wakeup.clear()
+                continue
+            with self._active_lock:
+                self.active += 1
+            try:
+                self._run(job)
+            finally:
+                with self._active_lock:
+                    self.active -= 1
+
+    def _run(self, job: Dict[str, Any]):
+        index_fn = self.index_fn
+        if index_fn is None:
+            from .chroma_utils import index_document_to_chroma as index_fn
+
+        started = time.time()
+        error = None
+        try:
+            # Embedding runs on the index executor so jobs and /files/edit share the index budget
+            indexed = resource_manager.executors["index"].submit(
+                index_fn, job["file_path"], job["file_id"], organization_id=job["organization_id"],
+                metadata=job["metadata"], filename=os.path.basename(job["filename"])
+            ).result()
+            if not indexed:
+                error = "Indexing failed"
+        except Exception as e:
+            error = str(e)
+
+        if error is None:
+            finish_indexing_job(job["id"], DONE)
+            logger.info(f"✓ Indexing job {job['id']} done: {job['filename']} in {time.time() - started:.1f}s")
+        elif job["attempts"] < job["max_attempts"]:
+            delay = RETRY_DELAY_SECONDS * 2 ** (job["attempts"] - 1)
+            finish_indexing_job(job["id"], QUEUED, error=error, retry_at=time.time() + delay)
+            logger.warning(f"Indexing job {job['id']} ({job['filename']}) failed on attempt "
+                           f"{job['attempts']}/{job['max_attempts']}, retrying in {delay:.0f}s: {error}")
+            return
+        else:
+            finish_indexing_job(job["id"], FAILED, error=error)
+            logger.error(f"Indexing job {job['id']} ({job['filename']}) failed permanently: {error}")
+        shutil.rmtree(os.path.dirname(job["file_path"]), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": len(self._threads), "active": self.active, "jobs": count_indexing_jobs()}
+
+
+indexing_pool = IndexingWorkerPool(resource_manager.budget.index_workers)
@@ -0,0 +1,185 @@
+"""
+Ingestion progress and throughput. Every file being indexed gets an
+IngestJob whose counters are advanced from inside the indexing path
+(load_and_split_document, index_document_to_chroma and the bulk pipeline):
+the current stage (parse, chunk, embed, store), pages, chunks and bytes
+processed, time spent per stage, and errors. Rates are derived from the
+counters, so a slow stage shows up as jobs lingering in it and as a low
+chunks/s.
+
+The job of the calling thread is implicit: track() makes a job current for
+the thread, and stage()/add()/fail() update it (they do nothing when no job
+is tracked). Served at GET /ingestion/status and pushed over /ws/ingestion.
+"""
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+STAGES = ("parse", "chunk", "embed", "store")
+# Finished jobs kept for the status API
+HISTORY_JOBS = int(os.getenv("RAG_INGEST_PROGRESS_HISTORY", "100"))
+# Seconds between pushes on /ws/ingestion
+PUSH_INTERVAL_SECONDS = float(os.getenv("RAG_INGEST_PROGRESS_INTERVAL", "1"))
+
+
+class IngestJob:
+    def __init__(self, filename: str, file_id: Any = None, organization_id: Optional[str] = None,
+                 bytes_total: Optional[int] = None, kind: str = "file"):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.filename = filename
+        self.file_id = file_id
+        self.organization_id = organization_id
+        self.bytes_total = bytes_total
+        self.stage = "queued"
+        self.counts = {"pages": 0, "chunks": 0, "chunks_stored": 0, "bytes": 0, "files": 0}
+        self.errors: List[str] = []
+        self.stage_seconds: Dict[str, float] = {}
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._stage_started = self.started
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage: str):
+        with self._lock:
+            now = time.time()
+            if self.stage in STAGES:
+                self.stage_seconds[self.stage] = self.stage_seconds.get(self.stage, 0.0) + now - self._stage_started
+            self.stage = stage
+            self._stage_started = now
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self.counts[name] = self.counts.get(name, 0) + value
+
+    def fail(self, error: str):
+        with self._lock:
+            self.errors.append(error)
+
+    def finish(self):
+        self.set_stage("failed" if self.errors else "done")
+        self.finished = time.time()
+        if not self.errors and self.bytes_total:
+            self.counts["bytes"] = self.bytes_total
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = max((self.finished or time.time()) - self.started, 1e-6)
+            stage_seconds = dict(self.stage_seconds)
+            if self.stage in STAGES:
+                stage_seconds[self.stage] = stage_seconds.get(self.stage, 0.0) + time.time() - self._stage_started
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "filename": self.filename,
+                "file_id": self.file_id,
+                "organization_id": self.organization_id,
+                "stage": self.stage,
+                **self.counts,
+                "bytes_total": self.bytes_total,
+                "elapsed_seconds": round(elapsed, 2),
+                "chunks_per_second": round(self.counts["chunks_stored"] / elapsed, 1),
+                "bytes_per_second": round(self.counts["bytes"] / elapsed),
+                "stage_seconds": {stage: round(seconds, 2) for stage, seconds in stage_seconds.items()},
+                "errors": list(self.errors),
+            }
+
+
+class IngestProgressTracker:
+    def __init__(self, history: int = HISTORY_JOBS):
+        self._active: Dict[str, IngestJob] = {}
+        self._recent: deque = deque(maxlen=history)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[IngestJob]:
+        return getattr(self._local, "job", None)
+
+    @contextmanager
+    def track(self, filename: str, file_id: Any = None, organization_id: Optional[str] = None,
+              bytes_total: Optional[int] = None, kind: str = "file") -> Iterator[IngestJob]:
+        """Make a new job current for this thread; nested calls reuse the outer job"""
+        outer = self.current()
+        if outer is not None:
+            yield outer
+            return
+        job = IngestJob(filename, file_id, organization_id, bytes_total, kind)
+        with self._lock:
+            self._active[job.id] = job
+        self._local.job = job
+        try:
+            yield job
+        except Exception as e:
+            job.fail(str(e))
+            raise
+        finally:
+            self._local.job = None
+            job.finish()
+            with self._lock:
+                self._active.pop(job.id, None)
+                self._recent.append(job)
+
+    def stage(self, stage: str):
+        job = self.current()
+        if job is not None:
+            job.set_stage(stage)
+
+    def add(self, **counts):
+        job = self.current()
+        if job is not None:
+            job.add(**counts)
+
+    def fail(self, error: str):
+        job = self.current()
+        if job is not None:
+            job.fail(error)
+
+    def status(self, organization_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Active and recent jobs (an organization's plus those with no organization,
+        or all when organization_id is None), with totals per stage
+        """
+        with self._lock:
+            active = [job.snapshot() for job in self._active.values()]
+            recent = [job.snapshot() for job in reversed(self._recent)]
+        if organization_id is not None:
+            visible = lambda job: job["organization_id"] in (organization_id, None)
+            active = [job for job in active if visible(job)]
+            recent = [job for job in recent if visible(job)]
+
+        stage_seconds: Dict[str, float] = {}
+        for job in active + recent:
+            for stage, seconds in job["stage_seconds"].items():
+                stage_seconds[stage] = round(stage_seconds.get(stage, 0.0) + seconds, 2)
+        return {
+            "active": active,
+            "recent": recent,
+            "active_by_stage": {stage: sum(1 for job in active if job["stage"] == stage) for stage in STAGES},
+            "errors": sum(len(job["errors"]) for job in active + recent),
+            "chunks_per_second": round(sum(job["chunks_per_second"] for job in active), 1),
+            "bytes_per_second": sum(job["bytes_per_second"] for job in active),
+            "stage_seconds": stage_seconds,
+        }
+
+
+def source_size(source: Any) -> Optional[int]:
+    """Size in bytes of a path, bytes or seekable stream, if it can be told"""
+    try:
+        if isinstance(source, str):
+            return os.path.getsize(source)
+        if isinstance(source, (bytes, bytearray)):
+            return len(source)
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size
+    except Exception:
+        return None
+
+
+ingest_progress = IngestProgressTracker()
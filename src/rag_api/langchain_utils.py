@@ -3,7 +3,9 @@ import json
 import logging
 from dotenv import load_dotenv
 from langchain_core.documents import Document
-from .chroma_utils import vectorstore, search_documents
+from .chroma_utils import get_vectorstore, search_documents
+from .lazy import LazyResource
+from .resource_manager import resource_manager
 from .timing_utils import Timer, PerformanceTracker, time_block
 
 # Load environment variables
@@ -14,57 +16,62 @@ DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Initialize clients
-deepseek_client = None
-openai_client = None
-gemini_client = None
-active_llm = None
-
-# Try DeepSeek first (preferred)
-if DEEPSEEK_API_KEY:
-    try:
-        from openai import AsyncOpenAI
-        deepseek_client = AsyncOpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com/v1"
-        )
-        active_llm = "deepseek"
-        print("✓ DeepSeek client initialized for RAG chain")
-    except Exception as e:
-        print(f"Warning: Failed to initialize DeepSeek client: {e}")
-        deepseek_client = None
-
-# Try ChatGPT/OpenAI if DeepSeek is not available
-if not deepseek_client and OPENAI_API_KEY:
-    try:
-        from openai import AsyncOpenAI
-        openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-        active_llm = "chatgpt"
-        print("✓ ChatGPT (OpenAI) client initialized for RAG chain")
-    except Exception as e:
-        print(f"Warning: Failed to initialize OpenAI client: {e}")
-        openai_client = None
-
-# Try Gemini if DeepSeek and ChatGPT are not available
-if not deepseek_client and not openai_client and GEMINI_API_KEY:
-    try:
-        from google import genai
-        # Set the API key in environment for the library
-        if not os.getenv("GOOGLE_API_KEY"):
-            os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
-        gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-        active_llm = "gemini"
-        print("✓ Gemini client initialized for RAG chain")
-    except Exception as e:
-        print(f"Warning: Failed to initialize Gemini client: {e}")
-        gemini_client = None
-
-if not deepseek_client and not openai_client and not gemini_client:
-    print("ℹ No LLM API key found. RAG will work in retrieval-only mode.")
+def _create_llm_clients():
+    """Initialize the LLM SDK clients used by the RAG chain on first use"""
+    clients = {"deepseek": None, "chatgpt": None, "gemini": None, "active": None}
+
+    # Try DeepSeek first (preferred)
+    if DEEPSEEK_API_KEY:
+        try:
+            from openai import AsyncOpenAI
+            clients["deepseek"] = AsyncOpenAI(
+                api_key=DEEPSEEK_API_KEY,
+                base_url="https://api.deepseek.com/v1"
+            )
+            clients["active"] = "deepseek"
+            print("✓ DeepSeek client initialized for RAG chain")
+        except Exception as e:
+            print(f"Warning: Failed to initialize DeepSeek client: {e}")
+
+    # Try ChatGPT/OpenAI if DeepSeek is not available
+    if not clients["deepseek"] and OPENAI_API_KEY:
+        try:
+            from openai import AsyncOpenAI
+            clients["chatgpt"] = AsyncOpenAI(api_key=OPENAI_API_KEY)
+            clients["active"] = "chatgpt"
+            print("✓ ChatGPT (OpenAI) client initialized for RAG chain")
+        except Exception as e:
+            print(f"Warning: Failed to initialize OpenAI client: {e}")
+
+    # Try Gemini if DeepSeek and ChatGPT are not available
+    if not clients["deepseek"] and not clients["chatgpt"] and GEMINI_API_KEY:
+        try:
+            from google import genai
+            # Set the API key in environment for the library
+            if not os.getenv("GOOGLE_API_KEY"):
+                os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
+            clients["gemini"] = genai.Client(api_key=GEMINI_API_KEY)
+            clients["active"] = "gemini"
+            print("✓ Gemini client initialized for RAG chain")
+        except Exception as e:
+            print(f"Warning: Failed to initialize Gemini client: {e}")
+
+    if not clients["active"]:
+        print("ℹ No LLM API key found. RAG will work in retrieval-only mode.")
+    return clients
+
+rag_llm_clients = LazyResource("rag_chain_llm_clients", _create_llm_clients, required_for_ready=False)
 
 class ChromaRetriever:
-    def __init__(self, vectorstore):
-        self.vectorstore = vectorstore
+    def __init__(self, vectorstore=None):
+        self._vectorstore = vectorstore
+
+    @property
+    def vectorstore(self):
+        # Resolved on first use so building the retriever does not open Chroma
+        if self._vectorstore is None:
+            self._vectorstore = get_vectorstore()
+        return self._vectorstore
     
     def get_relevant_documents(self, query: str) -> list[Document]:
         """Retrieve documents relevant to the query."""
@@ -84,7 +91,7 @@ class ChromaRetriever:
         return self.get_relevant_documents(query)
 
 # Create a custom retriever that uses our enhanced search
-retriever = ChromaRetriever(vectorstore)
+retriever = ChromaRetriever()
 
 # Enhanced prompt with better context utilization and response guidance
 qa_prompt = """You are an expert assistant analyzing company documents. Your task is to provide accurate, detailed answers based on the provided context.
@@ -128,6 +135,9 @@ def get_rag_chain(model: str = None):
             user_input = inputs.get("input", "No question provided")
             tracker.end_operation("format_prompt")
 
+            clients = rag_llm_clients.get()
+            deepseek_client, openai_client, gemini_client = clients["deepseek"], clients["chatgpt"], clients["gemini"]
+
             # If no LLM is available, return just the context
             if not deepseek_client and not openai_client and not gemini_client:
                 logger.info("No LLM available, returning context only")
@@ -184,7 +194,7 @@ def get_rag_chain(model: str = None):
                     import asyncio
                     loop = asyncio.get_event_loop()
                     response = await loop.run_in_executor(
-                        None,
+                        resource_manager.executors["llm"],
                         lambda: gemini_client.models.generate_content(
                             model="gemini-2.0-flash-exp",
                             contents=[
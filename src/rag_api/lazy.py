@@ -0,0 +1,127 @@
+"""
+Lazily initialized heavy resources (embedding model, tokenizers, Chroma,
+LLM clients) with explicit readiness states, so importing the API is cheap
+and health, auth and CMS endpoints serve while the search stack warms up.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COLD = "cold"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyResource:
+    """
+    A resource built by a factory on first use.
+
+    get() builds the resource once (thread-safe) and returns it; concurrent
+    callers wait for the same build. A failed build is remembered and retried
+    on the next get(), so a transient error does not poison the process.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], depends_on: Optional[List["LazyResource"]] = None,
+                 required_for_ready: bool = True):
+        """
+        Args:
+            name: Name in readiness reports and warm_up()
+            factory: Builds the resource
+            depends_on: Resources built before this one
+            required_for_ready: Whether the process is reported ready only once this is built;
+                resources only some requests need (LLM clients, tenant shards) build on first use
+        """
+        self.name = name
+        self._factory = factory
+        self._depends_on = depends_on or []
+        self.required_for_ready = required_for_ready
+        self._lock = threading.RLock()
+        self._value = None
+        self.state = COLD
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        register(self)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def get(self) -> Any:
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state == READY:
+                return self._value
+            for dependency in self._depends_on:
+                dependency.get()
+            self.state = LOADING
+            start = time.perf_counter()
+            try:
+                self._value = self._factory()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                logger.error(f"Failed to initialize {self.name}: {e}")
+                raise
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            self.error = None
+            self.state = READY
+            logger.info(f"Initialized {self.name} in {self.load_seconds}s")
+            return self._value
+
+    def reset(self):
+        """Drop the built resource; the next get() rebuilds it"""
+        with self._lock:
+            self._value = None
+            self.state = COLD
+            self.error = None
+            self.load_seconds = None
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds,
+                "required": self.required_for_ready}
+
+
+_registry: Dict[str, LazyResource] = {}
+
+
+def register(resource: LazyResource):
+    _registry[resource.name] = resource
+
+
+def get_resource(name: str) -> Optional[LazyResource]:
+    return _registry.get(name)
+
+
+def readiness() -> Dict[str, Any]:
+    """Readiness of every registered resource; ready once all required ones are built"""
+    resources = {name: resource.status() for name, resource in _registry.items()}
+    return {
+        "ready": all(r["state"] == READY for r in resources.values() if r["required"]),
+        "resources": resources
+    }
+
+
+def warm_up(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Build the named (default: all registered) resources, logging failures"""
+    for name in names or list(_registry.keys()):
+        resource = _registry.get(name)
+        if resource is None:
+            logger.warning(f"Unknown lazy resource '{name}'")
+            continue
+        try:
+            resource.get()
+        except Exception:
+            pass  # Recorded as failed in the resource status
+    return readiness()
+
+
+def warm_up_in_background(names: Optional[List[str]] = None) -> threading.Thread:
+    """Warm resources in a daemon thread so startup does not block on them"""
+    thread = threading.Thread(target=warm_up, args=(names,), name="lazy-warmup", daemon=True)
+    thread.start()
+    return thread
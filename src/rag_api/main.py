@@ -3,10 +3,11 @@ from .pydantic_models import QueryInput, QueryResponse, DocumentInfo, DeleteFile
 from .langchain_utils import get_rag_chain
 from .db_utils import insert_application_logs, get_chat_history, get_all_documents, insert_document_record, delete_document_record
 from .chroma_utils import index_document_to_chroma, delete_doc_from_chroma
+from .zip_ingest import ZipIngester, ZipBombError
 import os
 import uuid
 import logging
-import shutil
+import zipfile
 
 logging.basicConfig(filename='app.log', level=logging.INFO)
 
@@ -40,155 +41,53 @@ def upload_and_index_document(file: UploadFile = File(...)):
 
 	logging.info(f"Upload request: {file.filename} (Type: {file_extension})")
 	
-	# Handle ZIP files by extracting and uploading each file separately
+	# Handle ZIP files by ingesting each entry as a separate file
 	if file_extension == '.zip':
-		logging.info(f"Archive detected: {file.filename}. Extracting and processing contents...")
-		import zipfile
-		import tempfile
-		
-		temp_zip_path = f"temp_{file.filename}"
-		extracted_files = []
-		failed_files = []
+		logging.info(f"Archive detected: {file.filename}. Ingesting its entries...")
 		
 		try:
-			# Save uploaded ZIP temporarily
-			with open(temp_zip_path, "wb") as buffer:
-				shutil.copyfileobj(file.file, buffer)
-			
-			# Extract and process each file with unicode support
-			with tempfile.TemporaryDirectory() as temp_extract_dir:
-				with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-					logging.info(f"Archive extracted: {len(zip_ref.filelist)} total files (UTF-8 filename support enabled)")
-					
-					# Extract files and fix filenames if needed
-					for member in zip_ref.filelist:
-						try:
-							# Access raw filename to properly decode
-							raw_filename = member.filename
-							filename_to_use = raw_filename
-							
-							# Check if filename appears to be mojibake (UTF-8 decoded as CP437)
-							if isinstance(raw_filename, str) and any(ord(c) > 127 for c in raw_filename):
-								# Contains non-ASCII characters
-								try:
-									# First try: latin-1→utf-8
-									attempt1 = raw_filename.encode('latin-1').decode('utf-8')
-									filename_to_use = attempt1
-									logging.debug(f"Successfully decoded via latin-1→utf-8: {raw_filename} -> {attempt1}")
-								except (UnicodeDecodeError, UnicodeEncodeError):
-									# If that fails, try CP437→UTF-8
-									try:
-										attempt2 = raw_filename.encode('cp437').decode('utf-8')
-										filename_to_use = attempt2
-										logging.debug(f"Successfully decoded via cp437→utf-8: {raw_filename} -> {attempt2}")
-									except (UnicodeDecodeError, UnicodeEncodeError):
-										# Keep original if both attempts fail
-										logging.debug(f"Could not decode {raw_filename}, keeping original")
-										filename_to_use = raw_filename
-							
-							# Now extract with the corrected filename
-							member.filename = filename_to_use
-							extracted_path = zip_ref.extract(member, temp_extract_dir)
-							
-							# Extract with corrected filename
-							extracted_path = zip_ref.extract(member, temp_extract_dir)
-							
-						except Exception as e:
-							logging.warning(f"Could not extract {member.filename}: {str(e)}")
-							try:
-								zip_ref.extract(member, temp_extract_dir)
-							except Exception as e2:
-								logging.error(f"Failed to extract {member.filename}: {str(e2)}")
-				
-				# Process supported files from archive
-				allowed_archive_extensions = ['.pdf', '.docx', '.doc', '.html', '.txt', '.md']
-				
-				for root, dirs, files in os.walk(temp_extract_dir):
-					for extracted_filename in files:
-						extracted_file_path = os.path.join(root, extracted_filename)
-						extracted_ext = os.path.splitext(extracted_filename)[1].lower()
-						
-						# Only process supported file types
-						if extracted_ext not in allowed_archive_extensions:
-							logging.info(f"Skipping unsupported file: {extracted_filename}")
-							continue
-						
-						try:
-							logging.info(f"Processing extracted file: {extracted_filename}")
-							
-							# Save each extracted file to database (with unicode support)
-							file_id = insert_document_record(extracted_filename)
-							
-							# Index to Chroma
-							temp_index_path = f"temp_{extracted_filename}"
-							with open(temp_index_path, "wb") as buffer:
-								with open(extracted_file_path, "rb") as src:
-									shutil.copyfileobj(src, buffer)
-							
-							if index_document_to_chroma(temp_index_path, file_id):
-								logging.info(f"✓ Processed {extracted_filename} (file_id: {file_id})")
-								extracted_files.append({
-									"filename": extracted_filename,
-									"file_id": file_id
-								})
-							else:
-								logging.error(f"Failed to index {extracted_filename}")
-								delete_document_record(file_id)
-								failed_files.append(extracted_filename)
-							
-							if os.path.exists(temp_index_path):
-								os.remove(temp_index_path)
-						
-						except Exception as e:
-							logging.error(f"Error processing {extracted_filename}: {str(e)}")
-							failed_files.append(extracted_filename)
-				
-			logging.info(f"Archive processing complete: {len(extracted_files)} files processed, {len(failed_files)} failed")
-			
-			return {
-				"message": f"Archive {file.filename} processed: {len(extracted_files)} files uploaded and indexed.",
-				"archive_name": file.filename,
-				"files_processed": len(extracted_files),
-				"files_failed": len(failed_files),
-				"extracted_files": extracted_files
-			}
-		
-		except zipfile.BadZipFile as e:
+			# Entries are read straight from the uploaded stream and parsed in parallel
+			state = ZipIngester().run(file.file, file.filename)
+		except (zipfile.BadZipFile, ZipBombError) as e:
 			logging.error(f"Invalid ZIP file: {str(e)}")
 			raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {str(e)}")
 		except Exception as e:
 			logging.error(f"Error processing archive: {str(e)}")
 			raise HTTPException(status_code=400, detail=f"Error processing archive: {str(e)}")
-		finally:
-			if os.path.exists(temp_zip_path):
-				os.remove(temp_zip_path)
+		
+		extracted_files = [
+			{"filename": entry["filename"], "file_id": entry["file_id"]}
+			for entry in state["entries"] if entry["status"] == "indexed"
+		]
+		failed_files = [entry["filename"] for entry in state["entries"] if entry["status"] == "failed"]
+		logging.info(f"Archive processing complete: {len(extracted_files)} files processed, {len(failed_files)} failed")
+		
+		return {
+			"message": f"Archive {file.filename} processed: {len(extracted_files)} files uploaded and indexed.",
+			"archive_name": file.filename,
+			"files_processed": len(extracted_files),
+			"files_failed": len(failed_files),
+			"extracted_files": extracted_files,
+			"entries": state["entries"]
+		}
 	
 	else:
-		# Handle regular (non-ZIP) files
-		temp_file_path = f"temp_{file.filename}"
-
-		try:
-			with open(temp_file_path, "wb") as buffer:
-				shutil.copyfileobj(file.file, buffer)
-
-			file_id = insert_document_record(file.filename)
-			logging.info(f"File saved to database: {file.filename} (file_id: {file_id})")
-			
-			success = index_document_to_chroma(temp_file_path, file_id)
+		# Handle regular (non-ZIP) files; the upload's spooled file is parsed directly
+		file_id = insert_document_record(file.filename)
+		logging.info(f"File saved to database: {file.filename} (file_id: {file_id})")
+		
+		success = index_document_to_chroma(file.file, file_id, filename=file.filename)
 
-			if success:
-				logging.info(f"✓ Upload completed: {file.filename} (file_id: {file_id})")
-				return {
-					"message": f"File {file.filename} has been successfully uploaded and indexed.",
-					"file_id": file_id
-				}
-			else:
-				delete_document_record(file_id)
-				logging.error(f"Failed to index {file.filename}")
-				raise HTTPException(status_code=500, detail=f"Failed to index {file.filename}.")
-		finally:
-			if os.path.exists(temp_file_path):
-				os.remove(temp_file_path)
+		if success:
+			logging.info(f"✓ Upload completed: {file.filename} (file_id: {file_id})")
+			return {
+				"message": f"File {file.filename} has been successfully uploaded and indexed.",
+				"file_id": file_id
+			}
+		else:
+			delete_document_record(file_id)
+			logging.error(f"Failed to index {file.filename}")
+			raise HTTPException(status_code=500, detail=f"Failed to index {file.filename}.")
 
 @app.get("/list-docs", response_model=list[DocumentInfo])
 def list_documents():
@@ -4,16 +4,12 @@ Script to reindex all documents in the database.
 
 This script will:
 1. Fetch all documents from the database
-2. Save them to a temporary directory
-3. Reindex them using the reindex_documents function
+2. Rebuild the index from them using the reindex_documents function, under
+   their document_store ids and organizations
 """
-import os
-import tempfile
-import sqlite3
-from pathlib import Path
-from typing import List, Dict, Any
 import logging
-from .chroma_utils import reindex_documents
+from .chroma_utils import reindex_documents, backfill_document_summaries
+from .db_utils import get_all_documents
 
 # Configure logging
 logging.basicConfig(
@@ -22,51 +18,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    """Get a connection to the SQLite database."""
-    db_path = os.path.join(os.path.dirname(__file__), "rag_app.db")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def get_all_documents() -> List[Dict[str, Any]]:
-    """Fetch all documents from the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, filename, content FROM document_store')
-    documents = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return documents
-
-def save_documents_to_temp(documents: List[Dict[str, Any]]) -> str:
-    """Save documents to a temporary directory and return the directory path."""
-    temp_dir = tempfile.mkdtemp(prefix="reindex_docs_")
-    
-    for doc in documents:
-        try:
-            filename = doc['filename']
-            content = doc['content']
-            
-            # Handle both string and bytes content
-            if isinstance(content, str):
-                content = content.encode('utf-8')
-            elif not isinstance(content, bytes):
-                logger.warning(f"Unexpected content type for {filename}, skipping")
-                continue
-                
-            filepath = os.path.join(temp_dir, filename)
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            with open(filepath, 'wb') as f:
-                f.write(content)
-                
-            logger.info(f"Saved document to {filepath}")
-            
-        except Exception as e:
-            logger.error(f"Error processing document {doc.get('id', 'unknown')}: {str(e)}")
-    
-    return temp_dir
-
 def main():
     try:
         logger.info("Starting document reindexing process...")
@@ -81,15 +32,11 @@ def main():
             
         logger.info(f"Found {len(documents)} documents in the database.")
         
-        # 2. Save documents to a temporary directory
-        logger.info("Saving documents to temporary directory...")
-        temp_dir = save_documents_to_temp(documents)
-        
-        # 3. Reindex the documents
+        # 2. Reindex the documents (their content is read from the database by the parsers)
         logger.info("Starting reindexing process...")
-        stats = reindex_documents(temp_dir)
+        stats = reindex_documents()
         
-        # 4. Print statistics
+        # 3. Print statistics
         logger.info("\nReindexing completed!")
         logger.info(f"Total files processed: {stats['total_files']}")
         logger.info(f"Successfully indexed: {stats['successful']}")
@@ -112,15 +59,16 @@ def main():
     except Exception as e:
         logger.error(f"Fatal error during reindexing: {str(e)}", exc_info=True)
         raise
-    finally:
-        # Clean up temporary directory if it exists
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            import shutil
-            try:
-                shutil.rmtree(temp_dir)
-                logger.info(f"Cleaned up temporary directory: {temp_dir}")
-            except Exception as e:
-                logger.warning(f"Could not clean up temporary directory {temp_dir}: {str(e)}")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reindex documents stored in the database")
+    parser.add_argument("--backfill-summaries", action="store_true",
+                        help="Only build missing document summary vectors from already indexed chunks")
+    args = parser.parse_args()
+
+    if args.backfill_summaries:
+        backfill_document_summaries()
+    else:
+        main()
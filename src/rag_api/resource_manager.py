@@ -0,0 +1,204 @@
+"""
+CPU thread budget: sizes torch/ONNX intra-op threads, tokenizer parallelism,
+Chroma HNSW threads and the executor pools (search, index, I/O, LLM) from the
+host's core count, so they share the cores instead of each assuming it owns
+all of them. Every pool reports its queue depth for the admin resources endpoint.
+
+All sizes can be overridden through RAG_* environment variables. CPU-bound
+threads, (search workers + index workers) x torch threads + HNSW threads, are
+kept within RAG_CPU_BUDGET: every index worker runs embedding inference with
+the same torch thread count as a search. Oversized settings are shrunk to fit
+(torch threads first, then HNSW threads, index workers and search workers);
+only below three cores does the floor of one thread each exceed the budget.
+"""
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def _cpu_count() -> int:
+    if psutil is not None:
+        count = psutil.cpu_count(logical=False) or psutil.cpu_count()
+        if count:
+            return count
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def current_rss_mb() -> float:
+    """Resident memory of this process in MB"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class ThreadBudget:
+    """How many threads each CPU consumer gets"""
+
+    def __init__(self):
+        # Cores this process may keep busy (lower it when co-locating processes)
+        self.cpu_budget = _env_int("RAG_CPU_BUDGET", _cpu_count())
+        # Intra-op threads of one embedding inference (torch or ONNX)
+        self.torch_threads = _env_int("RAG_TORCH_THREADS", min(8, max(1, self.cpu_budget // 4)))
+        # HNSW query threads inside Chroma
+        self.hnsw_threads = _env_int("RAG_HNSW_THREADS", max(1, self.cpu_budget // 8))
+        # Background indexing jobs running at once (parse, chunk, embed); 0 disables the pool
+        self.index_workers = _env_int("RAG_INDEX_WORKERS", max(1, self.cpu_budget // 32))
+        # Concurrent searches (each runs an embedding inference plus ranking) get the remaining cores
+        remaining = self.cpu_budget - self.hnsw_threads - self.index_workers * self.torch_threads
+        self.search_workers = _env_int("RAG_SEARCH_WORKERS", max(1, remaining // self.torch_threads))
+        # Blocking I/O (SQLite, file reads); not CPU-bound, so not part of the budget
+        self.io_workers = _env_int("RAG_IO_WORKERS", min(32, self.cpu_budget * 4))
+        # Blocking LLM SDK calls (waiting on the network)
+        self.llm_workers = _env_int("RAG_LLM_WORKERS", 8)
+        self._clamp()
+
+    @property
+    def cpu_threads(self) -> int:
+        """Threads that can be CPU-bound at the same time"""
+        return (self.search_workers + self.index_workers) * self.torch_threads + self.hnsw_threads
+
+    def _clamp(self):
+        """Shrink the CPU-bound pools until they fit the budget"""
+        requested = self.to_dict()
+        inference_pools = lambda: self.search_workers + self.index_workers
+        if self.cpu_threads > self.cpu_budget:
+            self.torch_threads = max(1, (self.cpu_budget - self.hnsw_threads) // inference_pools())
+        if self.cpu_threads > self.cpu_budget:
+            self.hnsw_threads = max(1, self.cpu_budget - inference_pools() * self.torch_threads)
+        if self.cpu_threads > self.cpu_budget and self.index_workers:
+            self.index_workers = max(1, (self.cpu_budget - self.hnsw_threads) // self.torch_threads - self.search_workers)
+        if self.cpu_threads > self.cpu_budget:
+            self.search_workers = max(1, (self.cpu_budget - self.hnsw_threads) // self.torch_threads - self.index_workers)
+        if self.to_dict() != requested:
+            changed = {name: f"{requested[name]} -> {value}" for name, value in self.to_dict().items() if requested[name] != value}
+            logger.warning(
+                f"CPU-bound threads exceeded the CPU budget of {self.cpu_budget} "
+                f"({requested['cpu_threads']} requested); shrunk {changed}"
+            )
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "cpu_budget": self.cpu_budget,
+            "torch_threads": self.torch_threads,
+            "search_workers": self.search_workers,
+            "hnsw_threads": self.hnsw_threads,
+            "io_workers": self.io_workers,
+            "llm_workers": self.llm_workers,
+            "index_workers": self.index_workers,
+            "cpu_threads": self.cpu_threads,
+        }
+
+
+class MonitoredExecutor(ThreadPoolExecutor):
+    """Thread pool that tracks queued, running and completed tasks"""
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"rag-{name}")
+        self.name = name
+        self.size = max_workers
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._stats_lock:
+            self.queued += 1
+
+        def tracked():
+            with self._stats_lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        return super().submit(tracked)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "queued": self.queued, "running": self.running, "completed": self.completed}
+
+
+class ResourceManager:
+    """Process-wide owner of the thread budget and executor pools"""
+
+    def __init__(self, budget: ThreadBudget = None):
+        self.budget = budget or ThreadBudget()
+        self.executors: Dict[str, MonitoredExecutor] = {
+            "search": MonitoredExecutor("search", self.budget.search_workers),
+            # Indexing and re-embedding; background jobs and edits share the index workers' budget
+            "index": MonitoredExecutor("index", max(1, self.budget.index_workers)),
+            "io": MonitoredExecutor("io", self.budget.io_workers),
+            "llm": MonitoredExecutor("llm", self.budget.llm_workers),
+        }
+        self._torch_configured = False
+
+    def configure_thread_env(self):
+        """
+        Set thread counts read by native libraries at import time (OpenMP/MKL
+        for torch and ONNX Runtime, HF tokenizers). Explicit settings win.
+        """
+        threads = str(self.budget.torch_threads)
+        os.environ.setdefault("OMP_NUM_THREADS", threads)
+        os.environ.setdefault("MKL_NUM_THREADS", threads)
+        # Tokenizers would spawn a thread per core on every batch
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    def configure_torch(self):
+        """Apply the intra-op budget to torch (once, before the first inference)"""
+        if self._torch_configured:
+            return
+        import torch
+        torch.set_num_threads(self.budget.torch_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Already set once parallel work has started
+        self._torch_configured = True
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        """Route the loop's default executor and Starlette's threadpool through the I/O budget"""
+        loop.set_default_executor(self.executors["io"])
+        try:
+            import anyio.to_thread
+            anyio.to_thread.current_default_thread_limiter().total_tokens = self.budget.io_workers
+        except Exception as e:
+            logger.warning(f"Could not size the anyio threadpool: {e}")
+
+    async def run(self, pool: str, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking call on one of the executor pools"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executors[pool], partial(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget.to_dict(),
+            "executors": {name: executor.stats() for name, executor in self.executors.items()},
+        }
+
+
+resource_manager = ResourceManager()
+resource_manager.configure_thread_env()
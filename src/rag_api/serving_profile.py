@@ -0,0 +1,38 @@
+"""
+Serving profiles. "full" (default) serves the whole API. "search" is for
+read replicas: only auth, query and health routes are mounted, Chroma is
+treated as read-only, and uploads, indexers, CMS, analytics and their
+startup initialization are skipped, so query capacity scales out with
+small, fast-starting processes. api.py registers the search routes on the
+app and everything else on a router only the full profile mounts; the
+modules behind those routes are imported under the full profile only.
+"""
+import os
+
+FULL_PROFILE = "full"
+SEARCH_PROFILE = "search"
+
+SERVING_PROFILE = os.getenv("RAG_SERVING_PROFILE", FULL_PROFILE).lower()
+if SERVING_PROFILE not in (FULL_PROFILE, SEARCH_PROFILE):
+    raise ValueError(f"Unknown RAG_SERVING_PROFILE '{SERVING_PROFILE}' (expected '{FULL_PROFILE}' or '{SEARCH_PROFILE}')")
+
+# Routes mounted by the search profile
+SEARCH_PROFILE_PATHS = {
+    "/health",
+    "/health/ready",
+    "/login",
+    "/logout",
+    "/token/validate",
+    "/query",
+    "/query/results",
+    "/ws/query",
+}
+
+# Writes to Chroma are refused on read replicas
+CHROMA_READ_ONLY = os.getenv(
+    "RAG_CHROMA_READ_ONLY", "true" if SERVING_PROFILE == SEARCH_PROFILE else "false"
+).lower() == "true"
+
+
+def is_search_profile() -> bool:
+    return SERVING_PROFILE == SEARCH_PROFILE
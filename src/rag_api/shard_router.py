@@ -0,0 +1,207 @@
+"""
+Tenant shard router: places each organization's chunk vectors on one of N
+local Chroma instances by consistent hashing, so per-instance HNSW memory and
+search latency stay bounded as tenants are added. Searches for an organization
+touch its shard plus the shard holding shared (organization-less) documents;
+cross-tenant admin searches fan out to every shard and merge by distance.
+
+Enabled with RAG_CHROMA_SHARDS > 1. With the default of 1 the single
+./chroma_db store is used unchanged. After enabling sharding or changing the
+shard count, move existing vectors (without re-embedding) with:
+
+    python -m rag_api.shard_router rebalance
+    python -m rag_api.shard_router status
+"""
+import os
+import bisect
+import hashlib
+import logging
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from .lazy import LazyResource
+from .write_gate import index_write_gate
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = int(os.getenv("RAG_CHROMA_SHARDS", "1"))
+SHARD_ROOT = os.getenv("RAG_CHROMA_SHARD_ROOT", "./chroma_shards")
+# Virtual nodes per shard; more gives a more even spread of tenants
+SHARD_VNODES = int(os.getenv("RAG_CHROMA_SHARD_VNODES", "64"))
+# Placement key of documents without an organization
+SHARED_TENANT = ""
+
+
+def _hash(key: str) -> int:
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class ConsistentHashRing:
+    """Maps tenants to shards; changing the shard count moves ~1/N of tenants"""
+
+    def __init__(self, shard_count: int, vnodes: int = SHARD_VNODES):
+        self.shard_count = shard_count
+        points = []
+        for shard in range(shard_count):
+            for vnode in range(vnodes):
+                points.append((_hash(f"shard-{shard}#{vnode}"), shard))
+        points.sort()
+        self._keys = [p[0] for p in points]
+        self._shards = [p[1] for p in points]
+
+    def shard_for(self, organization_id: Optional[str]) -> int:
+        if self.shard_count <= 1:
+            return 0
+        idx = bisect.bisect(self._keys, _hash(organization_id or SHARED_TENANT)) % len(self._keys)
+        return self._shards[idx]
+
+
+def shard_directory(shard: int) -> str:
+    return os.path.join(SHARD_ROOT, f"shard-{shard:02d}")
+
+
+class ShardRouter:
+    def __init__(self, shard_count: int = SHARD_COUNT):
+        self.ring = ConsistentHashRing(shard_count)
+        self.shard_count = shard_count
+        self._stores = [
+            LazyResource(f"vectorstore_shard_{shard}", lambda shard=shard: self._open_shard(shard), required_for_ready=False)
+            for shard in range(shard_count)
+        ]
+
+    @staticmethod
+    def _open_shard(shard: int):
+        from langchain_chroma import Chroma
+        from .chroma_utils import get_chroma_settings
+        return Chroma(**{**get_chroma_settings(), "persist_directory": shard_directory(shard)})
+
+    def store(self, shard: int):
+        return self._stores[shard].get()
+
+    def store_for(self, organization_id: Optional[str]):
+        """Store an organization's documents are written to"""
+        return self.store(self.ring.shard_for(organization_id))
+
+    def shards_for_search(self, organization_id: Optional[str]) -> List[int]:
+        """The tenant's shard and the shared documents' shard; all shards without a tenant"""
+        if not organization_id:
+            return list(range(self.shard_count))
+        return sorted({self.ring.shard_for(organization_id), self.ring.shard_for(SHARED_TENANT)})
+
+    def similarity_search(self, query_embedding: List[float], k: int, filter: Optional[Dict] = None,
+                          organization_id: Optional[str] = None) -> List[Tuple[Any, float]]:
+        """Search the relevant shards and merge the hits by distance (lower is closer)"""
+        hits = []
+        for shard in self.shards_for_search(organization_id):
+            hits.extend(self.store(shard).similarity_search_by_vector_with_relevance_scores(
+                query_embedding, k=k, filter=filter
+            ))
+        hits.sort(key=lambda hit: hit[1])
+        return hits[:k]
+
+    def stores_for_delete(self, organization_id: Optional[str]) -> List[Any]:
+        if organization_id:
+            return [self.store_for(organization_id)]
+        return [self.store(shard) for shard in range(self.shard_count)]
+
+    def status(self) -> Dict[str, Any]:
+        shards = []
+        for shard in range(self.shard_count):
+            try:
+                count = self.store(shard)._collection.count()
+            except Exception as e:
+                count = f"error: {e}"
+            shards.append({"shard": shard, "directory": shard_directory(shard), "chunks": count})
+        return {"shard_count": self.shard_count, "shards": shards}
+
+
+_router: Optional[ShardRouter] = None
+
+
+def sharding_enabled() -> bool:
+    return SHARD_COUNT > 1
+
+
+def get_shard_router() -> ShardRouter:
+    global _router
+    if _router is None:
+        _router = ShardRouter()
+    return _router
+
+
+def _move_misplaced(source, source_label: str, router: ShardRouter, source_shard: Optional[int],
+                    batch_size: int) -> int:
+    """Move vectors whose tenant hashes to another shard; embeddings are copied, not recomputed"""
+    moved = 0
+    offset = 0
+    while True:
+        batch = source._collection.get(include=["embeddings", "metadatas", "documents"],
+                                       limit=batch_size, offset=offset)
+        ids = batch.get("ids") or []
+        if not ids:
+            break
+
+        by_target: Dict[int, List[int]] = {}
+        for i, metadata in enumerate(batch["metadatas"]):
+            target = router.ring.shard_for((metadata or {}).get("organization_id"))
+            if target != source_shard:
+                by_target.setdefault(target, []).append(i)
+
+        moved_ids = []
+        for target, positions in by_target.items():
+            router.store(target)._collection.upsert(
+                ids=[ids[i] for i in positions],
+                embeddings=[batch["embeddings"][i] for i in positions],
+                metadatas=[batch["metadatas"][i] for i in positions],
+                documents=[batch["documents"][i] for i in positions],
+            )
+            moved_ids.extend(ids[i] for i in positions)
+        if moved_ids:
+            source._collection.delete(ids=moved_ids)
+            moved += len(moved_ids)
+            logger.info(f"Moved {len(moved_ids)} chunks out of {source_label}")
+        # Deleted rows shift the remaining ones down
+        offset += len(ids) - len(moved_ids)
+    return moved
+
+
+def rebalance(batch_size: int = 500, include_legacy: bool = True) -> Dict[str, int]:
+    """
+    Move every chunk to the shard its organization hashes to, from the legacy
+    single store and from shards that no longer own it. Index writes are
+    quiesced for the duration.
+    """
+    from .chroma_utils import get_vectorstore
+
+    router = get_shard_router()
+    stats = {}
+    with index_write_gate.quiesced(timeout=3600):
+        if include_legacy:
+            stats["legacy"] = _move_misplaced(get_vectorstore(), "legacy store", router, None, batch_size)
+        for shard in range(router.shard_count):
+            stats[f"shard-{shard:02d}"] = _move_misplaced(router.store(shard), f"shard {shard}", router, shard, batch_size)
+    logger.info(f"Rebalance finished: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma tenant shard management")
+    parser.add_argument("command", choices=["status", "rebalance"])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not drain the legacy single store")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not sharding_enabled():
+        print("ℹ Sharding is disabled (set RAG_CHROMA_SHARDS > 1)")
+        return
+    if args.command == "status":
+        for shard in get_shard_router().status()["shards"]:
+            print(f"shard {shard['shard']:>2}  {shard['chunks']:>8} chunks  {shard['directory']}")
+    else:
+        stats = rebalance(args.batch_size, include_legacy=not args.skip_legacy)
+        print(f"✅ Moved {sum(stats.values())} chunks: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Consistent index snapshots: the Chroma persist directory, rag_app.db and
+users.db captured together while index writes are quiesced, so a restore
+never leaves vectors pointing at missing document_store rows (or the reverse)
+and never needs a full re-embedding.
+
+Snapshots live in RAG_SNAPSHOT_DIR as numbered generations:
+
+    gen-000007/
+        manifest.json      generation, parent, counts, SHA-256 per file
+        chroma_db/
+        databases/rag_app.db
+        databases/users.db
+
+Usage (from src/, with the API's working directory):
+    python -m rag_api.snapshot create
+    python -m rag_api.snapshot list
+    python -m rag_api.snapshot restore [--generation 7]
+"""
+import os
+import re
+import json
+import shutil
+import sqlite3
+import logging
+import argparse
+import datetime
+from typing import Any, Dict, List, Optional
+
+from .artifacts import checksum_tree, MANIFEST_NAME
+from .db_utils import DB_NAME
+from .write_gate import index_write_gate
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("RAG_SNAPSHOT_DIR", "snapshots")
+USERS_DB_PATH = os.getenv("RAG_USERS_DB", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "users.db"))
+CHROMA_SQLITE_NAME = "chroma.sqlite3"
+
+_GENERATION_DIR = re.compile(r"^gen-(\d+)$")
+
+
+class SnapshotError(Exception):
+    """Raised for missing or corrupt snapshots"""
+
+
+def default_sources() -> Dict[str, Any]:
+    """The live index: Chroma directory plus the SQLite databases to capture"""
+    from .chroma_utils import CHROMA_PERSIST_DIRECTORY
+    return {
+        "chroma_dir": CHROMA_PERSIST_DIRECTORY,
+        "databases": {"rag_app.db": DB_NAME, "users.db": USERS_DB_PATH},
+    }
+
+
+def _sqlite_backup(src_path: str, dst_path: str):
+    """Copy a live SQLite database with the online backup API"""
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _copy_chroma_dir(src_dir: str, dst_dir: str):
+    # HNSW segment files are plain copies; Chroma's own SQLite goes through the backup API
+    shutil.copytree(src_dir, dst_dir, ignore=shutil.ignore_patterns(CHROMA_SQLITE_NAME, "*-wal", "*-shm"))
+    chroma_sqlite = os.path.join(src_dir, CHROMA_SQLITE_NAME)
+    if os.path.exists(chroma_sqlite):
+        _sqlite_backup(chroma_sqlite, os.path.join(dst_dir, CHROMA_SQLITE_NAME))
+
+
+def _count_rows(db_path: str, table: str) -> Optional[int]:
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def list_snapshots(snapshot_root: str = SNAPSHOT_DIR) -> List[Dict[str, Any]]:
+    """Manifests of all complete snapshots, oldest generation first"""
+    snapshots = []
+    if not os.path.isdir(snapshot_root):
+        return snapshots
+    for name in os.listdir(snapshot_root):
+        match = _GENERATION_DIR.match(name)
+        manifest_path = os.path.join(snapshot_root, name, MANIFEST_NAME)
+        if match and os.path.isfile(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                snapshots.append({**json.load(f), "path": os.path.join(snapshot_root, name)})
+    return sorted(snapshots, key=lambda m: m["generation"])
+
+
+def create_snapshot(snapshot_root: str = SNAPSHOT_DIR, sources: Optional[Dict[str, Any]] = None,
+                    quiesce_timeout: float = 300.0) -> Dict[str, Any]:
+    """
+    Capture the index as a new generation. Index writes (in this and other
+    processes) are blocked for the duration of the copy.
+
+    Returns:
+        The snapshot manifest
+    """
+    sources = sources or default_sources()
+    os.makedirs(snapshot_root, exist_ok=True)
+
+    with index_write_gate.quiesced(timeout=quiesce_timeout):
+        existing = list_snapshots(snapshot_root)
+        parent = existing[-1]["generation"] if existing else None
+        generation = (parent or 0) + 1
+        final_dir = os.path.join(snapshot_root, f"gen-{generation:06d}")
+        work_dir = final_dir + ".tmp"
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(os.path.join(work_dir, "databases"))
+
+        started = datetime.datetime.utcnow()
+        if os.path.isdir(sources["chroma_dir"]):
+            _copy_chroma_dir(sources["chroma_dir"], os.path.join(work_dir, "chroma_db"))
+        databases = {}
+        for name, path in sources["databases"].items():
+            if os.path.exists(path):
+                _sqlite_backup(path, os.path.join(work_dir, "databases", name))
+                databases[name] = os.path.abspath(path)
+
+    # Checksumming happens after writes resume; the copies are already consistent
+    rag_db = os.path.join(work_dir, "databases", "rag_app.db")
+    manifest = {
+        "generation": generation,
+        "parent_generation": parent,
+        "created_at": started.isoformat(),
+        "chroma_dir": os.path.abspath(sources["chroma_dir"]),
+        "databases": databases,
+        "document_count": _count_rows(rag_db, "document_store"),
+        "chunk_count": _count_rows(rag_db, "document_chunks"),
+        "files": checksum_tree(work_dir),
+    }
+    with open(os.path.join(work_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(work_dir, final_dir)
+
+    logger.info(f"Created index snapshot generation {generation} ({manifest['document_count']} documents)")
+    return manifest
+
+
+def verify_snapshot(snapshot_dir: str) -> Dict[str, Any]:
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        raise SnapshotError(f"No manifest in snapshot {snapshot_dir}")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    actual = checksum_tree(snapshot_dir)
+    for rel, checksum in manifest.get("files", {}).items():
+        if actual.get(rel) != checksum:
+            raise SnapshotError(f"Snapshot file missing or modified: {rel}")
+    return manifest
+
+
+def _replace_file(src: str, dst: str):
+    tmp = dst + ".restore-tmp"
+    shutil.copy2(src, tmp)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(dst + suffix):
+            os.remove(dst + suffix)
+    os.replace(tmp, dst)
+
+
+def restore_snapshot(generation: Optional[int] = None, snapshot_root: str = SNAPSHOT_DIR,
+                     sources: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Restore a generation (default: the latest) over the live index. Files are
+    staged next to their targets and swapped in with renames; the previous
+    Chroma directory is kept as <chroma_dir>.pre-restore until the next restore.
+    """
+    sources = sources or default_sources()
+    snapshots = list_snapshots(snapshot_root)
+    if generation is not None:
+        snapshots = [s for s in snapshots if s["generation"] == generation]
+    if not snapshots:
+        raise SnapshotError(f"No snapshot {'generation ' + str(generation) if generation else ''} in {snapshot_root}")
+    snapshot_dir = snapshots[-1]["path"]
+    manifest = verify_snapshot(snapshot_dir)
+
+    with index_write_gate.quiesced():
+        for name, path in sources["databases"].items():
+            src = os.path.join(snapshot_dir, "databases", name)
+            if os.path.exists(src):
+                _replace_file(src, path)
+
+        src_chroma = os.path.join(snapshot_dir, "chroma_db")
+        if os.path.isdir(src_chroma):
+            chroma_dir = sources["chroma_dir"].rstrip("/")
+            staged = chroma_dir + ".restore-tmp"
+            previous = chroma_dir + ".pre-restore"
+            shutil.rmtree(staged, ignore_errors=True)
+            shutil.copytree(src_chroma, staged)
+            shutil.rmtree(previous, ignore_errors=True)
+            if os.path.isdir(chroma_dir):
+                os.rename(chroma_dir, previous)
+            os.rename(staged, chroma_dir)
+
+    _reset_in_process_state()
+    logger.info(f"Restored index snapshot generation {manifest['generation']}")
+    return manifest
+
+
+def _reset_in_process_state():
+    """Reopen Chroma and drop cached titles if this process had them loaded"""
+    try:
+        from .chroma_utils import vectorstore_resource, summary_vectorstore_resource
+        vectorstore_resource.reset()
+        summary_vectorstore_resource.reset()
+    except ImportError:
+        pass
+    from .title_index import invalidate_title_index
+    invalidate_title_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistent index snapshots")
+    parser.add_argument("command", choices=["create", "list", "restore"])
+    parser.add_argument("--generation", type=int, help="Generation to restore (default: latest)")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "create":
+        manifest = create_snapshot(args.snapshot_dir)
+        print(f"✅ Snapshot generation {manifest['generation']}: {manifest['document_count']} documents, "
+              f"{len(manifest['files'])} files")
+    elif args.command == "list":
+        for snapshot in list_snapshots(args.snapshot_dir):
+            print(f"gen {snapshot['generation']:>4}  {snapshot['created_at']}  "
+                  f"{snapshot['document_count']} documents  {snapshot['path']}")
+    else:
+        manifest = restore_snapshot(args.generation, args.snapshot_dir)
+        print(f"✅ Restored snapshot generation {manifest['generation']}; restart API workers to reopen Chroma")
+
+
+if __name__ == "__main__":
+    main()
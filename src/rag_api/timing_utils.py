@@ -120,6 +120,75 @@ class PerformanceTracker:
             percentage = (time_ms / total_time) * 100 if total_time > 0 else 0
             self.logger.info(f"  - {operation}: {time_ms:.2f}ms ({percentage:.1f}%)")
 
+class SearchTrace:
+    """
+    Structured trace of a single search request (explain mode).
+
+    Unlike PerformanceTracker, which only logs, the trace is returned to the
+    caller: per-stage timings, candidate counts at each stage and the reason
+    each result was kept or dropped.
+    """
+
+    # Cap on recorded keep/drop decisions so a trace stays a bounded payload
+    MAX_DECISIONS = 500
+
+    def __init__(self, query: str):
+        self.query = query
+        self.start_time = time.time()
+        self.stages: list = []
+        self.decisions: list = []
+        self.dropped_decisions = 0
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.info: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str, **details):
+        """Time a pipeline stage; details can be updated inside the block"""
+        entry = {'stage': name, 'ms': None, **details}
+        self.stages.append(entry)
+        start = time.time()
+        try:
+            yield entry
+        finally:
+            entry['ms'] = round((time.time() - start) * 1000, 2)
+
+    def add_stage(self, name: str, elapsed_ms: float, **details):
+        """Record a stage that was timed elsewhere"""
+        self.stages.append({'stage': name, 'ms': round(elapsed_ms, 2), **details})
+
+    def decision(self, item: str, kept: bool, reason: str, stage: str, score: Optional[float] = None):
+        """Record why a result was kept or dropped at a given stage"""
+        if len(self.decisions) >= self.MAX_DECISIONS:
+            self.dropped_decisions += 1
+            return
+        entry = {'item': item, 'kept': kept, 'reason': reason, 'stage': stage}
+        if score is not None:
+            entry['score'] = round(float(score), 4)
+        self.decisions.append(entry)
+
+    def count(self, stage: str, **counts: int):
+        """Record candidate counts at a stage (e.g. before/after a filter)"""
+        self.counts.setdefault(stage, {}).update(counts)
+
+    def note(self, key: str, value: Any):
+        """Attach a free-form fact to the trace (cache bypass, fallback used, ...)"""
+        self.info[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        total_ms = (time.time() - self.start_time) * 1000
+        stage_ms = [s for s in self.stages if s.get('ms') is not None]
+        slowest = max(stage_ms, key=lambda s: s['ms'])['stage'] if stage_ms else None
+        return {
+            'query': self.query,
+            'total_ms': round(total_ms, 2),
+            'slowest_stage': slowest,
+            'stages': self.stages,
+            'candidate_counts': self.counts,
+            'decisions': self.decisions,
+            'decisions_truncated': self.dropped_decisions,
+            'info': self.info
+        }
+
 # Thread-local storage for performance trackers
 _thread_local = threading.local()
 
@@ -0,0 +1,265 @@
+"""
+Title index: document titles, headings and section outlines extracted once at
+ingest and served from an in-memory per-organization lookup (prefix trie plus
+fuzzy scoring), so title-oriented questions never touch chunk text at query time.
+Every process (prefork workers, indexers) drops its cached lookups once the
+document_titles generation counter moves, checked at most every
+RAG_TITLE_INDEX_CHECK_INTERVAL seconds.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from .db_utils import upsert_document_title, get_document_titles, delete_document_title, get_document_titles_generation
+
+try:
+    from rapidfuzz import fuzz, process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    from difflib import SequenceMatcher
+    RAPIDFUZZ_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Minimum fuzzy score (0-100) for a title to count as a match
+TITLE_MATCH_CUTOFF = float(os.getenv("RAG_TITLE_MATCH_CUTOFF", "80"))
+# Cap on headings kept per document
+MAX_HEADINGS = 200
+# Shorter queries would prefix-match half of the titles
+MIN_PREFIX_LENGTH = 3
+# Minimum seconds between checks for title changes made by other processes
+CHECK_INTERVAL_SECONDS = float(os.getenv("RAG_TITLE_INDEX_CHECK_INTERVAL", "1"))
+
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_JSON_TITLE = re.compile(r"['\"]title['\"]\s*:\s*['\"]([^'\"]+)['\"]")
+
+
+def normalize_title(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    text = re.sub(r"[^\w\s]", " ", (text or "").lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _title_from_json_text(text: str) -> Optional[str]:
+    """Title of a JSON record (e.g. an exported product) stored as text"""
+    stripped = text.strip()
+    if not stripped.startswith('{'):
+        return None
+    try:
+        start, end = stripped.find("{"), stripped.rfind("}")
+        data = json.loads(stripped[start:end + 1])
+        title = data.get("title") if isinstance(data, dict) else None
+        if isinstance(title, str) and title.strip():
+            return title.strip()
+    except Exception:
+        pass
+    m = _JSON_TITLE.search(stripped[:2000])
+    return m.group(1).strip() if m else None
+
+
+def extract_document_outline(filename: str, documents: List[Any]) -> Dict[str, Any]:
+    """
+    Extract the title, headings and section outline of a loaded (unchunked) document.
+
+    The title comes from loader metadata (DOCX core properties, PDF info), then a
+    JSON "title" field, then the first top-level heading, and finally the filename.
+    """
+    title = None
+    outline = []
+
+    for doc in documents:
+        metadata = getattr(doc, 'metadata', {}) or {}
+        if not title and isinstance(metadata.get('title'), str) and metadata['title'].strip():
+            title = metadata['title'].strip()
+
+        text = getattr(doc, 'page_content', '') or ''
+        if not title:
+            title = _title_from_json_text(text)
+
+        for line in text.splitlines():
+            if len(outline) >= MAX_HEADINGS:
+                break
+            m = _MARKDOWN_HEADING.match(line.strip())
+            if m:
+                outline.append({"level": len(m.group(1)), "heading": m.group(2).strip()})
+
+    if not title and outline:
+        title = min(outline, key=lambda h: h["level"])["heading"]
+    if not title:
+        title = os.path.splitext(filename)[0].replace('_', ' ').strip()
+
+    return {
+        "title": title,
+        "headings": [h["heading"] for h in outline],
+        "outline": outline
+    }
+
+
+class _TitleTrie:
+    """Prefix trie over normalized titles and headings, mapping to filenames"""
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def insert(self, key: str, filename: str):
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault('$', set()).add(filename)
+
+    def search_prefix(self, prefix: str, limit: int = 20) -> Set[str]:
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        found: Set[str] = set()
+        stack = [node]
+        while stack and len(found) < limit:
+            current = stack.pop()
+            for key, child in current.items():
+                if key == '$':
+                    found.update(child)
+                else:
+                    stack.append(child)
+        return found
+
+
+class TitleIndex:
+    """In-memory title lookup for one organization"""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.trie = _TitleTrie()
+        self.title_by_file: Dict[str, str] = {}
+        self.files_by_title: Dict[str, List[str]] = {}
+        # Fuzzy choices: normalized title/heading -> filenames
+        self.choices: Dict[str, Set[str]] = {}
+
+        for entry in entries:
+            filename = entry['filename']
+            title = entry.get('title') or filename
+            self.title_by_file[filename] = title
+            self.files_by_title.setdefault(title, [])
+            if filename not in self.files_by_title[title]:
+                self.files_by_title[title].append(filename)
+            for text in [title, os.path.splitext(filename)[0]] + list(entry.get('headings') or []):
+                key = normalize_title(text)
+                if key:
+                    self.trie.insert(key, filename)
+                    self.choices.setdefault(key, set()).add(filename)
+
+    def lookup(self, query: str, limit: int = 5, score_cutoff: float = TITLE_MATCH_CUTOFF) -> List[Dict[str, Any]]:
+        """Files whose title or headings match the query, best first, with a 0-100 score"""
+        key = normalize_title(query)
+        if not key:
+            return []
+
+        scores: Dict[str, float] = {}
+        # A query that is the start of a title is a perfect match
+        if len(key) >= MIN_PREFIX_LENGTH:
+            for filename in self.trie.search_prefix(key, limit=limit * 4):
+                scores[filename] = 100.0
+
+        if RAPIDFUZZ_AVAILABLE:
+            matches = process.extract(key, list(self.choices.keys()), scorer=fuzz.WRatio,
+                                      limit=limit * 4, score_cutoff=score_cutoff)
+            scored = [(choice, score) for choice, score, _ in matches]
+        else:
+            scored = [(choice, SequenceMatcher(None, key, choice).ratio() * 100) for choice in self.choices]
+            scored = [(c, sc) for c, sc in scored if sc >= score_cutoff]
+
+        for choice, score in scored:
+            for filename in self.choices[choice]:
+                scores[filename] = max(scores.get(filename, 0.0), float(score))
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [
+            {"filename": filename, "title": self.title_by_file.get(filename), "score": score}
+            for filename, score in ranked
+        ]
+
+
+_indexes: Dict[str, TitleIndex] = {}
+_lock = threading.Lock()
+_generation: Optional[int] = None
+_checked = 0.0
+
+
+def _follow_title_changes():
+    """Drop the cached indexes once document_titles changed, in this or another process"""
+    global _generation, _checked
+    now = time.monotonic()
+    if now - _checked < CHECK_INTERVAL_SECONDS:
+        return
+    _checked = now
+    generation = get_document_titles_generation()
+    if generation != _generation:
+        with _lock:
+            _indexes.clear()
+            _generation = generation
+
+
+def get_title_index(organization_id: Optional[str] = None) -> TitleIndex:
+    """Get (building on first use) the title index of an organization"""
+    _follow_title_changes()
+    key = organization_id or ""
+    index = _indexes.get(key)
+    if index is None:
+        with _lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = TitleIndex(get_document_titles(organization_id))
+                _indexes[key] = index
+                logger.info(f"Built title index for org '{key}' with {len(index.title_by_file)} documents")
+    return index
+
+
+def invalidate_title_index(organization_id: Optional[str] = None):
+    """Drop cached indexes; legacy (org-less) documents are shared, so they drop all"""
+    with _lock:
+        if organization_id:
+            _indexes.pop(organization_id, None)
+            _indexes.pop("", None)
+        else:
+            _indexes.clear()
+
+
+def index_document_titles(file_id: int, filename: str, documents: List[Any], organization_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Extract and store the title and outline of a document at ingest time"""
+    try:
+        outline = extract_document_outline(filename, documents)
+        upsert_document_title(file_id, filename, organization_id or "", outline["title"], outline["headings"], outline["outline"])
+        invalidate_title_index(organization_id)
+        return outline
+    except Exception as e:
+        logger.warning(f"Could not index titles for {filename} (ID: {file_id}): {e}")
+        return None
+
+
+def remove_document_titles(file_id: int):
+    """Remove a document from the title index"""
+    try:
+        delete_document_title(file_id)
+        invalidate_title_index()
+    except Exception as e:
+        logger.warning(f"Could not remove titles for file_id {file_id}: {e}")
+
+
+def lookup_titles(query: str, organization_id: Optional[str] = None, limit: int = 5,
+                  score_cutoff: float = TITLE_MATCH_CUTOFF) -> List[Dict[str, Any]]:
+    """Resolve a title-oriented question to candidate files"""
+    return get_title_index(organization_id).lookup(query, limit=limit, score_cutoff=score_cutoff)
+
+
+def get_title_for_file(filename: str, organization_id: Optional[str] = None) -> Optional[str]:
+    """Precomputed title of a file"""
+    return get_title_index(organization_id).title_by_file.get(os.path.basename(filename or ''))
+
+
+def get_files_by_title(organization_id: Optional[str] = None) -> Dict[str, List[str]]:
+    """Mapping of document titles to the files carrying them"""
+    return get_title_index(organization_id).files_by_title
@@ -0,0 +1,89 @@
+"""
+Index write gate: every write to the document index (document_store rows,
+chunks, titles and Chroma vectors) holds a shared lock, and a snapshot holds
+it exclusively, so snapshots see no half-applied writes. The lock is an
+flock on a file next to rag_app.db, so it also quiesces other processes
+(API workers, indexers) writing the same index. Writes made by the thread
+holding the exclusive lock (e.g. the last catch-up before a blue/green flip)
+pass through.
+"""
+import os
+import time
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+INDEX_LOCK_FILE = os.getenv("RAG_INDEX_LOCK_FILE", ".index_write.lock")
+
+
+class IndexWriteGate:
+    def __init__(self, lock_file: str = INDEX_LOCK_FILE):
+        self.lock_file = lock_file
+        self._local = threading.local()
+        self._acquire_hooks = []
+
+    def _open(self):
+        return open(self.lock_file, "a+")
+
+    def on_acquire(self, hook):
+        """Call hook() each time a write takes the gate, e.g. to pick up state changed while it waited"""
+        self._acquire_hooks.append(hook)
+
+    @contextmanager
+    def writing(self):
+        """Shared hold for one index write; nested holds in a thread are free"""
+        depth = getattr(self._local, "depth", 0)
+        handle = None
+        if depth == 0:
+            handle = self._open()
+            fcntl.flock(handle, fcntl.LOCK_SH)
+        self._local.depth = depth + 1
+        try:
+            if handle is not None:
+                for hook in self._acquire_hooks:
+                    hook()
+            yield
+        finally:
+            self._local.depth = depth
+            if handle is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+
+    @contextmanager
+    def quiesced(self, timeout: float = 300.0):
+        """Exclusive hold: waits for in-flight writes to finish and blocks new ones from other threads and processes"""
+        handle = self._open()
+        deadline = time.monotonic() + timeout
+        depth = getattr(self._local, "depth", 0)
+        try:
+            while True:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Index writes did not quiesce within {timeout}s")
+                    time.sleep(0.05)
+            logger.info("Index writes quiesced")
+            # This thread's own writes nest inside the exclusive hold
+            self._local.depth = depth + 1
+            yield
+        finally:
+            self._local.depth = depth
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def writer(self, fn):
+        """Decorator holding the gate for the duration of an index write"""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.writing():
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+index_write_gate = IndexWriteGate()
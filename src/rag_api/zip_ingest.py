@@ -0,0 +1,353 @@
+"""
+Streaming ZIP ingestion. Entries are read one at a time straight from the
+archive (nothing is extracted to disk), filtered by type and size, stored in
+document_store as documents of their own and handed to the bulk reindex
+pipeline, whose parser processes work on earlier entries while later ones are
+still being read. Every entry's status (skipped, parsing, indexed, failed) and
+error is tracked on a ZipIngestion, which uploads expose at
+GET /files/archives/{ingestion_id}.
+
+Zip-bomb protection counts decompressed bytes: the declared sizes of the
+selected entries are checked before anything is read, and reading stops as
+soon as an entry exceeds RAG_ZIP_MAX_ENTRY_BYTES or the archive exceeds
+RAG_ZIP_MAX_TOTAL_BYTES, whatever the headers claim.
+
+    python -m rag_api.zip_ingest archive.zip --organization <org_id>
+"""
+import io
+import os
+import time
+import uuid
+import zipfile
+import logging
+import argparse
+import threading
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from cachetools import TTLCache
+
+from .bulk_reindex import BulkReindexer, PARSE_PROCESSES
+from .db_utils import insert_document_record, delete_document_record, get_document_info_by_filename
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = ['.pdf', '.docx', '.doc', '.html', '.txt', '.md']
+# Entries larger than this (declared or actually decompressed) are not ingested
+MAX_ENTRY_BYTES = int(os.getenv("RAG_ZIP_MAX_ENTRY_BYTES", str(100 * 1024 * 1024)))
+# Decompressed bytes allowed per archive
+MAX_TOTAL_BYTES = int(os.getenv("RAG_ZIP_MAX_TOTAL_BYTES", str(2 * 1024 * 1024 * 1024)))
+MAX_ENTRIES = int(os.getenv("RAG_ZIP_MAX_ENTRIES", "10000"))
+ZIP_PROCESSES = int(os.getenv("RAG_ZIP_PROCESSES", str(PARSE_PROCESSES)))
+READ_BLOCK_BYTES = 1024 * 1024
+
+# Finished ingestions stay queryable for an hour
+_ingestions: TTLCache = TTLCache(maxsize=256, ttl=3600)
+_ingestions_lock = threading.Lock()
+
+
+class ZipBombError(ValueError):
+    """The archive decompresses to more than the configured limits"""
+
+
+def decode_entry_name(info: zipfile.ZipInfo) -> str:
+    """Entry name, repairing UTF-8 names stored without the UTF-8 flag (which zipfile reads as cp437)"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def select_entries(zip_ref: zipfile.ZipFile, allowed_extensions: Optional[List[str]] = None,
+                   max_entry_bytes: int = MAX_ENTRY_BYTES, max_total_bytes: int = MAX_TOTAL_BYTES,
+                   max_entries: int = MAX_ENTRIES) -> Tuple[List[Tuple[zipfile.ZipInfo, str]], List[Dict[str, Any]]]:
+    """
+    Entries of an archive to ingest, from the central directory alone.
+
+    Returns:
+        (info, decoded name) of the selected entries, and the skipped entries with reasons
+
+    Raises:
+        ZipBombError: If the selected entries declare more than max_total_bytes or number more than max_entries
+    """
+    allowed_extensions = allowed_extensions or ALLOWED_EXTENSIONS
+    selected, skipped = [], []
+    declared_bytes = 0
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+        name = decode_entry_name(info)
+        filename = os.path.basename(name)
+        ext = os.path.splitext(filename)[1].lower()
+        if name.startswith('__MACOSX/') or filename.startswith('._'):
+            reason = "archive metadata"
+        elif ext not in allowed_extensions:
+            reason = f"unsupported file type {ext or '(none)'}"
+        elif info.file_size > max_entry_bytes:
+            reason = f"larger than {max_entry_bytes} bytes"
+        else:
+            reason = None
+        if reason:
+            skipped.append({"entry": name, "filename": filename, "status": "skipped", "reason": reason})
+            continue
+
+        if len(selected) >= max_entries:
+            raise ZipBombError(f"Archive has more than {max_entries} supported entries")
+        declared_bytes += info.file_size
+        if declared_bytes > max_total_bytes:
+            raise ZipBombError(f"Archive declares more than {max_total_bytes} uncompressed bytes")
+        selected.append((info, name))
+    return selected, skipped
+
+
+class ArchiveBudget:
+    """Decompressed bytes of one archive, checked against the limits while entries are read"""
+
+    def __init__(self, max_entry_bytes: int = MAX_ENTRY_BYTES, max_total_bytes: int = MAX_TOTAL_BYTES):
+        self.max_entry_bytes = max_entry_bytes
+        self.max_total_bytes = max_total_bytes
+        self.total_bytes = 0
+
+    def read_entry(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, sink: Optional[BinaryIO] = None) -> BinaryIO:
+        """
+        Decompress an entry into sink (default: memory) block by block.
+
+        Returns:
+            The sink, positioned at its start
+
+        Raises:
+            ZipBombError: As soon as the entry or the archive exceeds its limit
+        """
+        sink = sink if sink is not None else io.BytesIO()
+        entry_bytes = 0
+        with zip_ref.open(info) as entry:
+            for block in iter(lambda: entry.read(READ_BLOCK_BYTES), b""):
+                entry_bytes += len(block)
+                self.total_bytes += len(block)
+                if entry_bytes > self.max_entry_bytes:
+                    raise ZipBombError(f"{info.filename} decompresses to more than {self.max_entry_bytes} bytes")
+                if self.total_bytes > self.max_total_bytes:
+                    raise ZipBombError(f"Archive decompresses to more than {self.max_total_bytes} bytes")
+                sink.write(block)
+        sink.seek(0)
+        return sink
+
+
+class ZipIngestion:
+    """Progress of one archive: the status of every entry and the pipeline counters"""
+
+    def __init__(self, archive_name: str, organization_id: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.archive_name = archive_name
+        self.organization_id = organization_id
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.bytes_read = 0
+        self.pipeline: Dict[str, Any] = {}
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def set_entry(self, name: str, **fields):
+        with self._lock:
+            self.entries.setdefault(name, {"entry": name, "filename": os.path.basename(name)}).update(fields)
+
+    def set_pipeline(self, snapshot: Dict[str, Any]):
+        self.pipeline = snapshot
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+
+    def snapshot(self, include_entries: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            entries = [dict(entry) for entry in self.entries.values()]
+        counts: Dict[str, int] = {}
+        for entry in entries:
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        state = {
+            "ingestion_id": self.id,
+            "archive_name": self.archive_name,
+            "organization_id": self.organization_id,
+            "status": self.status,
+            "error": self.error,
+            "entries_total": len(entries),
+            "entry_counts": counts,
+            "bytes_read": self.bytes_read,
+            "elapsed_seconds": round((self.finished or time.time()) - self.started, 1),
+            "pipeline": self.pipeline,
+        }
+        if include_entries:
+            state["entries"] = entries
+        return state
+
+
+class ZipIngester:
+    def __init__(self, processes: int = ZIP_PROCESSES, max_entry_bytes: int = MAX_ENTRY_BYTES,
+                 max_total_bytes: int = MAX_TOTAL_BYTES, max_entries: int = MAX_ENTRIES,
+                 allowed_extensions: Optional[List[str]] = None):
+        """
+        Args:
+            processes: Parser processes of the bulk reindex pipeline
+            max_entry_bytes: Largest entry ingested, in decompressed bytes
+            max_total_bytes: Decompressed bytes allowed per archive
+            max_entries: Most supported entries allowed per archive
+            allowed_extensions: Entry types ingested (default: ALLOWED_EXTENSIONS)
+        """
+        self.processes = max(1, processes)
+        self.max_entry_bytes = max_entry_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_entries = max_entries
+        self.allowed_extensions = allowed_extensions or ALLOWED_EXTENSIONS
+
+    def run(self, source: Union[str, bytes, BinaryIO], archive_name: str, organization_id: Optional[str] = None,
+            metadata: Optional[Dict[str, str]] = None, ingestion: Optional[ZipIngestion] = None) -> Dict[str, Any]:
+        """
+        Ingest every supported entry of an archive as a separate document.
+
+        Args:
+            source: Path, bytes or seekable stream of the archive
+
+        Returns:
+            The ingestion snapshot, with the status and error of every entry
+
+        Raises:
+            zipfile.BadZipFile: If the source is not a ZIP archive
+            ZipBombError: If the central directory already exceeds the limits
+        """
+        ingestion = ingestion or register_ingestion(archive_name, organization_id)
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+
+        try:
+            with zipfile.ZipFile(source, 'r') as zip_ref:
+                selected, skipped = select_entries(zip_ref, self.allowed_extensions, self.max_entry_bytes,
+                                                   self.max_total_bytes, self.max_entries)
+                for entry in skipped:
+                    ingestion.set_entry(entry["entry"], status="skipped", reason=entry["reason"])
+                logger.info(f"Ingesting {len(selected)} of {len(zip_ref.infolist())} entries of {archive_name} "
+                            f"({len(skipped)} skipped)")
+                if selected:
+                    self._ingest(zip_ref, selected, ingestion, organization_id, metadata)
+        except Exception as e:
+            ingestion.finish("failed", str(e))
+            logger.error(f"ZIP ingestion of {archive_name} failed: {e}")
+            raise
+
+        if ingestion.status == "running":
+            ingestion.finish("done")
+        state = ingestion.snapshot()
+        logger.info(f"ZIP ingestion of {archive_name} {ingestion.status}: {state['entry_counts']} "
+                    f"in {state['elapsed_seconds']}s")
+        return state
+
+    def _ingest(self, zip_ref: zipfile.ZipFile, selected: List[Tuple[zipfile.ZipInfo, str]], ingestion: ZipIngestion,
+                organization_id: Optional[str], metadata: Optional[Dict[str, str]]):
+        entry_names: Dict[int, str] = {}
+
+        def items() -> Iterator[Dict[str, Any]]:
+            # Runs on the pipeline's dispatch loop, so entries are only read as parsers free up
+            budget = ArchiveBudget(self.max_entry_bytes, self.max_total_bytes)
+            for info, name in selected:
+                filename = os.path.basename(name)
+                if get_document_info_by_filename(filename, organization_id=organization_id) is not None:
+                    ingestion.set_entry(name, status="skipped", reason="a file with this name already exists")
+                    continue
+                try:
+                    content = budget.read_entry(zip_ref, info).getvalue()
+                except ZipBombError as e:
+                    ingestion.set_entry(name, status="failed", reason=str(e))
+                    ingestion.finish("aborted", str(e))
+                    logger.error(f"Stopped reading {ingestion.archive_name}: {e}")
+                    return
+                except Exception as e:
+                    ingestion.set_entry(name, status="failed", reason=f"Could not read entry: {e}")
+                    continue
+                finally:
+                    ingestion.bytes_read = budget.total_bytes
+
+                file_id = insert_document_record(filename, content, organization_id=organization_id)
+                if not file_id:
+                    ingestion.set_entry(name, status="failed", reason="Could not store document")
+                    continue
+                entry_names[file_id] = name
+                ingestion.set_entry(name, status="parsing", file_id=file_id, size=len(content))
+                yield {"file_id": file_id, "filename": filename, "organization_id": organization_id, "metadata": metadata}
+
+        def on_file(result: Dict[str, Any]):
+            name = entry_names.get(result["file_id"], result["filename"])
+            if result["status"] == "indexed":
+                ingestion.set_entry(name, status="indexed", chunks=result["chunks"])
+            else:
+                ingestion.set_entry(name, status="failed", reason=result["reason"])
+                delete_document_record(result["file_id"])
+
+        reindexer = BulkReindexer(min(self.processes, len(selected)), progress_callback=ingestion.set_pipeline,
+                                  file_callback=on_file)
+        result = reindexer.run(items(), total_files=len(selected), job_name=archive_name,
+                              organization_id=organization_id)
+        # Per-file results are already on the entries
+        ingestion.set_pipeline({key: value for key, value in result.items()
+                                if key not in ("indexed_documents", "failed_documents", "replaced_documents")})
+
+
+def register_ingestion(archive_name: str, organization_id: Optional[str] = None) -> ZipIngestion:
+    ingestion = ZipIngestion(archive_name, organization_id)
+    with _ingestions_lock:
+        _ingestions[ingestion.id] = ingestion
+    return ingestion
+
+
+def get_ingestion(ingestion_id: str) -> Optional[ZipIngestion]:
+    with _ingestions_lock:
+        return _ingestions.get(ingestion_id)
+
+
+def list_ingestions() -> List[ZipIngestion]:
+    with _ingestions_lock:
+        return list(_ingestions.values())
+
+
+def start_zip_ingestion(archive_path: str, archive_name: str, organization_id: Optional[str] = None,
+                        metadata: Optional[Dict[str, str]] = None, remove_archive: bool = False,
+                        on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> ZipIngestion:
+    """Ingest an archive on a background thread; poll the returned ingestion for progress"""
+    ingestion = register_ingestion(archive_name, organization_id)
+
+    def run():
+        try:
+            state = ZipIngester().run(archive_path, archive_name, organization_id, metadata, ingestion=ingestion)
+            if on_done:
+                on_done(state)
+        except Exception:
+            pass  # Recorded on the ingestion
+        finally:
+            if remove_archive:
+                try:
+                    os.remove(archive_path)
+                except OSError:
+                    pass
+
+    threading.Thread(target=run, name=f"rag-zip-{ingestion.id[:8]}", daemon=True).start()
+    return ingestion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest the documents of a ZIP archive")
+    parser.add_argument("archive")
+    parser.add_argument("--organization", required=True)
+    parser.add_argument("--processes", type=int, default=ZIP_PROCESSES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    state = ZipIngester(args.processes).run(args.archive, os.path.basename(args.archive), args.organization)
+    for entry in state["entries"]:
+        print(f"{entry['status']:>8}  {entry['entry']}  {entry.get('reason') or ''}")
+    print(f"✅ {state['status']}: {state['entry_counts']} in {state['elapsed_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
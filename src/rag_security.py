@@ -7,6 +7,7 @@ import sys
 import os
 from typing import List, Optional, Dict, Any
 import logging
+import time
 import uuid
 
 # Add rag_api to path
@@ -14,32 +15,92 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'rag_api'))
 
 from userdb import get_user_allowed_filenames, check_file_access
 
-# Import chroma_utils components with explicit path handling
+# Import chroma_utils components with explicit path handling; the vectorstore
+# itself is opened lazily on first use
 try:
     import rag_api.chroma_utils as chroma_utils
-    vectorstore = chroma_utils.vectorstore
 except (ImportError, NameError, AttributeError) as e:
-    print(f"Warning: Could not import vectorstore: {e}")
-    vectorstore = None
+    print(f"Warning: Could not import chroma_utils: {e}")
     chroma_utils = None
 
 from typing import List, Dict, Any
 import os
-from rag_api.timing_utils import Timer, PerformanceTracker, time_block
+from rag_api.timing_utils import Timer, PerformanceTracker, SearchTrace, time_block
+from rag_api.resource_manager import resource_manager
 
 logger = logging.getLogger(__name__)
 
-async def get_relevant_files_for_query(username: str, query: str, k: int = 20, organization_id: str = None) -> List[Dict[str, Any]]:
+def normalize_access_filename(name: str, allowed_files: Optional[List[str]] = None) -> str:
+    """Normalize a filename for comparison against a user's allowed files"""
+    if not name:
+        return ''
+    try:
+        # Handle different path formats (both forward and backslashes)
+        name = name.replace('\\', '/')
+        # Get just the filename without path
+        base = os.path.basename(name)
+        # Convert to lowercase for case-insensitive comparison
+        normalized = base.lower()
+        # Remove any URL parameters or fragments
+        normalized = normalized.split('?')[0].split('#')[0]
+        # Remove any temporary prefixes/suffixes if needed
+        if normalized.startswith('temp_') and not any(f.startswith('temp_') for f in allowed_files or []):
+            normalized = normalized[5:]
+        return normalized
+    except Exception as e:
+        logger.error(f"Error normalizing filename '{name}': {str(e)}")
+        return ''
+
+async def get_file_access_checker(username: str):
+    """
+    Build a filename -> bool access check for a user.
+    Admins (allowed files None) can access everything.
+    """
+    allowed_files = await get_user_allowed_filenames(username)
+    if allowed_files is None:
+        return lambda filename: True
+    allowed_files_set = {normalize_access_filename(f, allowed_files) for f in allowed_files if f}
+
+    def is_allowed(filename: str) -> bool:
+        norm_name = normalize_access_filename(filename, allowed_files)
+        return bool(norm_name) and norm_name in allowed_files_set
+
+    return is_allowed
+
+async def _search_documents(query: str, organization_id: Optional[str], load_context: bool,
+                            trace: Optional[SearchTrace], **params) -> Dict[str, Any]:
+    """
+    Run search_documents on the search pool. The search sees no caller identity
+    (access filtering is applied per caller to its results), so concurrent
+    identical searches share one run. Traced searches run on their own so the
+    trace reflects this request's work.
+    """
+    from rag_api.chroma_utils import search_documents
+    from query_coalescing import query_coalescer, make_query_key
+
+    def _search():
+        # (searches run on the CPU-budgeted search pool, off the event loop)
+        return resource_manager.run("search", search_documents, query=query, organization_id=organization_id,
+                                    load_context=load_context, trace=trace, **params)
+
+    if trace is not None:
+        return await _search()
+    key = make_query_key("search", query, organization_id, None, load_context=load_context, **params)
+    return await query_coalescer.run(key, _search)
+
+
+async def get_relevant_files_for_query(username: str, query: str, k: int = 20, organization_id: str = None,
+                                      trace: Optional[SearchTrace] = None, load_context: bool = True) -> List[Dict[str, Any]]:
     """
     Get list of relevant files and chunks for a query that the user has access to.
     Uses the enhanced search_documents function with filename similarity and semantic search.
+    If a SearchTrace is given, ACL decisions and search stages are recorded on it.
+    With load_context=False, chunks are returned without their parent windows.
     """
     logger = logging.getLogger(__name__)
     tracker = PerformanceTracker(f"get_relevant_files_for_query('{username}', '{query[:50]}...')", logger)
 
     try:
-        from rag_api.chroma_utils import search_documents
-
         # Get user's file access permissions
         tracker.start_operation("get_user_permissions")
         # Returns None for admins (full access) or a list of allowed files
@@ -48,24 +109,7 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
 
         # Normalize filenames for comparison
         def normalize_filename(name: str) -> str:
-            if not name:
-                return ''
-            try:
-                # Handle different path formats (both forward and backslashes)
-                name = name.replace('\\', '/')
-                # Get just the filename without path
-                base = os.path.basename(name)
-                # Convert to lowercase for case-insensitive comparison
-                normalized = base.lower()
-                # Remove any URL parameters or fragments
-                normalized = normalized.split('?')[0].split('#')[0]
-                # Remove any temporary prefixes/suffixes if needed
-                if normalized.startswith('temp_') and not any(f.startswith('temp_') for f in allowed_files or []):
-                    normalized = normalized[5:]
-                return normalized
-            except Exception as e:
-                logger.error(f"Error normalizing filename '{name}': {str(e)}")
-                return ''
+            return normalize_access_filename(name, allowed_files)
 
         # If user is not an admin (allowed_files is a list), create a set for faster lookups
         # For admins (allowed_files is None), they can access all files
@@ -84,7 +128,7 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
 
         tracker.start_operation("search_documents")
         # First pass: Get broad results with lower threshold
-        search_results = search_documents(
+        search_results = await _search_documents(
             query=query,
             similarity_threshold=0.2,  # Lower threshold to get more potential matches
             filename_similarity_threshold=0.6,  # Slightly lower for broader filename matching
@@ -94,7 +138,9 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
             min_relevance_score=0.25,  # Slightly lower minimum score
             filename_match_boost=1.3,  # Moderate boost for filename matches
             language='russian',  # Explicitly set language for better tokenization
-            organization_id=organization_id
+            organization_id=organization_id,
+            load_context=load_context,
+            trace=trace
         )
         
         # Log initial search results
@@ -103,7 +149,9 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
         # If we don't have enough high-confidence results, try a more permissive search
         if len(search_results.get('semantic_results', [])) < k:
             logger.info("Performing fallback search with expanded parameters")
-            fallback_results = search_documents(
+            if trace is not None:
+                trace.note('fallback_search', True)
+            fallback_results = await _search_documents(
                 query=query,
                 similarity_threshold=0.15,  # Even lower threshold
                 filename_similarity_threshold=0.5,
@@ -113,7 +161,9 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
                 min_relevance_score=0.2,
                 filename_match_boost=1.1,
                 language='russian',
-                organization_id=organization_id
+                organization_id=organization_id,
+                load_context=load_context,
+                trace=trace
             )
             # Log fallback results
             logger.info(f"Fallback search results - Semantic matches: {len(fallback_results.get('semantic_results', []))}, Filename matches: {len(fallback_results.get('filename_matches', {}))}")
@@ -141,6 +191,7 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
 
         # Process semantic results with enhanced context
         tracker.start_operation("process_semantic_results")
+        acl_started = time.time()
         relevant_files = []
         seen_files = set()
         file_chunks = {}
@@ -162,6 +213,8 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
                 if not norm_name:
                     logger.debug(f"Skipping file {file_source} - could not normalize filename")
                     total_skipped += 1
+                    if trace is not None:
+                        trace.decision(file_source, False, 'unnormalizable_filename', 'acl_filter')
                     continue
                     
                 if norm_name not in allowed_files_set:
@@ -169,6 +222,8 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
                     logger.debug(f"  Normalized: {norm_name!r}")
                     logger.debug(f"  Allowed files: {allowed_files_set}")
                     total_skipped += 1
+                    if trace is not None:
+                        trace.decision(file_source, False, 'acl_denied', 'acl_filter')
                     continue
                     
                 logger.info(f"File {file_source} is in allowed list (normalized: {norm_name})")
@@ -179,17 +234,23 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
                 file_chunks[file_source] = []
                 
             # Add chunk with metadata
+            # Child chunks matched the query; the LLM gets the surrounding parent window
             chunk_data = {
-                "content": doc.page_content,
+                "content": doc.metadata.get('parent_window') or doc.page_content,
                 "score": doc.metadata.get('similarity_score', 0.5),
                 "metadata": {
                     k: v for k, v in doc.metadata.items()
-                    if k not in ['filename', 'source']  # Exclude redundant fields
+                    if k not in ['filename', 'source', 'parent_window', 'full_file_content']  # Exclude redundant fields
                 }
             }
             file_chunks[file_source].append(chunk_data)
         
         logger.info(f"Processed {len(search_results.get('semantic_results', []))} documents - Allowed: {total_allowed}, Skipped: {total_skipped}")
+        if trace is not None:
+            trace.add_stage("acl_filter", (time.time() - acl_started) * 1000,
+                            restricted=allowed_files_set is not None)
+            trace.count('acl_filter', before=len(search_results.get('semantic_results', [])),
+                        after=sum(len(c) for c in file_chunks.values()), denied=total_skipped)
 
         # Process each file's chunks for optimal context
         for file_source, chunks in file_chunks.items():
@@ -274,6 +335,9 @@ async def get_relevant_files_for_query(username: str, query: str, k: int = 20, o
         # Sort by relevance score (higher is better) and take top k
         relevant_files.sort(key=lambda x: x["relevance_score"], reverse=True)
         result = relevant_files[:k]
+        if trace is not None:
+            trace.count('files', relevant=len(relevant_files), returned=len(result),
+                        filename_matches_added=filename_matches_added)
         
         # Log final results
         logger.info(f"Returning {len(result)} relevant files")
@@ -367,6 +431,7 @@ async def get_filtered_rag_context(query: str, username: str, k: int = 3) -> Lis
     """
     try:
         # Check if vectorstore is available
+        vectorstore = chroma_utils.get_vectorstore() if chroma_utils else None
         if vectorstore is None:
             logger.error("Vectorstore not available for RAG context retrieval")
             return []
@@ -477,14 +542,16 @@ class SecureRAGRetriever:
         self.organization_id = organization_id
         self.rag_chain = None
     
-    async def get_relevant_documents(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    async def get_relevant_documents(self, query: str, k: int = 5, trace: Optional[SearchTrace] = None,
+                                     load_context: bool = True) -> List[Dict[str, Any]]:
         """
         Get relevant documents for a query that the user has access to.
         Returns a list of document dictionaries with metadata and multiple chunks per file.
         """
         logger = logging.getLogger(__name__)
         try:
-            files = await get_relevant_files_for_query(self.username, query, k, organization_id=self.organization_id)
+            files = await get_relevant_files_for_query(self.username, query, k, organization_id=self.organization_id,
+                                                       trace=trace, load_context=load_context)
             
             # Convert to list of documents with proper format
             documents = []
@@ -510,7 +577,8 @@ class SecureRAGRetriever:
             logger.error(f"Error in get_relevant_documents for session {self.session_id}: {str(e)}")
             return []
     
-    async def invoke_secure_rag_chain(self, rag_chain, query: str, chat_history: List = None, model_type: str = "server", humanize: bool = True, skip_llm: bool = False):
+    async def invoke_secure_rag_chain(self, rag_chain, query: str, chat_history: List = None, model_type: str = "server", humanize: bool = True, skip_llm: bool = False,
+                                      trace: Optional[SearchTrace] = None, load_context: bool = True):
         """
         Invoke RAG chain with security filtering.
         Returns a dictionary with answer, source documents, and relevant files.
@@ -518,10 +586,12 @@ class SecureRAGRetriever:
         
         Args:
             skip_llm: If True, skip LLM generation and return only documents (for immediate results)
+            trace: Optional SearchTrace recording the retrieval pipeline (explain mode)
+            load_context: If False, skip loading parent windows (callers that don't return chunk content)
         """
         try:
             # Get relevant documents for the query
-            relevant_docs = await self.get_relevant_documents(query)
+            relevant_docs = await self.get_relevant_documents(query, trace=trace, load_context=load_context)
             
             if not relevant_docs:
                 return {
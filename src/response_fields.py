@@ -0,0 +1,133 @@
+"""
+Response Field Projection
+Lets clients choose which fields /query, /files/list and /files/content return
+(fields=immediate.files,immediate.snippets.source,...), with per-API-key
+defaults. Endpoints check wants() before loading data, so content nobody
+asked for is never fetched, not just stripped before serialization.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+from db_pool import get_db_connection, return_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Endpoints that honour field projection
+PROJECTABLE_ENDPOINTS = ("query", "files.list", "files.content")
+
+# Parsed fields: nested dict of path segments; True marks a fully included subtree
+FieldTree = Dict[str, Union["FieldTree", bool]]
+
+
+async def init_field_defaults_db():
+    conn = await get_db_connection()
+    try:
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS api_key_field_defaults (
+                key_id TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (key_id, endpoint)
+            )
+        ''')
+        await conn.commit()
+    finally:
+        await return_db_connection(conn)
+
+
+async def set_api_key_field_defaults(key_id: str, endpoint: str, fields: Optional[List[str]]):
+    """Set (or with None/empty, clear) the default fields of an API key for an endpoint"""
+    conn = await get_db_connection()
+    try:
+        if fields:
+            await conn.execute(
+                'INSERT OR REPLACE INTO api_key_field_defaults (key_id, endpoint, fields, updated_at) '
+                'VALUES (?, ?, ?, CURRENT_TIMESTAMP)',
+                (str(key_id), endpoint, ",".join(f.strip() for f in fields if f.strip()))
+            )
+        else:
+            await conn.execute(
+                'DELETE FROM api_key_field_defaults WHERE key_id = ? AND endpoint = ?',
+                (str(key_id), endpoint)
+            )
+        await conn.commit()
+    finally:
+        await return_db_connection(conn)
+
+
+async def get_api_key_field_defaults(key_id: str) -> Dict[str, List[str]]:
+    """Default fields of an API key, per endpoint"""
+    conn = await get_db_connection()
+    try:
+        cursor = await conn.execute(
+            'SELECT endpoint, fields FROM api_key_field_defaults WHERE key_id = ?',
+            (str(key_id),)
+        )
+        rows = await cursor.fetchall()
+        return {row[0]: row[1].split(",") for row in rows}
+    finally:
+        await return_db_connection(conn)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldTree]:
+    """
+    Parse a comma-separated list of dotted field paths into a field tree.
+    None or an empty string means "all fields".
+    """
+    if not fields or not fields.strip():
+        return None
+    tree: FieldTree = {}
+    for path in fields.split(","):
+        parts = [p for p in path.strip().split(".") if p]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break  # A parent path already includes everything below it
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return tree or None
+
+
+async def resolve_fields(user, endpoint: str, fields: Optional[str]) -> Optional[FieldTree]:
+    """Explicit fields win; otherwise API keys fall back to their stored defaults"""
+    if fields:
+        return parse_fields(fields)
+    if user and user[3] == "api_key":
+        try:
+            defaults = await get_api_key_field_defaults(user[0])
+            if endpoint in defaults:
+                return parse_fields(",".join(defaults[endpoint]))
+        except Exception as e:
+            logger.warning(f"Could not load field defaults for API key {user[0]}: {e}")
+    return None
+
+
+def wants(fields: Optional[FieldTree], path: str) -> bool:
+    """Whether anything at or below a dotted path was requested"""
+    if fields is None:
+        return True
+    node: Union[FieldTree, bool] = fields
+    for part in path.split("."):
+        if node is True:
+            return True
+        if part not in node:
+            return False
+        node = node[part]
+    return True
+
+
+def project(data: Any, fields: Optional[FieldTree]) -> Any:
+    """Keep only the requested fields; lists are projected element-wise"""
+    if fields is None or fields is True:
+        return data
+    if isinstance(data, list):
+        return [project(item, fields) for item in data]
+    if isinstance(data, dict):
+        return {key: project(value, fields[key]) for key, value in data.items() if key in fields}
+    return data
@@ -0,0 +1,175 @@
+"""
+Search Results Module
+Cursor-paginated and NDJSON-streamed search results.
+
+The ranking of a query is computed once and kept as a lightweight result set
+(ids, scores and snippets only). Pages and stream items load their context
+window lazily, one result at a time, so neither the server nor the client
+has to hold every hit's content at once.
+"""
+
+import base64
+import logging
+import os
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
+from cachetools import TTLCache
+from rag_api.resource_manager import resource_manager
+from rag_security import get_file_access_checker
+
+logger = logging.getLogger(__name__)
+
+# How long a ranked result set stays addressable by its cursors
+RESULT_SET_TTL = int(os.getenv("RAG_RESULT_SET_TTL", "600"))
+# Upper bound on the number of ranked results kept per query
+MAX_RANKED_RESULTS = int(os.getenv("RAG_MAX_RANKED_RESULTS", "200"))
+
+_result_sets = TTLCache(maxsize=1000, ttl=RESULT_SET_TTL)
+
+
+class CursorError(ValueError):
+    """Raised for malformed, expired or foreign cursors"""
+
+
+def encode_cursor(result_set_id: str, offset: int) -> str:
+    """Opaque cursor pointing at an offset of a ranked result set"""
+    raw = orjson.dumps({"rs": result_set_id, "o": offset})
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = orjson.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(data["rs"]), int(data["o"])
+    except Exception:
+        raise CursorError("Malformed cursor")
+
+
+def _rank(query: str, organization_id: Optional[str], max_results: int) -> List[Any]:
+    """Score and rank chunks without loading any context (parent windows, full files)"""
+    from rag_api.chroma_utils import search_documents
+
+    results = search_documents(
+        query=query,
+        similarity_threshold=0.2,
+        filename_similarity_threshold=0.6,
+        max_results=max_results,
+        max_chunks_per_file=5,
+        min_relevance_score=0.25,
+        filename_match_boost=1.3,
+        language='russian',
+        organization_id=organization_id,
+        load_context=False
+    )
+    return results.get('semantic_results', [])
+
+
+def _to_item(doc: Any, rank: int) -> Dict[str, Any]:
+    metadata = doc.metadata or {}
+    return {
+        "rank": rank,
+        "file_id": metadata.get('file_id'),
+        "chunk_index": metadata.get('chunk_index'),
+        "filename": metadata.get('filename', ''),
+        "source": metadata.get('source', ''),
+        "score": float(metadata.get('relevance_score', 0.0)),
+        "snippet": doc.page_content
+    }
+
+
+def _load_context(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the parent window of a ranked chunk (falls back to its snippet)"""
+    from rag_api.chroma_utils import get_parent_window
+
+    content = None
+    if item.get("file_id") is not None and item.get("chunk_index") is not None:
+        content = get_parent_window(item["file_id"], item["chunk_index"])
+    return {**item, "content": content or item["snippet"]}
+
+
+async def create_result_set(username: str, query: str, organization_id: Optional[str],
+                            max_results: int = MAX_RANKED_RESULTS) -> Dict[str, Any]:
+    """Rank a query once, keep only the hits the user may access, and cache the ranking"""
+    docs = await resource_manager.run("search", _rank, query, organization_id, min(max_results, MAX_RANKED_RESULTS))
+    is_allowed = await get_file_access_checker(username)
+
+    items = []
+    for doc in docs:
+        if is_allowed(doc.metadata.get('filename', '')):
+            items.append(_to_item(doc, len(items)))
+
+    result_set = {
+        "id": uuid.uuid4().hex,
+        "username": username,
+        "organization_id": organization_id,
+        "query": query,
+        "items": items
+    }
+    _result_sets[result_set["id"]] = result_set
+    return result_set
+
+
+def get_result_set(result_set_id: str, username: str) -> Dict[str, Any]:
+    result_set = _result_sets.get(result_set_id)
+    # Cursors are bound to the user that created them
+    if not result_set or result_set["username"] != username:
+        raise CursorError("Cursor expired or invalid")
+    return result_set
+
+
+async def get_results_page(username: str, query: Optional[str], organization_id: Optional[str],
+                           cursor: Optional[str] = None, page_size: int = 10,
+                           max_results: int = MAX_RANKED_RESULTS) -> Dict[str, Any]:
+    """
+    Get one page of ranked results. Without a cursor the query is ranked and the
+    first page returned; next_cursor addresses the following page (None at the end).
+    """
+    if cursor:
+        result_set_id, offset = decode_cursor(cursor)
+        result_set = get_result_set(result_set_id, username)
+    else:
+        result_set = await create_result_set(username, query, organization_id, max_results)
+        offset = 0
+
+    items = result_set["items"]
+    window = items[offset:offset + page_size]
+    results = [await resource_manager.run("io", _load_context, item) for item in window]
+
+    next_offset = offset + len(window)
+    return {
+        "query": result_set["query"],
+        "results": results,
+        "offset": offset,
+        "total": len(items),
+        "next_cursor": encode_cursor(result_set["id"], next_offset) if next_offset < len(items) else None
+    }
+
+
+async def stream_results_ndjson(username: str, query: str, organization_id: Optional[str],
+                                max_results: int = MAX_RANKED_RESULTS) -> AsyncIterator[bytes]:
+    """
+    Stream ranked results as NDJSON lines. The query is ranked in full first
+    (scores are only final once every candidate is scored); then each result
+    is ACL-checked, has its context loaded and is emitted on its own, so no
+    context is held beyond the result being sent.
+    """
+    count = 0
+    try:
+        docs = await resource_manager.run("search", _rank, query, organization_id, min(max_results, MAX_RANKED_RESULTS))
+        is_allowed = await get_file_access_checker(username)
+
+        for doc in docs:
+            if not is_allowed(doc.metadata.get('filename', '')):
+                continue
+            item = await resource_manager.run("io", _load_context, _to_item(doc, count))
+            count += 1
+            yield orjson.dumps({"type": "result", **item}) + b"\n"
+    except Exception as e:
+        logger.error(f"Error streaming search results for user {username}: {e}", exc_info=True)
+        yield orjson.dumps({"type": "error", "message": str(e)}) + b"\n"
+        return
+
+    yield orjson.dumps({"type": "end", "count": count}) + b"\n"
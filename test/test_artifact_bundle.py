@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline artifact bundle manifest.
+
+Tests that:
+1. A written manifest verifies and exposes the bundle paths
+2. Modified or missing bundle files are rejected
+3. With a bundle configured, the Hugging Face hub is offline from import on
+4. Chunkers refuse to fall back to hub tokenizers a bundle lacks
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.artifacts import ArtifactBundleError, load_bundle, write_manifest
+
+
+def _make_bundle(root: Path):
+    (root / "embedding").mkdir()
+    (root / "embedding" / "model.safetensors").write_bytes(b"weights")
+    (root / "tokenizers" / "gpt2").mkdir(parents=True)
+    (root / "tokenizers" / "gpt2" / "tokenizer.json").write_text("{}")
+    (root / "nltk_data").mkdir()
+    (root / "nltk_data" / "stopwords.txt").write_text("и\nthe\n")
+    return write_manifest(str(root), {"version": "test-1", "onnx": False, "tokenizers": {"gpt2": "gpt2"}})
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = _make_bundle(tmp_path)
+    assert "embedding/model.safetensors" in manifest["files"]
+
+    bundle = load_bundle(str(tmp_path))
+    assert bundle.version == "test-1"
+    assert bundle.tokenizer_path("gpt2").endswith("tokenizers/gpt2")
+    assert bundle.tokenizer_path("mistral") is None
+    assert bundle.onnx_path is None
+
+
+def test_tampered_or_missing_files_are_rejected(tmp_path):
+    _make_bundle(tmp_path)
+    (tmp_path / "embedding" / "model.safetensors").write_bytes(b"other weights")
+    with pytest.raises(ArtifactBundleError, match="Checksum mismatch"):
+        load_bundle(str(tmp_path))
+
+    (tmp_path / "nltk_data" / "stopwords.txt").unlink()
+    with pytest.raises(ArtifactBundleError):
+        load_bundle(str(tmp_path))
+
+    # Without verification the manifest alone is trusted
+    assert load_bundle(str(tmp_path), verify=False).version == "test-1"
+
+
+def test_bundle_sets_offline_mode_before_hub_import(tmp_path):
+    pytest.importorskip("huggingface_hub")
+    env = {**os.environ, "RAG_ARTIFACT_BUNDLE": str(tmp_path), "PYTHONPATH": str(Path(__file__).parent.parent / "src")}
+    env.pop("HF_HUB_OFFLINE", None)
+    code = "import rag_api.artifacts, huggingface_hub.constants as c; print(c.HF_HUB_OFFLINE)"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == "True", result.stderr
+
+
+def test_chunkers_require_bundled_tokenizer(tmp_path, monkeypatch):
+    pytest.importorskip("langchain_core")
+    pytest.importorskip("chonkie")
+    from rag_api import chroma_utils
+
+    (tmp_path / "nltk_data").mkdir()
+    write_manifest(str(tmp_path), {"version": "test-2", "onnx": False, "tokenizers": {}})
+    monkeypatch.setattr(chroma_utils, "get_artifact_bundle", lambda: load_bundle(str(tmp_path), verify=False))
+    with pytest.raises(ArtifactBundleError, match="no chunker tokenizer"):
+        chroma_utils._create_chunkers()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-process bulk reindex pipeline.
+
+Tests that:
+1. Files parsed in worker processes are embedded in batches into the given store
+2. Unreadable and empty files are reported as failed without stopping the run
+3. file_callback receives the result of every file
+4. Rebuild items carry the document_store id and organization of each file
+"""
+
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("chonkie")
+
+
+class FakeCollection:
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, ids=None, where=None):
+        self.deleted.extend(ids or [])
+
+
+class FakeStore:
+    """Records what the pipeline writes instead of embedding it"""
+
+    def __init__(self):
+        self._collection = FakeCollection()
+        self.documents = {}
+
+    def add_documents(self, documents, ids):
+        self.documents.update(zip(ids, documents))
+
+    def add_texts(self, texts, metadatas, ids):
+        self.documents.update(zip(ids, texts))
+
+
+@pytest.fixture
+def bulk_reindex(tmp_path, monkeypatch):
+    # db_utils keeps its tables in rag_app.db in the working directory
+    monkeypatch.chdir(tmp_path)
+    db_utils = importlib.import_module("rag_api.db_utils")
+    for create in (db_utils.create_document_store, db_utils.create_document_chunks, db_utils.create_document_titles,
+                   db_utils.create_document_manifest):
+        create()
+    return importlib.import_module("rag_api.bulk_reindex")
+
+
+def test_bulk_reindex_counts_and_callbacks(bulk_reindex, tmp_path):
+    items = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"Document {i}. " + "Some indexed text about topic %d. " % i * 40)
+        items.append({"file_id": i + 1, "filename": path.name, "path": str(path)})
+    empty = tmp_path / "empty.txt"
+    empty.write_text("")
+    items.append({"file_id": 10, "filename": "empty.txt", "path": str(empty)})
+    items.append({"file_id": 11, "filename": "missing.txt", "path": str(tmp_path / "missing.txt")})
+
+    chunks, summaries, results = FakeStore(), FakeStore(), []
+    reindexer = bulk_reindex.BulkReindexer(processes=2, batch_chunks=8, vectorstore=chunks,
+                                           summary_vectorstore=summaries, file_callback=results.append)
+    state = reindexer.run(iter(items), total_files=len(items))
+
+    assert (state["indexed"], state["failed"], state["parsed"]) == (3, 2, 5)
+    assert sorted(doc["file_id"] for doc in state["indexed_documents"]) == [1, 2, 3]
+    assert sorted(doc["file_id"] for doc in state["failed_documents"]) == [10, 11]
+    assert state["chunks"] == sum(doc["chunks"] for doc in state["indexed_documents"]) == len(chunks.documents)
+
+    statuses = {result["file_id"]: result["status"] for result in results}
+    assert statuses == {1: "indexed", 2: "indexed", 3: "indexed", 10: "failed", 11: "failed"}
+    assert all(vector_id.split(":")[0] in {"1", "2", "3"} for vector_id in chunks.documents)
+    assert sorted(summaries.documents) == ["file-1", "file-2", "file-3"]
+
+
+def test_rebuild_items_use_document_store_ids(bulk_reindex, tmp_path):
+    db_utils = importlib.import_module("rag_api.db_utils")
+    chroma_utils = importlib.import_module("rag_api.chroma_utils")
+    guide = db_utils.insert_document_record("guide.txt", b"guide", organization_id="org-a")
+    faq = db_utils.insert_document_record("faq.txt", b"faq", organization_id="org-b")
+    db_utils.insert_document_record("shared.txt", b"a", organization_id="org-a")
+    db_utils.insert_document_record("shared.txt", b"b", organization_id="org-b")
+
+    items = {item["filename"]: item for item in bulk_reindex.organization_items()}
+    assert items["guide.txt"] == {"file_id": guide, "filename": "guide.txt", "organization_id": "org-a"}
+    assert items["faq.txt"]["organization_id"] == "org-b"
+    assert [item["file_id"] for item in bulk_reindex.organization_items("org-b")].count(faq) == 1
+
+    paths = [str(tmp_path / name) for name in ("guide.txt", "shared.txt", "unknown.txt")]
+    matched, errors = chroma_utils.stored_items_for_paths(paths)
+    assert matched == [{"path": paths[0], "filename": "guide.txt", "file_id": guide, "organization_id": "org-a"}]
+    assert len(errors) == 2 and "shared.txt" in errors[0] and "unknown.txt" in errors[1]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for parent-child chunk windows.
+
+Tests that:
+1. Child chunks written to document_chunks are read back by file and index range
+2. Replacing a file's chunks drops the previous ones
+3. A window of overlapping chunks is stitched without repeating the overlap
+"""
+
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api import db_utils
+
+
+def chunk(index, text, start, segment=0):
+    return SimpleNamespace(page_content=text, metadata={
+        "chunk_index": index, "segment_index": segment, "chunk_start": start, "chunk_end": start + len(text)
+    })
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DB_NAME", str(tmp_path / "rag_app.db"))
+    db_utils.create_document_chunks()
+    return tmp_path
+
+
+def test_chunks_read_back_by_range(db):
+    db_utils.replace_document_chunks(1, [chunk(i, f"chunk {i}", i * 10) for i in range(6)])
+    db_utils.replace_document_chunks(2, [chunk(0, "other file", 0)])
+
+    window = db_utils.get_document_chunks(1, 1, 3)
+    assert [row["chunk_index"] for row in window] == [1, 2, 3]
+    assert window[0] == {"file_id": 1, "chunk_index": 1, "segment_index": 0, "chunk_start": 10,
+                         "chunk_end": 17, "content": "chunk 1", "vector_id": None}
+    assert len(db_utils.get_document_chunks(1)) == 6
+
+    db_utils.replace_document_chunks(1, [chunk(0, "rewritten", 0)])
+    assert [row["content"] for row in db_utils.get_document_chunks(1)] == ["rewritten"]
+    assert [row["content"] for row in db_utils.get_document_chunks(2)] == ["other file"]
+
+    db_utils.delete_document_chunks(1)
+    assert db_utils.get_document_chunks(1) == []
+
+
+def test_window_overlap_is_stitched(db, monkeypatch):
+    pytest.importorskip("langchain_core")
+    monkeypatch.chdir(db)
+    chroma_utils = importlib.import_module("rag_api.chroma_utils")
+
+    text = "The quick brown fox jumps over the lazy dog"
+    # Overlapping chunks of one segment, then a chunk of the next segment
+    db_utils.replace_document_chunks(5, [
+        chunk(0, text[0:19], 0), chunk(1, text[15:35], 15), chunk(2, text[30:], 30), chunk(3, "Next section", 0, segment=1)
+    ])
+
+    assert chroma_utils.get_parent_window(5, 1, window=1) == text
+    assert chroma_utils.get_parent_window(5, 3, window=1) == text[30:] + "\n\nNext section"
+    assert chroma_utils.get_parent_window(9, 0) is None
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the blue/green active collection pointer.
+
+Tests that:
+1. Roles without a pointer entry serve their default collection
+2. A flip activates every role at once and records what it retired
+3. Other processes notice a flip when they refresh
+4. Updates from a process with a stale view keep the other processes' flips
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.collection_pointer import CollectionPointer, versioned_name
+
+DEFAULTS = {"documents": "documents_optimized", "summary": "documents_summary"}
+
+
+def test_flip_retires_previous_collections(tmp_path):
+    pointer = CollectionPointer(str(tmp_path / "active.json"), check_interval=0)
+    assert pointer.active("documents", DEFAULTS["documents"]) == "documents_optimized"
+
+    first = {"documents": versioned_name("documents_optimized"), "summary": versioned_name("documents_summary")}
+    assert pointer.flip(first, DEFAULTS) == DEFAULTS
+    assert pointer.active("documents", DEFAULTS["documents"]) == first["documents"]
+
+    second = {"documents": first["documents"] + "b", "summary": first["summary"] + "b"}
+    assert pointer.flip(second, DEFAULTS) == first
+    assert [entry["name"] for entry in pointer.retired()] == list(DEFAULTS.values()) + list(first.values())
+
+    pointer.forget_retired(list(DEFAULTS.values()))
+    assert [entry["name"] for entry in pointer.retired()] == list(first.values())
+
+
+def test_other_process_follows_flip(tmp_path):
+    path = str(tmp_path / "active.json")
+    writer = CollectionPointer(path, check_interval=0)
+    reader = CollectionPointer(path, check_interval=0)
+    assert not reader.refresh()
+
+    writer.flip({"documents": "documents_optimized_v2"}, DEFAULTS)
+    assert reader.refresh()
+    assert reader.active("documents", DEFAULTS["documents"]) == "documents_optimized_v2"
+    assert not reader.refresh()
+
+
+def test_stale_process_keeps_other_flips(tmp_path):
+    path = str(tmp_path / "active.json")
+    first, second = CollectionPointer(path, check_interval=3600), CollectionPointer(path, check_interval=3600)
+    first.flip({"documents": "documents_optimized_v2"}, DEFAULTS)
+
+    # second has not refreshed since the flip
+    second.forget_retired(["documents_optimized"])
+    assert second.active("documents", DEFAULTS["documents"]) == "documents_optimized_v2"
+    assert second.flip({"summary": "documents_summary_v2"}, DEFAULTS) == {"summary": "documents_summary"}
+    assert first.refresh(force=True)
+    assert first.active("documents", DEFAULTS["documents"]) == "documents_optimized_v2"
+    assert first.active("summary", DEFAULTS["summary"]) == "documents_summary_v2"
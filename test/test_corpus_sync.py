@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental corpus sync planning.
+
+Tests that:
+1. Stored documents are diffed against the indexed manifest by content hash
+2. Legacy rows without a stored hash get one computed and saved
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api import db_utils
+from rag_api.corpus_sync import plan_sync, run_sync
+from rag_api.write_gate import index_write_gate
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DB_NAME", str(tmp_path / "rag_app.db"))
+    monkeypatch.setattr(index_write_gate, "lock_file", str(tmp_path / ".index_write.lock"))
+    db_utils.create_document_store()
+    db_utils.create_document_manifest()
+    return tmp_path
+
+
+def test_plan_diffs_by_content_hash(db):
+    same = db_utils.insert_document_record("same.txt", b"same", organization_id="org")
+    changed = db_utils.insert_document_record("changed.txt", b"v1", organization_id="org")
+    new = db_utils.insert_document_record("new.txt", b"new", organization_id="org")
+    db_utils.insert_document_record("other.txt", b"other", organization_id="other-org")
+    db_utils.upsert_manifest_entry(same, "same.txt", "org", db_utils.content_hash(b"same"))
+    db_utils.upsert_manifest_entry(changed, "changed.txt", "org", db_utils.content_hash(b"v1"))
+    db_utils.upsert_manifest_entry(999, "gone.txt", "org", db_utils.content_hash(b"gone"))
+    db_utils.update_document_record("changed.txt", b"v2", organization_id="org")
+
+    plan = plan_sync("org")
+    assert [d["file_id"] for d in plan["added"]] == [new]
+    assert [d["file_id"] for d in plan["modified"]] == [changed]
+    assert [d["file_id"] for d in plan["deleted"]] == [999]
+    assert plan["unchanged"] == 1
+
+    # Dry runs leave the index alone
+    assert run_sync("org", dry_run=True)["plan"] == plan
+
+
+def test_legacy_rows_are_hashed(db):
+    conn = db_utils.get_db_connection()
+    conn.execute("INSERT INTO document_store (filename, content, organization_id) VALUES ('old.txt', ?, 'org')", (b"old",))
+    conn.commit()
+    conn.close()
+
+    assert db_utils.get_document_hashes("org")[0]["content_hash"] == db_utils.content_hash(b"old")
+    conn = db_utils.get_db_connection()
+    assert conn.execute("SELECT content_hash FROM document_store").fetchone()[0] == db_utils.content_hash(b"old")
+    conn.close()
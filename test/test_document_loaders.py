@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for loading documents from paths, bytes and streams.
+
+Tests that:
+1. Text, markdown and HTML load the same content from bytes and streams as from a path
+2. Documents loaded from bytes or streams are named after the upload, not a temp path
+3. Loading from bytes or streams, including ZIP entries, creates no temporary files
+"""
+
+import io
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+pytest.importorskip("langchain_community")
+
+from rag_api import document_loaders
+
+SAMPLES = {
+    "notes.txt": "Shipping policy\n\nOrders ship within two days.\nReturns are accepted for 30 days. Ünïcödé too.\n",
+    "guide.md": "# Setup guide\n\nInstall the package, then run `make serve`.\n\n- step one\n- step two\n",
+    "page.html": "<html><body><h1>Store hours</h1><p>We are open from nine to five on weekdays.</p></body></html>",
+}
+
+
+@pytest.fixture
+def no_temp_files(monkeypatch):
+    """Fail any attempt to create a temporary file on disk"""
+    created = []
+
+    def refuse(name):
+        def create(*args, **kwargs):
+            created.append(name)
+            raise AssertionError(f"tempfile.{name} called while loading from memory")
+        return create
+
+    for name in ("NamedTemporaryFile", "TemporaryFile", "mkstemp", "mkdtemp"):
+        monkeypatch.setattr(tempfile, name, refuse(name))
+    return created
+
+
+@pytest.mark.parametrize("filename", sorted(SAMPLES))
+def test_bytes_and_streams_match_path(tmp_path, no_temp_files, filename):
+    if filename.endswith(".html"):
+        pytest.importorskip("unstructured")
+    path = tmp_path / filename
+    path.write_text(SAMPLES[filename], encoding="utf-8")
+    expected = [doc.page_content for doc in document_loaders.load_source(str(path), filename)]
+    assert expected and all(expected)
+
+    data = path.read_bytes()
+    stream = io.BytesIO(data)
+    stream.read()  # Loaders rewind streams themselves
+    for source in (data, stream):
+        docs = document_loaders.load_source(source, filename)
+        assert [doc.page_content for doc in docs] == expected
+        assert all(doc.metadata["source"] == filename for doc in docs)
+    assert no_temp_files == []
+
+
+def test_zip_entries_load_in_memory(no_temp_files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("docs/notes.txt", SAMPLES["notes.txt"])
+        zf.writestr("docs/guide.md", SAMPLES["guide.md"])
+
+    for source in (buffer.getvalue(), buffer):
+        docs = document_loaders.load_source(source, "bundle.zip")
+        assert {doc.metadata["archive_path"]: doc.page_content for doc in docs} == {
+            "notes.txt": SAMPLES["notes.txt"], "guide.md": SAMPLES["guide.md"]
+        }
+        assert all(doc.metadata["source"].startswith("zip://bundle.zip/docs/") for doc in docs)
+    assert no_temp_files == []
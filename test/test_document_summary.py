@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the document summary index.
+
+Tests that:
+1. The backfill builds summaries from stored chunks in chunk_index order
+2. The prefilter threshold counts only the summaries an organization can see
+"""
+
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+pytest.importorskip("langchain_core")
+
+
+class FakeCollection:
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, where=None, include=None):
+        allowed = where["organization_id"]["$in"] if where else None
+        return {"ids": [row_id for row_id, metadata in self.rows.items()
+                        if allowed is None or metadata["organization_id"] in allowed]}
+
+
+class FakeSummaryStore:
+    def __init__(self, rows=None):
+        self._collection = FakeCollection("documents_summary", rows or {})
+        self.added = []
+        self.searches = []
+
+    def get(self, include=None):
+        return {"ids": list(self._collection.rows)}
+
+    def add_texts(self, texts, metadatas, ids):
+        self.added.extend(zip(ids, texts))
+
+    def similarity_search_with_score(self, query, k, filter=None):
+        self.searches.append(filter)
+        return []
+
+
+class FakeChunkStore:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def get(self, include=None, limit=None, offset=0):
+        page = self.chunks[offset:offset + limit]
+        return {"ids": [str(i) for i in range(len(page))],
+                "metadatas": [metadata for metadata, _ in page], "documents": [text for _, text in page]}
+
+
+@pytest.fixture
+def chroma_utils(tmp_path, monkeypatch):
+    # db_utils creates rag_app.db in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("rag_api.chroma_utils")
+    module._summary_counts.clear()
+    return module
+
+
+def test_backfill_orders_chunks_by_index(chroma_utils, monkeypatch):
+    # Older chunks carry no chunk_start, and the store returns them out of order
+    chunks = [
+        ({"file_id": 1, "filename": "guide.txt", "chunk_index": 1}, "second"),
+        ({"file_id": 1, "filename": "guide.txt", "chunk_index": 0}, "first"),
+        ({"file_id": 1, "filename": "guide.txt", "chunk_index": 2}, "third"),
+    ]
+    summaries = FakeSummaryStore()
+    monkeypatch.setattr(chroma_utils, "get_vectorstore", lambda: FakeChunkStore(chunks))
+    monkeypatch.setattr(chroma_utils, "get_summary_vectorstore", lambda: summaries)
+
+    stats = chroma_utils.backfill_document_summaries(page_size=2)
+    assert stats == {"files_scanned": 1, "summaries_created": 1}
+    assert summaries.added == [("file-1", "guide\nfirst second third")]
+
+
+def test_prefilter_threshold_is_per_organization(chroma_utils, monkeypatch):
+    rows = {f"file-{i}": {"organization_id": "big-org"} for i in range(10)}
+    rows["file-shared"] = {"organization_id": ""}
+    summaries = FakeSummaryStore(rows)
+    monkeypatch.setattr(chroma_utils, "get_summary_vectorstore", lambda: summaries)
+
+    assert chroma_utils.count_document_summaries("big-org") == 11
+    assert chroma_utils.count_document_summaries("new-org") == 1
+
+    # The small organization skips the prefilter instead of getting an empty candidate set
+    assert chroma_utils.select_candidate_files("query", "new-org", top_n=2, min_indexed_files=5) is None
+    assert summaries.searches == []
+    chroma_utils.select_candidate_files("query", "big-org", top_n=2, min_indexed_files=5)
+    assert summaries.searches == [{"organization_id": {"$in": ["big-org", ""]}}]
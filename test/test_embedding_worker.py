@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared embedding worker.
+
+Tests that:
+1. Remote embeddings return the worker's vectors in request order
+2. Concurrent requests from several clients are batched into fewer model calls
+3. The worker loads the model itself even when API workers are pointed at it
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.embedding_worker import EmbeddingWorkerServer, RemoteEmbeddings, _default_embed_fn
+
+
+def _start_worker(embed_fn, max_wait_ms=50):
+    socket_path = str(Path(tempfile.mkdtemp()) / "embed.sock")
+    server = EmbeddingWorkerServer(socket_path, embed_fn=embed_fn, max_wait_ms=max_wait_ms)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(server.serve_forever(),), daemon=True).start()
+    for _ in range(100):
+        if Path(socket_path).exists():
+            break
+        time.sleep(0.01)
+    return server, socket_path
+
+
+def test_remote_embeddings_round_trip():
+    server, socket_path = _start_worker(lambda texts: [[float(len(t)), 1.0] for t in texts], max_wait_ms=1)
+    remote = RemoteEmbeddings(socket_path)
+
+    assert remote.embed_documents(["a", "bbb"]) == [[1.0, 1.0], [3.0, 1.0]]
+    assert remote.embed_query("cc") == [2.0, 1.0]
+    assert remote.is_query_cached("cc")
+    assert remote.ping()["ok"] is True
+
+
+def test_concurrent_clients_share_batches():
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        return [[float(i)] for i, _ in enumerate(texts)]
+
+    server, socket_path = _start_worker(embed)
+    # Separate clients stand in for separate API worker processes
+    clients = [RemoteEmbeddings(socket_path) for _ in range(8)]
+    results = [None] * len(clients)
+
+    def run(i):
+        results[i] = clients[i].embed_documents([f"text {i}"])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(clients))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(len(r) == 1 for r in results)
+    assert sum(calls) == 8
+    assert len(calls) < 8
+
+
+if __name__ == "__main__":
+    test_remote_embeddings_round_trip()
+    test_concurrent_clients_share_batches()
+    print("✓ All embedding worker tests passed")
+
+
+def test_worker_embeds_locally_when_socket_is_configured(monkeypatch):
+    pytest.importorskip("langchain_core")
+    from rag_api import chroma_utils
+
+    class LocalEmbeddings:
+        def __init__(self, **kwargs):
+            pass
+
+        def embed_documents(self, texts):
+            return [[0.5] for _ in texts]
+
+    monkeypatch.setattr(chroma_utils, "EMBEDDING_WORKER_SOCKET", "/tmp/graphtalk-embed.sock")
+    monkeypatch.setattr(chroma_utils, "CachedEmbeddings", LocalEmbeddings)
+    monkeypatch.setattr(chroma_utils, "get_artifact_bundle", lambda: None)
+    monkeypatch.setattr(chroma_utils, "get_device", lambda: "cpu")
+    monkeypatch.setattr(chroma_utils, "WARMUP_INFERENCE", False)
+    assert _default_embed_fn()(["a", "b"]) == [[0.5], [0.5]]
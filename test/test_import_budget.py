@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for lazy cold start.
+
+Tests that:
+1. Lazy resources move through cold -> loading -> ready and build only once
+2. A failed build is reported and retried on the next use
+3. Readiness waits only for the resources required for ready
+4. Importing the search modules stays within the import-time budget and
+   does not pull in the model, tokenizer or Chroma stacks
+5. Importing the API module stays within its budget and leaves the feature
+   modules (quizzes, plugins, catalogs) to the routes that use them
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from rag_api import lazy
+from rag_api.lazy import LazyResource, readiness, COLD, READY, FAILED
+
+# Seconds a fresh interpreter may spend importing the search modules
+IMPORT_BUDGET_SECONDS = 1.0
+HEAVY_MODULES = ["torch", "nltk", "chonkie", "sentence_transformers", "langchain_chroma", "chromadb", "openai"]
+# Seconds a fresh interpreter may spend importing api.py (FastAPI, pydantic and the route modules)
+API_IMPORT_BUDGET_SECONDS = 3.0
+FEATURE_MODULES = ["quiz_management", "plugin_manager", "quizdb", "opencart_catalog"]
+
+
+def test_resource_builds_once_and_reports_ready():
+    calls = []
+
+    def factory():
+        calls.append(threading.get_ident())
+        return object()
+
+    resource = LazyResource("test_builds_once", factory)
+    assert resource.state == COLD
+    assert readiness()["resources"]["test_builds_once"]["state"] == COLD
+
+    threads = [threading.Thread(target=resource.get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert resource.state == READY
+    assert resource.get() is resource.get()
+
+
+def test_failed_build_is_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model download failed")
+        return "model"
+
+    resource = LazyResource("test_flaky", flaky)
+    with pytest.raises(RuntimeError):
+        resource.get()
+    assert resource.state == FAILED
+    assert "download failed" in resource.status()["error"]
+
+    assert resource.get() == "model"
+    assert resource.state == READY
+
+
+def test_readiness_ignores_optional_resources(monkeypatch):
+    monkeypatch.setattr(lazy, "_registry", {})
+    required = LazyResource("test_required", object)
+    optional = LazyResource("test_optional", object, required_for_ready=False)
+    assert not readiness()["ready"]
+
+    required.get()
+    state = readiness()
+    assert state["ready"]
+    assert state["resources"]["test_optional"] == {"state": COLD, "error": None, "load_seconds": None, "required": False}
+    assert optional.state == COLD
+
+
+def test_search_modules_import_within_budget():
+    pytest.importorskip("langchain_core")
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import rag_api.chroma_utils, rag_api.langchain_utils\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(f\"{elapsed}|{','.join(heavy)}\")\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    elapsed, heavy = out.stdout.strip().splitlines()[-1].split("|")
+    assert not heavy, f"Heavy modules imported at import time: {heavy}"
+    assert float(elapsed) < IMPORT_BUDGET_SECONDS
+
+
+def test_api_module_imports_within_budget(tmp_path):
+    # No importorskip: a missing dependency of api.py is a failure, not a skip
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import api\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"loaded = [m for m in {HEAVY_MODULES + FEATURE_MODULES!r} if m in sys.modules]\n"
+        "print(f\"{elapsed}|{','.join(loaded)}\")\n"
+    )
+    # api.py creates its upload directory and databases in the working directory
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+                         env={**os.environ, "PYTHONPATH": str(SRC_DIR)})
+    assert out.returncode == 0, f"Importing api failed:\n{out.stderr[-2000:]}"
+    elapsed, loaded = out.stdout.strip().splitlines()[-1].split("|")
+    assert not loaded, f"Modules imported with api: {loaded}"
+    assert float(elapsed) < API_IMPORT_BUDGET_SECONDS
+
+
+if __name__ == "__main__":
+    test_resource_builds_once_and_reports_ready()
+    test_failed_build_is_retried()
+    test_search_modules_import_within_budget()
+    print("✓ All import budget tests passed")
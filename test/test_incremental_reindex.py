@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental reindexing of edited documents.
+
+Tests that:
+1. Content-defined sections partition the text and survive edits elsewhere
+2. An edit at the start, middle or end re-embeds only the chunks of its own section
+3. Chunks outside the edited section keep their vector IDs and embeddings
+4. A full re-index of changed content deletes the vectors of the previous version
+5. Documents stored, changed or deleted during a rebuild are replayed into the new collection
+"""
+
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+pytest.importorskip("langchain_core")
+
+SECTION_CHARS = 1000
+WORDS = ["river", "stone", "cloud", "paper", "lamp", "garden", "window", "market", "signal", "harbor"]
+
+
+def paragraph(i):
+    # Distinct paragraphs of different lengths, so no two chunks share a content hash
+    return f"Paragraph {i}. " + " ".join(f"{WORDS[(i + j) % len(WORDS)]}{i}.{j}" for j in range(20 + i * 7 % 25))
+
+
+class WindowChunker:
+    """Fixed character windows with overlap, like a token chunker without a tokenizer"""
+
+    def __init__(self, size=120, overlap=30):
+        self.size, self.step = size, size - overlap
+
+    def chunk(self, text):
+        starts = range(0, max(1, len(text) - self.size + self.step), self.step)
+        return [SimpleNamespace(text=text[start:start + self.size], start_index=start,
+                                end_index=min(len(text), start + self.size), token_count=1) for start in starts]
+
+
+class FakeCollection:
+    name = "documents_optimized"
+
+    def __init__(self):
+        self.vectors = {}
+
+    def get(self, ids=None, where=None, include=None):
+        ids = [vector_id for vector_id in (ids if ids is not None else self.vectors) if vector_id in self.vectors]
+        if where and "file_id" in where:
+            ids = [vector_id for vector_id in ids if self.vectors[vector_id]["metadata"].get("file_id") == where["file_id"]]
+        rows = [self.vectors[vector_id] for vector_id in ids]
+        return {"ids": ids, "metadatas": [row["metadata"] for row in rows],
+                "documents": [row["document"] for row in rows], "embeddings": [row["embedding"] for row in rows]}
+
+    def update(self, ids, metadatas):
+        for vector_id, metadata in zip(ids, metadatas):
+            self.vectors[vector_id]["metadata"] = dict(metadata)
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        for row in zip(ids, embeddings, metadatas, documents):
+            self.vectors[row[0]] = {"embedding": row[1], "metadata": dict(row[2]), "document": row[3]}
+
+    def delete(self, ids=None, where=None):
+        for vector_id in ids if ids is not None else self.get(where=where)["ids"]:
+            self.vectors.pop(vector_id, None)
+
+
+class FakeStore:
+    """Chunk store whose 'embedding' is a counter, so reuse and re-embedding are visible"""
+
+    def __init__(self):
+        self._collection = FakeCollection()
+        self.embedded = 0
+
+    def add_documents(self, documents, ids):
+        for vector_id, document in zip(ids, documents):
+            self.embedded += 1
+            self._collection.upsert([vector_id], [self.embedded], [document.metadata], [document.page_content])
+
+    def add_texts(self, texts, metadatas, ids):
+        pass
+
+
+@pytest.fixture
+def chroma_utils(tmp_path, monkeypatch):
+    # db_utils keeps its tables in rag_app.db in the working directory
+    monkeypatch.chdir(tmp_path)
+    db_utils = importlib.import_module("rag_api.db_utils")
+    for create in (db_utils.create_document_store, db_utils.create_document_chunks, db_utils.create_document_titles,
+                   db_utils.create_document_manifest):
+        create()
+    module = importlib.import_module("rag_api.chroma_utils")
+    monkeypatch.setattr(module.index_write_gate, "lock_file", str(tmp_path / ".index_write.lock"))
+    monkeypatch.setattr(module, "SECTION_TARGET_CHARS", SECTION_CHARS)
+    monkeypatch.setattr(module, "preprocess_text", lambda text: " ".join(text.split()))
+    monkeypatch.setattr(module, "select_optimal_chunker", lambda filename, content: WindowChunker())
+    store = FakeStore()
+    monkeypatch.setattr(module, "get_vectorstore_for_org", lambda organization_id=None: store)
+    monkeypatch.setattr(module, "get_summary_vectorstore", lambda: FakeStore())
+    return module
+
+
+def test_sections_are_content_defined(chroma_utils):
+    paragraphs = [paragraph(i) for i in range(60)]
+    text = "\n\n".join(paragraphs)
+    sections = chroma_utils.content_defined_sections(text, SECTION_CHARS)
+    assert "".join(sections) == text
+    assert 1 < len(sections) < len(paragraphs)
+    assert max(map(len, sections)) <= SECTION_CHARS * 4 + max(map(len, paragraphs))
+
+    paragraphs[0] = "A new opening sentence. " + paragraphs[0]
+    edited = chroma_utils.content_defined_sections("\n\n".join(paragraphs), SECTION_CHARS)
+    # Only the first section changes
+    assert edited[1:] == sections[1:]
+
+
+def vector_position(vector_id):
+    _file_id, chunk_index, chunk_hash = vector_id.split(":")
+    return int(chunk_index), chunk_hash
+
+
+@pytest.mark.parametrize("position", [0, 30, 59])
+def test_edit_reembeds_only_its_section(chroma_utils, position):
+    paragraphs = [paragraph(i) for i in range(60)]
+    original = "\n\n".join(paragraphs)
+    assert chroma_utils.index_document_to_chroma(original.encode("utf-8"), 7, filename="notes.txt")
+    store = chroma_utils.get_vectorstore_for_org()
+    before = dict(store._collection.vectors)
+    embedded = store.embedded
+
+    paragraphs[position] = paragraphs[position].replace(". ", ". A sentence inserted while editing. ", 1)
+    text = "\n\n".join(paragraphs)
+    stats = chroma_utils.reindex_document_incremental(text.encode("utf-8"), 7, filename="notes.txt")
+    after = store._collection.vectors
+
+    reembedded = {vector_id for vector_id, row in after.items() if row["embedding"] > embedded}
+    assert store.embedded - embedded == len(reembedded) == stats["added"]
+    assert stats["reused"] == len(after) - len(reembedded)
+
+    # Only the chunks of the edited section are embedded again (the edit may add or remove
+    # the cut point after its paragraph, splitting the section or merging it with the next)
+    unchanged = set(chroma_utils.content_defined_sections(original, SECTION_CHARS))
+    changed = [section for section in chroma_utils.content_defined_sections(text, SECTION_CHARS) if section not in unchanged]
+    assert 1 <= len(changed) <= 2
+    assert 0 < len(reembedded) <= sum(len(WindowChunker().chunk(" ".join(section.split()))) for section in changed)
+    assert len(reembedded) < len(before) // 4
+
+    # Every other chunk keeps its embedding; chunks before the edit keep their vector ID, later
+    # ones keep their content hash and move by the change in the edited section's chunk count
+    edit_index = min(vector_position(vector_id)[0] for vector_id in reembedded)
+    origin = {row["embedding"]: vector_id for vector_id, row in before.items()}
+    shifts = set()
+    for vector_id in set(after) - reembedded:
+        previous = origin[after[vector_id]["embedding"]]
+        (index, chunk_hash), (previous_index, previous_hash) = vector_position(vector_id), vector_position(previous)
+        assert chunk_hash == previous_hash
+        if index < edit_index:
+            assert vector_id == previous
+        else:
+            shifts.add(index - previous_index)
+    assert len(shifts) <= 1
+    assert stats["deleted"] == len(before) - stats["reused"]
+
+
+def test_full_reindex_deletes_stale_vectors(chroma_utils):
+    paragraphs = [paragraph(i) for i in range(20)]
+    assert chroma_utils.index_document_to_chroma("\n\n".join(paragraphs).encode("utf-8"), 7, filename="notes.txt")
+    store = chroma_utils.get_vectorstore_for_org()
+    first = set(store._collection.vectors)
+
+    paragraphs[0] = "A rewritten opening. " + paragraphs[0]
+    assert chroma_utils.index_document_to_chroma("\n\n".join(paragraphs[:10]).encode("utf-8"), 7, filename="notes.txt")
+    current = chroma_utils.get_chunk_vector_ids(7)
+    assert set(store._collection.vectors) == set(current)
+    assert first - set(current)
+
+
+def test_rebuild_replays_changes_made_meanwhile(chroma_utils):
+    pytest.importorskip("langchain_community")
+    db_utils = importlib.import_module("rag_api.db_utils")
+    kept, edited, removed = (db_utils.insert_document_record(f"doc{i}.txt", paragraph(i).encode("utf-8"), organization_id="org-a")
+                             for i in range(3))
+    snapshot = chroma_utils._stored_documents()
+
+    # The rebuild indexed every file, then the live index moved on
+    candidate, candidate_summary = FakeStore(), FakeStore()
+    for file_id in (kept, edited, removed):
+        candidate._collection.upsert([f"{file_id}:0:built"], [0], [{"file_id": file_id}], ["built"])
+    db_utils.update_document_record("doc1.txt", paragraph(21).encode("utf-8"), organization_id="org-a")
+    db_utils.delete_document_record(removed)
+    added = db_utils.insert_document_record("doc3.txt", paragraph(3).encode("utf-8"), organization_id="org-a")
+
+    replay = chroma_utils._replay_changes(candidate, candidate_summary, snapshot)
+    assert (replay["changed"], replay["deleted"], replay["errors"]) == (2, 1, [])
+    file_ids = {row["metadata"]["file_id"] for row in candidate._collection.vectors.values()}
+    assert file_ids == {kept, edited, added}
+    assert f"{edited}:0:built" not in candidate._collection.vectors
+    assert set(chroma_utils.get_chunk_vector_ids(added)) <= set(candidate._collection.vectors)
+    assert chroma_utils.get_chunk_vector_ids(removed) is None
+
+    assert chroma_utils._replay_changes(candidate, candidate_summary, replay["snapshot"])["changed"] == 0
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the background indexing job queue.
+
+Tests that:
+1. Jobs are claimed by priority, then age, and one file never runs twice at once
+2. Failed jobs are retried with backoff, then marked failed
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api import db_utils, indexing_queue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DB_NAME", str(tmp_path / "rag_app.db"))
+    monkeypatch.setattr(indexing_queue, "SPOOL_DIR", str(tmp_path / "spool"))
+    db_utils.create_indexing_jobs()
+    return indexing_queue
+
+
+def test_claim_order_and_per_file_lock(queue):
+    low = queue.enqueue_indexing_job(1, "a.pdf", b"a", organization_id="org")
+    high = queue.enqueue_indexing_job(2, "b.pdf", b"b", organization_id="org", priority=5)
+    again = queue.enqueue_indexing_job(3, "b.pdf", b"b2", organization_id="org", priority=5)
+
+    assert db_utils.claim_indexing_job("w1", time.time())["id"] == high
+    # The second b.pdf waits while the first is running
+    assert db_utils.claim_indexing_job("w2", time.time())["id"] == low
+    assert db_utils.claim_indexing_job("w3", time.time()) is None
+
+    db_utils.finish_indexing_job(high, queue.DONE)
+    job = db_utils.claim_indexing_job("w3", time.time())
+    assert job["id"] == again
+    assert Path(job["file_path"]).name == "b.pdf" and Path(job["file_path"]).read_bytes() == b"b2"
+    assert queue.get_job_status(high)["status"] == "done"
+
+
+def test_retry_then_fail(queue, monkeypatch):
+    monkeypatch.setattr(queue, "RETRY_DELAY_SECONDS", 60)
+    job_id = queue.enqueue_indexing_job(1, "a.pdf", b"a")
+    pool = queue.IndexingWorkerPool(0, index_fn=lambda *args, **kwargs: False)
+
+    for attempt in range(1, 4):
+        job = db_utils.claim_indexing_job("w", time.time() + 1000 * attempt)
+        assert job["attempts"] == attempt
+        pool._run(job)
+        assert db_utils.claim_indexing_job("w", time.time()) is None
+
+    status = queue.get_job_status(job_id)
+    assert status["status"] == "failed" and status["error"] == "Indexing failed"
+    assert not Path(job["file_path"]).exists()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for ingestion progress tracking.
+
+Tests that:
+1. Counters and stage times accumulate on the job current for the thread
+2. Nested tracking reuses the outer job
+3. A job that raised ends as failed with its error
+4. Status is filtered by organization
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api import ingest_progress
+from rag_api.ingest_progress import IngestProgressTracker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_counters_follow_current_job():
+    tracker = IngestProgressTracker()
+    tracker.add(chunks=5)  # no job: ignored
+
+    with tracker.track("a.pdf", file_id=1, bytes_total=1000) as job:
+        tracker.stage("parse")
+        tracker.add(pages=3, bytes=400)
+        tracker.stage("chunk")
+        with tracker.track("a.pdf") as inner:
+            assert inner is job
+            tracker.add(chunks=10)
+        tracker.stage("embed")
+        tracker.add(chunks_stored=10)
+        assert tracker.status()["active_by_stage"]["embed"] == 1
+
+    state = tracker.status()
+    assert state["active"] == []
+    [done] = state["recent"]
+    assert done["stage"] == "done"
+    assert (done["pages"], done["chunks"], done["chunks_stored"], done["bytes"]) == (3, 10, 10, 1000)
+    assert set(done["stage_seconds"]) == {"parse", "chunk", "embed"}
+    assert tracker.current() is None
+
+
+def test_failure_and_organization_filter():
+    tracker = IngestProgressTracker()
+    with pytest.raises(ValueError):
+        with tracker.track("bad.docx", organization_id="org-a"):
+            raise ValueError("No content extracted")
+    with tracker.track("shared.txt"):
+        pass
+    with tracker.track("other.txt", organization_id="org-b"):
+        pass
+
+    state = tracker.status("org-a")
+    assert [job["filename"] for job in state["recent"]] == ["shared.txt", "bad.docx"]
+    assert state["recent"][1]["stage"] == "failed"
+    assert state["errors"] == 1
+    assert len(tracker.status()["recent"]) == 3
+
+
+def test_stage_times_accumulate(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ingest_progress.time, "time", clock)
+    tracker = IngestProgressTracker()
+
+    with tracker.track("manual.pdf") as job:
+        clock.now += 1  # queued time is not a stage
+        tracker.stage("parse")
+        clock.now += 2
+        tracker.stage("chunk")
+        clock.now += 3
+        tracker.stage("parse")
+        clock.now += 1.5
+        # The running stage counts up to now
+        assert tracker.status()["active"][0]["stage_seconds"] == {"parse": 3.5, "chunk": 3.0}
+
+        seen = []
+        other = threading.Thread(target=lambda: seen.append(tracker.current()))
+        other.start()
+        other.join()
+        assert seen == [None]  # other threads have no current job
+        tracker.stage("store")
+        clock.now += 0.5
+
+    done = tracker.status()["recent"][0]
+    assert done["stage_seconds"] == {"parse": 3.5, "chunk": 3.0, "store": 0.5}
+    assert done["elapsed_seconds"] == 8.0
+    assert job.stage == "done"
+
+    with tracker.track("notes.txt"):
+        tracker.stage("parse")
+        clock.now += 1
+    assert tracker.status()["stage_seconds"] == {"parse": 4.5, "chunk": 3.0, "store": 0.5}
+
+
+def test_failed_job_keeps_its_counters():
+    tracker = IngestProgressTracker()
+    with tracker.track("scan.pdf", bytes_total=5000):
+        tracker.stage("parse")
+        tracker.add(pages=2, bytes=1200)
+        tracker.stage("embed")
+        # Errors reported without raising (e.g. by the bulk pipeline) fail the job too
+        tracker.fail("Embedding failed: model unavailable")
+
+    [failed] = tracker.status()["recent"]
+    assert failed["stage"] == "failed"
+    assert failed["errors"] == ["Embedding failed: model unavailable"]
+    # Bytes stay at what was read instead of jumping to the file size
+    assert (failed["pages"], failed["bytes"], failed["bytes_total"]) == (2, 1200, 5000)
+    assert set(failed["stage_seconds"]) == {"parse", "embed"}
+
+    with pytest.raises(RuntimeError):
+        with tracker.track("broken.docx"):
+            tracker.fail("Could not read page 3")
+            raise RuntimeError("Parser crashed")
+    assert tracker.status()["recent"][0]["errors"] == ["Could not read page 3", "Parser crashed"]
+    assert tracker.status()["errors"] == 3
+    assert tracker.current() is None
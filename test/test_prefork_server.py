@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the preload-and-fork server.
+
+Tests that:
+1. The master preloads once and forks the requested number of workers
+2. Every worker gets the master's preloaded app, frozen heap and listening socket
+3. A worker that exits is restarted, and SIGTERM stops the master and all workers
+4. The worker count comes from --workers, defaulting to RAG_API_WORKERS
+5. Warm-up inference runs in each forked worker, never in the master before fork
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+import prefork_server
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs os.fork")
+
+MASTER = """
+import gc, os, signal, sys
+import prefork_server
+
+prefork_server.MEMORY_REPORT_DELAY = 0
+prefork_server.RESTART_BACKOFF = 0
+out = sys.argv[1]
+
+def preload():
+    with open(os.path.join(out, "preload"), "a") as f:
+        f.write(f"{os.getpid()}\\n")
+    gc.freeze()
+    return {"master": os.getpid()}
+
+def worker(app, sock, worker_id):
+    marker = os.path.join(out, f"worker-{worker_id}")
+    first_start = not os.path.exists(marker)
+    with open(marker, "a") as f:
+        f.write(f"{os.getpid()} {os.getppid()} {app['master']} {sock.getsockname()[1]} {gc.get_freeze_count() > 0}\\n")
+    if worker_id == 0 and first_start:
+        return  # the first worker exits once and must be restarted
+    signal.pause()
+
+prefork_server.serve("127.0.0.1", 0, workers=3, preload_fn=preload, worker_fn=worker)
+"""
+
+
+def read_lines(path):
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def test_workers_share_the_preloaded_master(tmp_path):
+    master = subprocess.Popen([sys.executable, "-c", MASTER, str(tmp_path)], cwd=SRC_DIR,
+                              env={**os.environ, "PYTHONPATH": str(SRC_DIR)})
+    try:
+        deadline = time.time() + 20
+        expected = {"worker-0": 2, "worker-1": 1, "worker-2": 1}
+        while any(len(read_lines(tmp_path / name)) < count for name, count in expected.items()):
+            assert time.time() < deadline, "workers did not start"
+            assert master.poll() is None, "master exited early"
+            time.sleep(0.05)
+    finally:
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=20) == 0
+
+    assert read_lines(tmp_path / "preload") == [str(master.pid)]
+    starts = [line.split() for name in expected for line in read_lines(tmp_path / name)]
+    assert len(starts) == 4
+    assert len({pid for pid, *_ in starts}) == 4
+    for _pid, parent, app_master, port, frozen in starts:
+        assert parent == app_master == str(master.pid)
+        assert frozen == "True"
+    assert len({port for *_, port, _frozen in starts}) == 1
+    assert not (tmp_path / "worker-3").exists()
+
+
+def test_worker_count_from_arguments(monkeypatch):
+    calls = []
+    monkeypatch.setattr(prefork_server, "serve", lambda host, port, workers: calls.append(workers))
+    monkeypatch.setenv("RAG_API_WORKERS", "6")
+
+    monkeypatch.setattr(sys, "argv", ["prefork_server.py"])
+    prefork_server.main()
+    monkeypatch.setattr(sys, "argv", ["prefork_server.py", "--workers", "3"])
+    prefork_server.main()
+    assert calls == [6, 3]
+
+
+def test_warm_up_inference_runs_after_fork(monkeypatch):
+    pytest.importorskip("uvicorn")
+    pytest.importorskip("langchain_core")
+    import uvicorn
+    from rag_api import chroma_utils
+    from rag_api.lazy import get_resource
+
+    calls = []
+    monkeypatch.setattr(chroma_utils, "WARMUP_INFERENCE", True)
+    monkeypatch.setattr(chroma_utils, "warm_up_inference", lambda: calls.append("inference"))
+    monkeypatch.setattr(uvicorn.Server, "run", lambda self, sockets: calls.append("serve"))
+    for name in prefork_server.FORK_UNSAFE_RESOURCES:
+        if get_resource(name) is not None:
+            monkeypatch.setattr(get_resource(name), "reset", lambda: None)
+
+    prefork_server._run_worker(object(), None, 0)
+    assert calls == ["inference", "serve"]
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for singleflight query coalescing.
+
+Tests that:
+1. Concurrent identical queries run the computation once
+2. Late stream subscribers receive the full token stream
+3. Different ACL fingerprints never share a flight
+4. Each caller gets its own copy of the shared result
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from query_coalescing import QueryCoalescer, make_query_key
+
+
+def test_concurrent_duplicates_share_one_computation():
+    coalescer = QueryCoalescer()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def main():
+        key = make_query_key("retrieval", "What is RAG?", "org-1", None)
+        return await asyncio.gather(*(coalescer.run(key, compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r == {"answer": 42} for r in results)
+    assert coalescer.stats == {"executed": 1, "coalesced": 4}
+
+
+def test_stream_fans_out_to_late_subscribers():
+    coalescer = QueryCoalescer()
+    calls = []
+
+    async def generate(publish):
+        calls.append(1)
+        for token in ["a", "b", "c"]:
+            await publish(token)
+            await asyncio.sleep(0.01)
+        return "abc"
+
+    async def subscriber(delay):
+        await asyncio.sleep(delay)
+        received = []
+
+        async def on_token(token):
+            received.append(token)
+
+        result = await coalescer.run_stream("k", generate, stream_callback=on_token)
+        return result, received
+
+    async def main():
+        return await asyncio.gather(subscriber(0), subscriber(0.015))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    for result, received in results:
+        assert result == "abc"
+        assert received == ["a", "b", "c"]
+
+
+def test_callers_get_independent_results():
+    coalescer = QueryCoalescer()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return {"sources": [{"file": "a.pdf"}]}
+
+    async def caller():
+        result = await coalescer.run("k", compute)
+        # Per-session post-processing of one response
+        result["sources"][0]["file"] = "redacted"
+        result["sources"].append({"file": "extra"})
+        await asyncio.sleep(0.01)
+        return result
+
+    async def main():
+        first = asyncio.ensure_future(caller())
+        await asyncio.sleep(0)
+        untouched = await coalescer.run("k", compute)
+        return await first, untouched
+
+    mutated, untouched = asyncio.run(main())
+    assert mutated["sources"] == [{"file": "redacted"}, {"file": "extra"}]
+    assert untouched == {"sources": [{"file": "a.pdf"}]}
+    assert coalescer.stats["coalesced"] == 1
+
+
+def test_key_separates_acl_and_normalizes_query():
+    admin = make_query_key("retrieval", "Hello  World", "org", None)
+    assert admin == make_query_key("retrieval", " hello world ", "org", None)
+    assert admin != make_query_key("retrieval", "hello world", "org", ["a.pdf"])
+    assert make_query_key("retrieval", "q", "org", ["b.pdf", "A.pdf"]) == \
+        make_query_key("retrieval", "q", "org", ["a.pdf", "b.pdf"])
+
+
+if __name__ == "__main__":
+    test_concurrent_duplicates_share_one_computation()
+    test_stream_fans_out_to_late_subscribers()
+    test_callers_get_independent_results()
+    test_key_separates_acl_and_normalizes_query()
+    print("✓ All query coalescing tests passed")
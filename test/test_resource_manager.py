@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the CPU thread budget manager.
+
+Tests that:
+1. Torch threads are clamped so search workers never oversubscribe the budget
+2. Search, index and HNSW threads together stay within the budget for any core count
+3. Executor pools report queued, running and completed tasks
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.resource_manager import ResourceManager, ThreadBudget
+
+
+def test_budget_prevents_oversubscription(monkeypatch):
+    monkeypatch.setenv("RAG_CPU_BUDGET", "16")
+    monkeypatch.setenv("RAG_SEARCH_WORKERS", "4")
+    monkeypatch.setenv("RAG_TORCH_THREADS", "8")
+    budget = ThreadBudget()
+    assert budget.search_workers == 4
+    assert budget.torch_threads == 2
+    assert budget.cpu_threads <= budget.cpu_budget
+
+    monkeypatch.delenv("RAG_SEARCH_WORKERS")
+    monkeypatch.delenv("RAG_TORCH_THREADS")
+    budget = ThreadBudget()
+    assert (budget.torch_threads, budget.search_workers, budget.index_workers, budget.hnsw_threads) == (4, 2, 1, 2)
+    assert budget.cpu_threads == 14
+
+
+@pytest.mark.parametrize("cores", [3, 4, 6, 8, 12, 16, 24, 32, 64, 128])
+def test_cpu_bound_threads_fit_budget(monkeypatch, cores):
+    for name in ("RAG_TORCH_THREADS", "RAG_SEARCH_WORKERS", "RAG_HNSW_THREADS", "RAG_INDEX_WORKERS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("RAG_CPU_BUDGET", str(cores))
+
+    def total(budget):
+        return (budget.search_workers + budget.index_workers) * budget.torch_threads + budget.hnsw_threads
+
+    budget = ThreadBudget()
+    assert total(budget) == budget.cpu_threads <= cores
+    assert min(budget.search_workers, budget.index_workers, budget.torch_threads, budget.hnsw_threads) >= 1
+
+    # Settings sized for a bigger host are shrunk to fit
+    for name in ("RAG_TORCH_THREADS", "RAG_SEARCH_WORKERS", "RAG_HNSW_THREADS"):
+        monkeypatch.setenv(name, "16")
+    monkeypatch.setenv("RAG_INDEX_WORKERS", "8")
+    budget = ThreadBudget()
+    assert total(budget) <= cores
+    assert budget.index_workers >= 1 and budget.search_workers >= 1
+
+
+def test_executor_queue_depths():
+    manager = ResourceManager()
+    release = threading.Event()
+
+    async def main():
+        size = manager.executors["search"].size
+        tasks = [asyncio.ensure_future(manager.run("search", release.wait)) for _ in range(size + 2)]
+        await asyncio.sleep(0.05)
+        busy = manager.stats()["executors"]["search"]
+        release.set()
+        await asyncio.gather(*tasks)
+        return size, busy
+
+    size, busy = asyncio.run(main())
+    assert busy["running"] == size
+    assert busy["queued"] == 2
+    done = manager.stats()["executors"]["search"]
+    assert done["completed"] == size + 2 and done["queued"] == 0 and done["running"] == 0
+
+
+if __name__ == "__main__":
+    test_executor_queue_depths()
+    print("✓ All resource manager tests passed")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for response field projection.
+
+Tests that:
+1. Dotted field paths parse into a field tree
+2. wants() reports which parts of a response to load
+3. project() keeps only requested fields, element-wise in lists
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from response_fields import parse_fields, project, wants
+
+
+RESPONSE = {
+    "immediate": {
+        "files": ["a.pdf"],
+        "snippets": [{"content": "long text", "source": "a.pdf"}],
+        "model": "server"
+    },
+    "overview": "summary",
+    "model": "server"
+}
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields(" ") is None
+    assert parse_fields("immediate.files,overview") == {"immediate": {"files": True}, "overview": True}
+    # A parent path includes everything below it
+    assert parse_fields("immediate,immediate.files") == {"immediate": True}
+
+
+def test_wants():
+    fields = parse_fields("immediate.snippets.source")
+    assert wants(None, "overview")
+    assert wants(fields, "immediate.snippets")
+    assert wants(fields, "immediate.snippets.source")
+    assert not wants(fields, "immediate.snippets.content")
+    assert not wants(fields, "overview")
+    assert wants(parse_fields("immediate"), "immediate.snippets.content")
+
+
+def test_project():
+    assert project(RESPONSE, None) is RESPONSE
+    projected = project(RESPONSE, parse_fields("immediate.files,immediate.snippets.source"))
+    assert projected == {"immediate": {"files": ["a.pdf"], "snippets": [{"source": "a.pdf"}]}}
+
+
+if __name__ == "__main__":
+    test_parse_fields()
+    test_wants()
+    test_project()
+    print("✓ All response field tests passed")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the search explain trace.
+
+Tests that:
+1. Stages are timed and carry their details
+2. Keep/drop decisions are recorded and capped
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.timing_utils import SearchTrace
+
+
+def test_stages_counts_and_decisions():
+    trace = SearchTrace("what is graphtalk")
+    with trace.stage("vector_query", restricted_to_candidates=True) as stage:
+        stage["returned"] = 7
+    trace.add_stage("llm_overview", 1200.0)
+    trace.count("acl_filter", before=7, after=5, denied=2)
+    trace.decision("secret.pdf", False, "acl_denied", "acl_filter")
+    trace.decision("guide.md#3", True, "ranked", "ranking", 0.81234)
+
+    result = trace.to_dict()
+    assert result["slowest_stage"] == "llm_overview"
+    assert result["stages"][0]["returned"] == 7
+    assert result["stages"][0]["ms"] is not None
+    assert result["candidate_counts"]["acl_filter"]["denied"] == 2
+    assert result["decisions"][0]["reason"] == "acl_denied"
+    assert result["decisions"][1]["score"] == 0.8123
+
+
+def test_decisions_are_capped():
+    trace = SearchTrace("q")
+    for i in range(SearchTrace.MAX_DECISIONS + 10):
+        trace.decision(f"f#{i}", False, "max_results", "ranking")
+    result = trace.to_dict()
+    assert len(result["decisions"]) == SearchTrace.MAX_DECISIONS
+    assert result["decisions_truncated"] == 10
+
+
+if __name__ == "__main__":
+    test_stages_counts_and_decisions()
+    test_decisions_are_capped()
+    print("✓ All search trace tests passed")
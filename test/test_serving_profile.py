@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for the search serving profile.
+
+Tests that:
+1. The search profile app exposes exactly the search profile routes
+2. Write routes such as /upload are not mounted (404)
+3. Analytics, reports, CMS and feature modules are not imported
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from rag_api.serving_profile import SEARCH_PROFILE_PATHS
+
+FULL_PROFILE_MODULES = ["analytics_core", "advanced_analytics_api", "reports_api", "metrics_middleware",
+                        "routers.cms", "quiz_management", "plugin_manager", "quizdb", "opencart_catalog"]
+
+SEARCH_APP = f"""
+import json, sys
+from fastapi.testclient import TestClient
+import api
+
+client = TestClient(api.app)
+print(json.dumps({{
+    "paths": sorted({{route.path for route in api.app.router.routes}}),
+    "upload": client.post("/upload").status_code,
+    "files": client.get("/files/list").status_code,
+    "loaded": [m for m in {FULL_PROFILE_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def test_search_profile_mounts_only_search_routes(tmp_path):
+    # api.py creates its upload directory and databases in the working directory
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR), "RAG_SERVING_PROFILE": "search", "RAG_WARMUP_ON_STARTUP": "false"}
+    out = subprocess.run([sys.executable, "-c", SEARCH_APP], cwd=tmp_path, capture_output=True, text=True, env=env)
+    assert out.returncode == 0, f"Search profile app failed:\n{out.stderr[-2000:]}"
+    state = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert set(state["paths"]) == SEARCH_PROFILE_PATHS
+    assert state["upload"] == 404
+    assert state["files"] == 404
+    assert state["loaded"] == []
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for tenant shard routing.
+
+Tests that:
+1. Organizations map to a stable shard and spread over all shards
+2. Growing the ring moves only a fraction of organizations
+3. Searches touch the tenant and shared shards, or every shard without a tenant
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.shard_router import SHARED_TENANT, ConsistentHashRing, ShardRouter
+
+
+ORGS = [f"org-{i}" for i in range(1000)]
+
+
+def test_placement_is_stable_and_spread():
+    ring = ConsistentHashRing(4)
+    placement = [ring.shard_for(org) for org in ORGS]
+    assert placement == [ConsistentHashRing(4).shard_for(org) for org in ORGS]
+    counts = [placement.count(shard) for shard in range(4)]
+    assert min(counts) > 100
+    assert ConsistentHashRing(1).shard_for("org-1") == 0
+
+
+def test_adding_a_shard_moves_few_tenants():
+    before, after = ConsistentHashRing(4), ConsistentHashRing(5)
+    moved = sum(before.shard_for(org) != after.shard_for(org) for org in ORGS)
+    assert moved < len(ORGS) * 0.35
+    # Tenants only move onto the new shard
+    assert all(after.shard_for(org) == 4 for org in ORGS if before.shard_for(org) != after.shard_for(org))
+
+
+def test_search_shards():
+    router = ShardRouter(4)
+    shards = router.shards_for_search("org-7")
+    assert router.ring.shard_for("org-7") in shards
+    assert router.ring.shard_for(SHARED_TENANT) in shards
+    assert len(shards) <= 2
+    assert router.shards_for_search(None) == [0, 1, 2, 3]
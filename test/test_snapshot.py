@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for consistent index snapshots.
+
+Tests that:
+1. Snapshots capture Chroma and the SQLite databases as numbered generations
+2. Restore brings back the captured state and rejects modified snapshots
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.snapshot import SnapshotError, create_snapshot, list_snapshots, restore_snapshot
+from rag_api.write_gate import index_write_gate
+
+
+@pytest.fixture
+def live_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(index_write_gate, "lock_file", str(tmp_path / ".index_write.lock"))
+    chroma_dir = tmp_path / "chroma_db"
+    (chroma_dir / "segment-1").mkdir(parents=True)
+    (chroma_dir / "segment-1" / "data_level0.bin").write_bytes(b"vectors-v1")
+    sqlite3.connect(chroma_dir / "chroma.sqlite3").execute("CREATE TABLE embeddings (id INTEGER)").connection.commit()
+
+    rag_db = tmp_path / "rag_app.db"
+    conn = sqlite3.connect(rag_db)
+    conn.execute("CREATE TABLE document_store (id INTEGER PRIMARY KEY, filename TEXT)")
+    conn.execute("INSERT INTO document_store (filename) VALUES ('guide.pdf')")
+    conn.commit()
+    conn.close()
+
+    users_db = tmp_path / "users.db"
+    sqlite3.connect(users_db).execute("CREATE TABLE users (username TEXT)").connection.commit()
+
+    return {
+        "chroma_dir": str(chroma_dir),
+        "databases": {"rag_app.db": str(rag_db), "users.db": str(users_db)},
+    }
+
+
+def test_snapshot_and_restore(live_index, tmp_path):
+    snapshots = str(tmp_path / "snapshots")
+    first = create_snapshot(snapshots, live_index)
+    assert first["generation"] == 1 and first["document_count"] == 1
+    assert "chroma_db/segment-1/data_level0.bin" in first["files"]
+
+    # Change the live index after the snapshot
+    conn = sqlite3.connect(live_index["databases"]["rag_app.db"])
+    conn.execute("INSERT INTO document_store (filename) VALUES ('new.pdf')")
+    conn.commit()
+    conn.close()
+    Path(live_index["chroma_dir"], "segment-1", "data_level0.bin").write_bytes(b"vectors-v2")
+
+    second = create_snapshot(snapshots, live_index)
+    assert second["generation"] == 2 and second["parent_generation"] == 1
+    assert [s["generation"] for s in list_snapshots(snapshots)] == [1, 2]
+
+    restore_snapshot(1, snapshots, live_index)
+    conn = sqlite3.connect(live_index["databases"]["rag_app.db"])
+    assert conn.execute("SELECT COUNT(*) FROM document_store").fetchone()[0] == 1
+    conn.close()
+    assert Path(live_index["chroma_dir"], "segment-1", "data_level0.bin").read_bytes() == b"vectors-v1"
+
+
+def test_modified_snapshot_is_rejected(live_index, tmp_path):
+    snapshots = str(tmp_path / "snapshots")
+    create_snapshot(snapshots, live_index)
+    Path(snapshots, "gen-000001", "chroma_db", "segment-1", "data_level0.bin").write_bytes(b"corrupt")
+    with pytest.raises(SnapshotError):
+        restore_snapshot(None, snapshots, live_index)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for bounded-memory ingestion storage.
+
+Tests that:
+1. Uploaded files are copied into document_store incrementally and read back intact
+2. Chunks indexed in batches accumulate in document_chunks
+3. Chunk vector IDs are recorded for direct deletes, unless a chunk predates them
+"""
+
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api import db_utils
+from rag_api.write_gate import index_write_gate
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DB_NAME", str(tmp_path / "rag_app.db"))
+    monkeypatch.setattr(index_write_gate, "lock_file", str(tmp_path / ".index_write.lock"))
+    db_utils.create_document_store()
+    db_utils.create_document_chunks()
+    return tmp_path
+
+
+def test_blob_streamed_from_file(db):
+    content = os.urandom(300_000)
+    upload = db / "manual.pdf"
+    upload.write_bytes(content)
+
+    file_id = db_utils.insert_document_record_from_file("manual.pdf", str(upload), organization_id="org", chunk_size=4096)
+    stored = db_utils.get_file_content_by_id(file_id, "org")
+    assert stored["content"] == content
+
+    empty = db / "empty.txt"
+    empty.write_bytes(b"")
+    assert db_utils.get_file_content_by_id(db_utils.insert_document_record_from_file("empty.txt", str(empty)))["content"] == b""
+
+
+def test_chunks_appended_in_batches(db):
+    chunk = lambda i: SimpleNamespace(page_content=f"chunk {i}", metadata={"chunk_index": i, "segment_index": i // 2})
+    db_utils.append_document_chunks(7, [chunk(0), chunk(1)])
+    db_utils.append_document_chunks(7, [chunk(2)])
+    assert [row["content"] for row in db_utils.get_document_chunks(7)] == ["chunk 0", "chunk 1", "chunk 2"]
+
+
+def test_chunk_vector_ids(db):
+    chunk = lambda i, vector_id: SimpleNamespace(page_content=f"chunk {i}", metadata={"chunk_index": i, "vector_id": vector_id})
+    db_utils.replace_document_chunks(3, [chunk(0, "3:0:aa"), chunk(1, "3:1:bb")])
+    assert db_utils.get_chunk_vector_ids(3) == ["3:0:aa", "3:1:bb"]
+
+    db_utils.append_document_chunks(3, [chunk(2, None)])
+    assert db_utils.get_chunk_vector_ids(3) is None
+    assert db_utils.get_chunk_vector_ids(4) is None
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the precomputed title index.
+
+Tests that:
+1. Titles and outlines are extracted from loaded documents
+2. Title lookups resolve prefixes and near matches to files
+3. Cached indexes follow title changes written by another process
+"""
+
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+
+@pytest.fixture
+def title_index(tmp_path, monkeypatch):
+    # db_utils creates rag_app.db in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("rag_api.title_index")
+
+
+def test_extract_outline_prefers_metadata_then_headings(title_index):
+    docs = [SimpleNamespace(page_content="# Installation Guide\n\n## Requirements\ntext\n## Setup", metadata={})]
+    outline = title_index.extract_document_outline("install.md", docs)
+    assert outline["title"] == "Installation Guide"
+    assert outline["headings"] == ["Installation Guide", "Requirements", "Setup"]
+    assert outline["outline"][1] == {"level": 2, "heading": "Requirements"}
+
+    docs = [SimpleNamespace(page_content="plain text", metadata={"title": "Annual Report"})]
+    assert title_index.extract_document_outline("r.pdf", docs)["title"] == "Annual Report"
+
+    docs = [SimpleNamespace(page_content="no headings", metadata={})]
+    assert title_index.extract_document_outline("price_list.txt", docs)["title"] == "price list"
+
+
+def test_lookup_by_prefix_and_fuzzy(title_index):
+    index = title_index.TitleIndex([
+        {"filename": "install.md", "title": "Installation Guide", "headings": ["Requirements"]},
+        {"filename": "report.pdf", "title": "Annual Report 2024", "headings": []},
+    ])
+    assert index.lookup("install")[0]["filename"] == "install.md"
+    assert index.lookup("anual report")[0]["filename"] == "report.pdf"
+    assert index.files_by_title["Installation Guide"] == ["install.md"]
+    assert index.lookup("zzzz qqqq") == []
+
+
+def test_cached_index_follows_other_process_writes(title_index, monkeypatch):
+    db_utils = importlib.import_module("rag_api.db_utils")
+    db_utils.create_document_titles()
+    monkeypatch.setattr(title_index, "CHECK_INTERVAL_SECONDS", 0)
+    db_utils.upsert_document_title(1, "install.md", "org-a", "Installation Guide", [], [])
+    assert title_index.get_title_for_file("install.md", "org-a") == "Installation Guide"
+
+    # Another worker changes the table without touching this process's cache
+    db_utils.upsert_document_title(1, "install.md", "org-a", "Setup Guide", [], [])
+    assert title_index.get_title_for_file("install.md", "org-a") == "Setup Guide"
+    db_utils.delete_document_title(1)
+    assert title_index.get_title_for_file("install.md", "org-a") is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming ZIP ingestion limits.
+
+Tests that:
+1. Entries are filtered by type and declared size, with reasons
+2. Archives declaring too many bytes are rejected before anything is read
+3. Decompressed bytes are counted against the entry and archive budgets
+4. UTF-8 names stored without the UTF-8 flag are repaired
+"""
+
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from rag_api.zip_ingest import ArchiveBudget, ZipBombError, decode_entry_name, select_entries
+
+
+def make_zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries.items():
+            zf.writestr(name, data)
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer)
+
+
+def test_select_filters_by_type_and_size():
+    zf = make_zip({"a.txt": "hello", "b.exe": "x", "big.pdf": "0" * 2000, "__MACOSX/._a.txt": "", "docs/c.md": "# c"})
+    selected, skipped = select_entries(zf, max_entry_bytes=1000)
+
+    assert [name for _, name in selected] == ["a.txt", "docs/c.md"]
+    reasons = {entry["entry"]: entry["reason"] for entry in skipped}
+    assert reasons["b.exe"].startswith("unsupported")
+    assert reasons["big.pdf"].startswith("larger than")
+    assert reasons["__MACOSX/._a.txt"] == "archive metadata"
+
+
+def test_declared_total_is_checked_up_front():
+    zf = make_zip({f"{i}.txt": "0" * 600 for i in range(3)})
+    with pytest.raises(ZipBombError):
+        select_entries(zf, max_total_bytes=1000)
+    with pytest.raises(ZipBombError):
+        select_entries(zf, max_entries=2)
+
+
+def test_decompressed_bytes_are_budgeted():
+    zf = make_zip({"a.txt": "0" * 600, "b.txt": "0" * 600})
+    budget = ArchiveBudget(max_entry_bytes=1000, max_total_bytes=1000)
+
+    assert budget.read_entry(zf, zf.getinfo("a.txt")).read() == b"0" * 600
+    with pytest.raises(ZipBombError):
+        budget.read_entry(zf, zf.getinfo("b.txt"))
+
+    # Reading stops once an entry passes its limit, whatever the header declares
+    info = zf.getinfo("a.txt")
+    with pytest.raises(ZipBombError):
+        ArchiveBudget(max_entry_bytes=100).read_entry(zf, info)
+
+
+def test_decode_entry_name():
+    info = zipfile.ZipInfo("отчёт.txt".encode("utf-8").decode("cp437"))
+    assert decode_entry_name(info) == "отчёт.txt"
+
+    flagged = zipfile.ZipInfo("plain.txt")
+    flagged.flag_bits |= 0x800
+    assert decode_entry_name(flagged) == "plain.txt"